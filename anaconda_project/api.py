@@ -31,7 +31,7 @@ class AnacondaProject(object):
         """Construct an API instance."""
         pass
 
-    def load_project(self, directory_path, frontend):
+    def load_project(self, directory_path, frontend, compiled_cache=False):
         """Load a project from the given directory.
 
         If there's a problem, the returned Project instance will
@@ -44,12 +44,14 @@ class AnacondaProject(object):
         Args:
             directory_path (str): path to the project directory
             frontend (Frontend): UX abstraction
+            compiled_cache (bool): reuse a snapshot of the configuration if the project files haven't changed,
+                                   and otherwise parse them quickly for reading
 
         Returns:
             a Project instance
 
         """
-        return project.Project(directory_path=directory_path, frontend=frontend)
+        return project.Project(directory_path=directory_path, frontend=frontend, compiled_cache=compiled_cache)
 
     def create_project(self, directory_path, make_directory=False, name=None, icon=None, description=None):
         """Create a project skeleton in the given directory.
@@ -82,7 +84,8 @@ class AnacondaProject(object):
                                 env_spec_name=None,
                                 command_name=None,
                                 command=None,
-                                extra_command_args=None):
+                                extra_command_args=None,
+                                use_fingerprint=False):
         """Prepare a project to run one of its commands.
 
         "Locally" means a machine where development will go on,
@@ -122,6 +125,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            use_fingerprint (bool): reuse the last successful prepare if none of its inputs changed
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -134,7 +138,8 @@ class AnacondaProject(object):
             env_spec_name=env_spec_name,
             command_name=command_name,
             command=command,
-            extra_command_args=extra_command_args)
+            extra_command_args=extra_command_args,
+            use_fingerprint=use_fingerprint)
 
     def prepare_project_production(self,
                                    project,
@@ -142,7 +147,8 @@ class AnacondaProject(object):
                                    env_spec_name=None,
                                    command_name=None,
                                    command=None,
-                                   extra_command_args=None):
+                                   extra_command_args=None,
+                                   use_fingerprint=False):
         """Prepare a project to run one of its commands.
 
         "Production" means some sort of production deployment, so
@@ -166,6 +172,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            use_fingerprint (bool): reuse the last successful prepare if none of its inputs changed
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -178,7 +185,8 @@ class AnacondaProject(object):
             env_spec_name=env_spec_name,
             command_name=command_name,
             command=command,
-            extra_command_args=extra_command_args)
+            extra_command_args=extra_command_args,
+            use_fingerprint=use_fingerprint)
 
     def prepare_project_check(self,
                               project,
@@ -186,7 +194,8 @@ class AnacondaProject(object):
                               env_spec_name=None,
                               command_name=None,
                               command=None,
-                              extra_command_args=None):
+                              extra_command_args=None,
+                              use_fingerprint=False):
         """Prepare a project to run one of its commands.
 
         This version only checks the status of the project's
@@ -205,6 +214,7 @@ class AnacondaProject(object):
             command_name (str): which named command to choose from the project, None for default
             command (ProjectCommand): a command object (alternative to command_name)
             extra_command_args (list): extra args to include in the returned command argv
+            use_fingerprint (bool): reuse the last successful prepare if none of its inputs changed
 
         Returns:
             a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -217,7 +227,42 @@ class AnacondaProject(object):
             env_spec_name=env_spec_name,
             command_name=command_name,
             command=command,
-            extra_command_args=extra_command_args)
+            extra_command_args=extra_command_args,
+            use_fingerprint=use_fingerprint)
+
+    def prepare_projects(self,
+                         directory_path,
+                         environ,
+                         frontend,
+                         mode=provide.PROVIDE_MODE_DEVELOPMENT,
+                         env_spec_name=None,
+                         max_workers=None):
+        """Prepare every project in a directory tree.
+
+        Work shared by several projects, such as building an
+        environment with the same locked packages or downloading
+        the same file, is only done once, and projects that don't
+        share work are prepared concurrently.
+
+        Args:
+            directory_path (str): root of the tree of projects
+            environ (dict): os.environ or the previously-prepared environ; not modified in-place
+            frontend (Frontend): UX abstraction, gets each project's output once it's prepared
+            mode (str): mode from ``PROVIDE_MODE_PRODUCTION``, ``PROVIDE_MODE_DEVELOPMENT``, ``PROVIDE_MODE_CHECK``
+            env_spec_name (str): the package set name to require, or None for each project's default
+            max_workers (int): how many projects to prepare at once, None for the default
+
+        Returns:
+            list of ``(Project, PrepareResult)`` in directory order
+
+        """
+        return project_ops.prepare_projects(
+            directory_path=directory_path,
+            environ=environ,
+            frontend=frontend,
+            mode=mode,
+            env_spec_name=env_spec_name,
+            max_workers=max_workers)
 
     def unprepare(self, project, prepare_result, whitelist=None):
         """Attempt to clean up project-scoped resources allocated by prepare().
@@ -21,7 +21,8 @@ import uuid
 import zipfile
 
 from anaconda_project.frontend import _new_error_recorder
-from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal import file_index, logged_subprocess, user_cache
+from anaconda_project.internal.prepare_fingerprint import path_state
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal.directory_contains import subdirectory_relative_to_directory
 from anaconda_project.internal.rename import rename_over_existing
@@ -40,6 +41,10 @@ class _FileInfo(object):
         self.is_directory = is_directory
 
 
+class _FilterFailed(Exception):
+    pass
+
+
 def _list_project(project_directory, ignore_filter, frontend):
     try:
         file_infos = []
@@ -208,16 +213,20 @@ def _ignore_file_filter(project_directory, frontend):
     return matches_some_pattern
 
 
-def _enumerate_archive_files(project_directory, frontend, requirements):
+def _plugin_ignore_patterns(requirements):
+    plugin_patterns = set()
+    for req in requirements:
+        plugin_patterns = plugin_patterns.union(req.ignore_patterns)
+    return plugin_patterns
+
+
+def _project_filter(project_directory, frontend, requirements):
     git_filter = _git_filter(project_directory, frontend)
     ignore_file_filter = _ignore_file_filter(project_directory, frontend)
     if git_filter is None or ignore_file_filter is None:
         return None
 
-    plugin_patterns = set()
-    for req in requirements:
-        plugin_patterns = plugin_patterns.union(req.ignore_patterns)
-    plugin_patterns = [_FilePattern(s) for s in plugin_patterns]
+    plugin_patterns = [_FilePattern(s) for s in _plugin_ignore_patterns(requirements)]
 
     def is_plugin_generated(info):
         for pattern in plugin_patterns:
@@ -228,6 +237,14 @@ def _enumerate_archive_files(project_directory, frontend, requirements):
     def all_filters(info):
         return git_filter(info) or ignore_file_filter(info) or is_plugin_generated(info)
 
+    return all_filters
+
+
+def _enumerate_archive_files(project_directory, frontend, requirements):
+    all_filters = _project_filter(project_directory, frontend, requirements)
+    if all_filters is None:
+        return None
+
     infos = _list_project(project_directory, all_filters, frontend)
     if infos is None:
         return None
@@ -271,11 +288,71 @@ def _write_zip(archive_root_name, infos, filename, frontend):
 
 
 # function exported for project.py
+def _ignore_file_states(project_directory, directories):
+    # the files that decide what's ignored, besides the requirements
+    names = [".projectignore"]
+    if os.path.exists(os.path.join(project_directory, ".git")):
+        names.extend([os.path.join(".git", "index"), os.path.join(".git", "info", "exclude")])
+        names.extend(
+            os.path.join(relative_dir, ".gitignore") for (relative_dir, entry) in sorted(directories.items())
+            if ".gitignore" in entry[1])
+    return [[name, path_state(os.path.join(project_directory, name))] for name in names]
+
+
 def _list_relative_paths_for_unignored_project_files(project_directory, frontend, requirements):
-    infos = _enumerate_archive_files(project_directory, frontend, requirements=requirements)
-    if infos is None:
+    """List the relative paths of the files and directories that aren't ignored.
+
+    This is the same list of files we'd archive, but we keep an
+    index of them (see ``file_index``) so listing them again is
+    cheap when little or nothing changed.
+    """
+    project_filter = []
+
+    def list_directory(relative_dir):
+        if len(project_filter) == 0:
+            ignore_filter = _project_filter(project_directory, frontend, requirements)
+            if ignore_filter is None:
+                raise _FilterFailed()
+            project_filter.append(ignore_filter)
+
+        path = os.path.join(project_directory, relative_dir)
+        files = []
+        subdirectories = []
+        for name in sorted(os.listdir(path)):
+            full_path = os.path.join(path, name)
+            is_directory = os.path.isdir(full_path)
+            info = _FileInfo(project_directory=project_directory, filename=full_path, is_directory=is_directory)
+            if not project_filter[0](info):
+                (subdirectories if is_directory else files).append(name)
+        return (files, subdirectories)
+
+    def key_for(directories):
+        return dict(
+            patterns=sorted(_plugin_ignore_patterns(requirements)),
+            ignore_files=_ignore_file_states(project_directory, directories))
+
+    (saved_key, saved_directories) = file_index.load_index(project_directory)
+    if not user_cache.key_matches(saved_key, key_for(saved_directories)):
+        saved_directories = dict()
+
+    try:
+        (directories, changed) = file_index.update_index(project_directory, saved_directories, list_directory)
+        key = key_for(directories)
+        if len(saved_directories) > 0 and not user_cache.key_matches(saved_key, key):
+            # a .gitignore appeared, which may ignore things we
+            # didn't list again because their directory didn't change.
+            (directories, changed) = file_index.update_index(project_directory, dict(), list_directory)
+            key = key_for(directories)
+    except _FilterFailed:
         return None
-    return [info.relative_path for info in infos]
+    except OSError as e:
+        frontend.error("Could not list files in %s: %s." % (project_directory, str(e)))
+        return None
+
+    if changed:
+        file_index.save_index(project_directory, key, directories)
+
+    return file_index.relative_paths(directories)
 
 
 # function exported for project_ops.py
@@ -9,8 +9,10 @@
 from __future__ import absolute_import
 
 from abc import ABCMeta, abstractmethod
+import contextlib
 from copy import deepcopy
 import difflib
+import threading
 
 from anaconda_project.yaml_file import (_CommentedMap, _CommentedSeq, _block_style_all_nodes)
 from anaconda_project.internal.metaclass import with_metaclass
@@ -45,6 +47,69 @@ def new_conda_manager(frontend=None):
     return klass(frontend=frontend)
 
 
+class _DeviationCache(object):
+    """Remembers ``find_environment_deviations()`` results during one prepare.
+
+    Keys are tuples starting with the environment prefix, and should
+    include whatever else would change the deviations (such as the
+    env spec hash and the state of the environment). ``invalidate()``
+    must be called after modifying an environment.
+
+    The ``computed`` and ``reused`` counters record how many times
+    deviations were actually computed or found here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deviations = dict()
+        self.computed = 0
+        self.reused = 0
+
+    def get(self, key):
+        with self._lock:
+            deviations = self._deviations.get(key, None)
+            if deviations is not None:
+                self.reused += 1
+            return deviations
+
+    def put(self, key, deviations):
+        with self._lock:
+            self.computed += 1
+            self._deviations[key] = deviations
+
+    def invalidate(self, prefix):
+        with self._lock:
+            for key in list(self._deviations.keys()):
+                if key[0] == prefix:
+                    del self._deviations[key]
+
+    @property
+    def counts(self):
+        with self._lock:
+            return dict(computed=self.computed, reused=self.reused)
+
+
+# the deviation cache in use is per-thread, so that prepares
+# running on different threads don't share counters.
+_deviation_cache_state = threading.local()
+
+
+@contextlib.contextmanager
+def _deviation_cache_scope(cache):
+    """Use the given ``_DeviationCache`` (or None) on this thread while in the ``with`` block."""
+    previous = getattr(_deviation_cache_state, 'cache', None)
+    _deviation_cache_state.cache = cache
+    try:
+        yield cache
+    finally:
+        _deviation_cache_state.cache = previous
+
+
+def _current_deviation_cache():
+    """Get the ``_DeviationCache`` for this thread, or None."""
+    return getattr(_deviation_cache_state, 'cache', None)
+
+
 class CondaManagerError(Exception):
     """General Conda error."""
 
@@ -254,10 +319,53 @@ def _pretty_diff(old_list, new_list, indent):
     return list(diff)
 
 
+def _diff_by_platform(new_by_platform, old_by_platform, section_name):
+    # "old_by_platform" can be None to mean diff vs. nothing.
+    keys = list(new_by_platform.keys())
+    if old_by_platform is not None:
+        keys = keys + list(old_by_platform.keys())
+        # de-dup
+        keys = list(set(keys))
+
+    # sort nicely
+    keys = conda_api.sort_platform_list(keys)
+
+    result = []
+    for key in keys:
+        if old_by_platform is None:
+            old_list = []
+        else:
+            old_list = old_by_platform.get(key, [])
+
+        new_list = new_by_platform.get(key, [])
+
+        diff = _pretty_diff(old_list, new_list, indent="    ")
+
+        if diff:
+            if old_by_platform is None or key not in old_by_platform:
+                result.append("+   %s:" % key)
+            elif key not in new_by_platform:
+                result.append("-   %s:" % key)
+            else:
+                result.append("    %s:" % key)
+            result.extend(diff)
+
+    if result:
+        result = ['  %s:' % section_name] + result
+
+    return result
+
+
 class CondaLockSet(object):
     """Represents a locked set of package versions."""
 
-    def __init__(self, package_specs_by_platform, platforms, enabled=True, env_spec_hash=None, missing=False):
+    def __init__(self,
+                 package_specs_by_platform,
+                 platforms,
+                 enabled=True,
+                 env_spec_hash=None,
+                 missing=False,
+                 package_urls_by_platform=None):
         """Construct a ``CondaLockSet``.
 
         The passed-in dict should be like:
@@ -267,14 +375,25 @@ class CondaLockSet(object):
            "linux-64" : [ "libffi=1.2=0" ]
         }
 
+        The optional package URLs are per concrete platform (no
+        "all" or "unix" here), in the format of an @EXPLICIT file:
+
+        {
+           "linux-64" : [ "https://repo.anaconda.com/pkgs/main/linux-64/libffi-1.2-0.tar.bz2#<md5>" ]
+        }
+
         Args:
           packages_by_platform (dict): dict from platform to spec list
           platforms (list of str): platform list
+          package_urls_by_platform (dict): dict from platform to full list of package URLs
         """
         assert package_specs_by_platform is not None
         assert platforms is not None
+        if package_urls_by_platform is None:
+            package_urls_by_platform = dict()
         # we deepcopy this to avoid sharing issues
         self._package_specs_by_platform = deepcopy(package_specs_by_platform)
+        self._package_urls_by_platform = deepcopy(package_urls_by_platform)
         self._platforms = tuple(conda_api.sort_platform_list(platforms))
         self._enabled = enabled
         self._env_spec_hash = env_spec_hash
@@ -324,6 +443,7 @@ class CondaLockSet(object):
         # use this to test whether the lock set for an old env
         # spec is the same as the one for a new env spec.
         return self._package_specs_by_platform == other._package_specs_by_platform and \
+            self._package_urls_by_platform == other._package_urls_by_platform and \
             self._platforms == other._platforms and \
             self._enabled is other._enabled
 
@@ -332,37 +452,14 @@ class CondaLockSet(object):
 
         "old" can be None to mean diff vs. nothing.
         """
-        keys = list(self._package_specs_by_platform.keys())
-        if old is not None:
-            keys = keys + list(old._package_specs_by_platform.keys())
-            # de-dup
-            keys = list(set(keys))
-
-        # sort nicely
-        keys = conda_api.sort_platform_list(keys)
-
-        packages_diff = []
-        for key in keys:
-            if old is None:
-                old_list = []
-            else:
-                old_list = old._package_specs_by_platform.get(key, [])
-
-            new_list = self._package_specs_by_platform.get(key, [])
-
-            diff = _pretty_diff(old_list, new_list, indent="    ")
-
-            if diff:
-                if old is None or key not in old._package_specs_by_platform:
-                    packages_diff.append("+   %s:" % key)
-                elif key not in self._package_specs_by_platform:
-                    packages_diff.append("-   %s:" % key)
-                else:
-                    packages_diff.append("    %s:" % key)
-                packages_diff.extend(map(lambda x: x, diff))
-
-        if packages_diff:
-            packages_diff = ['  packages:'] + packages_diff
+        if old is None:
+            packages_diff = _diff_by_platform(self._package_specs_by_platform, None, 'packages')
+            urls_diff = _diff_by_platform(self._package_urls_by_platform, None, 'package_urls')
+        else:
+            packages_diff = _diff_by_platform(self._package_specs_by_platform, old._package_specs_by_platform,
+                                              'packages')
+            urls_diff = _diff_by_platform(self._package_urls_by_platform, old._package_urls_by_platform,
+                                          'package_urls')
 
         if old is None:
             old_platforms = []
@@ -372,7 +469,7 @@ class CondaLockSet(object):
         if platforms_diff:
             platforms_diff = ['  platforms:'] + platforms_diff
 
-        return "\n".join(platforms_diff + packages_diff)
+        return "\n".join(platforms_diff + packages_diff + urls_diff)
 
     def package_specs_for_platform(self, platform):
         """Sequence of package spec strings for the requested platform."""
@@ -400,6 +497,22 @@ class CondaLockSet(object):
         assert self.supports_current_platform
         return self.package_specs_for_platform(platform=conda_api.current_platform())
 
+    def package_urls_for_platform(self, platform):
+        """Sequence of package URLs for the requested platform, or None if not recorded.
+
+        If present, these are the exact packages to install, without
+        running the conda solver.
+        """
+        assert platform in self.platforms
+        assert self.enabled
+        return self._package_urls_by_platform.get(platform, None)
+
+    @property
+    def package_urls_for_current_platform(self):
+        """Sequence of package URLs for the current platform, or None if not recorded."""
+        assert self.supports_current_platform
+        return self.package_urls_for_platform(platform=conda_api.current_platform())
+
     @property
     def supports_current_platform(self):
         """Whether we have locked deps for the current platform."""
@@ -427,5 +540,14 @@ class CondaLockSet(object):
             packages_dict[platform] = packages
         yaml_dict['packages'] = packages_dict
 
+        if len(self._package_urls_by_platform) > 0:
+            urls_dict = _CommentedMap()
+            for platform in conda_api.sort_platform_list(self._package_urls_by_platform.keys()):
+                urls = _CommentedSeq()
+                for url in self._package_urls_by_platform[platform]:
+                    urls.append(url)
+                urls_dict[platform] = urls
+            yaml_dict['package_urls'] = urls_dict
+
         _block_style_all_nodes(yaml_dict)
         return yaml_dict
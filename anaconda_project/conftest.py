@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_user_cache(monkeypatch, tmpdir):
+    # keep tests from reading or writing the real per-user cache
+    # (for example, a cached "conda info" would hide a mocked one)
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', str(tmpdir.join('user-cache')))
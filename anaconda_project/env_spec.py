@@ -14,6 +14,7 @@ import os
 import re
 
 import anaconda_project.internal.conda_api as conda_api
+import anaconda_project.internal.env_store as env_store
 import anaconda_project.internal.pip_api as pip_api
 from anaconda_project.internal.py2_compat import is_string
 
@@ -280,6 +281,17 @@ class EnvSpec(object):
         else:
             return self.conda_packages
 
+    @property
+    def conda_package_urls_for_create(self):
+        """Get the exact package URLs from the lock set, or None if it doesn't have them.
+
+        If we have these, we can create the environment without the conda solver.
+        """
+        if self._lock_set is not None and self._lock_set.enabled and self._lock_set.supports_current_platform:
+            return self._lock_set.package_urls_for_current_platform
+        else:
+            return None
+
     def _specs_for_package_names(self, names, mapping):
         specs = []
         for name in names:
@@ -307,7 +319,16 @@ class EnvSpec(object):
         return self._inherit_from_names
 
     def path(self, project_dir):
-        """The filesystem path to the default conda env containing our packages."""
+        """The filesystem path to the default conda env containing our packages.
+
+        If the shared environment store is enabled, this is the
+        store's environment for our locked packages, rather than
+        one inside the project.
+        """
+        shared_envs_path = env_store.shared_envs_path()
+        if shared_envs_path is not None:
+            return os.path.join(shared_envs_path, self.locked_hash)
+
         envs_path = os.environ.get('ANACONDA_PROJECT_ENVS_PATH', os.path.join(project_dir, "envs"))
 
         return os.path.join(envs_path, self.name)
@@ -136,3 +136,41 @@ class _ErrorRecordingFrontendProxy(Frontend):
 
 def _new_error_recorder(frontend):
     return _ErrorRecordingFrontendProxy(frontend)
+
+
+class _BufferedFrontend(Frontend):
+    """Frontend which saves messages so they can be replayed later.
+
+    This is for work done on another thread, whose output would
+    otherwise interleave unpredictably with other output.
+    """
+
+    def __init__(self):
+        super(_BufferedFrontend, self).__init__()
+        self._messages = []
+
+    def info(self, message):
+        """Log an info-level message."""
+        self._messages.append((False, message))
+
+    def error(self, message):
+        """Log an error-level message."""
+        self._messages.append((True, message))
+
+    def pop_messages(self):
+        """Remove and return all messages so far, as (is_error, message) tuples."""
+        messages = self._messages
+        self._messages = []
+        return messages
+
+    def replay(self, frontend):
+        """Send all messages so far to another frontend, in order."""
+        for (is_error, message) in self.pop_messages():
+            if is_error:
+                frontend.error(message)
+            else:
+                frontend.info(message)
+
+
+def _new_buffered_frontend():
+    return _BufferedFrontend()
@@ -15,6 +15,7 @@ try:
 except ImportError:  # pragma: no cover (py2 only)
     from pipes import quote
 
+from anaconda_project.internal.cli import daemon_client
 from anaconda_project.internal.cli.prepare_with_mode import prepare_with_ui_mode_printing_errors
 from anaconda_project.internal.cli.project_load import load_project
 
@@ -27,18 +28,23 @@ def activate(dirname, ui_mode, conda_environment, command_name):
     Returns:
         None on failure or a list of lines to print.
     """
-    project = load_project(dirname)
-    result = prepare_with_ui_mode_printing_errors(
-        project, ui_mode=ui_mode, env_spec_name=conda_environment, command_name=command_name)
-    if result.failed:
-        return None
+    response = daemon_client.prepare_in_daemon('activate', dirname, ui_mode, conda_environment, command_name)
+    if response is not None:
+        environ = response['environ']
+    else:
+        project = load_project(dirname, read_only=True)
+        result = prepare_with_ui_mode_printing_errors(
+            project, ui_mode=ui_mode, env_spec_name=conda_environment, command_name=command_name)
+        if result.failed:
+            return None
+        environ = result.environ
 
     exports = []
     # sort so we have deterministic output order for tests
-    sorted_keys = list(result.environ.keys())
+    sorted_keys = list(environ.keys())
     sorted_keys.sort()
     for key in sorted_keys:
-        value = result.environ[key]
+        value = environ[key]
         if key not in os.environ or os.environ[key] != value:
             exports.append("export {key}={value}".format(key=key, value=quote(value)))
     return exports
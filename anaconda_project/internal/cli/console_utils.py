@@ -11,6 +11,8 @@ from __future__ import absolute_import, print_function
 import getpass
 import sys
 
+from anaconda_project.internal.timings import format_timings
+
 _PY2 = sys.version_info[0] == 2
 
 
@@ -25,6 +27,15 @@ def print_project_problems(project):
         return False
 
 
+def print_project_suggestions(suggestions):
+    """Print a project's suggestions (potential issues), if it has any."""
+    if len(suggestions) > 0:
+        print("Potential issues with this project:")
+        for suggestion in suggestions:
+            print("  * " + suggestion)
+        print("")
+
+
 def print_status_errors(status):
     """Print out status description to stderr."""
     assert status is not None
@@ -33,6 +44,12 @@ def print_status_errors(status):
     print(status.status_description, file=sys.stderr)
 
 
+def print_timings(timings):
+    """Print a table of prepare timings to stderr, slowest first."""
+    for line in format_timings(timings):
+        print(line, file=sys.stderr)
+
+
 def format_names_and_descriptions(objects, name_attr='name', description_attr='description'):
     """Format a table with names on the left and descriptions on the right."""
     pairs = []
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""The ``daemon`` command keeps projects loaded, so ``prepare``, ``run`` and ``activate`` start faster.
+
+The daemon listens on a UNIX socket (see ``daemon_client``). Each
+request is one line of JSON, and so is each response. A project
+is reloaded when its project file, lock file, or the list of files
+in its directory changes; prepare rereads the local state file
+itself.
+"""
+from __future__ import absolute_import, print_function
+
+import collections
+import json
+import os
+import sys
+import threading
+
+try:
+    from socketserver import StreamRequestHandler, ThreadingMixIn, UnixStreamServer  # pragma: no cover (py3 only)
+except ImportError:  # pragma: no cover (py2 only)
+    from SocketServer import StreamRequestHandler, ThreadingMixIn, UnixStreamServer  # pragma: no cover (py2 only)
+
+from anaconda_project import prepare
+from anaconda_project.frontend import _new_buffered_frontend
+from anaconda_project.project import Project
+from anaconda_project.project_file import possible_project_file_names
+from anaconda_project.project_lock_file import possible_project_lock_file_names
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.cli import daemon_client
+from anaconda_project.internal.cli.prepare_with_mode import provide_mode_without_asking
+from anaconda_project.internal.cli.run import _command_from_name
+
+_MAX_WARM_PROJECTS = 32
+
+
+def _directory_signature(directory_path):
+    """Get something that changes when the project needs reloading."""
+    signature = []
+    for name in (os.curdir, ) + possible_project_file_names + possible_project_lock_file_names:
+        try:
+            info = os.stat(os.path.join(directory_path, name))
+        except OSError:
+            continue
+        signature.append((name, info.st_mtime, info.st_size))
+    return tuple(signature)
+
+
+class _WarmProject(object):
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        self.lock = threading.Lock()
+        self.output = _new_buffered_frontend()
+        self._signature = None
+        self._project = None
+
+    def refresh(self):
+        """Get the project, reloading it if its files changed; call with ``lock`` held."""
+        # stat before loading, so a change while we load means
+        # we load again next time.
+        signature = _directory_signature(self.directory_path)
+        if self._project is None or signature != self._signature:
+            self._project = Project(self.directory_path, frontend=self.output, must_exist=True)
+            self._signature = signature
+        return self._project
+
+
+class PrepareDaemon(object):
+    """Prepares projects on behalf of CLI commands, keeping recently-used projects loaded."""
+
+    def __init__(self, max_projects=_MAX_WARM_PROJECTS, environ=None):
+        """Construct a PrepareDaemon.
+
+        Args:
+            max_projects (int): how many projects to keep loaded
+            environ (dict): our own environment, None for os.environ
+        """
+        if environ is None:
+            environ = os.environ
+        self._settings = daemon_client.settings_from_environ(environ)
+        self._max_projects = max_projects
+        self._projects = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _warm_project(self, directory_path):
+        with self._lock:
+            warm = self._projects.pop(directory_path, None)
+            if warm is None:
+                warm = _WarmProject(directory_path)
+            self._projects[directory_path] = warm
+            while len(self._projects) > self._max_projects:
+                self._projects.popitem(last=False)
+            return warm
+
+    def handle_request(self, request):
+        """Prepare a project as the client asks.
+
+        Returns:
+            the response dict; it has a ``fallback`` reason if the client should prepare without us
+        """
+        if daemon_client.settings_from_environ(request['environ']) != self._settings:
+            return dict(fallback="the daemon was started with different conda or ANACONDA_PROJECT_ settings")
+
+        warm = self._warm_project(request['directory'])
+        with warm.lock:
+            try:
+                return self._prepare(warm.refresh(), warm.output, request)
+            finally:
+                warm.output.pop_messages()
+
+    def _prepare(self, project, output, request):
+        if len(project.problems) > 0:
+            return dict(fallback="the project has problems")
+
+        command_name = request['command_name']
+        command = None
+        if request['action'] == 'run':
+            if project.has_bootstrap_env_spec():
+                return dict(fallback="the project uses a bootstrap env")
+            command = _command_from_name(project, command_name)
+            command_name = None
+
+        result = prepare.prepare_without_interaction(
+            project,
+            request['environ'],
+            mode=provide_mode_without_asking(request['ui_mode']),
+            env_spec_name=request['env_spec_name'],
+            command_name=command_name,
+            command=command,
+            extra_command_args=request['extra_command_args'],
+            use_fingerprint=(request['action'] == 'run'))
+        if result.failed:
+            # the client prepares again itself, so it can print the
+            # errors and maybe ask the user how to fix them.
+            return dict(fallback="prepare failed")
+
+        exec_info = result.command_exec_info
+        if exec_info is not None:
+            exec_info = dict(cwd=exec_info.cwd, args=exec_info.args, shell=exec_info.shell, env=exec_info.env)
+        return dict(
+            suggestions=project.suggestions,
+            output=output.pop_messages(),
+            environ=result.environ,
+            exec_info=exec_info,
+            timings=result.timings)
+
+
+class _RequestHandler(StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.prepare_daemon.handle_request(request)
+        except Exception as e:
+            response = dict(fallback="daemon error: %s" % e)
+        self.wfile.write((json.dumps(response) + "\n").encode('utf-8'))
+
+
+class _Server(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def _listen(prepare_daemon, path):
+    makedirs_ok_if_exists(os.path.dirname(path))
+    if os.path.exists(path):
+        if daemon_client.daemon_is_running(path):
+            raise RuntimeError("Another daemon is already listening on %s" % path)
+        # left behind by a daemon that didn't exit cleanly
+        os.remove(path)
+
+    # only our user may connect, since we run things on their behalf
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(path, _RequestHandler)
+    finally:
+        os.umask(old_umask)
+    server.prepare_daemon = prepare_daemon
+    return server
+
+
+def serve(prepare_daemon, path):
+    """Answer requests on a UNIX socket until interrupted."""
+    server = _listen(prepare_daemon, path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def main(args):
+    """Start the daemon command and return exit status code."""
+    path = daemon_client.socket_path()
+    if daemon_client.daemon_is_running(path):
+        print("A daemon is already listening on %s." % path, file=sys.stderr)
+        return 1
+    print("Listening on %s; press Ctrl+C to stop." % path)
+    try:
+        serve(PrepareDaemon(), path)
+    except KeyboardInterrupt:
+        pass
+    return 0
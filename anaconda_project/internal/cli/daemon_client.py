@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Ask a running ``anaconda-project daemon`` to prepare a project.
+
+The ``prepare``, ``run`` and ``activate`` commands try the daemon
+first, and do the work themselves if there's no daemon or it
+can't help (for example if the prepare fails, since only the
+command itself can ask the user how to fix things).
+"""
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import socket
+import sys
+
+from anaconda_project.internal.cli import console_utils
+from anaconda_project.internal.user_cache import user_cache_directory
+from anaconda_project.verbose import _verbose_logger
+
+SOCKET_PATH_VARIABLE = 'ANACONDA_PROJECT_DAEMON_SOCKET'
+
+
+def socket_path(environ=None):
+    """Get the path of the daemon's UNIX socket.
+
+    ``ANACONDA_PROJECT_DAEMON_SOCKET`` overrides the default,
+    which is ``daemon.sock`` in the user cache directory.
+    """
+    if environ is None:
+        environ = os.environ
+    override = environ.get(SOCKET_PATH_VARIABLE, '')
+    if override != '':
+        return os.path.abspath(os.path.expanduser(override))
+    return os.path.join(user_cache_directory(environ), 'daemon.sock')
+
+
+# besides ANACONDA_PROJECT_* and CONDA_*, these decide which conda
+# and which Python code the daemon would use on a client's behalf
+_SETTINGS_VARIABLES = ('PATH', 'PYTHONPATH', 'HOME')
+
+
+def _is_setting(key):
+    if key == SOCKET_PATH_VARIABLE:
+        return False
+    return key.startswith('ANACONDA_PROJECT_') or key.startswith('CONDA_') or key in _SETTINGS_VARIABLES
+
+
+def settings_from_environ(environ):
+    """Get the variables which configure anaconda-project and the conda it runs.
+
+    The daemon can only prepare for a client with the same settings,
+    since it reads some of them from its own environment rather than
+    the client's; for example conda runs with the daemon's ``PATH``
+    and ``CONDA_*`` variables. So a client in another activated
+    environment or conda install prepares without the daemon.
+    """
+    return dict((key, value) for (key, value) in environ.items() if _is_setting(key))
+
+
+def daemon_is_running(path):
+    """Check whether a daemon is listening on the socket at ``path``."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except (IOError, OSError, socket.error):
+        return False
+    finally:
+        sock.close()
+
+
+def send_request(request, path=None):
+    """Send a request to the daemon.
+
+    Returns:
+        the response dict, or None if the daemon isn't running or can't handle the request
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    if path is None:
+        path = socket_path()
+    if not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+        line = sock.makefile('rb').readline()
+    except (IOError, OSError, socket.error) as e:
+        _verbose_logger().info("Not using daemon at %s: %s", path, e)
+        return None
+    finally:
+        sock.close()
+
+    try:
+        response = json.loads(line.decode('utf-8'))
+    except ValueError:
+        _verbose_logger().info("Not using daemon at %s: bad response %r", path, line)
+        return None
+    if 'fallback' in response:
+        _verbose_logger().info("Not using daemon at %s: %s", path, response['fallback'])
+        return None
+    return response
+
+
+def prepare_in_daemon(action, project_dir, ui_mode, env_spec_name, command_name=None, extra_command_args=None):
+    """Prepare a project in the daemon, for the ``prepare``, ``run`` or ``activate`` command.
+
+    On success, prints the output of the prepare and returns the
+    response, which has the prepared ``environ``, the ``timings``,
+    and for ``run`` the ``exec_info`` (a dict of
+    ``CommandExecInfo`` constructor args, or None).
+
+    Returns:
+        the response dict, or None to prepare without the daemon
+    """
+    response = send_request(
+        dict(action=action,
+             directory=os.path.abspath(project_dir),
+             ui_mode=ui_mode,
+             env_spec_name=env_spec_name,
+             command_name=command_name,
+             extra_command_args=extra_command_args,
+             environ=dict(os.environ)))
+    if response is None:
+        return None
+
+    console_utils.print_project_suggestions(response['suggestions'])
+    for (is_error, message) in response['output']:
+        print(message, file=(sys.stderr if is_error else sys.stdout))
+    return response
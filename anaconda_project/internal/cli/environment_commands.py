@@ -101,7 +101,7 @@ def remove_platforms(project, environment, platforms):
 
 def list_env_specs(project_dir):
     """List environments in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     print("Environments for project: {}\n".format(project_dir))
@@ -111,7 +111,7 @@ def list_env_specs(project_dir):
 
 def list_packages(project_dir, environment):
     """List the packages for an environment in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     if environment is None:
@@ -127,7 +127,7 @@ def list_packages(project_dir, environment):
 
 def list_platforms(project_dir, environment):
     """List the platforms for an environment in the project."""
-    project = load_project(project_dir)
+    project = load_project(project_dir, read_only=True)
     if console_utils.print_project_problems(project):
         return 1
     if environment is None:
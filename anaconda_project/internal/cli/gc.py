@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""The ``gc`` command removes unneeded environments from the shared store."""
+from __future__ import absolute_import, print_function
+
+from anaconda_project.internal.cli import console_utils
+from anaconda_project.internal.cli.project_load import CliFrontend
+import anaconda_project.project_ops as project_ops
+
+
+def gc_command(max_age_days, max_size_mb):
+    """Remove unneeded environments from the shared environment store.
+
+    Returns:
+        exit code
+    """
+    max_age = None if max_age_days is None else max_age_days * 24 * 60 * 60
+    max_bytes = None if max_size_mb is None else int(max_size_mb * 1024 * 1024)
+    status = project_ops.gc_shared_envs(frontend=CliFrontend(), max_age=max_age, max_bytes=max_bytes)
+    if status:
+        print(status.status_description)
+        return 0
+    else:
+        console_utils.print_status_errors(status)
+        return 1
+
+
+def main(args):
+    """Start the gc command and return exit status code."""
+    return gc_command(args.max_age_days, args.max_size_mb)
@@ -8,8 +8,10 @@
 """The ``main`` function chooses and runs a subcommand."""
 from __future__ import absolute_import, print_function
 
+import importlib
 import logging
 import os
+import socket
 import sys
 from argparse import ArgumentParser, REMAINDER
 
@@ -22,19 +24,17 @@ from anaconda_project.requirements_registry.registry import RequirementsRegistry
 from anaconda_project.requirements_registry.requirements.download import _hash_algorithms
 import anaconda_project
 from anaconda_project.internal.cli.bug_handler import handle_bugs
-import anaconda_project.internal.cli.init as init
-import anaconda_project.internal.cli.run as run
-import anaconda_project.internal.cli.prepare as prepare
-import anaconda_project.internal.cli.clean as clean
-import anaconda_project.internal.cli.archive as archive
-import anaconda_project.internal.cli.unarchive as unarchive
-import anaconda_project.internal.cli.upload as upload
-import anaconda_project.internal.cli.activate as activate
-import anaconda_project.internal.cli.variable_commands as variable_commands
-import anaconda_project.internal.cli.download_commands as download_commands
-import anaconda_project.internal.cli.service_commands as service_commands
-import anaconda_project.internal.cli.environment_commands as environment_commands
-import anaconda_project.internal.cli.command_commands as command_commands
+
+
+def _subcommand(module_name, function_name='main'):
+    # import each subcommand's module only when it runs, so starting
+    # "anaconda-project run" doesn't pay for importing everything
+    # "upload" or "archive" need.
+    def run_subcommand(args):
+        module = importlib.import_module('anaconda_project.internal.cli.' + module_name)
+        return getattr(module, function_name)(args)
+
+    return run_subcommand
 
 
 def _parse_args_and_run_subcommand(argv):
@@ -81,6 +81,13 @@ def _parse_args_and_run_subcommand(argv):
                 action='store',
                 help="A command name from anaconda-project.yml (env spec for this command will be used)")
 
+    def add_timings_arg(preset):
+        preset.add_argument(
+            '--timings',
+            action='store_true',
+            default=False,
+            help="Print how long each step of setting up the requirements took")
+
     def add_env_spec_name_arg(preset, required):
         preset.add_argument(
             '-n',
@@ -93,49 +100,77 @@ def _parse_args_and_run_subcommand(argv):
     preset = subparsers.add_parser('init', help="Initialize a directory with default project configuration")
     add_directory_arg(preset)
     preset.add_argument('-y', '--yes', action='store_true', help="Assume yes to all confirmation prompts", default=None)
-    preset.set_defaults(main=init.main)
+    preset.set_defaults(main=_subcommand('init'))
 
     preset = subparsers.add_parser('run', help="Run the project, setting up requirements first")
     add_prepare_args(preset, include_command=False)
     preset.add_argument(
         'command', metavar='COMMAND_NAME', default=None, nargs='?', help="A command name from anaconda-project.yml")
+    add_timings_arg(preset)
     preset.add_argument('extra_args_for_command', metavar='EXTRA_ARGS_FOR_COMMAND', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=run.main)
+    preset.set_defaults(main=_subcommand('run'))
 
     preset = subparsers.add_parser('prepare', help="Set up the project requirements, but does not run the project")
     add_prepare_args(preset)
-    preset.set_defaults(main=prepare.main)
+    add_timings_arg(preset)
+    preset.add_argument(
+        '--recursive',
+        metavar='ROOT_DIRECTORY',
+        default=None,
+        action='store',
+        help="Prepare every project found under this directory, instead of the one in --directory")
+    preset.set_defaults(main=_subcommand('prepare'))
 
     preset = subparsers.add_parser(
         'clean', help="Removes generated state (stops services, deletes environment files, etc)")
     add_directory_arg(preset)
-    preset.set_defaults(main=clean.main)
+    preset.set_defaults(main=_subcommand('clean'))
+
+    preset = subparsers.add_parser('gc', help="Removes environments no longer needed from the shared environment store")
+    preset.add_argument(
+        '--max-age-days',
+        metavar='DAYS',
+        type=float,
+        default=None,
+        help="Also remove environments not prepared for this many days")
+    preset.add_argument(
+        '--max-size-mb',
+        metavar='MEGABYTES',
+        type=float,
+        default=None,
+        help="Also remove least recently used environments until the store is this small")
+    preset.set_defaults(main=_subcommand('gc'))
+
+    if hasattr(socket, 'AF_UNIX'):
+        preset = subparsers.add_parser(
+            'daemon', help="Keep projects loaded in the background, so prepare, run and activate start faster")
+        preset.set_defaults(main=_subcommand('daemon'))
 
     if not anaconda_project._beta_test_mode:
         preset = subparsers.add_parser(
             'activate', help="Set up the project and output shell export commands reflecting the setup")
         add_prepare_args(preset)
-        preset.set_defaults(main=activate.main)
+        preset.set_defaults(main=_subcommand('activate'))
 
     preset = subparsers.add_parser(
         'archive', help="Create a .zip, .tar.gz, or .tar.bz2 archive with project files in it")
     add_directory_arg(preset)
     preset.add_argument('filename', metavar='ARCHIVE_FILENAME')
-    preset.set_defaults(main=archive.main)
+    preset.set_defaults(main=_subcommand('archive'))
 
     preset = subparsers.add_parser(
         'unarchive', help="Unpack a .zip, .tar.gz, or .tar.bz2 archive with project files in it")
     preset.add_argument('filename', metavar='ARCHIVE_FILENAME')
     preset.add_argument('directory', metavar='DESTINATION_DIRECTORY', default=None, nargs='?')
 
-    preset.set_defaults(main=unarchive.main)
+    preset.set_defaults(main=_subcommand('unarchive'))
 
     preset = subparsers.add_parser('upload', help="Upload the project to Anaconda Cloud")
     add_directory_arg(preset)
     preset.add_argument('-s', '--site', metavar='SITE', help='Select site to use')
     preset.add_argument('-t', '--token', metavar='TOKEN', help='Auth token or a path to a file containing a token')
     preset.add_argument('-u', '--user', metavar='USERNAME', help='User account, defaults to the current user')
-    preset.set_defaults(main=upload.main)
+    preset.set_defaults(main=_subcommand('upload'))
 
     preset = subparsers.add_parser('add-variable', help="Add a required environment variable to the project")
     add_env_spec_arg(preset)
@@ -143,32 +178,32 @@ def _parse_args_and_run_subcommand(argv):
     preset.add_argument(
         '--default', metavar='DEFAULT_VALUE', default=None, help='Default value if environment variable is unset')
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_add)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-variable', help="Remove an environment variable from the project")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
     preset.add_argument('vars_to_remove', metavar='VARS_TO_REMOVE', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=variable_commands.main_remove)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-variables', help="List all variables on the project")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_list)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_list'))
 
     preset = subparsers.add_parser(
         'set-variable', help="Set an environment variable value in anaconda-project-local.yml")
     add_env_spec_arg(preset)
     preset.add_argument('vars_and_values', metavar='VARS_AND_VALUES', default=None, nargs=REMAINDER)
     add_directory_arg(preset)
-    preset.set_defaults(main=variable_commands.main_set)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_set'))
 
     preset = subparsers.add_parser(
         'unset-variable', help="Unset an environment variable value from anaconda-project-local.yml")
     add_env_spec_arg(preset)
     add_directory_arg(preset)
     preset.add_argument('vars_to_unset', metavar='VARS_TO_UNSET', default=None, nargs=REMAINDER)
-    preset.set_defaults(main=variable_commands.main_unset)
+    preset.set_defaults(main=_subcommand('variable_commands', 'main_unset'))
 
     preset = subparsers.add_parser('add-download', help="Add a URL to be downloaded before running commands")
     add_directory_arg(preset)
@@ -179,18 +214,18 @@ def _parse_args_and_run_subcommand(argv):
     preset.add_argument(
         '--hash-algorithm', help="Defines which hash algorithm to use", default=None, choices=_hash_algorithms)
     preset.add_argument('--hash-value', help="The expected checksum hash of the downloaded file", default=None)
-    preset.set_defaults(main=download_commands.main_add)
+    preset.set_defaults(main=_subcommand('download_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-download', help="Remove a download from the project and from the filesystem")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('filename_variable', metavar='ENV_VAR_FOR_FILENAME', default=None)
-    preset.set_defaults(main=download_commands.main_remove)
+    preset.set_defaults(main=_subcommand('download_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-downloads', help="List all downloads on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=download_commands.main_list)
+    preset.set_defaults(main=_subcommand('download_commands', 'main_list'))
 
     service_types = RequirementsRegistry().list_service_types()
     service_choices = list(map(lambda s: s.name, service_types))
@@ -203,18 +238,18 @@ def _parse_args_and_run_subcommand(argv):
     add_env_spec_arg(preset)
     add_service_variable_name(preset)
     preset.add_argument('service_type', metavar='SERVICE_TYPE', default=None, choices=service_choices)
-    preset.set_defaults(main=service_commands.main_add)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-service', help="Remove a service from the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('variable', metavar='SERVICE_REFERENCE', default=None)
-    preset.set_defaults(main=service_commands.main_remove)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-services', help="List services present in the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=service_commands.main_list)
+    preset.set_defaults(main=_subcommand('service_commands', 'main_list'))
 
     def add_package_args(preset):
         preset.add_argument(
@@ -225,54 +260,54 @@ def _parse_args_and_run_subcommand(argv):
     add_directory_arg(preset)
     add_package_args(preset)
     add_env_spec_name_arg(preset, required=True)
-    preset.set_defaults(main=environment_commands.main_add)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add'))
 
     preset = subparsers.add_parser('remove-env-spec', help="Remove an environment spec from the project")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=True)
-    preset.set_defaults(main=environment_commands.main_remove)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-env-specs', help="List all environment specs for the project")
     add_directory_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_env_specs)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_env_specs'))
 
     preset = subparsers.add_parser('export-env-spec', help="Save an environment spec as a conda environment file")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
     preset.add_argument('filename', metavar='ENVIRONMENT_FILE')
-    preset.set_defaults(main=environment_commands.main_export)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_export'))
 
     preset = subparsers.add_parser('lock', help="Lock all packages at their current versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_lock)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_lock'))
 
     preset = subparsers.add_parser('unlock', help="Remove locked package versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_unlock)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_unlock'))
 
     preset = subparsers.add_parser('update', help="Update all packages to their latest versions")
     add_directory_arg(preset)
     add_env_spec_name_arg(preset, required=False)
-    preset.set_defaults(main=environment_commands.main_update)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_update'))
 
     preset = subparsers.add_parser('add-packages', help="Add packages to one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_package_args(preset)
-    preset.set_defaults(main=environment_commands.main_add_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add_packages'))
 
     preset = subparsers.add_parser('remove-packages', help="Remove packages from one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     preset.add_argument('packages', metavar='PACKAGE_NAME', default=None, nargs='+')
-    preset.set_defaults(main=environment_commands.main_remove_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove_packages'))
 
     preset = subparsers.add_parser('list-packages', help="List packages for an environment on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_packages)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_packages'))
 
     def add_platforms_list(preset):
         preset.add_argument('platforms', metavar='PLATFORM_NAME', default=None, nargs='+')
@@ -281,18 +316,18 @@ def _parse_args_and_run_subcommand(argv):
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_platforms_list(preset)
-    preset.set_defaults(main=environment_commands.main_add_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_add_platforms'))
 
     preset = subparsers.add_parser('remove-platforms', help="Remove platforms from one or all project environments")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
     add_platforms_list(preset)
-    preset.set_defaults(main=environment_commands.main_remove_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_remove_platforms'))
 
     preset = subparsers.add_parser('list-platforms', help="List platforms for an environment on the project")
     add_directory_arg(preset)
     add_env_spec_arg(preset)
-    preset.set_defaults(main=environment_commands.main_list_platforms)
+    preset.set_defaults(main=_subcommand('environment_commands', 'main_list_platforms'))
 
     def add_command_name_arg(preset):
         preset.add_argument('name', metavar="NAME", help="Command name used to invoke it")
@@ -315,16 +350,16 @@ def _parse_args_and_run_subcommand(argv):
         action="store_false",
         help=" The command does not support project's HTTP server options")
     preset.add_argument('command', metavar="COMMAND", help="Command line or app filename to add")
-    preset.set_defaults(main=command_commands.main, supports_http_options=None)
+    preset.set_defaults(main=_subcommand('command_commands'), supports_http_options=None)
 
     preset = subparsers.add_parser('remove-command', help="Remove a command from the project")
     add_directory_arg(preset)
     add_command_name_arg(preset)
-    preset.set_defaults(main=command_commands.main_remove)
+    preset.set_defaults(main=_subcommand('command_commands', 'main_remove'))
 
     preset = subparsers.add_parser('list-commands', help="List the commands on the project")
     add_directory_arg(preset)
-    preset.set_defaults(main=command_commands.main_list)
+    preset.set_defaults(main=_subcommand('command_commands', 'main_list'))
 
     # argparse doesn't do this for us for whatever reason
     if len(argv) < 2:
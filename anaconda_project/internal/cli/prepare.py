@@ -8,29 +8,73 @@
 """The ``prepare`` command configures a project to run, asking the user questions if necessary."""
 from __future__ import absolute_import, print_function
 
+import sys
+
 import anaconda_project.internal.cli.console_utils as console_utils
-from anaconda_project.internal.cli.prepare_with_mode import prepare_with_ui_mode_printing_errors
-from anaconda_project.internal.cli.project_load import load_project
+from anaconda_project.internal.cli import daemon_client
+from anaconda_project.internal.cli.prepare_with_mode import (prepare_with_ui_mode_printing_errors,
+                                                             provide_mode_without_asking)
+from anaconda_project.internal.cli.project_load import load_project, CliFrontend
+import anaconda_project.project_ops as project_ops
 
 
-def prepare_command(project_dir, ui_mode, conda_environment, command_name):
+def prepare_command(project_dir, ui_mode, conda_environment, command_name, print_timings=False):
     """Configure the project to run.
 
     Returns:
         Prepare result (can be treated as True on success).
     """
+    response = daemon_client.prepare_in_daemon('prepare', project_dir, ui_mode, conda_environment, command_name)
+    if response is not None:
+        if print_timings:
+            console_utils.print_timings(response['timings'])
+        return True
+
     project = load_project(project_dir)
     if console_utils.print_project_problems(project):
         return False
     result = prepare_with_ui_mode_printing_errors(
         project, env_spec_name=conda_environment, ui_mode=ui_mode, command_name=command_name)
+    if print_timings:
+        console_utils.print_timings(result.timings)
 
     return result
 
 
+def prepare_recursive_command(root_dir, ui_mode, conda_environment, print_timings=False):
+    """Configure every project under a directory to run.
+
+    We can't ask questions about many projects at once, so the
+    modes which would ask use the development defaults instead.
+
+    Returns:
+        True if all the projects were prepared.
+    """
+    results = project_ops.prepare_projects(
+        root_dir, frontend=CliFrontend(), mode=provide_mode_without_asking(ui_mode), env_spec_name=conda_environment)
+    if len(results) == 0:
+        print("No projects found in %s." % root_dir, file=sys.stderr)
+        return False
+
+    failed = 0
+    for (project, result) in results:
+        if print_timings:
+            console_utils.print_timings(result.timings)
+        if result.failed:
+            failed += 1
+            print("Failed to prepare %s." % project.directory_path, file=sys.stderr)
+        else:
+            print("Prepared %s." % project.directory_path)
+    if failed > 0:
+        print("%d of %d projects could not be prepared." % (failed, len(results)), file=sys.stderr)
+    return failed == 0
+
+
 def main(args):
     """Start the prepare command and return exit status code."""
-    if prepare_command(args.directory, args.mode, args.env_spec, args.command):
+    if args.recursive is not None:
+        return 0 if prepare_recursive_command(args.recursive, args.mode, args.env_spec, args.timings) else 1
+    if prepare_command(args.directory, args.mode, args.env_spec, args.command, args.timings):
         print("The project is ready to run commands.")
         print("Use `anaconda-project list-commands` to see what's available.")
         return 0
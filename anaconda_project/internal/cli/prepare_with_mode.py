@@ -74,13 +74,24 @@ def _interactively_fix_missing_variables(project, result):
         return start_over
 
 
+def provide_mode_without_asking(ui_mode):
+    """Get the provide mode for a UI mode, using development defaults for the modes that can ask questions."""
+    if ui_mode == UI_MODE_TEXT_ASSUME_YES_PRODUCTION:
+        return PROVIDE_MODE_PRODUCTION
+    elif ui_mode == UI_MODE_TEXT_ASSUME_NO:
+        return PROVIDE_MODE_CHECK
+    else:
+        return PROVIDE_MODE_DEVELOPMENT
+
+
 def prepare_with_ui_mode_printing_errors(project,
                                          environ=None,
                                          ui_mode=UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
                                          env_spec_name=None,
                                          command_name=None,
                                          command=None,
-                                         extra_command_args=None):
+                                         extra_command_args=None,
+                                         use_fingerprint=False):
     """Perform all steps needed to get a project ready to execute.
 
     This may need to ask the user questions, may start services,
@@ -96,6 +107,7 @@ def prepare_with_ui_mode_printing_errors(project,
         command_name (str): command name to use or None for default
         command (ProjectCommand): a command object or None
         extra_command_args (list of str): extra args for the command we prepare
+        use_fingerprint (bool): reuse the last prepare if nothing has changed
 
     Returns:
         a ``PrepareResult`` instance
@@ -103,16 +115,8 @@ def prepare_with_ui_mode_printing_errors(project,
     """
     assert ui_mode in _all_ui_modes  # the arg parser should have guaranteed this
 
-    ask = False
-    if ui_mode == UI_MODE_TEXT_ASSUME_YES_PRODUCTION:
-        provide_mode = PROVIDE_MODE_PRODUCTION
-    elif ui_mode == UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT:
-        provide_mode = PROVIDE_MODE_DEVELOPMENT
-    elif ui_mode == UI_MODE_TEXT_ASSUME_NO:
-        provide_mode = PROVIDE_MODE_CHECK
-    elif ui_mode == UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK:
-        provide_mode = PROVIDE_MODE_DEVELOPMENT
-        ask = True
+    provide_mode = provide_mode_without_asking(ui_mode)
+    ask = (ui_mode == UI_MODE_TEXT_DEVELOPMENT_DEFAULTS_OR_ASK)
 
     # We might implement this by using
     # Provider.read_config/Provider.set_config_values_as_strings
@@ -125,12 +129,7 @@ def prepare_with_ui_mode_printing_errors(project,
     # TODO: this could let you fix the suggestions if they are fixable.
     # (Note that we fix fatal problems in project_load.py, but we only
     #  display suggestions when we do a manual prepare, run, etc.)
-    suggestions = project.suggestions
-    if len(suggestions) > 0:
-        print("Potential issues with this project:")
-        for suggestion in project.suggestions:
-            print("  * " + suggestion)
-        print("")
+    console_utils.print_project_suggestions(project.suggestions)
 
     environ = None
     while True:
@@ -141,7 +140,8 @@ def prepare_with_ui_mode_printing_errors(project,
             env_spec_name=env_spec_name,
             command_name=command_name,
             command=command,
-            extra_command_args=extra_command_args)
+            extra_command_args=extra_command_args,
+            use_fingerprint=use_fingerprint)
 
         if result.failed:
             if ask and _interactively_fix_missing_variables(project, result):
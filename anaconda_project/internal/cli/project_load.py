@@ -35,9 +35,13 @@ class CliFrontend(Frontend):
         sys.stderr.flush()
 
 
-def load_project(dirname):
-    """Load a Project, fixing it if needed and possible."""
-    project = Project(dirname, frontend=CliFrontend(), must_exist=True)
+def load_project(dirname, read_only=False):
+    """Load a Project, fixing it if needed and possible.
+
+    Commands which only read the project should pass ``read_only``,
+    so we can load it from a compiled snapshot, or parse it quickly.
+    """
+    project = Project(dirname, frontend=CliFrontend(), must_exist=True, compiled_cache=read_only)
 
     # No sense in engaging the user if we cannot achieve a fixed state.
     if project.unfixable_problems:
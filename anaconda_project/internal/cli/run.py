@@ -10,15 +10,21 @@ from __future__ import absolute_import, print_function
 
 import sys
 
+import anaconda_project.internal.cli.console_utils as console_utils
+from anaconda_project.internal.cli import daemon_client
 from anaconda_project.internal.cli.prepare_with_mode import prepare_with_ui_mode_printing_errors
 from anaconda_project.internal.cli.project_load import load_project
-from anaconda_project.project_commands import ProjectCommand
+from anaconda_project.project_commands import CommandExecInfo, ProjectCommand
 from anaconda_project.internal.cli.environment_commands import (create_bootstrap_env, run_on_bootstrap_env)
 
 
 def _command_from_name(project, command_name):
+    if command_name is None:
+        # let prepare pick the default command; it checks all the
+        # requirements, not just those the command declares
+        return None
     command = project.command_for_name(command_name)
-    if command is None and command_name is not None:
+    if command is None:
         # if the command name isn't a configured command name,
         # interpret the command as a notebook or executable.
         attrs = dict(env_spec=project.default_env_spec_name)
@@ -32,13 +38,35 @@ def _command_from_name(project, command_name):
     return command
 
 
-def run_command(project_dir, ui_mode, conda_environment, command_name, extra_command_args):
+def _execute(project_dir, command_exec_info):
+    if command_exec_info is None:
+        print(
+            "No known run command for project %s; try adding a 'commands:' section to anaconda-project.yml" %
+            project_dir,
+            file=sys.stderr)
+    else:
+        try:
+            command_exec_info.execvpe()
+        except OSError as e:
+            print("Failed to execute '%s': %s" % (" ".join(command_exec_info.args), e.strerror), file=sys.stderr)
+
+
+def run_command(project_dir, ui_mode, conda_environment, command_name, extra_command_args, print_timings=False):
     """Run the project.
 
     Returns:
         Does not return if successful.
     """
-    project = load_project(project_dir)
+    response = daemon_client.prepare_in_daemon('run', project_dir, ui_mode, conda_environment, command_name,
+                                               extra_command_args)
+    if response is not None:
+        if print_timings:
+            console_utils.print_timings(response['timings'])
+        exec_info = response['exec_info']
+        _execute(project_dir, None if exec_info is None else CommandExecInfo(**exec_info))
+        return
+
+    project = load_project(project_dir, read_only=True)
 
     if project.has_bootstrap_env_spec() and not project.is_running_in_bootstrap_env():
         print("Project should be ran by bootstrap env... fixing.")
@@ -54,28 +82,20 @@ def run_command(project_dir, ui_mode, conda_environment, command_name, extra_com
             env_spec_name=conda_environment,
             command=command,
             extra_command_args=extra_command_args,
-            environ=environ)
+            environ=environ,
+            use_fingerprint=True)
+
+        if print_timings:
+            console_utils.print_timings(result.timings)
 
         if result.failed:
             # errors were printed already
             return
-        elif result.command_exec_info is None:
-            print(
-                "No known run command for project %s; try adding a 'commands:' section to anaconda-project.yml" %
-                project_dir,
-                file=sys.stderr)
-        else:
-            try:
-
-                result.command_exec_info.execvpe()
-            except OSError as e:
-                print(
-                    "Failed to execute '%s': %s" % (" ".join(result.command_exec_info.args), e.strerror),
-                    file=sys.stderr)
+        _execute(project_dir, result.command_exec_info)
 
 
 def main(args):
     """Start the run command and return exit status code.."""
-    run_command(args.directory, args.mode, args.env_spec, args.command, args.extra_args_for_command)
+    run_command(args.directory, args.mode, args.env_spec, args.command, args.extra_args_for_command, args.timings)
     # if we returned, we failed to run the command and should have printed an error
     return 1
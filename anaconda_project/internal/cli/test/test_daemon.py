@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+import time
+
+from anaconda_project.internal.cli import daemon_client
+from anaconda_project.internal.cli.daemon import PrepareDaemon, _listen
+from anaconda_project.internal.cli.prepare import prepare_command
+from anaconda_project.internal.cli.prepare_with_mode import UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
+from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents,
+                                                          with_directory_contents_completing_project_file)
+from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
+from anaconda_project.test.test_prepare import _push_fake_env_creator, _pop_fake_env_creator
+
+_project_file = """
+variables:
+  FOO: {default: bar}
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+"""
+
+
+def _with_fake_env_creator(check):
+    def wrapped(dirname):
+        _push_fake_env_creator()
+        try:
+            return check(dirname)
+        finally:
+            _pop_fake_env_creator()
+
+    return wrapped
+
+
+def _request(dirname, action='prepare', **kwargs):
+    environ = dict(PATH=os.environ['PATH'])
+    environ.update(kwargs.pop('environ', dict()))
+    request = dict(action=action,
+                   directory=dirname,
+                   ui_mode=UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
+                   env_spec_name=None,
+                   command_name=None,
+                   extra_command_args=None,
+                   environ=environ)
+    request.update(kwargs)
+    return request
+
+
+def test_socket_path(monkeypatch):
+    monkeypatch.delenv(daemon_client.SOCKET_PATH_VARIABLE, raising=False)
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', '/cache')
+    assert os.path.abspath('/cache/daemon.sock') == daemon_client.socket_path()
+    monkeypatch.setenv(daemon_client.SOCKET_PATH_VARIABLE, '/elsewhere/daemon.sock')
+    assert os.path.abspath('/elsewhere/daemon.sock') == daemon_client.socket_path()
+
+
+def test_daemon_keeps_project_loaded():
+    def check(dirname):
+        prepare_daemon = PrepareDaemon(environ=dict(PATH=os.environ['PATH']))
+
+        response = prepare_daemon.handle_request(_request(dirname, action='run'))
+        assert 'fallback' not in response
+        assert 'bar' == response['environ']['FOO']
+        assert dirname == response['exec_info']['cwd']
+        assert 'echo hello' in response['exec_info']['args'][-1]
+        project = prepare_daemon._projects[dirname]._project
+
+        response = prepare_daemon.handle_request(_request(dirname, environ=dict(FOO='baz')))
+        assert 'baz' == response['environ']['FOO']
+        assert response['exec_info'] is not None
+        assert project is prepare_daemon._projects[dirname]._project
+
+        # editing the project file reloads the project
+        time.sleep(0.01)
+        with open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME), 'a') as f:
+            f.write("\ndescription: changed\n")
+        response = prepare_daemon.handle_request(_request(dirname))
+        assert 'bar' == response['environ']['FOO']
+        assert project is not prepare_daemon._projects[dirname]._project
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_file},
+                                                    _with_fake_env_creator(check))
+
+
+def test_daemon_forgets_least_recently_used_projects():
+    def check(dirname):
+        prepare_daemon = PrepareDaemon(max_projects=2, environ=dict(PATH=os.environ['PATH']))
+        for name in ('a', 'b', 'a', 'c'):
+            prepare_daemon.handle_request(_request(os.path.join(dirname, name)))
+        assert [os.path.join(dirname, name) for name in ('a', 'c')] == list(prepare_daemon._projects.keys())
+
+    with_directory_contents(dict(), check)
+
+
+def test_daemon_falls_back():
+    def check(dirname):
+        different = "the daemon was started with different conda or ANACONDA_PROJECT_ settings"
+        daemon_environ = dict(PATH=os.environ['PATH'])
+        prepare_daemon = PrepareDaemon(environ=dict(daemon_environ, ANACONDA_PROJECT_ENVS_PATH='/envs'))
+        assert different == prepare_daemon.handle_request(_request(dirname))['fallback']
+
+        # a client in another conda install or activated env
+        prepare_daemon = PrepareDaemon(environ=daemon_environ)
+        for environ in (dict(PATH='/other/conda/bin'), dict(CONDA_PREFIX='/other/env'), dict(PYTHONPATH='/other'),
+                        dict(CONDA_EXE='/other/conda/bin/conda')):
+            assert different == prepare_daemon.handle_request(_request(dirname, environ=environ))['fallback']
+        # but the socket location doesn't matter
+        response = prepare_daemon.handle_request(
+            _request(dirname, environ={daemon_client.SOCKET_PATH_VARIABLE: '/elsewhere/daemon.sock'}))
+        assert 'fallback' not in response
+
+        prepare_daemon = PrepareDaemon(environ=dict(PATH=os.environ['PATH']))
+        assert "the project has problems" == \
+            prepare_daemon.handle_request(_request(os.path.join(dirname, 'missing')))['fallback']
+        assert "prepare failed" == \
+            prepare_daemon.handle_request(_request(dirname, env_spec_name='nope'))['fallback']
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_file},
+                                                    _with_fake_env_creator(check))
+
+
+def test_prepare_command_uses_daemon(monkeypatch, capsys):
+    def check(dirname):
+        path = os.path.join(dirname, 'daemon.sock')
+        monkeypatch.setenv(daemon_client.SOCKET_PATH_VARIABLE, path)
+        assert not daemon_client.daemon_is_running(path)
+
+        prepare_daemon = PrepareDaemon()
+        handled = []
+        handle_request = prepare_daemon.handle_request
+
+        def recording_handle_request(request):
+            handled.append(request['action'])
+            return handle_request(request)
+
+        prepare_daemon.handle_request = recording_handle_request
+
+        server = _listen(prepare_daemon, path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            assert daemon_client.daemon_is_running(path)
+            result = prepare_command(dirname, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, None, None)
+            assert result is True
+            assert ['prepare'] == handled
+
+            # a bad request gets a fallback
+            assert daemon_client.send_request(dict(), path=path) is None
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        # with no daemon we prepare in-process
+        os.remove(path)
+        result = prepare_command(dirname, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT, None, None)
+        assert result
+        assert result is not True
+        assert ['prepare'] == handled
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: _project_file},
+                                                    _with_fake_env_creator(check))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+
+from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def test_gc_command_without_shared_envs(capsys):
+    code = _parse_args_and_run_subcommand(['anaconda-project', 'gc'])
+    assert code == 1
+
+    out, err = capsys.readouterr()
+    assert '' == out
+    assert 'No shared environment store; set ANACONDA_PROJECT_SHARED_ENVS_PATH to enable it.\n' == err
+
+
+def test_gc_command(capsys, monkeypatch):
+    def check(dirname):
+        store_dir = os.path.join(dirname, 'store')
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+        # created long enough ago that it can't be being created now
+        os.utime(os.path.join(store_dir, 'abc', 'conda-meta'), (100, 100))
+        code = _parse_args_and_run_subcommand(['anaconda-project', 'gc'])
+        assert code == 0
+
+        out, err = capsys.readouterr()
+        assert ("Removing %s (not used by any project).\n" % os.path.join(store_dir, 'abc') +
+                "Removed 1 environments from %s.\n" % store_dir) == out
+        assert '' == err
+        assert not os.path.exists(os.path.join(store_dir, 'abc'))
+
+    with_directory_contents({'store/abc/conda-meta/a-1.0-0.json': '{}'}, check)
+
+
+def test_gc_command_with_limits(monkeypatch):
+    def check(dirname):
+        calls = []
+
+        def mock_gc_shared_envs(frontend, max_age, max_bytes):
+            calls.append((max_age, max_bytes))
+            from anaconda_project.internal.simple_status import SimpleStatus
+            return SimpleStatus(success=True, description="Done.")
+
+        monkeypatch.setattr('anaconda_project.project_ops.gc_shared_envs', mock_gc_shared_envs)
+        code = _parse_args_and_run_subcommand(
+            ['anaconda-project', 'gc', '--max-age-days', '2', '--max-size-mb', '1.5'])
+        assert code == 0
+        assert [(2 * 24 * 60 * 60, 1536 * 1024)] == calls
+
+    with_directory_contents(dict(), check)
@@ -9,16 +9,20 @@ from __future__ import absolute_import, print_function
 from functools import partial
 
 import os
+import subprocess
+import sys
+
+import pytest
 
 import anaconda_project
 from anaconda_project.internal.cli.main import _parse_args_and_run_subcommand
 
-all_subcommands = ('init', 'run', 'prepare', 'clean', 'activate', 'archive', 'unarchive', 'upload', 'add-variable',
-                   'remove-variable', 'list-variables', 'set-variable', 'unset-variable', 'add-download',
-                   'remove-download', 'list-downloads', 'add-service', 'remove-service', 'list-services',
-                   'add-env-spec', 'remove-env-spec', 'list-env-specs', 'export-env-spec', 'lock', 'unlock', 'update',
-                   'add-packages', 'remove-packages', 'list-packages', 'add-platforms', 'remove-platforms',
-                   'list-platforms', 'add-command', 'remove-command', 'list-commands')
+all_subcommands = ('init', 'run', 'prepare', 'clean', 'gc', 'daemon', 'activate', 'archive', 'unarchive', 'upload',
+                   'add-variable', 'remove-variable', 'list-variables', 'set-variable', 'unset-variable',
+                   'add-download', 'remove-download', 'list-downloads', 'add-service', 'remove-service',
+                   'list-services', 'add-env-spec', 'remove-env-spec', 'list-env-specs', 'export-env-spec', 'lock',
+                   'unlock', 'update', 'add-packages', 'remove-packages', 'list-packages', 'add-platforms',
+                   'remove-platforms', 'list-platforms', 'add-command', 'remove-command', 'list-commands')
 all_subcommands_in_curlies = "{" + ",".join(all_subcommands) + "}"
 all_subcommands_comma_space = ", ".join(["'" + s + "'" for s in all_subcommands])
 
@@ -68,6 +72,10 @@ expected_usage_msg_format = (  # noqa
     '                        project\n'
     '    clean               Removes generated state (stops services, deletes\n'
     '                        environment files, etc)\n'
+    '    gc                  Removes environments no longer needed from the shared\n'
+    '                        environment store\n'
+    '    daemon              Keep projects loaded in the background, so prepare,\n'
+    '                        run and activate start faster\n'
     '%s'
     '    archive             Create a .zip, .tar.gz, or .tar.bz2 archive with\n'
     '                        project files in it\n'
@@ -201,3 +209,53 @@ Details about the error were saved to """)
     assert os.path.isfile(filename)
 
     os.remove(filename)
+
+
+# seconds we allow for importing everything "anaconda-project run",
+# "activate" or "list-commands" needs before it starts working; it
+# was almost two seconds when every subcommand was imported up front.
+_STARTUP_IMPORT_BUDGET = 1.0
+
+# modules only some subcommands need, which are slow to import
+_SLOW_OPTIONAL_MODULES = ('binstar_client', 'requests', 'keyring', 'distutils', 'pkg_resources')
+
+
+def _import_times(subcommand_module):
+    code = ("import anaconda_project.internal.cli.main; "
+            "import anaconda_project.internal.cli.%s" % subcommand_module)
+    environ = os.environ.copy()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(anaconda_project.__file__)))
+    environ['PYTHONPATH'] = os.pathsep.join([root] + [p for p in [environ.get('PYTHONPATH')] if p])
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code],
+                               stderr=subprocess.PIPE,
+                               env=environ)
+    (out, err) = process.communicate()
+    assert 0 == process.returncode, err.decode()
+
+    # lines look like "import time: self [us] | cumulative | <indent>module"
+    imported = dict()
+    for line in err.decode().splitlines():
+        if not line.startswith('import time:'):
+            continue
+        (self_us, cumulative_us, name) = line[len('import time:'):].split('|')
+        if cumulative_us.strip().isdigit():
+            imported[name.strip()] = (len(name) - len(name.lstrip()), int(cumulative_us))
+    return imported
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="-X importtime needs Python 3.7")
+def test_startup_imports_within_budget():
+    for module in ('run', 'activate', 'command_commands'):
+        imported = _import_times(module)
+        assert 'anaconda_project.internal.cli.%s' % module in imported
+        for name in _SLOW_OPTIONAL_MODULES:
+            assert name not in imported, "%s imports %s" % (module, name)
+
+        # top-level entries include everything they imported; our
+        # budget doesn't cover what Python imported to start up.
+        microseconds = 0
+        for (name, (indent, cumulative)) in imported.items():
+            if indent == 1 and name.startswith('anaconda_project'):
+                microseconds += cumulative
+        seconds = microseconds / 1000000.0
+        assert seconds < _STARTUP_IMPORT_BUDGET, "%s took %.3f seconds to import" % (module, seconds)
@@ -29,6 +29,8 @@ class Args(object):
         self.env_spec = None
         self.mode = UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
         self.command = None
+        self.timings = False
+        self.recursive = None
         for key in kwargs:
             setattr(self, key, kwargs[key])
 
@@ -65,6 +67,69 @@ services:
     }, prepare_redis_url)
 
 
+def test_prepare_command_print_timings(monkeypatch, capsys):
+    class FakeResult(object):
+        timings = [
+            dict(requirement='FOO', operation='check_status', seconds=0.5),
+            dict(requirement='CONDA_PREFIX', operation='provide', seconds=2.0)
+        ]
+
+    def mock_prepare(*args, **kwargs):
+        return FakeResult()
+
+    monkeypatch.setattr('anaconda_project.internal.cli.prepare.prepare_with_ui_mode_printing_errors', mock_prepare)
+
+    def prepare_with_timings(dirname):
+        result = prepare_command(dirname,
+                                 UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT,
+                                 conda_environment=None,
+                                 command_name=None,
+                                 print_timings=True)
+        assert result
+        (out, err) = capsys.readouterr()
+        assert '' == out
+        assert ["Seconds  Operation     Requirement",
+                " 2.000s  provide       CONDA_PREFIX",
+                " 0.500s  check_status  FOO"] == err.splitlines()
+
+    with_directory_contents_completing_project_file(dict(), prepare_with_timings)
+
+
+def test_prepare_recursive(monkeypatch, capsys):
+    class FakeProject(object):
+        def __init__(self, directory_path):
+            self.directory_path = directory_path
+
+    class FakeResult(object):
+        def __init__(self, failed):
+            self.failed = failed
+            self.timings = []
+
+    params = dict()
+
+    def mock_prepare_projects(directory_path, frontend, mode, env_spec_name):
+        params.update(directory_path=directory_path, mode=mode, env_spec_name=env_spec_name)
+        return [(FakeProject('/tree/a'), FakeResult(False)), (FakeProject('/tree/b'), FakeResult(True))]
+
+    monkeypatch.setattr('anaconda_project.project_ops.prepare_projects', mock_prepare_projects)
+
+    code = _parse_args_and_run_subcommand(['anaconda-project', 'prepare', '--recursive', '/tree', '--mode=check',
+                                           '--env-spec=foo'])
+    assert 1 == code
+    assert dict(directory_path='/tree', mode='check', env_spec_name='foo') == params
+    (out, err) = capsys.readouterr()
+    assert "Prepared /tree/a.\n" == out
+    assert "Failed to prepare /tree/b.\n1 of 2 projects could not be prepared.\n" == err
+
+
+def test_prepare_recursive_no_projects(monkeypatch, capsys):
+    monkeypatch.setattr('anaconda_project.project_ops.prepare_projects', lambda *args, **kwargs: [])
+
+    assert 1 == main(Args(recursive='/tree'))
+    (out, err) = capsys.readouterr()
+    assert '' == out
+    assert "No projects found in /tree.\n" == err
+
 def test_prepare_command_development(monkeypatch):
     _test_prepare_command(monkeypatch, UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT)
 
@@ -28,6 +28,7 @@ class Args(object):
         self.env_spec = None
         self.mode = UI_MODE_TEXT_ASSUME_YES_DEVELOPMENT
         self.command = None
+        self.timings = False
         self.extra_args_for_command = None
         for key in kwargs:
             setattr(self, key, kwargs[key])
@@ -493,6 +494,44 @@ def test_run_command_omit_name_use_default(monkeypatch, capsys):
     assert args == ['--version', 'def']
 
 
+def test_run_command_omit_name_checks_all_requirements(monkeypatch, capsys):
+    executed = {}
+
+    def mock_execvpe(file, args, env):
+        executed['args'] = args
+        executed['env'] = env
+
+    monkeypatch.setattr('os.execvpe', mock_execvpe)
+
+    def check_run_main(dirname):
+        project_dir_disable_dedicated_env(dirname)
+        result = _parse_args_and_run_subcommand(['anaconda-project', 'run', '--directory', dirname])
+
+        assert 1 == result
+        assert '--version' == executed['args'][1]
+        # the default command only declares FOO but running
+        # without a command name still prepares everything
+        assert 'foo' == executed['env']['FOO']
+        assert 'bar' == executed['env']['BAR']
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: { default: foo }
+  BAR: { default: bar }
+commands:
+  default:
+    conda_app_entry: python --version
+    requirements: [FOO]
+"""
+        }, check_run_main)
+
+    out, err = capsys.readouterr()
+    assert "" == out
+    assert "" == err
+
+
 # can't put an assert in a lambda so this makes us a "lambda" with
 # an assert in it
 def _func_asserting_contains(what):
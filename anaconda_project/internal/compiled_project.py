@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Snapshots of a project's validated configuration, to skip parsing and validating it.
+
+A snapshot is a pickle of the objects ``Project`` builds from its
+project and lock files (env specs, lock sets, commands,
+requirements...), saved along with a key made from the hashes of
+the files it was built from. Loading a snapshot with a matching
+key gives the same objects without reading any YAML.
+
+Snapshots live in the per-user cache directory, and like the other
+caches there they are trusted, since unpickling can run code.
+"""
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+import pickle
+import sys
+import uuid
+
+try:
+    import copyreg  # pragma: no cover (py3 only)
+except ImportError:  # pragma: no cover (py2 only)
+    import copy_reg as copyreg  # pragma: no cover (py2 only)
+
+from anaconda_project.conda_manager import CondaManager, new_conda_manager
+from anaconda_project.internal import user_cache
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.rename import rename_over_existing
+from anaconda_project.yaml_file import _CommentedMap, _CommentedSeq
+
+# bump this if the format of snapshots or the objects in them changes
+_FORMAT_VERSION = 1
+
+_SNAPSHOT_DIRECTORY = 'compiled-projects'
+
+# the Python 2 pickler doesn't support a per-pickler dispatch_table
+supported = sys.version_info >= (3, 3)
+
+
+def snapshot_filename(directory_path):
+    """Get the file to save a project's snapshot in."""
+    digest = hashlib.sha1(os.path.abspath(directory_path).encode('utf-8')).hexdigest()
+    return os.path.join(user_cache.user_cache_directory(), _SNAPSHOT_DIRECTORY, digest + ".pickle")
+
+
+def file_hashes(filenames):
+    """Get a dict from each filename to a hash of its content, or None if it can't be read."""
+    hashes = dict()
+    for filename in filenames:
+        try:
+            with open(filename, 'rb') as f:
+                hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+        except (IOError, OSError):
+            hashes[filename] = None
+    return hashes
+
+
+def _reduce_commented_map(value):
+    return (dict, (dict(value), ))
+
+
+def _reduce_commented_seq(value):
+    return (list, (list(value), ))
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, f, registry):
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        self._registry = registry
+        # the snapshot is read-only, so plain dicts and lists will do
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        self.dispatch_table[_CommentedMap] = _reduce_commented_map
+        self.dispatch_table[_CommentedSeq] = _reduce_commented_seq
+
+    def persistent_id(self, obj):
+        # these belong to the process, not the project
+        if obj is self._registry:
+            return 'registry'
+        elif isinstance(obj, CondaManager):
+            return 'conda_manager'
+        else:
+            return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, f, registry):
+        pickle.Unpickler.__init__(self, f)
+        self._registry = registry
+
+    def persistent_load(self, pid):
+        if pid == 'registry':
+            return self._registry
+        elif pid == 'conda_manager':
+            return new_conda_manager()
+        else:
+            raise pickle.UnpicklingError("unknown persistent id %r" % (pid, ))
+
+
+def load_snapshot(filename, key, registry):
+    """Load the state saved by ``save_snapshot``, if it was saved with the same key.
+
+    Args:
+        filename (str): the snapshot file
+        key (dict): describes the inputs the state must have been built from
+        registry (RequirementsRegistry): put in place of the registry the state was saved with
+
+    Returns:
+        the state, or None if missing, unreadable or for a different key
+    """
+    if not supported:
+        return None
+    try:
+        with open(filename, 'rb') as f:
+            unpickler = _Unpickler(f, registry)
+            # the key comes first, so we don't load the whole
+            # snapshot if it's stale
+            if unpickler.load() != dict(format=_FORMAT_VERSION, key=key):
+                return None
+            return unpickler.load()
+    except Exception:
+        # a corrupt or incompatible pickle can raise about anything
+        return None
+
+
+def save_snapshot(filename, key, state, registry):
+    """Atomically save state along with the key it's valid for.
+
+    Errors are ignored, since a snapshot is only an optimization.
+    """
+    if not supported:
+        return
+    tmp = filename + ".tmp-" + str(uuid.uuid4())
+    try:
+        makedirs_ok_if_exists(os.path.dirname(filename))
+        with open(tmp, 'wb') as f:
+            pickler = _Pickler(f, registry)
+            pickler.dump(dict(format=_FORMAT_VERSION, key=key))
+            pickler.dump(state)
+        rename_over_existing(tmp, filename)
+    except (IOError, OSError, pickle.PicklingError, TypeError, AttributeError):
+        pass
+    finally:
+        try:
+            os.remove(tmp)
+        except (IOError, OSError):
+            pass
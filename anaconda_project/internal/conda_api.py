@@ -7,6 +7,7 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function, division, unicode_literals
 
+import atexit
 import collections
 import errno
 import json
@@ -16,8 +17,13 @@ import re
 import shutil
 import sys
 import tempfile
+import threading
 
 from anaconda_project.internal import streaming_popen
+from anaconda_project.internal import conda_worker
+from anaconda_project.internal import solve_cache
+from anaconda_project.internal import timings
+from anaconda_project.internal import user_cache
 from anaconda_project.internal.directory_contains import subdirectory_relative_to_directory
 from anaconda_project.internal.py2_compat import is_string
 
@@ -49,7 +55,7 @@ def _get_conda_command(extra_args):
 # This is obviously ridiculous, we'll work to
 # find a better way (at least in newer versions
 # of conda).
-def _platform_hacked_conda_code(platform, bits):
+def _platform_hack_setup_code(platform, bits):
     return """import conda
 try:
     # this is conda 4.2 and 4.3
@@ -92,15 +98,33 @@ except ImportError:
     else:
         if msys_url in conda.config.defaults_:
             conda.config.defaults_.remove(msys_url)
+""".format(
+        platform=platform, bits=bits).strip() + "\n"
 
 
+def _platform_hacked_conda_code(platform, bits):
+    return _platform_hack_setup_code(platform, bits) + """
+
 import conda.cli
 import sys
 
 sys.argv[0] = "conda"
 sys.exit(conda.cli.main())
-""".format(
-        platform=platform, bits=bits).strip() + "\n"
+"""
+
+
+def _get_root_python():
+    # this has to be the python from the root env,
+    # so the conda modules will be found.
+    root_prefix = _get_root_prefix()
+    if root_prefix is None:
+        return None
+    for location in (('bin', 'python'), ('python.exe', ), ('Scripts', 'python.exe'), ('Library', 'bin',
+                                                                                      'python.exe')):
+        candidate = os.path.join(root_prefix, *location)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
 
 
 def _get_platform_hacked_conda_command(extra_args, platform):
@@ -113,16 +137,7 @@ def _get_platform_hacked_conda_command(extra_args, platform):
 
         conda_code = _platform_hacked_conda_code(platform_name, bits)
 
-        # this has to run with the python from the root env,
-        # so the conda modules will be found.
-        root_prefix = _get_root_prefix()
-        root_python = None
-        for location in (('bin', 'python'), ('python.exe', ), ('Scripts', 'python.exe'), ('Library', 'bin',
-                                                                                          'python.exe')):
-            candidate = os.path.join(root_prefix, *location)
-            if os.path.isfile(candidate):
-                root_python = candidate
-                break
+        root_python = _get_root_python()
         assert root_python is not None
 
         cmd_list = [root_python, '-c', conda_code]
@@ -130,18 +145,92 @@ def _get_platform_hacked_conda_command(extra_args, platform):
         return (cmd_list, " ".join(["conda"] + cmd_list[3:]))
 
 
-def _call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
-    assert len(extra_args) > 0  # we deref extra_args[0] below
+# platform name => CondaWorker
+_conda_workers = dict()
+_conda_workers_lock = threading.Lock()
+
+
+def _close_conda_workers():
+    with _conda_workers_lock:
+        for worker in _conda_workers.values():
+            worker.close()
+        _conda_workers.clear()
+
+
+atexit.register(_close_conda_workers)
+
+
+# set while we look up the root python for a worker, since that
+# runs "conda info" which would otherwise want a worker itself.
+_conda_worker_state = threading.local()
+
+
+def _get_conda_worker(platform):
+    """Get the conda worker for a platform, or None if workers are disabled or unusable."""
+    if not conda_worker.enabled() or getattr(_conda_worker_state, 'finding_root_python', False):
+        return None
+    if platform is None:
+        platform = current_platform()
+    with _conda_workers_lock:
+        worker = _conda_workers.get(platform, None)
+    if worker is None:
+        _conda_worker_state.finding_root_python = True
+        try:
+            root_python = _get_root_python()
+        except CondaError:
+            root_python = None
+        finally:
+            _conda_worker_state.finding_root_python = False
+        if root_python is None:
+            return None
+        setup_code = ''
+        if platform != current_platform():
+            (platform_name, bits) = platform.split("-")
+            setup_code = _platform_hack_setup_code(platform_name, bits)
+        with _conda_workers_lock:
+            worker = _conda_workers.setdefault(platform, conda_worker.CondaWorker(root_python, setup_code))
+    if worker.broken:
+        return None
+    return worker
+
+
+def _popen_conda(extra_args, platform, stdout_callback, stderr_callback):
+    """Run conda, returning (returncode, stdout_lines, stderr_lines, command_in_errors)."""
+    worker = _get_conda_worker(platform)
+    if worker is not None:
+        command_in_errors = " ".join(["conda"] + list(extra_args))
+        try:
+            result = worker.call(extra_args, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
+        except conda_worker.CondaWorkerDied as e:
+            raise CondaError(str(e))
+        if result is not None:
+            (returncode, stdout_lines, stderr_lines) = result
+            return (returncode, stdout_lines, stderr_lines, command_in_errors)
+        # the worker was busy or can't import conda, so fall
+        # back to a subprocess
 
     (cmd_list, command_in_errors) = _get_platform_hacked_conda_command(extra_args, platform=platform)
 
+    timings.emit_event('subprocess_started', args=cmd_list)
+    start = timings.monotonic()
     try:
         (p, stdout_lines, stderr_lines) = streaming_popen.popen(
             cmd_list, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
     except OSError as e:
         raise CondaError("failed to run: %r: %r" % (command_in_errors, repr(e)))
+    timings.emit_event(
+        'subprocess_exited', args=cmd_list, returncode=p.returncode, seconds=(timings.monotonic() - start))
+    return (p.returncode, stdout_lines, stderr_lines, command_in_errors)
+
+
+def _call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
+    assert len(extra_args) > 0  # we deref extra_args[0] below
+
+    with timings.timed("conda " + extra_args[0]):
+        (returncode, stdout_lines, stderr_lines, command_in_errors) = _popen_conda(
+            extra_args, platform=platform, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
     errstr = "".join(stderr_lines)
-    if p.returncode != 0:
+    if returncode != 0:
         parsed = None
         message = errstr
         if json_mode:
@@ -163,7 +252,7 @@ def _call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None
     elif errstr != '' and stderr_callback is None:
         # this is a sort of fallback because not all of our code
         # passes in a callback yet.
-        for line in stderr_lines:
+        for line in "".join(stderr_lines).splitlines(True):
             print("%s %s: %s" % ("conda", extra_args[0], line.strip()), file=sys.stderr)
 
     return "".join(stdout_lines)
@@ -186,6 +275,74 @@ def info(platform=None):
     return _call_and_parse_json(['info', '--json'], platform=platform)
 
 
+_INFO_CACHE_FILENAME = 'conda-info.json'
+
+# These are set by activating an environment and don't change
+# anything "conda info" reports that we rely on.
+_activation_variables = ('CONDA_PREFIX', 'CONDA_DEFAULT_ENV', 'CONDA_ENV_PATH', 'CONDA_SHLVL', 'CONDA_PROMPT_MODIFIER')
+
+
+def _which(program):
+    if hasattr(shutil, 'which'):
+        return shutil.which(program)
+    else:  # pragma: no cover (py2 only)
+        from distutils.spawn import find_executable
+        return find_executable(program)
+
+
+def _mtime_or_none(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _info_cache_key(cached):
+    # "cached" is the info we're validating; its envs dirs and
+    # condarc locations are what we'd have to look at again to know
+    # whether envs or config changed.
+    conda_exe = _which(CONDA_EXE) or CONDA_EXE
+    paths = list(cached.get('envs_dirs', []))
+    paths.append(os.path.join(os.path.expanduser('~'), '.conda', 'environments.txt'))
+    for rc_key in ('rc_path', 'user_rc_path', 'sys_rc_path'):
+        if cached.get(rc_key):
+            paths.append(cached[rc_key])
+    environ = []
+    for (name, value) in os.environ.items():
+        if name.startswith('CONDA') and name not in _activation_variables and not name.startswith('CONDA_PREFIX_'):
+            environ.append([name, value])
+    environ.sort()
+    return dict(
+        conda_exe=conda_exe,
+        conda_exe_mtime=_mtime_or_none(conda_exe),
+        paths=[[path, _mtime_or_none(path)] for path in paths],
+        environ=environ)
+
+
+def cached_info(refresh=False):
+    """Like ``info()`` for the current platform, but cached across processes.
+
+    The cache lives in the per-user cache directory and is thrown away
+    if the conda executable, the environment directories, condarc
+    files, or conda-related environment variables have changed.
+
+    Args:
+        refresh (bool): ignore any cached info and run conda again
+
+    Returns:
+        dictionary from ``conda info --json``
+    """
+    filename = os.path.join(user_cache.user_cache_directory(), _INFO_CACHE_FILENAME)
+    if not refresh:
+        (key, value) = user_cache.load_json_cache(filename)
+        if isinstance(value, dict) and user_cache.key_matches(key, _info_cache_key(value)):
+            return value
+
+    result = info()
+    user_cache.save_json_cache(filename, _info_cache_key(result), result)
+    return result
+
+
 def resolve_env_to_prefix(name_or_prefix):
     """Convert an env name or path into a canonical prefix path.
 
@@ -195,7 +352,7 @@ def resolve_env_to_prefix(name_or_prefix):
     if os.path.isabs(name_or_prefix):
         return name_or_prefix
 
-    json = info()
+    json = cached_info()
     root_prefix = json.get('root_prefix', None)
     if name_or_prefix == 'root':
         return root_prefix
@@ -251,6 +408,47 @@ def install(prefix, pkgs=None, channels=(), stdout_callback=None, stderr_callbac
     _call_conda(cmd_list, stdout_callback=stdout_callback, stderr_callback=stderr_callback)
 
 
+def _call_conda_with_explicit_file(cmd_list, urls, stdout_callback, stderr_callback):
+    (fd, filename) = tempfile.mkstemp(prefix="anaconda_project_explicit_", suffix=".txt")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("@EXPLICIT\n")
+            for url in urls:
+                f.write(url + "\n")
+        _call_conda(cmd_list + ['--file', filename], stdout_callback=stdout_callback, stderr_callback=stderr_callback)
+    finally:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+
+def create_explicit(prefix, urls, stdout_callback=None, stderr_callback=None):
+    """Create an environment containing exactly the given package URLs, without solving.
+
+    The URLs are in the format of an @EXPLICIT file, usually with a ``#md5`` suffix.
+    """
+    if not urls or not isinstance(urls, (list, tuple)):
+        raise TypeError('must specify a list of one or more package URLs to install into new environment')
+
+    if os.path.exists(prefix):
+        raise CondaEnvExistsError('Conda environment [%s] already exists' % prefix)
+
+    _call_conda_with_explicit_file(['create', '--yes', '--prefix', prefix], urls, stdout_callback, stderr_callback)
+
+
+def install_explicit(prefix, urls, stdout_callback=None, stderr_callback=None):
+    """Install the given package URLs into an environment, without solving.
+
+    Installed packages with the same names are replaced. The URLs
+    are in the format of an @EXPLICIT file, usually with a ``#md5`` suffix.
+    """
+    if not urls or not isinstance(urls, (list, tuple)):
+        raise TypeError('must specify a list of one or more package URLs to install into existing environment')
+
+    _call_conda_with_explicit_file(['install', '--yes', '--prefix', prefix], urls, stdout_callback, stderr_callback)
+
+
 def remove(prefix, pkgs=None, stdout_callback=None, stderr_callback=None):
     """Remove packages from an environment either by name or path."""
     if not pkgs or not isinstance(pkgs, (list, tuple)):
@@ -273,6 +471,26 @@ def _parse_dist(dist):
         return None
 
 
+_explicit_url_re = re.compile(r'^[a-z][a-z0-9+.-]*://.+/([^/#]+)(\.tar\.bz2|\.conda)#([0-9a-f]{32})$')
+
+
+def parse_explicit_url(url):
+    """Parse a package URL of the kind found in an @EXPLICIT file.
+
+    Args:
+        url (str): like "https://repo.anaconda.com/pkgs/main/linux-64/numpy-1.10.4-py34_1.tar.bz2#<md5>"
+
+    Returns:
+        (name, version, build) tuple, or None if the URL isn't a package URL with an md5
+    """
+    if not is_string(url):
+        return None
+    match = _explicit_url_re.match(url.strip())
+    if match is None:
+        return None
+    return _parse_dist(match.group(1))
+
+
 def installed(prefix):
     """Get a dict of package names to (name, version, build) tuples."""
     meta_dir = os.path.join(prefix, 'conda-meta')
@@ -291,12 +509,110 @@ def installed(prefix):
     return result
 
 
-def resolve_dependencies(pkgs, channels=(), platform=None):
-    """Resolve packages into a full transitive list of (name, version, build) tuples."""
+def _solve_cache_key(pkgs, channels, platform):
+    try:
+        json = cached_info()
+    except CondaError:
+        # we can't tell which conda or repodata we'd be solving
+        # with, so don't use the cache.
+        return None
+    if platform is None:
+        platform = current_platform()
+    repodata = solve_cache.repodata_fingerprint(json.get('pkgs_dirs', []))
+    # include the configured channels (from condarc) since they
+    # are used in addition to the ones we pass in.
+    all_channels = list(channels) + ["condarc:" + c for c in json.get('channels', [])]
+    return solve_cache.solve_cache_key(
+        pkgs=pkgs,
+        channels=all_channels,
+        platform=platform,
+        conda_version=json.get('conda_version', None),
+        repodata=repodata)
+
+
+def resolve_dependencies(pkgs, channels=(), platform=None, with_urls=False):
+    """Resolve packages into a full transitive list of (name, version, build) tuples.
+
+    If ``with_urls`` is True, the tuples are instead (name, version,
+    build, url, md5), where url and md5 are None if we couldn't find
+    them out (usually because conda is too old to tell us and the
+    package isn't in the package cache).
+
+    If ``ANACONDA_PROJECT_SOLVE_CACHE_DIR`` is set, solves are
+    cached there keyed on the specs, channels, platform, conda
+    version and the state of conda's cached channel repodata.
+    """
     if not pkgs or not isinstance(pkgs, (list, tuple)):
         raise TypeError('must specify a list of one or more packages to install into existing environment, not %r',
                         pkgs)
 
+    cache = solve_cache.solve_cache_from_environment()
+    cache_key = None
+    if cache is not None:
+        cache_key = _solve_cache_key(pkgs, channels, platform)
+        if cache_key is not None:
+            results = cache.get(cache_key)
+            # a solve cached without urls doesn't help if we want them
+            if results is not None and not (with_urls and _any_missing_url(results)):
+                return _results_with_or_without_urls(results, with_urls)
+
+    results = _resolve_dependencies_with_conda(pkgs, channels, platform, with_urls)
+
+    if cache_key is not None:
+        # conda may have refreshed its repodata while solving, so
+        # store the solve under the repodata it actually used.
+        cache_key = _solve_cache_key(pkgs, channels, platform)
+        if cache_key is not None:
+            cache.put(cache_key, results)
+
+    return _results_with_or_without_urls(results, with_urls)
+
+
+def _any_missing_url(results):
+    for result in results:
+        if result[3] is None or result[4] is None:
+            return True
+    return False
+
+
+def _results_with_or_without_urls(results, with_urls):
+    if with_urls:
+        return results
+    else:
+        return [result[:3] for result in results]
+
+
+def _package_record(dist_name, pkgs_dirs):
+    # conda keeps the full index record, including url and md5,
+    # for each package in its package cache.
+    for pkgs_dir in pkgs_dirs:
+        filename = os.path.join(pkgs_dir, dist_name, 'info', 'repodata_record.json')
+        try:
+            with open(filename) as f:
+                record = json.load(f)
+        except (IOError, OSError, ValueError):
+            continue
+        if isinstance(record, dict):
+            return record
+    return None
+
+
+def _url_and_md5(link, fetches, pkgs_dirs, platform):
+    dist_name = link.get('dist_name', None)
+    candidates = [link, fetches.get(dist_name, None)]
+    if dist_name is not None:
+        candidates.append(_package_record(dist_name, pkgs_dirs))
+    for record in candidates:
+        if isinstance(record, dict) and is_string(record.get('url', None)) and is_string(record.get('md5', None)):
+            url = record['url']
+            # the package cache may have a same-named package for
+            # a different platform than the one we're solving for.
+            if "/%s/" % platform in url or "/noarch/" in url:
+                return (url, record['md5'])
+    return (None, None)
+
+
+def _resolve_dependencies_with_conda(pkgs, channels, platform, with_urls):
     # even with --dry-run, conda wants to create the prefix,
     # so we ensure it's somewhere out of the way.
     prefix = tempfile.mkdtemp(prefix="_anaconda_project_resolve_")
@@ -328,6 +644,24 @@ def resolve_dependencies(pkgs, channels=(), platform=None):
     if isinstance(actions, dict):
         actions = [actions]
 
+    fetches = dict()
+    pkgs_dirs = []
+    if with_urls:
+        # url and md5 are in LINK with newer conda; otherwise they
+        # are in FETCH for packages that need downloading, or in
+        # the package cache for the rest.
+        for action in actions:
+            if isinstance(action, dict):
+                for fetch in action.get('FETCH', []):
+                    if isinstance(fetch, dict) and 'dist_name' in fetch:
+                        fetches[fetch['dist_name']] = fetch
+        try:
+            pkgs_dirs = cached_info().get('pkgs_dirs', [])
+        except CondaError:
+            pass
+        if platform is None:
+            platform = current_platform()
+
     for action in actions:
         if isinstance(action, dict):
             links = action.get('LINK', [])
@@ -343,13 +677,19 @@ def resolve_dependencies(pkgs, channels=(), platform=None):
                     if name is not None and \
                        version is not None and \
                        build_string is not None:
-                        found = (name, version, build_string)
+                        if with_urls:
+                            url_and_md5 = _url_and_md5(link, fetches, pkgs_dirs, platform)
+                        else:
+                            url_and_md5 = (None, None)
+                        found = (name, version, build_string) + url_and_md5
                 elif is_string(link):
                     # we have a string like 'python-3.6.0-0 2'
                     pieces = link.split()
                     if len(pieces) > 0:
                         # 'found' can be None if we didn't understand the string
                         found = _parse_dist(pieces[0])
+                        if found is not None:
+                            found = found + (None, None)
 
                 if found is not None:
                     results.append(found)
@@ -571,7 +911,7 @@ def environ_set_prefix(environ, prefix, varname=conda_prefix_variable()):
         global _envs_dirs
         global _root_dir
         if _envs_dirs is None:
-            i = info()
+            i = cached_info()
             _envs_dirs = [os.path.normpath(d) for d in i.get('envs_dirs', [])]
             _root_dir = os.path.normpath(i.get('root_prefix'))
         if prefix == _root_dir:
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Long-lived worker processes which run conda's CLI in-process.
+
+Starting a new conda interpreter (and importing conda) for every
+operation dominates the cost of short operations like ``conda info``
+or a dry-run solve. A worker is a Python process from the root
+environment which imports conda once and then runs one conda
+command per request, streaming the output back to us as JSON lines
+over its stdin/stdout pipes.
+"""
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import subprocess
+import threading
+
+from anaconda_project.internal import logged_subprocess
+
+ENABLE_VARIABLE = 'ANACONDA_PROJECT_CONDA_WORKER'
+
+# Runs in the worker. "setup_code" is run before importing conda,
+# which is how we make a worker pretend to be another platform.
+# Every message we send is a single JSON line:
+#   {"ready": bool, "error": str}   once, at startup
+#   {"stream": "stdout"|"stderr", "data": str}   as conda writes output
+#   {"returncode": int}   when a request is complete
+_worker_code_template = """
+import json
+import os
+import sys
+import traceback
+
+_pipe = sys.stdout
+
+
+def _send(message):
+    _pipe.write(json.dumps(message) + "\\n")
+    _pipe.flush()
+
+
+try:
+{setup_code}
+    import conda.cli
+except Exception as e:
+    _send(dict(ready=False, error=str(e)))
+    sys.exit(1)
+
+
+class _Stream(object):
+    def __init__(self, name):
+        self.name = name
+        self.encoding = 'utf-8'
+
+    def write(self, data):
+        if not data:
+            return
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+        _send(dict(stream=self.name, data=data))
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _run(request):
+    os.environ.clear()
+    os.environ.update(request['environ'])
+    os.chdir(request['cwd'])
+    sys.argv = ['conda'] + request['args']
+    try:
+        result = conda.cli.main()
+    except SystemExit as e:
+        result = e.code
+    except BaseException:
+        sys.stderr.write(traceback.format_exc())
+        return 1
+    if result is None:
+        return 0
+    if isinstance(result, int):
+        return result
+    sys.stderr.write(str(result) + "\\n")
+    return 1
+
+
+_send(dict(ready=True))
+
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    request = json.loads(line)
+    (real_stdout, real_stderr) = (sys.stdout, sys.stderr)
+    sys.stdout = _Stream('stdout')
+    sys.stderr = _Stream('stderr')
+    try:
+        returncode = _run(request)
+    finally:
+        (sys.stdout, sys.stderr) = (real_stdout, real_stderr)
+    _send(dict(returncode=returncode))
+"""
+
+
+def _indent(code, prefix):
+    return "\n".join((prefix + line) if line.strip() != '' else line for line in code.split("\n"))
+
+
+def worker_code(setup_code=''):
+    """Get the Python source run by a worker process."""
+    if setup_code.strip() == '':
+        setup_code = 'pass'
+    return _worker_code_template.format(setup_code=_indent(setup_code.strip(), '    ')).strip() + "\n"
+
+
+def enabled(environ=None):
+    """True if the user has opted into conda workers with ``ANACONDA_PROJECT_CONDA_WORKER``."""
+    if environ is None:
+        environ = os.environ
+    return environ.get(ENABLE_VARIABLE, '').lower() in ('1', 'true', 'yes')
+
+
+class CondaWorkerDied(Exception):
+    """The worker exited partway through a request."""
+
+    pass
+
+
+class CondaWorker(object):
+    """A worker process running conda for one platform.
+
+    Workers handle one request at a time; ``call()`` returns None
+    rather than waiting if the worker is busy, or if the worker
+    can't run conda at all, so the caller can fall back to running
+    a conda subprocess.
+    """
+
+    def __init__(self, python, setup_code=''):
+        """Create a worker (the process is started on first use).
+
+        Args:
+            python (str): path to a Python which can import conda
+            setup_code (str): code to run before importing conda
+        """
+        self._python = python
+        self._setup_code = setup_code
+        self._process = None
+        self._broken = False
+        self._lock = threading.Lock()
+
+    @property
+    def broken(self):
+        """True if we gave up on this worker."""
+        return self._broken
+
+    def _start(self):
+        args = [self._python, '-u', '-c', worker_code(self._setup_code)]
+        try:
+            self._process = logged_subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError:
+            return False
+        hello = self._read_message()
+        if hello is None or not hello.get('ready', False):
+            self._kill()
+            return False
+        return True
+
+    def _read_message(self):
+        while True:
+            # readline() on the binary pipe returns as soon as it has
+            # a line, unlike a codecs reader which wants a full buffer.
+            line = self._process.stdout.readline().decode('utf-8', 'replace')
+            if line == '':
+                return None
+            try:
+                message = json.loads(line)
+            except ValueError:
+                # something in conda wrote to the real stdout
+                continue
+            if isinstance(message, dict):
+                return message
+
+    def _kill(self):
+        self._broken = True
+        if self._process is not None:
+            try:
+                self._process.kill()
+                self._process.wait()
+            except OSError:  # pragma: no cover (race with process exit)
+                pass
+            for pipe in (self._process.stdin, self._process.stdout):
+                try:
+                    pipe.close()
+                except (IOError, OSError):  # pragma: no cover
+                    pass
+            self._process = None
+
+    def call(self, extra_args, stdout_callback=None, stderr_callback=None):
+        """Run a conda command in the worker.
+
+        Args:
+            extra_args (list of str): conda command line, without "conda"
+            stdout_callback (function): called with chunks of stdout
+            stderr_callback (function): called with chunks of stderr
+
+        Returns:
+            (returncode, stdout_chunks, stderr_chunks) or None if the
+            worker couldn't take the request
+
+        Raises:
+            CondaWorkerDied if the worker exited after starting the request
+        """
+        if self._broken or not self._lock.acquire(False):
+            return None
+        try:
+            if self._process is None and not self._start():
+                return None
+
+            request = dict(args=list(extra_args), environ=dict(os.environ), cwd=os.getcwd())
+            try:
+                self._process.stdin.write((json.dumps(request) + "\n").encode('utf-8'))
+                self._process.stdin.flush()
+            except (IOError, OSError):
+                # died while idle; nothing was done on our behalf
+                self._kill()
+                return None
+
+            stdout_chunks = []
+            stderr_chunks = []
+            while True:
+                message = self._read_message()
+                if message is None:
+                    self._kill()
+                    raise CondaWorkerDied("conda worker exited while running: conda %s" % " ".join(extra_args))
+                if 'returncode' in message:
+                    return (message['returncode'], stdout_chunks, stderr_chunks)
+                data = message.get('data', '')
+                if message.get('stream') == 'stderr':
+                    stderr_chunks.append(data)
+                    if stderr_callback is not None:
+                        stderr_callback(data)
+                else:
+                    stdout_chunks.append(data)
+                    if stdout_callback is not None:
+                        stdout_callback(data)
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Stop the worker process."""
+        if self._process is not None:
+            try:
+                # closing stdin ends the worker's request loop
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+            except (IOError, OSError):  # pragma: no cover
+                pass
+            self._process = None
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Run tornado coroutines from blocking code, and blocking code from coroutines.
+
+Most of prepare is blocking (it runs conda, checks files, waits for
+services), but downloads are tornado coroutines. Blocking code runs
+coroutines with ``run_sync()``, which normally uses a private
+IOLoop. When a coroutine calls blocking code with ``run_blocking()``,
+the blocking code runs on a worker thread, and ``run_sync()`` on that
+thread runs coroutines on the caller's IOLoop instead.
+"""
+from __future__ import absolute_import, print_function
+
+import collections
+import contextlib
+import sys
+import threading
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from anaconda_project.internal import parallel
+
+_state = threading.local()
+
+_DEFAULT_BLOCKING_WORKERS = 8
+
+# idle workers exit after this long
+_WORKER_IDLE_SECONDS = 60
+
+
+def current_caller_loop():
+    """Get the IOLoop of the coroutine which is waiting on this thread, or None."""
+    return getattr(_state, 'io_loop', None)
+
+
+@contextlib.contextmanager
+def caller_loop_scope(io_loop):
+    """Make ``run_sync()`` on this thread use ``io_loop`` (None to use a private IOLoop)."""
+    old = current_caller_loop()
+    _state.io_loop = io_loop
+    try:
+        yield
+    finally:
+        _state.io_loop = old
+
+
+def run_sync(func):
+    """Run a coroutine function to completion from blocking code.
+
+    Args:
+        func (function): takes no arguments and returns a future
+
+    Returns:
+        the coroutine's result
+    """
+    io_loop = current_caller_loop()
+    if io_loop is None:
+        io_loop = IOLoop(make_current=False)
+        try:
+            return io_loop.run_sync(func)
+        finally:
+            io_loop.close()
+
+    done = threading.Event()
+    outcome = dict()
+
+    @gen.coroutine
+    def run():
+        try:
+            outcome['result'] = yield func()
+        except BaseException:
+            outcome['error'] = sys.exc_info()[1]
+        finally:
+            done.set()
+
+    io_loop.add_callback(run)
+    workers = getattr(_state, 'workers', None)
+    if workers is None:
+        done.wait()
+    else:
+        with workers.waiting():
+            done.wait()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+
+class _Workers(object):
+    """Threads which run blocking calls, started as needed up to a limit.
+
+    A worker waiting in ``run_sync()`` on its caller's IOLoop doesn't
+    count against the limit, since the coroutine it waits for may
+    itself be waiting on another blocking call.
+    """
+
+    def __init__(self, max_workers):
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        # (event, [job]) for each idle worker
+        self._idle = []
+        self._active = 0
+
+    def submit(self, job):
+        with self._lock:
+            self._pending.append(job)
+            self._dispatch()
+
+    def _dispatch(self):
+        # called with the lock held
+        while self._pending and self._active < self._max_workers:
+            job = self._pending.popleft()
+            self._active += 1
+            if self._idle:
+                (event, slot) = self._idle.pop()
+                slot.append(job)
+                event.set()
+            else:
+                thread = threading.Thread(target=self._work, args=(job, ))
+                thread.daemon = True
+                thread.start()
+
+    def _next_job(self):
+        event = threading.Event()
+        slot = []
+        with self._lock:
+            self._active -= 1
+            if self._pending and self._active < self._max_workers:
+                self._active += 1
+                return self._pending.popleft()
+            self._idle.append((event, slot))
+
+        event.wait(_WORKER_IDLE_SECONDS)
+        with self._lock:
+            if slot:
+                return slot[0]
+            self._idle.remove((event, slot))
+            return None
+
+    def _work(self, job):
+        _state.workers = self
+        while job is not None:
+            job()
+            job = self._next_job()
+
+    @contextlib.contextmanager
+    def waiting(self):
+        """Don't count the current worker against the limit for the duration of the block."""
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active += 1
+
+
+_workers = None
+_workers_lock = threading.Lock()
+
+
+def _get_workers():
+    global _workers
+    with _workers_lock:
+        if _workers is None:
+            _workers = _Workers(
+                parallel.default_max_workers('ANACONDA_PROJECT_BLOCKING_WORKERS', _DEFAULT_BLOCKING_WORKERS))
+        return _workers
+
+
+def run_blocking(func, *args, **kwargs):
+    """Call a blocking function on a worker thread, without blocking the current IOLoop.
+
+    Worker threads are shared and bounded in number (set
+    ``ANACONDA_PROJECT_BLOCKING_WORKERS`` to change the limit);
+    calls beyond the limit wait for a worker to be free. Coroutines
+    that ``func`` runs with ``run_sync()`` run on the current IOLoop.
+
+    Returns:
+        a future with the function's return value or exception
+    """
+    io_loop = IOLoop.current()
+    future = Future()
+
+    def work():
+        with caller_loop_scope(io_loop):
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                # including SystemExit and KeyboardInterrupt, so the
+                # coroutine waiting on us sees them instead of hanging
+                error = sys.exc_info()[1]
+                io_loop.add_callback(lambda: future.set_exception(error))
+            else:
+                io_loop.add_callback(lambda: future.set_result(result))
+
+    _get_workers().submit(work)
+    return future
@@ -9,14 +9,16 @@
 from __future__ import absolute_import
 
 import codecs
-import glob
+import hashlib
 import json
 import os
 
-from anaconda_project.conda_manager import (CondaManager, CondaEnvironmentDeviations, CondaLockSet, CondaManagerError)
+from anaconda_project.conda_manager import (CondaManager, CondaEnvironmentDeviations, CondaLockSet, CondaManagerError,
+                                            _current_deviation_cache)
 import anaconda_project.internal.conda_api as conda_api
 import anaconda_project.internal.pip_api as pip_api
 import anaconda_project.internal.makedirs as makedirs
+import anaconda_project.internal.parallel as parallel
 
 from anaconda_project.version import version
 
@@ -95,9 +97,56 @@ def _extract_common(by_platform):
     return {name: sorted(list(value)) for (name, value) in result.items()}
 
 
+# Each solve is a separate conda process which can use a fair bit
+# of memory, so we don't want one per platform without limit.
+_DEFAULT_RESOLVE_WORKERS = 4
+
+# Set this to record exact package URLs in lock sets, so
+# environments can be created from them without solving.
+LOCK_PACKAGE_URLS_VARIABLE = 'ANACONDA_PROJECT_LOCK_PACKAGE_URLS'
+
+
+def _lock_package_urls_enabled():
+    return os.environ.get(LOCK_PACKAGE_URLS_VARIABLE, '').lower() in ('1', 'true', 'yes')
+
+
+def environment_manifest(prefix):
+    """Get a hash of the names of the packages installed in an environment.
+
+    This is cheap to compute (no subprocesses) and changes whenever
+    conda or pip installs, removes, upgrades or downgrades anything.
+    """
+    # A hash of the names of the metadata entries for each
+    # installed package. conda-meta has one name-version-build.json
+    # per conda package, and pip leaves a name-version.dist-info
+    # (or .egg-info for older installs) in site-packages. We only
+    # list directories, so this is fast and doesn't depend on
+    # mtimes or clock resolution.
+    names = []
+    try:
+        names.extend("conda-meta/" + name for name in os.listdir(os.path.join(prefix, "conda-meta"))
+                     if name.endswith(".json"))
+    except OSError:
+        pass
+    for d in pip_api.site_packages_directories(prefix):
+        try:
+            names.extend("site-packages/" + name for name in os.listdir(d)
+                         if name.endswith(".dist-info") or name.endswith(".egg-info"))
+        except OSError:
+            pass
+    return hashlib.sha256("\n".join(sorted(names)).encode('utf-8')).hexdigest()
+
+
 class DefaultCondaManager(CondaManager):
-    def __init__(self, frontend):
+    def __init__(self, frontend, resolve_workers=None, lock_package_urls=None):
         self._frontend = frontend
+        if resolve_workers is None:
+            resolve_workers = parallel.default_max_workers('ANACONDA_PROJECT_RESOLVE_WORKERS',
+                                                           _DEFAULT_RESOLVE_WORKERS)
+        self._resolve_workers = resolve_workers
+        if lock_package_urls is None:
+            lock_package_urls = _lock_package_urls_enabled()
+        self._lock_package_urls = lock_package_urls
 
     def _log_info(self, line):
         if self._frontend is not None:
@@ -116,85 +165,41 @@ class DefaultCondaManager(CondaManager):
         if self._frontend is not None:
             self._frontend.partial_error(data)
 
-    def _timestamp_file(self, prefix, spec):
+    def _manifest_file(self, prefix, spec):
         return os.path.join(prefix, "var", "cache", "anaconda-project", "env-specs", spec.locked_hash)
 
-    def _timestamp_comparison_directories(self, prefix):
-        # this is a little bit heuristic; we are trying to detect
-        # if any packages are installed or removed. This may need
-        # to become more comprehensive.  We don't want to check
-        # directories that would change at runtime like /var/run,
-        # and we need this to be reasonably fast (so we can't do a
-        # full directory walk or something). Remember that on
-        # Linux at least a new mtime on a directory means
-        # _immediate_ child directory entries were added or
-        # removed, changing the files themselves or the files in
-        # subdirs will not affect mtime. Windows may be a bit
-        # different.
-
-        # Linux
-        dirs = list(glob.iglob(os.path.join(prefix, "lib", "python*", "site-packages")))
-        dirs.append(os.path.join(prefix, "bin"))
-        dirs.append(os.path.join(prefix, "lib"))
-        # Windows
-        dirs.append(os.path.join(prefix, "Lib", "site-packages"))
-        dirs.append(os.path.join(prefix, "Library", "bin"))
-        dirs.append(os.path.join(prefix, "Scripts"))
-        # conda-meta
-        dirs.append(os.path.join(prefix, "conda-meta"))
-
-        return dirs
-
-    def _timestamp_file_up_to_date(self, prefix, spec):
-        # The goal here is to return False if 1) the env spec
-        # has changed (different hash) or 2) the environment has
-        # been modified (e.g. by pip or conda).
+    def _environment_manifest(self, prefix):
+        return environment_manifest(prefix)
 
-        filename = self._timestamp_file(prefix, spec)
+    def _manifest_file_up_to_date(self, prefix, spec):
+        # The goal here is to return False if 1) the env spec
+        # has changed (different hash, so a different filename) or
+        # 2) the environment has been modified (e.g. by pip or conda).
+        filename = self._manifest_file(prefix, spec)
         try:
-            stamp_mtime = os.path.getmtime(filename)
-        except OSError:
+            with codecs.open(filename, 'r', encoding='utf-8') as f:
+                content = json.loads(f.read())
+        except (IOError, OSError, ValueError):
             return False
 
-        dirs = self._timestamp_comparison_directories(prefix)
-
-        for d in dirs:
-            try:
-                d_mtime = os.path.getmtime(d)
-            except OSError:
-                d_mtime = 0
-            # When we write the timestamp, we put it 1s in the
-            # future, so we want >= here (if the d_mtime has gone
-            # into the future from when we wrote the timestamp,
-            # the directory has changed).
-            if d_mtime >= stamp_mtime:
-                return False
+        # files written by older versions don't have a manifest
+        # and never match.
+        if not isinstance(content, dict) or 'manifest' not in content:
+            return False
 
-        return True
+        return content['manifest'] == self._environment_manifest(prefix)
 
-    def _write_timestamp_file(self, prefix, spec):
-        filename = self._timestamp_file(prefix, spec)
+    def _write_manifest_file(self, prefix, spec):
+        filename = self._manifest_file(prefix, spec)
         makedirs.makedirs_ok_if_exists(os.path.dirname(filename))
 
         try:
             with codecs.open(filename, 'w', encoding='utf-8') as f:
-                # we don't read the contents of the file for now, but
-                # recording the version in it in case in the future
-                # that is useful. We need to write something to the
-                # file to bump its mtime if it already exists...
-                f.write(json.dumps(dict(anaconda_project_version=version)) + "\n")
-            # set the timestamp 1s in the future, which guarantees
-            # it doesn't have the same mtime as any files in the
-            # environment changed by us; if another process
-            # changes some files during the current second, then
-            # we would not notice those changes. The alternative
-            # is that we falsely believe we changed things
-            # ourselves. Ultimately clock resolution keeps us from
-            # perfection here without some sort of cross-process
-            # locking.
-            actual_time = os.path.getmtime(filename)
-            next_tick_time = actual_time + 1
-            os.utime(filename, (next_tick_time, next_tick_time))
+                # the anaconda-project version isn't used for now, but
+                # recording it in case in the future that is useful.
+                f.write(
+                    json.dumps(dict(anaconda_project_version=version, manifest=self._environment_manifest(prefix))) +
+                    "\n")
         except (IOError, OSError):
             # ignore errors because this is just an optimization, if we
             # fail we will survive
@@ -212,17 +217,34 @@ class DefaultCondaManager(CondaManager):
             resolve_for_platforms.remove(current)
             resolve_for_platforms = [current] + resolve_for_platforms
         for conda_platform in resolve_for_platforms:
+            self._log_info("Resolving conda packages for %s" % conda_platform)
+
+        def resolve_for_platform(conda_platform):
             try:
-                self._log_info("Resolving conda packages for %s" % conda_platform)
-                deps = conda_api.resolve_dependencies(pkgs=package_specs, platform=conda_platform, channels=channels)
+                return conda_api.resolve_dependencies(
+                    pkgs=package_specs, platform=conda_platform, channels=channels, with_urls=self._lock_package_urls)
             except conda_api.CondaError as e:
                 raise CondaManagerError("Error resolving for {}: {}".format(conda_platform, str(e)))
-            locked_specs = ["%s=%s=%s" % dep for dep in deps]
+
+        # the solves are independent so we run them concurrently; if
+        # several fail, map_in_threads raises the error for the
+        # earliest platform in our list, which is "current" if present.
+        all_deps = parallel.map_in_threads(resolve_for_platform, resolve_for_platforms, self._resolve_workers)
+        urls_by_platform = {}
+        for (conda_platform, deps) in zip(resolve_for_platforms, all_deps):
+            locked_specs = ["%s=%s=%s" % tuple(dep[:3]) for dep in deps]
             by_platform[conda_platform] = sorted(locked_specs)
+            # we can only skip the solver if we know every package's
+            # url, so if any are missing we don't record any.
+            if self._lock_package_urls and all(dep[3] is not None and dep[4] is not None for dep in deps):
+                urls_by_platform[conda_platform] = sorted(["%s#%s" % (dep[3], dep[4]) for dep in deps])
 
         by_platform = _extract_common(by_platform)
 
-        lock_set = CondaLockSet(package_specs_by_platform=by_platform, platforms=resolve_for_platforms)
+        lock_set = CondaLockSet(
+            package_specs_by_platform=by_platform,
+            platforms=resolve_for_platforms,
+            package_urls_by_platform=urls_by_platform)
         return lock_set
 
     def _find_conda_deviations(self, prefix, env_spec):
@@ -234,6 +256,20 @@ class DefaultCondaManager(CondaManager):
         missing = set()
         wrong_version = set()
 
+        urls = env_spec.conda_package_urls_for_create
+        if urls is not None:
+            # we know exactly which builds should be installed
+            for url in urls:
+                wanted = conda_api.parse_explicit_url(url)
+                if wanted is None:
+                    continue
+                name = wanted[0]
+                if name not in installed:
+                    missing.add(name)
+                elif installed[name] != wanted:
+                    wrong_version.add(name)
+            return (sorted(list(missing)), sorted(list(wrong_version)))
+
         for spec_string in env_spec.conda_packages_for_create:
             spec = conda_api.parse_spec(spec_string)
             name = spec.name
@@ -275,10 +311,11 @@ class DefaultCondaManager(CondaManager):
         # TODO: we don't verify that the environment contains the right versions
         # https://github.com/Anaconda-Server/anaconda-project/issues/77
 
+        installed_names = set(pip_api.normalize_name(name) for name in installed)
         missing = set()
 
         for name in spec.pip_package_names_set:
-            if name not in installed:
+            if pip_api.normalize_name(name) not in installed_names:
                 missing.add(name)
 
         return sorted(list(missing))
@@ -298,6 +335,21 @@ class DefaultCondaManager(CondaManager):
         return error
 
     def find_environment_deviations(self, prefix, spec):
+        cache = _current_deviation_cache()
+        if cache is None:
+            return self._find_environment_deviations(prefix, spec)
+
+        # the manifest changes when anything is installed or removed,
+        # so a stale entry can't be found even if nobody invalidates it.
+        urls = spec.conda_package_urls_for_create
+        key = (prefix, spec.locked_hash, None if urls is None else tuple(urls), self._environment_manifest(prefix))
+        deviations = cache.get(key)
+        if deviations is None:
+            deviations = self._find_environment_deviations(prefix, spec)
+            cache.put(key, deviations)
+        return deviations
+
+    def _find_environment_deviations(self, prefix, spec):
         broken_lock_set = self._broken_lock_set_error(spec)
         if broken_lock_set is not None:
             return CondaEnvironmentDeviations(
@@ -318,16 +370,15 @@ class DefaultCondaManager(CondaManager):
                 wrong_version_pip_packages=(),
                 broken=True)
 
-        if self._timestamp_file_up_to_date(prefix, spec):
+        if self._manifest_file_up_to_date(prefix, spec):
             conda_missing = []
             conda_wrong_version = []
             pip_missing = []
-            timestamp_ok = True
+            manifest_ok = True
         else:
-
             (conda_missing, conda_wrong_version) = self._find_conda_deviations(prefix, spec)
             pip_missing = self._find_pip_missing(prefix, spec)
-            timestamp_ok = False
+            manifest_ok = False
 
         all_missing_string = ", ".join(conda_missing + pip_missing)
         all_wrong_version_string = ", ".join(conda_wrong_version)
@@ -339,7 +390,7 @@ class DefaultCondaManager(CondaManager):
             summary = "Conda environment is missing packages: %s" % all_missing_string
         elif all_wrong_version_string != "":
             summary = "Conda environment has wrong versions of: %s" % all_wrong_version_string
-        elif not timestamp_ok:
+        elif not manifest_ok:
             summary = "Conda environment needs to be marked as up-to-date"
         else:
             summary = "OK"
@@ -349,18 +400,42 @@ class DefaultCondaManager(CondaManager):
             wrong_version_packages=conda_wrong_version,
             missing_pip_packages=pip_missing,
             wrong_version_pip_packages=(),
-            broken=(not timestamp_ok))
+            broken=(not manifest_ok))
 
     def fix_environment_deviations(self, prefix, spec, deviations=None, create=True):
         if deviations is None:
             deviations = self.find_environment_deviations(prefix, spec)
 
+        try:
+            self._fix_environment_deviations(prefix, spec, deviations, create)
+        finally:
+            # if there was nothing to fix, the deviations we have are still right
+            cache = _current_deviation_cache()
+            if cache is not None and not deviations.ok:
+                cache.invalidate(prefix)
+
+    def _fix_environment_deviations(self, prefix, spec, deviations, create):
         if deviations.unfixable:
             raise CondaManagerError("Unable to update environment at %s" % prefix)
 
+        urls = spec.conda_package_urls_for_create
+
         if os.path.isdir(os.path.join(prefix, 'conda-meta')):
             to_update = list(set(deviations.missing_packages + deviations.wrong_version_packages))
-            if len(to_update) > 0:
+            update_urls = None
+            if urls is not None and len(to_update) > 0:
+                update_urls = self._urls_for_package_names(urls, to_update)
+            if update_urls is not None:
+                try:
+                    conda_api.install_explicit(
+                        prefix=prefix,
+                        urls=update_urls,
+                        stdout_callback=self._on_stdout,
+                        stderr_callback=self._on_stderr)
+                except conda_api.CondaError as e:
+                    raise CondaManagerError("Failed to install packages: {}: {}".format(
+                        ", ".join(sorted(to_update)), str(e)))
+            elif len(to_update) > 0:
                 specs = spec.specs_for_conda_package_names(to_update)
                 assert len(specs) == len(to_update)
                 try:
@@ -372,6 +447,13 @@ class DefaultCondaManager(CondaManager):
                         stderr_callback=self._on_stderr)
                 except conda_api.CondaError as e:
                     raise CondaManagerError("Failed to install packages: {}: {}".format(", ".join(specs), str(e)))
+        elif create and urls is not None and len(urls) > 0:
+            # Create environment from the exact packages in the lock set, no solving needed
+            try:
+                conda_api.create_explicit(
+                    prefix=prefix, urls=list(urls), stdout_callback=self._on_stdout, stderr_callback=self._on_stderr)
+            except conda_api.CondaError as e:
+                raise CondaManagerError("Failed to create environment at %s: %s" % (prefix, str(e)))
         elif create:
             # Create environment from scratch
 
@@ -403,11 +485,29 @@ class DefaultCondaManager(CondaManager):
                 raise CondaManagerError("Failed to install missing pip packages: {}: {}".format(
                     ", ".join(missing), str(e)))
 
-        # write a file to tell us we can short-circuit next time
-        self._write_timestamp_file(prefix, spec)
+        # record what's installed so we can short-circuit next time
+        self._write_manifest_file(prefix, spec)
+
+    def _urls_for_package_names(self, urls, names):
+        # None if we don't have a url for every name
+        by_name = dict()
+        for url in urls:
+            parsed = conda_api.parse_explicit_url(url)
+            if parsed is not None:
+                by_name[parsed[0]] = url
+        result = []
+        for name in sorted(names):
+            if name not in by_name:
+                return None
+            result.append(by_name[name])
+        return result
 
     def remove_packages(self, prefix, packages):
         try:
             conda_api.remove(prefix, packages, stdout_callback=self._on_stdout, stderr_callback=self._on_stderr)
         except conda_api.CondaError as e:
             raise CondaManagerError("Failed to remove packages from %s: %s" % (prefix, str(e)))
+        finally:
+            cache = _current_deviation_cache()
+            if cache is not None:
+                cache.invalidate(prefix)
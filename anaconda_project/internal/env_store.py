@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""A store of environments shared between projects.
+
+If ``ANACONDA_PROJECT_SHARED_ENVS_PATH`` is set, env specs use
+``<shared envs path>/<locked hash>`` as their environment, so all
+projects which lock to the same packages use the same environment.
+
+Each environment records which projects use it (references) and
+when it was last prepared; ``gc`` uses these to decide what to
+delete. While a project creates or updates an environment, it
+holds a lock so no other project or process works on the same
+environment at once, and leaves a marker so ``gc`` doesn't delete
+the environment out from under it.
+"""
+from __future__ import absolute_import, print_function
+
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.simple_status import SimpleStatus
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (Windows only)
+    fcntl = None
+    import msvcrt  # pragma: no cover (Windows only)
+
+SHARED_ENVS_PATH_VARIABLE = 'ANACONDA_PROJECT_SHARED_ENVS_PATH'
+
+# markers of environments being prepared live here, outside the
+# environments, since conda wants to create the prefix itself
+_PREPARING_DIRECTORY = '.preparing'
+
+# lock files for environments being prepared; not in
+# _PREPARING_DIRECTORY since they stay around after the prepare
+_LOCKS_DIRECTORY = '.locks'
+
+# a marker this old was left by a process that died
+_PREPARING_EXPIRES_SECONDS = 24 * 60 * 60
+
+# an environment whose conda-meta changed this recently may be
+# being created by something that didn't leave a marker
+_GRACE_SECONDS = 30 * 60
+
+
+def shared_envs_path(environ=None):
+    """Get the shared env store directory, or None if not enabled."""
+    if environ is None:
+        environ = os.environ
+    path = environ.get(SHARED_ENVS_PATH_VARIABLE, '')
+    if path == '':
+        return None
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def shared_env_store(environ=None):
+    """Get the shared ``EnvStore``, or None if not enabled."""
+    path = shared_envs_path(environ)
+    if path is None:
+        return None
+    return EnvStore(path)
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        # flock, unlike lockf, also excludes other threads in this process
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:  # pragma: no cover (Windows only)
+        while True:
+            try:
+                # LK_LOCK gives up after 10 seconds
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except (IOError, OSError):
+                pass
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:  # pragma: no cover (Windows only)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _directory_size(path):
+    total = 0
+    for (root, dirs, files) in os.walk(path):
+        for name in files:
+            try:
+                # lstat so a symlink counts as the link, not its target
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class EnvStore(object):
+    """A directory of environments named by ``EnvSpec.locked_hash``."""
+
+    def __init__(self, directory):
+        """Create a store in the given directory (which may not exist yet)."""
+        self._directory = directory
+
+    @property
+    def directory(self):
+        """The directory containing the environments."""
+        return self._directory
+
+    def prefix(self, locked_hash):
+        """Get the environment prefix for a locked hash."""
+        return os.path.join(self._directory, locked_hash)
+
+    def locked_hash_for_prefix(self, prefix):
+        """Get the locked hash if the prefix is in the store, else None."""
+        prefix = os.path.normpath(prefix)
+        if os.path.dirname(prefix) == os.path.normpath(self._directory):
+            return os.path.basename(prefix)
+        return None
+
+    def locked_hashes(self):
+        """List the hashes of environments in the store."""
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+        return sorted(name for name in names if os.path.isdir(os.path.join(self._directory, name, 'conda-meta')))
+
+    def _state_dir(self, locked_hash):
+        return os.path.join(self.prefix(locked_hash), 'var', 'cache', 'anaconda-project', 'store')
+
+    def _references_dir(self, locked_hash):
+        return os.path.join(self._state_dir(locked_hash), 'references')
+
+    def _last_used_file(self, locked_hash):
+        return os.path.join(self._state_dir(locked_hash), 'last-used')
+
+    def _reference_filename(self, project_dir, env_name):
+        key = hashlib.sha1((os.path.normpath(project_dir) + "\0" + env_name).encode('utf-8')).hexdigest()
+        return key + ".json"
+
+    def _preparing_dir(self):
+        return os.path.join(self._directory, _PREPARING_DIRECTORY)
+
+    @contextmanager
+    def _exclusive(self, locked_hash):
+        lock_dir = os.path.join(self._directory, _LOCKS_DIRECTORY)
+        f = None
+        try:
+            makedirs_ok_if_exists(lock_dir)
+            f = open(os.path.join(lock_dir, locked_hash + ".lock"), 'a')
+            _lock_file(f)
+        except (IOError, OSError):
+            # the filesystem may not support locks; the worst case
+            # is two prepares of the same env at once, as before
+            if f is not None:
+                f.close()
+                f = None
+        try:
+            yield
+        finally:
+            if f is not None:
+                _unlock_file(f)
+                f.close()
+
+    @contextmanager
+    def preparing(self, locked_hash):
+        """Lock an environment to create or update it, and keep ``gc`` away from it.
+
+        Only one project or process at a time can prepare an
+        environment; others wait here until it's done, so they
+        should check again whether the environment needs work
+        once they get the lock.
+
+        Use as ``with store.preparing(locked_hash):``.
+        """
+        with self._exclusive(locked_hash):
+            with self._marked_preparing(locked_hash):
+                yield
+
+    @contextmanager
+    def _marked_preparing(self, locked_hash):
+        marker = os.path.join(self._preparing_dir(), "%s.%s" % (locked_hash, uuid.uuid4().hex))
+        try:
+            makedirs_ok_if_exists(self._preparing_dir())
+            with codecs.open(marker, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(dict(pid=os.getpid())) + "\n")
+        except (IOError, OSError):
+            # the worst case is that gc removes the env while we
+            # prepare it, and the prepare fails
+            marker = None
+        try:
+            yield
+        finally:
+            if marker is not None:
+                try:
+                    os.remove(marker)
+                except OSError:
+                    pass
+
+    def is_preparing(self, locked_hash, now=None):
+        """Get whether a project is creating or updating an environment."""
+        if now is None:
+            now = time.time()
+        try:
+            names = os.listdir(self._preparing_dir())
+        except OSError:
+            return False
+        for name in names:
+            if name.split('.')[0] != locked_hash:
+                continue
+            try:
+                if now - os.path.getmtime(os.path.join(self._preparing_dir(), name)) < _PREPARING_EXPIRES_SECONDS:
+                    return True
+            except OSError:
+                pass
+        return False
+
+    def add_reference(self, locked_hash, project_dir, env_name):
+        """Record that a project's env spec uses an environment.
+
+        The env spec's reference to any other environment in the store
+        is removed, since it can only use one at a time. This also
+        marks the environment as used just now.
+        """
+        filename = self._reference_filename(project_dir, env_name)
+        self.remove_reference(project_dir, env_name, except_locked_hash=locked_hash)
+        references_dir = self._references_dir(locked_hash)
+        try:
+            makedirs_ok_if_exists(references_dir)
+            with codecs.open(os.path.join(references_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(json.dumps(dict(project_dir=os.path.normpath(project_dir), env_name=env_name)) + "\n")
+            with codecs.open(self._last_used_file(locked_hash), 'w', encoding='utf-8') as f:
+                f.write("%f\n" % time.time())
+        except (IOError, OSError):
+            # the worst case is that gc removes the env early
+            pass
+
+    def remove_reference(self, project_dir, env_name, except_locked_hash=None):
+        """Remove a project env spec's reference to any environment."""
+        filename = self._reference_filename(project_dir, env_name)
+        for locked_hash in self.locked_hashes():
+            if locked_hash == except_locked_hash:
+                continue
+            try:
+                os.remove(os.path.join(self._references_dir(locked_hash), filename))
+            except OSError:
+                pass
+
+    def references(self, locked_hash):
+        """List (project_dir, env_name) using an environment.
+
+        References from projects which no longer exist are deleted
+        and not returned.
+        """
+        references_dir = self._references_dir(locked_hash)
+        try:
+            filenames = sorted(os.listdir(references_dir))
+        except OSError:
+            return []
+        result = []
+        for filename in filenames:
+            path = os.path.join(references_dir, filename)
+            try:
+                with codecs.open(path, 'r', encoding='utf-8') as f:
+                    reference = json.loads(f.read())
+                project_dir = reference['project_dir']
+                env_name = reference['env_name']
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                continue
+            if os.path.isdir(project_dir):
+                result.append((project_dir, env_name))
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return result
+
+    def last_used(self, locked_hash):
+        """Time the environment was last prepared for a project (or created)."""
+        for path in (self._last_used_file(locked_hash), os.path.join(self.prefix(locked_hash), 'conda-meta')):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                pass
+        return 0
+
+    def gc(self, frontend, max_age=None, max_bytes=None, now=None):
+        """Delete environments we don't need to keep.
+
+        Environments no project refers to are always deleted. Then
+        environments unused for longer than max_age are deleted,
+        and if the store is still larger than max_bytes, the least
+        recently used environments are deleted until it isn't.
+        Deleted environments are simply recreated if a project
+        prepares them again.
+
+        Environments being prepared, or created very recently, are
+        never deleted.
+
+        Args:
+            frontend (Frontend): for progress messages
+            max_age (float): seconds, or None for no limit
+            max_bytes (int): bytes, or None for no limit
+            now (float): current time, defaults to time.time()
+
+        Returns:
+            a ``Status``, if failed has ``errors``
+        """
+        if now is None:
+            now = time.time()
+        errors = []
+        removed = []
+
+        def remove(locked_hash, why):
+            prefix = self.prefix(locked_hash)
+            frontend.info("Removing %s (%s)." % (prefix, why))
+            try:
+                shutil.rmtree(prefix)
+                removed.append(locked_hash)
+            except Exception as e:
+                error = "Error removing %s: %s." % (prefix, str(e))
+                frontend.error(error)
+                errors.append(error)
+
+        def in_use(locked_hash):
+            if self.is_preparing(locked_hash, now=now):
+                return True
+            try:
+                created = os.path.getmtime(os.path.join(self.prefix(locked_hash), 'conda-meta'))
+            except OSError:
+                # conda hasn't got far enough to make it
+                return True
+            return (now - created) < _GRACE_SECONDS
+
+        remaining = []
+        for locked_hash in self.locked_hashes():
+            if in_use(locked_hash):
+                continue
+            elif len(self.references(locked_hash)) == 0:
+                remove(locked_hash, "not used by any project")
+            elif max_age is not None and (now - self.last_used(locked_hash)) > max_age:
+                remove(locked_hash, "not used recently")
+            else:
+                remaining.append(locked_hash)
+
+        if max_bytes is not None:
+            sizes = dict((locked_hash, _directory_size(self.prefix(locked_hash))) for locked_hash in remaining)
+            total = sum(sizes.values())
+            for locked_hash in sorted(remaining, key=self.last_used):
+                if total <= max_bytes:
+                    break
+                remove(locked_hash, "store is too large")
+                total -= sizes[locked_hash]
+
+        if len(errors) > 0:
+            return SimpleStatus(success=False, description="Failed to remove some environments.", errors=errors)
+        elif len(removed) == 0:
+            return SimpleStatus(success=True, description="No environments to remove from %s." % self._directory)
+        else:
+            return SimpleStatus(
+                success=True, description="Removed %d environments from %s." % (len(removed), self._directory))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Saved listings of a project's files, checked against directory mtimes.
+
+Listing the files in a project (to find notebooks that no command
+runs, for example) means walking the whole tree and matching every
+file against the ignore patterns. Adding, removing or renaming an
+entry in a directory changes the directory's mtime, so we keep the
+listing of each directory along with the mtime it had, and only
+list again the directories whose mtime changed. When nothing
+changed, that's one stat() per directory.
+
+The index is an in-memory cache, backed by a JSON file in the
+per-user cache directory so new processes can use it too.
+"""
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+import stat
+import time
+
+from anaconda_project.internal import user_cache
+
+# bump this if the format of saved indexes changes
+_FORMAT_VERSION = 1
+
+_INDEX_DIRECTORY = 'file-indexes'
+
+# a directory modified this recently might be modified again
+# without its mtime changing (mtimes have limited resolution), so
+# we don't trust its mtime until it's older.
+_RACY_SECONDS = 2.0
+
+# project directory => (key, directories) we last loaded or saved
+_indexes = dict()
+
+
+def index_filename(project_directory):
+    """Get the file to save a project's index in."""
+    digest = hashlib.sha1(os.path.abspath(project_directory).encode('utf-8')).hexdigest()
+    return os.path.join(user_cache.user_cache_directory(), _INDEX_DIRECTORY, digest + ".json")
+
+
+def load_index(project_directory):
+    """Load the index saved by ``save_index``.
+
+    Returns:
+        (key, directories) tuple, or (None, dict()) if there's no saved index
+    """
+    if project_directory in _indexes:
+        return _indexes[project_directory]
+    (key, value) = user_cache.load_json_cache(index_filename(project_directory))
+    if not isinstance(key, dict) or key.get('format') != _FORMAT_VERSION or not isinstance(value, dict):
+        return (None, dict())
+    return (key['key'], value)
+
+
+def save_index(project_directory, key, directories):
+    """Save an index along with the key it's valid for.
+
+    Errors are ignored, since this is only an optimization.
+    """
+    key = user_cache._normalize_key(key)
+    _indexes[project_directory] = (key, directories)
+    user_cache.save_json_cache(index_filename(project_directory), dict(format=_FORMAT_VERSION, key=key), directories)
+
+
+def update_index(project_directory, directories, list_directory):
+    """Bring an index up to date with the files on disk.
+
+    Args:
+        project_directory (str): the project directory
+        directories (dict): relative directory path => [mtime, files, subdirectories],
+                            from a previous update or empty
+        list_directory (function): takes a relative directory path and returns
+                                   a (files, subdirectories) tuple of names;
+                                   may raise OSError
+
+    Returns:
+        (directories, changed) tuple; changed is False if the index was already up to date
+    """
+    updated = dict()
+    now = time.time()
+
+    def visit(relative_dir):
+        info = os.lstat(os.path.join(project_directory, relative_dir))
+        if stat.S_ISLNK(info.st_mode):
+            # like os.walk, list symlinks to directories but don't follow them
+            return False
+        saved = directories.get(relative_dir)
+        if saved is not None and saved[0] is not None and saved[0] == info.st_mtime:
+            (mtime, files, subdirectories) = saved
+            visit_changed = False
+        else:
+            (files, subdirectories) = list_directory(relative_dir)
+            mtime = info.st_mtime
+            if now - mtime < _RACY_SECONDS:
+                mtime = None
+            visit_changed = True
+        updated[relative_dir] = [mtime, files, subdirectories]
+        for name in subdirectories:
+            visit_changed = visit(os.path.join(relative_dir, name)) or visit_changed
+        return visit_changed
+
+    changed = visit('')
+    # directories that went away count as a change, too
+    changed = changed or set(updated.keys()) != set(directories.keys())
+    return (updated, changed)
+
+
+def relative_paths(directories):
+    """List the relative paths of all files and subdirectories in an index."""
+    paths = []
+    for relative_dir in sorted(directories.keys()):
+        (mtime, files, subdirectories) = directories[relative_dir]
+        # cheaper than os.path.join on big directories
+        prefix = relative_dir + os.sep if relative_dir != '' else ''
+        paths.extend(prefix + name for name in subdirectories)
+        paths.extend(prefix + name for name in files)
+    return paths
@@ -29,6 +29,7 @@ class FileDownloader(object):
         self._hash = None
         self._client = None
         self._errors = []
+        self._bytes_downloaded = 0
 
     @gen.coroutine
     def run(self):
@@ -78,6 +79,7 @@ class FileDownloader(object):
             if len(self._errors) > 0:
                 return
 
+            self._bytes_downloaded += len(chunk)
             if self._hash_algorithm is not None:
                 hasher.update(chunk)
 
@@ -121,6 +123,11 @@ class FileDownloader(object):
         """Hash of the downloaded file if we succeeded in downloading it, None if we failed."""
         return self._hash
 
+    @property
+    def bytes_downloaded(self):
+        """Number of bytes we have received so far."""
+        return self._bytes_downloaded
+
     @property
     def errors(self):
         """List of errors if we failed to download, empty list if we succeeded."""
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Download conda packages into the package cache before conda needs them.
+
+Conda only downloads a few packages at a time, but when a lock set
+records the exact package URLs we know everything we need up front,
+so we can fetch it all concurrently. Conda then finds the tarballs
+in its package cache and only has to extract and link them.
+"""
+from __future__ import absolute_import, print_function
+
+import codecs
+import hashlib
+import os
+import sys
+
+from tornado import gen
+from tornado.locks import Semaphore
+
+from anaconda_project.internal.http_client import FileDownloader
+import anaconda_project.internal.coroutines as coroutines
+import anaconda_project.internal.makedirs as makedirs
+import anaconda_project.internal.parallel as parallel
+import anaconda_project.internal.rename as rename
+
+try:
+    from urllib.parse import urlparse, unquote
+    from urllib.request import url2pathname
+except ImportError:  # pragma: no cover (py2 only)
+    from urlparse import urlparse
+    from urllib import unquote, url2pathname
+
+CONNECTIONS_VARIABLE = 'ANACONDA_PROJECT_PREFETCH_CONNECTIONS'
+
+_DEFAULT_CONNECTIONS = 4
+
+
+def default_connections():
+    """Number of simultaneous downloads, from ``ANACONDA_PROJECT_PREFETCH_CONNECTIONS`` or a default."""
+    return parallel.default_max_workers(CONNECTIONS_VARIABLE, _DEFAULT_CONNECTIONS)
+
+
+def writable_pkgs_dir(pkgs_dirs):
+    """Pick the first package cache directory we can write to, or None."""
+    for pkgs_dir in pkgs_dirs:
+        try:
+            makedirs.makedirs_ok_if_exists(pkgs_dir)
+        except (IOError, OSError):
+            continue
+        if os.access(pkgs_dir, os.W_OK):
+            return pkgs_dir
+    return None
+
+
+def _split_url(url):
+    # "https://.../foo-1.0-0.tar.bz2#<md5>" => (url, filename, md5)
+    (url, _, md5) = url.partition('#')
+    filename = unquote(urlparse(url).path.split('/')[-1])
+    return (url, filename, md5 or None)
+
+
+def _strip_package_extension(filename):
+    for extension in ('.tar.bz2', '.conda'):
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+
+def _already_cached(pkgs_dir, filename):
+    # conda can use either the tarball or the extracted package
+    if os.path.isfile(os.path.join(pkgs_dir, filename)):
+        return True
+    extracted = os.path.join(pkgs_dir, _strip_package_extension(filename))
+    return os.path.isfile(os.path.join(extracted, 'info', 'repodata_record.json'))
+
+
+def _record_url(pkgs_dir, url):
+    # conda only reuses a cached tarball if it knows where the tarball
+    # came from, which it looks up in urls.txt; append to it the way
+    # conda does when it downloads a package itself.
+    linefeed = "\r\n" if sys.platform == 'win32' else "\n"
+    with codecs.open(os.path.join(pkgs_dir, 'urls.txt'), 'ab', encoding='utf-8') as f:
+        f.write(url + linefeed)
+
+
+def _copy_local_file(url, tmp_filename):
+    source = url2pathname(urlparse(url).path)
+    hasher = hashlib.md5()
+    with open(source, 'rb') as input_file:
+        with open(tmp_filename, 'wb') as output_file:
+            while True:
+                chunk = input_file.read(1024 * 1024)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                output_file.write(chunk)
+    return hasher.hexdigest()
+
+
+@gen.coroutine
+def _fetch_one(url, md5, filename, downloaded, errors):
+    tmp_filename = filename + ".prefetch"
+    try:
+        if url.startswith('file:'):
+            try:
+                computed = _copy_local_file(url, tmp_filename)
+            except (IOError, OSError) as e:
+                errors.append("Error downloading {}: {}".format(url, str(e)))
+                raise gen.Return(None)
+        else:
+            download = FileDownloader(url=url, filename=tmp_filename, hash_algorithm='md5')
+            try:
+                response = yield download.run()
+            except Exception as e:
+                errors.append("Error downloading {}: {}".format(url, str(e)))
+                raise gen.Return(None)
+            if response is None:
+                errors.extend(download.errors)
+                raise gen.Return(None)
+            elif response.code != 200:
+                errors.append("Error downloading {}: response code {}".format(url, response.code))
+                raise gen.Return(None)
+            computed = download.hash
+
+        if md5 is not None and md5 != computed:
+            errors.append("Error downloading {}: mismatched hashes. Expected: {}, calculated: {}".format(
+                url, md5, computed))
+            raise gen.Return(None)
+
+        try:
+            rename.rename_over_existing(tmp_filename, filename)
+        except (IOError, OSError) as e:
+            errors.append("Failed to rename %s to %s: %s" % (tmp_filename, filename, str(e)))
+            raise gen.Return(None)
+
+        try:
+            _record_url(os.path.dirname(filename), url)
+        except (IOError, OSError) as e:
+            errors.append("Failed to record %s in the package cache: %s" % (url, str(e)))
+            raise gen.Return(None)
+        downloaded.append(filename)
+    finally:
+        try:
+            os.remove(tmp_filename)
+        except (IOError, OSError):
+            pass
+
+
+@gen.coroutine
+def prefetch_packages_coroutine(urls, pkgs_dir, connections=None):
+    """Coroutine version of ``prefetch_packages``, for use on an existing IOLoop."""
+    if connections is None:
+        connections = default_connections()
+
+    needed = []
+    for url in urls:
+        (url, filename, md5) = _split_url(url)
+        if not _already_cached(pkgs_dir, filename):
+            needed.append((url, md5, os.path.join(pkgs_dir, filename)))
+
+    downloaded = []
+    errors = []
+    semaphore = Semaphore(max(1, connections))
+
+    @gen.coroutine
+    def fetch_when_allowed(url, md5, filename):
+        with (yield semaphore.acquire()):
+            yield _fetch_one(url, md5, filename, downloaded, errors)
+
+    yield [fetch_when_allowed(url, md5, filename) for (url, md5, filename) in needed]
+
+    raise gen.Return((len(downloaded), errors))
+
+
+def prefetch_packages(urls, pkgs_dir, connections=None):
+    """Download any packages not already in a package cache, several at once.
+
+    Each URL is checked against the md5 after its ``#``, if it has
+    one, and only moved into the package cache if it matches. The
+    URL (without the md5) is then added to the package cache's
+    ``urls.txt``, so conda will use the tarball.
+
+    Args:
+        urls (list of str): package URLs in @EXPLICIT file format
+        pkgs_dir (str): package cache directory
+        connections (int): max simultaneous downloads, None for the default
+
+    Returns:
+        (number of packages downloaded, list of error strings)
+    """
+    return coroutines.run_sync(lambda: prefetch_packages_coroutine(urls, pkgs_dir, connections))
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+from threading import Thread
+
+try:
+    from queue import Queue
+except ImportError:  # pragma: no cover (py2 only)
+    from Queue import Queue  # pragma: no cover (py2 only)
+
+
+def default_max_workers(env_var, default):
+    """Get a worker count from the environment, falling back to a default.
+
+    Args:
+        env_var (str): name of an environment variable which can override the default
+        default (int): worker count to use if the variable is unset or invalid
+
+    Returns:
+        a worker count of at least 1
+    """
+    value = os.environ.get(env_var, None)
+    if value is not None:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            pass
+    return max(1, default)
+
+
+def _worker(func, jobs, results):
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        (index, item) = job
+        try:
+            results.put((index, func(item), None))
+        except BaseException as e:
+            # includes KeyboardInterrupt and SystemExit, so every
+            # item gets a result or an error to re-raise
+            results.put((index, None, e))
+
+
+def map_in_threads(func, items, max_workers):
+    """Call func on each item using a bounded pool of threads.
+
+    This is intended for work which spends its time waiting on
+    subprocesses or the network, so the GIL doesn't matter.
+
+    Results are returned in the same order as the items. If any
+    call raises (even a ``BaseException`` such as
+    ``KeyboardInterrupt``), the exception from the earliest item (in item
+    order, not completion order) is re-raised once all calls have
+    finished, so errors are reported deterministically.
+
+    Args:
+        func (function): takes one item and returns a result
+        items (iterable): the items to process
+        max_workers (int): upper bound on the number of threads
+
+    Returns:
+        list of results, one per item
+    """
+    items = list(items)
+    if len(items) == 0:
+        return []
+
+    worker_count = max(1, min(max_workers, len(items)))
+    if worker_count == 1:
+        return [func(item) for item in items]
+
+    jobs = Queue()
+    results = Queue()
+    for job in enumerate(items):
+        jobs.put(job)
+
+    threads = []
+    for i in range(worker_count):
+        # one "stop" marker per thread
+        jobs.put(None)
+        t = Thread(target=_worker, args=(func, jobs, results))
+        t.daemon = True
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+
+    ordered = [None] * len(items)
+    errors = [None] * len(items)
+    while not results.empty():
+        (index, result, error) = results.get()
+        ordered[index] = result
+        errors[index] = error
+
+    for error in errors:
+        if error is not None:
+            raise error
+
+    return ordered
@@ -7,13 +7,16 @@
 # -----------------------------------------------------------------------------
 from __future__ import absolute_import, print_function
 
+import codecs
 import collections
+import glob
 import subprocess
 import os
 import re
 import sys
 
 from anaconda_project.internal import logged_subprocess
+from anaconda_project.internal import timings
 
 
 class PipError(Exception):
@@ -44,11 +47,16 @@ def _get_pip_command(prefix, extra_args):
 def _call_pip(prefix, extra_args):
     cmd_list = _get_pip_command(prefix, extra_args)
 
-    try:
-        p = logged_subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except OSError as e:
-        raise PipError("failed to run: %r: %r" % (" ".join(cmd_list), repr(e)))
-    (out, err) = p.communicate()
+    with timings.timed("pip " + extra_args[0]):
+        timings.emit_event('subprocess_started', args=cmd_list)
+        start = timings.monotonic()
+        try:
+            p = logged_subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise PipError("failed to run: %r: %r" % (" ".join(cmd_list), repr(e)))
+        (out, err) = p.communicate()
+        timings.emit_event(
+            'subprocess_exited', args=cmd_list, returncode=p.returncode, seconds=(timings.monotonic() - start))
     errstr = err.decode().strip()
     if p.returncode != 0:
         raise PipError('%s: %s' % (" ".join(cmd_list), errstr))
@@ -82,19 +90,105 @@ def remove(prefix, pkgs=None):
     return _call_pip(prefix, extra_args=args)
 
 
+def normalize_name(name):
+    """Normalize a Python package name as described in PEP 503."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def site_packages_directories(prefix):
+    """Get the site-packages directories which exist in a prefix."""
+    dirs = glob.glob(os.path.join(prefix, "lib", "python*", "site-packages"))
+    dirs.append(os.path.join(prefix, "Lib", "site-packages"))
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+# "pip freeze" leaves these out unless you pass --all
+_freeze_skipped = ('pip', 'setuptools', 'distribute', 'wheel')
+
+
+def _read_metadata_name_and_version(filename):
+    # METADATA and PKG-INFO start with RFC 822 style headers; we
+    # only need two of them, so we don't bother with a full parser.
+    name = None
+    version = None
+    try:
+        with codecs.open(filename, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if line == '':
+                    break
+                if line.startswith("Name:"):
+                    name = line[len("Name:"):].strip()
+                elif line.startswith("Version:"):
+                    version = line[len("Version:"):].strip()
+    except (IOError, OSError):
+        return None
+    if not name or not version:
+        return None
+    return (name, version)
+
+
+def _installed_from_metadata(prefix):
+    # Returns None if we can't be confident we'd see what pip
+    # freeze sees, so the caller falls back to running pip.
+    dirs = site_packages_directories(prefix)
+    if len(dirs) == 0:
+        return None
+
+    result = dict()
+    seen = set()
+    for d in dirs:
+        try:
+            entries = sorted(os.listdir(d))
+        except OSError:
+            return None
+        for entry in entries:
+            path = os.path.join(d, entry)
+            if entry.endswith(".egg-link"):
+                # develop installs keep their metadata outside site-packages
+                return None
+            elif entry.endswith(".dist-info"):
+                metadata = os.path.join(path, "METADATA")
+            elif entry.endswith(".egg-info"):
+                # either a directory or the PKG-INFO itself
+                metadata = os.path.join(path, "PKG-INFO") if os.path.isdir(path) else path
+            else:
+                continue
+            name_and_version = _read_metadata_name_and_version(metadata)
+            if name_and_version is None:
+                continue
+            normalized = normalize_name(name_and_version[0])
+            if normalized in seen or normalized in _freeze_skipped:
+                continue
+            seen.add(normalized)
+            result[name_and_version[0]] = name_and_version
+    return result
+
+
 def installed(prefix):
     """Get a dict of package names to (name, version) tuples."""
     if not os.path.isdir(prefix):
         return dict()
 
+    try:
+        _get_pip_command(prefix, extra_args=[])
+    except PipNotInstalledError:
+        return dict()  # if pip isn't installed, there are no pip packages
+
+    # reading the package metadata ourselves avoids starting up
+    # pip, which can take a second or so.
+    result = _installed_from_metadata(prefix)
+    if result is not None:
+        return result
+
     try:
         # Use freeze instead of list so we get a consistent format across
         # different versions of pip
         out = _call_pip(prefix, extra_args=['freeze']).decode('utf-8')
         # on Windows, $ in a regex doesn't match \r\n, we need to get rid of \r
         out = out.replace("\r\n", "\n")
-    except PipNotInstalledError:
-        out = ""  # if pip isn't installed, there are no pip packages
+    except PipNotInstalledError:  # pragma: no cover (we checked above)
+        out = ""
     # the output to parse ("legacy" format mode) looks like this:
     #   ympy (0.7.6.1)
     #   tables (3.2.2)
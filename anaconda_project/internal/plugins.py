@@ -8,12 +8,26 @@
 
 try:
     from entrypoints import get_group_named
-except ImportError:  # py 2.7
-    from pkg_resources import iter_entry_points
+except ImportError:
+    try:
+        # importing pkg_resources scans every installed distribution,
+        # which makes starting the CLI noticeably slower, so prefer
+        # importlib.metadata where we have it (py 3.8+)
+        from importlib import metadata as _metadata
+    except ImportError:  # py 2.7
+        _metadata = None
 
     def get_group_named(group_name):
         """Facade function to align old entry_points api to new one."""
-        return {plugin.name: plugin for plugin in iter_entry_points(group_name)}
+        if _metadata is None:
+            from pkg_resources import iter_entry_points
+            return {plugin.name: plugin for plugin in iter_entry_points(group_name)}
+        entry_points = _metadata.entry_points()
+        if hasattr(entry_points, 'select'):
+            group = entry_points.select(group=group_name)
+        else:  # py 3.8 and 3.9 return a dict of groups
+            group = entry_points.get(group_name, ())
+        return {plugin.name: plugin for plugin in group}
 
 
 def _get_entry_points_plugins(entry_point_group):
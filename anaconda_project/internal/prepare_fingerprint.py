@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Saved results of successful prepares, keyed by a fingerprint of their inputs.
+
+If nothing that went into a prepare has changed (the project files,
+the relevant environment variables, the conda environments,
+downloaded files...) then preparing again would give the same
+environment variables, so we can skip checking every requirement.
+The fingerprint only uses hashes of small files, directory
+listings and stat() results, so it's much cheaper than a prepare.
+"""
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+
+from anaconda_project.internal import user_cache
+
+# bump this if the format of saved fingerprints changes
+_FORMAT_VERSION = 1
+
+_FINGERPRINT_DIRECTORY = 'prepare-fingerprints'
+
+
+def fingerprint_filename(project_dir, name):
+    """Get the file to save a fingerprint in.
+
+    Args:
+        project_dir (str): the project directory
+        name (str): distinguishes different kinds of prepare in the same project,
+                    so they don't keep replacing each other's fingerprint
+
+    Returns:
+        a filename in the per-user cache directory
+    """
+    digest = hashlib.sha1((os.path.abspath(project_dir) + "\0" + name).encode('utf-8')).hexdigest()
+    return os.path.join(user_cache.user_cache_directory(), _FINGERPRINT_DIRECTORY, digest + ".json")
+
+
+def file_content_hash(filename):
+    """Get a hash of a file's content, or None if it can't be read."""
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def path_state(path):
+    """Get the type, size and mtime of a file or directory, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.isdir(path), st.st_size, st.st_mtime]
+
+
+def load_fingerprint(filename):
+    """Load a fingerprint and the prepare result saved with it.
+
+    Returns:
+        (fingerprint, saved) tuple, or (None, None) if missing or unreadable
+    """
+    (key, value) = user_cache.load_json_cache(filename)
+    if not isinstance(key, dict) or key.get('format') != _FORMAT_VERSION or not isinstance(value, dict):
+        return (None, None)
+    return (key['fingerprint'], value)
+
+
+def fingerprint_matches(loaded, fingerprint):
+    """True if a fingerprint from ``load_fingerprint`` is the same as fingerprint."""
+    return user_cache.key_matches(loaded, fingerprint)
+
+
+def save_fingerprint(filename, fingerprint, saved):
+    """Save a fingerprint along with the prepare result it's valid for.
+
+    Errors are ignored, since this is only an optimization.
+    """
+    user_cache.save_json_cache(filename, dict(format=_FORMAT_VERSION, fingerprint=fingerprint), saved)
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""On-disk cache of conda dependency solves."""
+from __future__ import absolute_import, print_function
+
+import codecs
+import glob
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.py2_compat import is_string
+from anaconda_project.internal.rename import rename_over_existing
+
+# bump this if the format of cache entries changes
+_CACHE_FORMAT_VERSION = 3
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CACHE_DIR_VARIABLE = 'ANACONDA_PROJECT_SOLVE_CACHE_DIR'
+MAX_BYTES_VARIABLE = 'ANACONDA_PROJECT_SOLVE_CACHE_MAX_BYTES'
+
+
+# conda 23.1 and later keep the state of each ``<cache>/<hash>.json``
+# (where it came from, and the etag and last-modified the server
+# sent) in ``<cache>/<hash>.info.json``; older condas put it in
+# underscore-prefixed keys at the start of the repodata itself.
+_STATE_SUFFIX = '.info.json'
+_EMBEDDED_STATE_BYTES = 4096
+_EMBEDDED_STATE_RE = re.compile(r'"_(url|etag|mod)"\s*:\s*("(?:[^"\\]|\\.)*")')
+# channel URLs may contain a per-user token, as in /t/<token>/
+_TOKEN_RE = re.compile(r'/t/[^/]+/')
+
+
+def _load_state(filename):
+    state = None
+    try:
+        with codecs.open(filename[:-len('.json')] + _STATE_SUFFIX, 'r', encoding='utf-8') as f:
+            state = json.loads(f.read())
+    except (IOError, OSError, ValueError):
+        pass
+    if isinstance(state, dict):
+        return state
+
+    state = dict()
+    try:
+        with open(filename, 'rb') as f:
+            head = f.read(_EMBEDDED_STATE_BYTES).decode('utf-8', 'replace')
+    except (IOError, OSError):
+        return None
+    for (name, value) in _EMBEDDED_STATE_RE.findall(head):
+        try:
+            state[name] = json.loads(value)
+        except ValueError:
+            pass
+    return state
+
+
+def _content_digest(filename):
+    digest = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def _channel_fingerprint(filename):
+    state = _load_state(filename)
+    if state is None:
+        return None
+    url = state.get('url', None)
+    if is_string(url):
+        url = _TOKEN_RE.sub('/t/<TOKEN>/', url)
+    etag = state.get('etag', None) or None
+    mod = state.get('mod', None) or None
+    sha = None
+    if etag is None and mod is None:
+        # without anything from the server to go on (e.g. a file://
+        # channel), the only reliable summary is the content.
+        sha = _content_digest(filename)
+        if sha is None:
+            return None
+    return (url, etag, mod, sha)
+
+
+def repodata_fingerprint(pkgs_dirs):
+    """Summarize the channel repodata conda has cached in the given package dirs.
+
+    Conda keeps downloaded channel repodata in ``<pkgs_dir>/cache``;
+    when it fetches new repodata, a solve made against the old
+    repodata may no longer be what conda would give us. Each channel
+    is summarized by its URL and the etag and last-modified the
+    server sent with it (or a hash of its content if there are
+    neither), so refreshing repodata that hasn't changed, or having
+    it under another path on another machine, gives the same
+    fingerprint. We don't parse the repodata itself, since that
+    would cost about as much as a solve.
+
+    Args:
+        pkgs_dirs (list of str): conda package cache directories
+
+    Returns:
+        a hex digest string
+    """
+    channels = set()
+    for pkgs_dir in pkgs_dirs:
+        for filename in glob.glob(os.path.join(pkgs_dir, 'cache', '*.json')):
+            if filename.endswith(_STATE_SUFFIX):
+                continue
+            fingerprint = _channel_fingerprint(filename)
+            if fingerprint is not None:
+                channels.add(fingerprint)
+    return hashlib.sha256(json.dumps(sorted(channels, key=repr)).encode('utf-8')).hexdigest()
+
+
+def solve_cache_key(pkgs, channels, platform, conda_version, repodata):
+    """Compute the cache key for a solve.
+
+    Package specs are sorted since their order doesn't affect the
+    solution, but channel order is kept because it sets channel
+    priority.
+
+    Args:
+        pkgs (list of str): package specs
+        channels (list of str): channels in priority order
+        platform (str): target platform
+        conda_version (str): version of the conda doing the solve
+        repodata (str): result of ``repodata_fingerprint()``
+
+    Returns:
+        a hex digest string
+    """
+    key_data = dict(
+        format=_CACHE_FORMAT_VERSION,
+        pkgs=sorted(pkgs),
+        channels=list(channels),
+        platform=platform,
+        conda_version=conda_version,
+        repodata=repodata)
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SolveCache(object):
+    """A directory of cached solves with size-bounded LRU eviction.
+
+    Each entry is a small JSON file named after its key. Keys don't
+    depend on local paths, so the directory can be shared between
+    users or machines (e.g. on a network filesystem); a solve made
+    on one of them is reused by another with the same conda
+    version, channels, and channel repodata. Entries are written
+    atomically; a reader can never see a partial entry. Recency is tracked with the
+    entry's mtime, which is bumped on every hit.
+
+    All filesystem errors are ignored, since the cache is only an
+    optimization.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """Create a cache in the given directory.
+
+        Args:
+            directory (str): where to keep entries (created on demand)
+            max_bytes (int): total size of entries to keep
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    @property
+    def directory(self):
+        """Directory containing cache entries."""
+        return self._directory
+
+    @property
+    def max_bytes(self):
+        """Total size of entries we keep before evicting."""
+        return self._max_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self._directory, key + ".json")
+
+    def get(self, key):
+        """Get the cached solve for key.
+
+        Returns:
+            list of (name, version, build, url, md5) tuples, or None if not cached
+        """
+        filename = self._entry_path(key)
+        try:
+            with codecs.open(filename, 'r', encoding='utf-8') as f:
+                entry = json.loads(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(entry, dict) or entry.get('format') != _CACHE_FORMAT_VERSION:
+            return None
+
+        packages = entry.get('packages')
+        if not isinstance(packages, list):
+            return None
+
+        try:
+            # mark as recently used
+            os.utime(filename, None)
+        except (IOError, OSError):
+            pass
+
+        return [tuple(package) for package in packages]
+
+    def put(self, key, packages):
+        """Store a solve, then evict old entries if we're over max_bytes.
+
+        Args:
+            key (str): from ``solve_cache_key()``
+            packages (list of tuple): (name, version, build, url, md5) tuples
+        """
+        entry = dict(format=_CACHE_FORMAT_VERSION, packages=[list(package) for package in packages])
+        filename = self._entry_path(key)
+        tmp = filename + ".tmp-" + str(uuid.uuid4())
+        try:
+            makedirs_ok_if_exists(self._directory)
+            with codecs.open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(entry))
+            rename_over_existing(tmp, filename)
+        except (IOError, OSError):
+            pass
+        finally:
+            try:
+                os.remove(tmp)
+            except (IOError, OSError):
+                pass
+
+        self.evict()
+
+    def evict(self):
+        """Remove least-recently-used entries until we're under max_bytes."""
+        entries = []
+        total = 0
+        for filename in glob.glob(os.path.join(self._directory, '*.json')):
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, filename, st.st_size))
+            total += st.st_size
+
+        entries.sort()
+        for (_, filename, size) in entries:
+            if total <= self._max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total -= size
+
+
+def solve_cache_from_environment(environ=None):
+    """Get the solve cache configured in the environment, if any.
+
+    The cache is off unless ``ANACONDA_PROJECT_SOLVE_CACHE_DIR`` is
+    set. ``ANACONDA_PROJECT_SOLVE_CACHE_MAX_BYTES`` overrides the
+    default size limit.
+
+    Returns:
+        a ``SolveCache`` or None
+    """
+    if environ is None:
+        environ = os.environ
+    directory = environ.get(CACHE_DIR_VARIABLE, '')
+    if directory == '':
+        return None
+
+    max_bytes = DEFAULT_MAX_BYTES
+    try:
+        max_bytes = int(environ.get(MAX_BYTES_VARIABLE, max_bytes))
+    except ValueError:
+        pass
+
+    return SolveCache(os.path.abspath(os.path.expanduser(directory)), max_bytes=max_bytes)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+
+import pytest
+
+from anaconda_project.conda_manager import CondaManager, new_conda_manager
+from anaconda_project.internal import compiled_project
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+from anaconda_project.requirements_registry.registry import RequirementsRegistry
+from anaconda_project.yaml_file import _CommentedMap, _CommentedSeq
+
+pytestmark = pytest.mark.skipif(not compiled_project.supported, reason="needs Python 3")
+
+
+def test_snapshot_filename(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', '/cache')
+    filename = compiled_project.snapshot_filename('/some/project')
+    assert os.path.abspath('/cache/compiled-projects') == os.path.dirname(filename)
+    assert filename != compiled_project.snapshot_filename('/other/project')
+
+
+def test_file_hashes():
+    def check(dirname):
+        present = os.path.join(dirname, 'present')
+        missing = os.path.join(dirname, 'missing')
+        hashes = compiled_project.file_hashes([present, missing])
+        assert [missing, present] == sorted(hashes.keys())
+        assert hashes[missing] is None
+        assert len(hashes[present]) == 64
+
+    with_directory_contents({'present': 'hello'}, check)
+
+
+def test_save_and_load_snapshot():
+    def check(dirname):
+        filename = os.path.join(dirname, 'snapshots', 'project.pickle')
+        registry = RequirementsRegistry()
+        yaml_map = _CommentedMap()
+        yaml_map['b'] = _CommentedSeq([1, 2])
+        yaml_map['a'] = 'x'
+        state = dict(registry=registry, yaml=yaml_map, conda=new_conda_manager())
+
+        assert compiled_project.load_snapshot(filename, dict(key=1), registry) is None
+        compiled_project.save_snapshot(filename, dict(key=1), state, registry)
+        assert [os.path.basename(filename)] == os.listdir(os.path.dirname(filename))
+
+        other_registry = RequirementsRegistry()
+        loaded = compiled_project.load_snapshot(filename, dict(key=1), other_registry)
+        assert loaded['registry'] is other_registry
+        assert dict(b=[1, 2], a='x') == loaded['yaml']
+        assert ['b', 'a'] == list(loaded['yaml'].keys())
+        assert type(loaded['yaml']) is dict
+        assert type(loaded['yaml']['b']) is list
+        assert isinstance(loaded['conda'], CondaManager)
+        assert loaded['conda'] is not state['conda']
+
+        assert compiled_project.load_snapshot(filename, dict(key=2), registry) is None
+
+        with open(filename, 'wb') as f:
+            f.write(b'not a pickle')
+        assert compiled_project.load_snapshot(filename, dict(key=1), registry) is None
+
+    with_directory_contents(dict(), check)
+
+
+def test_save_snapshot_ignores_errors():
+    def check(dirname):
+        filename = os.path.join(dirname, 'project.pickle')
+        compiled_project.save_snapshot(filename, dict(key=1), dict(unpicklable=lambda: None), RequirementsRegistry())
+        assert [] == os.listdir(dirname)
+
+    with_directory_contents(dict(), check)
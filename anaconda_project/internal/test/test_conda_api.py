@@ -247,6 +247,39 @@ def test_conda_install_gets_channels(monkeypatch):
     conda_api.install(prefix='/prefix', pkgs=['python'], channels=['foo'])
 
 
+_explicit_url = 'https://repo.example.com/pkgs/main/linux-64/numpy-1.10.4-py34_1.tar.bz2#' + '0123456789abcdef' * 2
+
+
+def test_conda_create_and_install_explicit(monkeypatch):
+    calls = []
+
+    def mock_call_conda(extra_args, json_mode=False, platform=None, stdout_callback=None, stderr_callback=None):
+        assert '--file' == extra_args[-2]
+        with open(extra_args[-1]) as f:
+            calls.append((extra_args[:-2], f.read()))
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', mock_call_conda)
+    conda_api.create_explicit(prefix='/does-not-exist', urls=[_explicit_url])
+    conda_api.install_explicit(prefix='/prefix', urls=[_explicit_url])
+
+    assert [(['create', '--yes', '--prefix', '/does-not-exist'], "@EXPLICIT\n%s\n" % _explicit_url),
+            (['install', '--yes', '--prefix', '/prefix'], "@EXPLICIT\n%s\n" % _explicit_url)] == calls
+
+    with pytest.raises(TypeError):
+        conda_api.create_explicit(prefix='/does-not-exist', urls=[])
+    with pytest.raises(TypeError):
+        conda_api.install_explicit(prefix='/prefix', urls=[])
+
+
+def test_parse_explicit_url():
+    assert ('numpy', '1.10.4', 'py34_1') == conda_api.parse_explicit_url(_explicit_url)
+    assert ('numpy', '1.10.4', 'py34_1') == conda_api.parse_explicit_url(_explicit_url.replace('.tar.bz2', '.conda'))
+    # no md5
+    assert conda_api.parse_explicit_url(_explicit_url.split('#')[0]) is None
+    assert conda_api.parse_explicit_url('numpy=1.10.4=py34_1') is None
+    assert conda_api.parse_explicit_url(42) is None
+
+
 def test_resolve_root_prefix():
     prefix = conda_api.resolve_env_to_prefix('root')
     assert prefix is not None
@@ -271,6 +304,79 @@ def test_resolve_bogus_env(monkeypatch):
     assert prefix is None
 
 
+def _mock_counted_info(monkeypatch, envs_dirs):
+    calls = []
+
+    def mock_info():
+        calls.append(1)
+        return {'root_prefix': '/foo', 'envs': ['/foo/envs/bar'], 'envs_dirs': envs_dirs, 'call': len(calls)}
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.info', mock_info)
+    return calls
+
+
+def test_cached_info_reused_across_processes(monkeypatch):
+    def check(dirname):
+        calls = _mock_counted_info(monkeypatch, [dirname])
+        assert 1 == conda_api.cached_info()['call']
+        # the cache is on disk, not in this process
+        assert os.path.isfile(os.path.join(os.environ['ANACONDA_PROJECT_CACHE_DIR'], 'conda-info.json'))
+        assert 1 == conda_api.cached_info()['call']
+        assert "/foo/envs/bar" == conda_api.resolve_env_to_prefix('bar')
+        assert 1 == len(calls)
+
+        assert 2 == conda_api.cached_info(refresh=True)['call']
+        assert 2 == conda_api.cached_info()['call']
+
+    with_directory_contents(dict(), check)
+
+
+def test_cached_info_invalidated_by_envs_dir_change(monkeypatch):
+    def check(dirname):
+        _mock_counted_info(monkeypatch, [dirname])
+        assert 1 == conda_api.cached_info()['call']
+        os.utime(dirname, (1, 1))
+        assert 2 == conda_api.cached_info()['call']
+        assert 2 == conda_api.cached_info()['call']
+
+    with_directory_contents(dict(), check)
+
+
+def test_cached_info_invalidated_by_conda_exe_change(monkeypatch):
+    def check(dirname):
+        _mock_counted_info(monkeypatch, [])
+        assert 1 == conda_api.cached_info()['call']
+        conda_exe = os.path.join(dirname, 'conda')
+        monkeypatch.setattr('anaconda_project.internal.conda_api.CONDA_EXE', conda_exe)
+        assert 2 == conda_api.cached_info()['call']
+        assert 2 == conda_api.cached_info()['call']
+        os.utime(conda_exe, (1, 1))
+        assert 3 == conda_api.cached_info()['call']
+
+    with_directory_contents({'conda': ''}, check)
+
+
+def test_cached_info_invalidated_by_conda_variables(monkeypatch):
+    _mock_counted_info(monkeypatch, [])
+    assert 1 == conda_api.cached_info()['call']
+    # activating an env doesn't matter
+    monkeypatch.setenv('CONDA_PREFIX', '/somewhere')
+    monkeypatch.setenv('CONDA_SHLVL', '7')
+    assert 1 == conda_api.cached_info()['call']
+    monkeypatch.setenv('CONDA_ENVS_PATH', '/somewhere/else')
+    assert 2 == conda_api.cached_info()['call']
+
+
+def test_cached_info_error_not_cached(monkeypatch):
+    def mock_info():
+        raise conda_api.CondaError("no conda")
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.info', mock_info)
+    with pytest.raises(conda_api.CondaError):
+        conda_api.cached_info()
+    assert not os.path.exists(os.path.join(os.environ['ANACONDA_PROJECT_CACHE_DIR'], 'conda-info.json'))
+
+
 def test_resolve_env_prefix_from_dirname():
     prefix = conda_api.resolve_env_to_prefix('/foo/bar')
     assert "/foo/bar" == prefix
@@ -771,6 +877,203 @@ def test_resolve_dependencies_pass_through_channels(monkeypatch):
     assert [('mkl', '2017.0.1', '0')] == result
 
 
+def _mock_info_and_resolve(monkeypatch, pkgs_dir, calls):
+    def mock_info(platform=None):
+        return dict(conda_version='4.3.30', pkgs_dirs=[pkgs_dir], channels=['https://example.com/defaults'])
+
+    def mock_call_conda(extra_args, json_mode, platform=None, stdout_callback=None, stderr_callback=None):
+        calls.append(extra_args)
+        return json.dumps({
+            'actions': [{
+                'LINK': [{
+                    'build_string': '0',
+                    'name': 'mkl',
+                    'version': '2017.0.1'
+                }]
+            }]
+        })
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.info', mock_info)
+    monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', mock_call_conda)
+
+
+def test_resolve_dependencies_uses_solve_cache(monkeypatch):
+    def do_test(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        calls = []
+        _mock_info_and_resolve(monkeypatch, pkgs_dir, calls)
+        monkeypatch.setenv('ANACONDA_PROJECT_SOLVE_CACHE_DIR', os.path.join(dirname, 'solves'))
+
+        result = conda_api.resolve_dependencies(['foo=1.0', 'bar'], channels=['abc'])
+        assert [('mkl', '2017.0.1', '0')] == result
+        assert 1 == len(calls)
+
+        # spec order doesn't matter
+        result = conda_api.resolve_dependencies(['bar', 'foo=1.0'], channels=['abc'])
+        assert [('mkl', '2017.0.1', '0')] == result
+        assert 1 == len(calls)
+
+        # different channels, platform, or repodata means a new solve
+        conda_api.resolve_dependencies(['bar', 'foo=1.0'], channels=['nbc'])
+        assert 2 == len(calls)
+        conda_api.resolve_dependencies(['bar', 'foo=1.0'], channels=['abc'], platform='linux-armv7l')
+        assert 3 == len(calls)
+        conda_api.resolve_dependencies(['bar', 'foo=1.0'], channels=['abc'], platform='linux-armv7l')
+        assert 3 == len(calls)
+
+        with open(os.path.join(pkgs_dir, 'cache', '12345678.json'), 'w') as f:
+            f.write('{"_url": "https://example.com/abc/linux-64", "_etag": "1"}')
+        conda_api.resolve_dependencies(['bar', 'foo=1.0'], channels=['abc'])
+        assert 4 == len(calls)
+
+    with_directory_contents({'pkgs/cache/abcdef.json': '{}'}, do_test)
+
+
+def _write_repodata_state(pkgs_dir, etag, refresh_ns):
+    with open(os.path.join(pkgs_dir, 'cache', 'abcdef.info.json'), 'w') as f:
+        f.write(json.dumps(dict(url='https://example.com/defaults/linux-64', etag=etag, refresh_ns=refresh_ns)))
+
+
+def test_resolve_dependencies_solve_cache_hits_after_unchanged_refresh(monkeypatch):
+    def do_test(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        calls = []
+        _mock_info_and_resolve(monkeypatch, pkgs_dir, calls)
+        monkeypatch.setenv('ANACONDA_PROJECT_SOLVE_CACHE_DIR', os.path.join(dirname, 'solves'))
+        solve = conda_api._call_conda
+
+        def refresh_and_solve(*args, **kwargs):
+            # conda checks with the server while solving; nothing new
+            _write_repodata_state(pkgs_dir, etag='1', refresh_ns=len(calls) + 10)
+            os.utime(os.path.join(pkgs_dir, 'cache', 'abcdef.json'), (len(calls) + 10, len(calls) + 10))
+            return solve(*args, **kwargs)
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', refresh_and_solve)
+
+        assert [('mkl', '2017.0.1', '0')] == conda_api.resolve_dependencies(['foo=1.0'])
+        assert 1 == len(calls)
+        assert [('mkl', '2017.0.1', '0')] == conda_api.resolve_dependencies(['foo=1.0'])
+        assert 1 == len(calls)
+
+    def setup(dirname):
+        _write_repodata_state(os.path.join(dirname, 'pkgs'), etag='1', refresh_ns=1)
+        do_test(dirname)
+
+    with_directory_contents({'pkgs/cache/abcdef.json': '{"packages": {}}'}, setup)
+
+
+def test_resolve_dependencies_solve_cache_keyed_on_repodata_the_solve_used(monkeypatch):
+    def do_test(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        calls = []
+        _mock_info_and_resolve(monkeypatch, pkgs_dir, calls)
+        monkeypatch.setenv('ANACONDA_PROJECT_SOLVE_CACHE_DIR', os.path.join(dirname, 'solves'))
+        solve = conda_api._call_conda
+
+        def refresh_and_solve(*args, **kwargs):
+            # conda gets new repodata while solving
+            _write_repodata_state(pkgs_dir, etag='2', refresh_ns=2)
+            return solve(*args, **kwargs)
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', refresh_and_solve)
+        conda_api.resolve_dependencies(['foo=1.0'])
+        assert 1 == len(calls)
+
+        # the solve was stored under the new repodata only
+        assert 1 == len(os.listdir(os.path.join(dirname, 'solves')))
+        conda_api.resolve_dependencies(['foo=1.0'])
+        assert 1 == len(calls)
+        _write_repodata_state(pkgs_dir, etag='1', refresh_ns=3)
+        monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', solve)
+        conda_api.resolve_dependencies(['foo=1.0'])
+        assert 2 == len(calls)
+
+    def setup(dirname):
+        _write_repodata_state(os.path.join(dirname, 'pkgs'), etag='1', refresh_ns=1)
+        do_test(dirname)
+
+    with_directory_contents({'pkgs/cache/abcdef.json': '{"packages": {}}'}, setup)
+
+
+def test_resolve_dependencies_solve_cache_disabled(monkeypatch):
+    def do_test(dirname):
+        calls = []
+        _mock_info_and_resolve(monkeypatch, os.path.join(dirname, 'pkgs'), calls)
+        monkeypatch.delenv('ANACONDA_PROJECT_SOLVE_CACHE_DIR', raising=False)
+
+        conda_api.resolve_dependencies(['foo=1.0'])
+        conda_api.resolve_dependencies(['foo=1.0'])
+        assert 2 == len(calls)
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_resolve_dependencies_solve_cache_skipped_when_info_fails(monkeypatch):
+    def do_test(dirname):
+        calls = []
+        _mock_info_and_resolve(monkeypatch, os.path.join(dirname, 'pkgs'), calls)
+
+        def mock_info(platform=None):
+            raise conda_api.CondaError("no info")
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api.info', mock_info)
+        monkeypatch.setenv('ANACONDA_PROJECT_SOLVE_CACHE_DIR', os.path.join(dirname, 'solves'))
+
+        assert [('mkl', '2017.0.1', '0')] == conda_api.resolve_dependencies(['foo=1.0'])
+        assert [('mkl', '2017.0.1', '0')] == conda_api.resolve_dependencies(['foo=1.0'])
+        assert 2 == len(calls)
+        assert not os.path.exists(os.path.join(dirname, 'solves'))
+
+    with_directory_contents(dict(), do_test)
+
+
+def test_resolve_dependencies_with_urls(monkeypatch):
+    def do_test(dirname):
+        md5 = 'c' * 32
+
+        def mock_info(platform=None):
+            return dict(pkgs_dirs=[os.path.join(dirname, 'pkgs')])
+
+        def mock_call_conda(extra_args, json_mode, platform=None, stdout_callback=None, stderr_callback=None):
+            link_with_url = dict(
+                name='a', version='1.0', build_string='0', url='https://example.com/linux-64/a-1.0-0.tar.bz2', md5=md5)
+            return json.dumps({
+                'actions': [{
+                    'FETCH': [{
+                        'dist_name': 'b-1.0-0',
+                        'url': 'https://example.com/noarch/b-1.0-0.tar.bz2',
+                        'md5': md5
+                    }],
+                    'LINK': [
+                        link_with_url,
+                        dict(name='b', version='1.0', build_string='0', dist_name='b-1.0-0'),
+                        dict(name='c', version='1.0', build_string='0', dist_name='c-1.0-0'),
+                        dict(name='d', version='1.0', build_string='0', dist_name='d-1.0-0')
+                    ]
+                }]
+            })
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api.cached_info', mock_info)
+        monkeypatch.setattr('anaconda_project.internal.conda_api._call_conda', mock_call_conda)
+
+        result = conda_api.resolve_dependencies(['a'], platform='linux-64', with_urls=True)
+        assert [('a', '1.0', '0', 'https://example.com/linux-64/a-1.0-0.tar.bz2', md5),
+                ('b', '1.0', '0', 'https://example.com/noarch/b-1.0-0.tar.bz2', md5),
+                ('c', '1.0', '0', 'https://example.com/linux-64/c-1.0-0.tar.bz2', md5),
+                ('d', '1.0', '0', None, None)] == result
+
+        assert [('a', '1.0', '0'), ('b', '1.0', '0'), ('c', '1.0', '0'),
+                ('d', '1.0', '0')] == conda_api.resolve_dependencies(['a'], platform='linux-64')
+
+    # the package cache has c for our platform, and d only for another one
+    with_directory_contents({
+        'pkgs/c-1.0-0/info/repodata_record.json':
+        json.dumps(dict(url='https://example.com/linux-64/c-1.0-0.tar.bz2', md5='c' * 32)),
+        'pkgs/d-1.0-0/info/repodata_record.json':
+        json.dumps(dict(url='https://example.com/osx-64/d-1.0-0.tar.bz2', md5='c' * 32))
+    }, do_test)
+
+
 def test_resolve_dependencies_no_packages():
     def do_test(dirname):
         with pytest.raises(TypeError) as excinfo:
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import sys
+
+import pytest
+
+import anaconda_project.internal.conda_api as conda_api
+from anaconda_project.internal.conda_worker import (CondaWorker, CondaWorkerDied, enabled, worker_code)
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+# A stand-in for conda.cli.main, which the worker imports
+_fake_conda_cli = """
+import os
+import sys
+
+
+def main():
+    args = sys.argv[1:]
+    if args[0] == 'info':
+        sys.stdout.write('{"fake": true, "cwd": "%s"}' % os.getcwd().replace("\\\\", "/"))
+    elif args[0] == 'echo':
+        sys.stdout.write(" ".join(args[1:]) + "\\n")
+        sys.stderr.write("to stderr\\n")
+    elif args[0] == 'env':
+        sys.stdout.write(os.environ.get('FAKE_CONDA_VARIABLE', 'unset'))
+    elif args[0] == 'fail':
+        sys.stderr.write("it failed\\n")
+        sys.exit(3)
+    elif args[0] == 'message':
+        return "a string result"
+    elif args[0] == 'raise':
+        raise RuntimeError("boom")
+    elif args[0] == 'die':
+        os._exit(1)
+    elif args[0] == 'platform':
+        import conda
+        sys.stdout.write(getattr(conda, 'fake_platform', 'native'))
+    return 0
+"""
+
+_fake_conda_files = {'conda/__init__.py': '', 'conda/cli/__init__.py': _fake_conda_cli}
+
+
+def _with_fake_conda(monkeypatch, f):
+    def check(dirname):
+        monkeypatch.setenv('PYTHONPATH', dirname)
+        f(dirname)
+
+    with_directory_contents(_fake_conda_files, check)
+
+
+def test_enabled():
+    assert not enabled(dict())
+    assert not enabled(dict(ANACONDA_PROJECT_CONDA_WORKER='0'))
+    assert enabled(dict(ANACONDA_PROJECT_CONDA_WORKER='1'))
+    assert enabled(dict(ANACONDA_PROJECT_CONDA_WORKER='True'))
+
+
+def test_worker_code_compiles_with_setup_code():
+    compile(worker_code(), 'worker', 'exec')
+    compile(worker_code("import os\nif True:\n    x = 1\n"), 'worker', 'exec')
+    compile(worker_code(conda_api._platform_hack_setup_code('win', '64')), 'worker', 'exec')
+
+
+def test_worker_runs_several_commands(monkeypatch):
+    def check(dirname):
+        worker = CondaWorker(sys.executable)
+        try:
+            stdout = []
+            stderr = []
+            (returncode, out, err) = worker.call(['echo', 'hello', 'world'],
+                                                 stdout_callback=stdout.append,
+                                                 stderr_callback=stderr.append)
+            assert 0 == returncode
+            assert "hello world\n" == "".join(out)
+            assert "to stderr\n" == "".join(err)
+            assert out == stdout
+            assert err == stderr
+
+            # the same process handles the next request, with our current environment
+            monkeypatch.setenv('FAKE_CONDA_VARIABLE', 'set later')
+            (returncode, out, err) = worker.call(['env'])
+            assert 0 == returncode
+            assert "set later" == "".join(out)
+
+            (returncode, out, err) = worker.call(['fail'])
+            assert 3 == returncode
+            assert "it failed\n" == "".join(err)
+
+            (returncode, out, err) = worker.call(['message'])
+            assert 1 == returncode
+            assert "a string result\n" == "".join(err)
+
+            (returncode, out, err) = worker.call(['raise'])
+            assert 1 == returncode
+            assert "RuntimeError: boom" in "".join(err)
+
+            assert not worker.broken
+        finally:
+            worker.close()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_worker_exits_during_request(monkeypatch):
+    def check(dirname):
+        worker = CondaWorker(sys.executable)
+        with pytest.raises(CondaWorkerDied) as excinfo:
+            worker.call(['die'])
+        assert 'conda worker exited while running: conda die' == str(excinfo.value)
+        assert worker.broken
+        assert worker.call(['echo']) is None
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_worker_cannot_import_conda(monkeypatch):
+    def check(dirname):
+        worker = CondaWorker(sys.executable, setup_code="raise ImportError('no conda here')")
+        assert worker.call(['info']) is None
+        assert worker.broken
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_worker_missing_python():
+    def check(dirname):
+        worker = CondaWorker(os.path.join(dirname, "nope"))
+        assert worker.call(['info']) is None
+
+    with_directory_contents(dict(), check)
+
+
+def test_worker_busy(monkeypatch):
+    def check(dirname):
+        worker = CondaWorker(sys.executable)
+        worker._lock.acquire()
+        try:
+            assert worker.call(['info']) is None
+            assert not worker.broken
+        finally:
+            worker._lock.release()
+        worker.close()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def _monkeypatch_conda_workers(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_CONDA_WORKER', '1')
+    monkeypatch.setattr('anaconda_project.internal.conda_api._get_root_python', lambda: sys.executable)
+    monkeypatch.setattr('anaconda_project.internal.conda_api._conda_workers', dict())
+
+    def mock_get_conda_command(extra_args):
+        return [sys.executable, '-c', 'print(\'{"subprocess": true}\')']
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api._get_conda_command', mock_get_conda_command)
+
+
+def test_conda_api_uses_worker(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        try:
+            assert conda_api.info()['fake']
+            assert conda_api.info()['fake']
+            assert [conda_api.current_platform()] == list(conda_api._conda_workers.keys())
+            # errors look the same as with a subprocess
+            with pytest.raises(conda_api.CondaError) as excinfo:
+                conda_api._call_conda(['fail'])
+            assert 'conda fail: it failed\n' == str(excinfo.value)
+        finally:
+            conda_api._close_conda_workers()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_conda_api_worker_runs_in_current_directory(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        old_cwd = os.getcwd()
+        try:
+            os.chdir(dirname)
+            expected = os.getcwd().replace("\\", "/")
+            assert expected == conda_api.info()['cwd']
+        finally:
+            os.chdir(old_cwd)
+            conda_api._close_conda_workers()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_conda_api_worker_for_other_platform(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+
+        def mock_setup_code(platform_name, bits):
+            return "import conda\nconda.fake_platform = '%s-%s'" % (platform_name, bits)
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api._platform_hack_setup_code', mock_setup_code)
+        try:
+            assert 'win-32' == conda_api._call_conda(['platform'], platform='win-32')
+            assert 'native' == conda_api._call_conda(['platform'])
+        finally:
+            conda_api._close_conda_workers()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_conda_api_worker_died(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        try:
+            with pytest.raises(conda_api.CondaError) as excinfo:
+                conda_api._call_conda(['die'])
+            assert 'conda worker exited while running: conda die' == str(excinfo.value)
+            # later calls fall back to a subprocess
+            assert json.loads(conda_api._call_conda(['info']))['subprocess']
+        finally:
+            conda_api._close_conda_workers()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_conda_api_falls_back_without_conda(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        # no fake conda on the path
+        monkeypatch.setenv('PYTHONPATH', dirname)
+        try:
+            assert {'subprocess': True} == conda_api.info()
+        finally:
+            conda_api._close_conda_workers()
+
+    with_directory_contents(dict(), check)
+
+
+def test_conda_api_workers_disabled(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        monkeypatch.delenv('ANACONDA_PROJECT_CONDA_WORKER')
+        assert {'subprocess': True} == conda_api.info()
+        assert dict() == conda_api._conda_workers
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_conda_api_worker_no_root_python(monkeypatch):
+    def check(dirname):
+        _monkeypatch_conda_workers(monkeypatch)
+        monkeypatch.setattr('anaconda_project.internal.conda_api._get_root_python', lambda: None)
+        assert {'subprocess': True} == conda_api.info()
+
+    _with_fake_conda(monkeypatch, check)
+
+
+def test_get_root_python_no_root_prefix(monkeypatch):
+    monkeypatch.setattr('anaconda_project.internal.conda_api._get_root_prefix', lambda: None)
+    assert conda_api._get_root_python() is None
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import threading
+
+import pytest
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from anaconda_project.internal import coroutines
+
+
+@gen.coroutine
+def _which_thread():
+    yield gen.moment
+    raise gen.Return(threading.current_thread())
+
+
+@gen.coroutine
+def _fail():
+    yield gen.moment
+    raise ValueError("coroutine failed")
+
+
+def test_run_sync_on_private_loop():
+    assert coroutines.current_caller_loop() is None
+    assert threading.current_thread() is coroutines.run_sync(_which_thread)
+    with pytest.raises(ValueError) as excinfo:
+        coroutines.run_sync(_fail)
+    assert "coroutine failed" in str(excinfo.value)
+
+
+def test_run_blocking_runs_coroutines_on_caller_loop():
+    loop_thread = threading.current_thread()
+    ticked = threading.Event()
+
+    def blocking():
+        assert threading.current_thread() is not loop_thread
+        # the IOLoop keeps running while we block
+        assert ticked.wait(10)
+        return (coroutines.run_sync(_which_thread), coroutines.current_caller_loop())
+
+    @gen.coroutine
+    def tick():
+        for i in range(3):
+            yield gen.sleep(0.01)
+        ticked.set()
+
+    @gen.coroutine
+    def run():
+        IOLoop.current().spawn_callback(tick)
+        result = yield coroutines.run_blocking(blocking)
+        raise gen.Return(result)
+
+    io_loop = IOLoop.current()
+    (coroutine_thread, caller_loop) = io_loop.run_sync(run)
+    assert coroutine_thread is loop_thread
+    assert caller_loop is io_loop
+    assert coroutines.current_caller_loop() is None
+
+
+def test_run_blocking_errors():
+    def blocking_fails():
+        raise ValueError("blocking failed")
+
+    def blocking_coroutine_fails():
+        return coroutines.run_sync(_fail)
+
+    with pytest.raises(ValueError) as excinfo:
+        IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking_fails))
+    assert "blocking failed" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking_coroutine_fails))
+    assert "coroutine failed" in str(excinfo.value)
+
+
+def test_run_blocking_base_exceptions():
+    def blocking_exits():
+        raise SystemExit(3)
+
+    def interrupted():
+        raise KeyboardInterrupt()
+
+    def blocking_coroutine_interrupted():
+        try:
+            coroutines.run_sync(interrupted)
+        except KeyboardInterrupt:
+            return "interrupted"
+
+    with pytest.raises(SystemExit):
+        IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking_exits), timeout=10)
+
+    result = IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking_coroutine_interrupted), timeout=10)
+    assert "interrupted" == result
+
+
+def test_run_blocking_reuses_workers():
+    def blocking():
+        return threading.current_thread()
+
+    first = IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking))
+    second = IOLoop.current().run_sync(lambda: coroutines.run_blocking(blocking))
+    assert first is second
+
+
+def test_workers_are_bounded():
+    workers = coroutines._Workers(2)
+    lock = threading.Lock()
+    running = []
+    most_running = []
+    release = threading.Event()
+    finished = []
+
+    def job():
+        with lock:
+            running.append(1)
+            most_running.append(len(running))
+        release.wait(10)
+        with lock:
+            running.pop()
+            finished.append(threading.current_thread())
+
+    for i in range(5):
+        workers.submit(job)
+    release.set()
+    for i in range(100):
+        if len(finished) == 5:
+            break
+        threading.Event().wait(0.1)
+    assert 5 == len(finished)
+    assert 2 == max(most_running)
+    assert 2 == len(set(finished))
+
+
+def test_waiting_worker_does_not_count_against_limit():
+    workers = coroutines._Workers(1)
+    inner_done = threading.Event()
+    outer_done = threading.Event()
+
+    def inner():
+        inner_done.set()
+
+    def outer():
+        with workers.waiting():
+            workers.submit(inner)
+            assert inner_done.wait(10)
+        outer_done.set()
+
+    workers.submit(outer)
+    assert outer_done.wait(10)
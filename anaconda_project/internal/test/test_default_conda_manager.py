@@ -12,11 +12,13 @@ import json
 import os
 import platform
 import pytest
+import threading
 import time
 from pprint import pprint
 
 from anaconda_project.env_spec import EnvSpec
-from anaconda_project.conda_manager import (CondaManagerError, CondaLockSet)
+from anaconda_project.conda_manager import (CondaManagerError, CondaLockSet, _DeviationCache, _deviation_cache_scope,
+                                            _current_deviation_cache)
 from anaconda_project.version import version
 from anaconda_project.frontend import NullFrontend
 
@@ -145,7 +147,7 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         assert not os.path.isdir(envdir)
         assert not os.path.exists(os.path.join(envdir, IPYTHON_BINARY))
         assert not os.path.exists(os.path.join(envdir, FLAKE8_BINARY))
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         deviations = manager.find_environment_deviations(envdir, spec)
 
@@ -167,8 +169,8 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         assert os.path.exists(os.path.join(envdir, IPYTHON_BINARY))
         assert os.path.exists(os.path.join(envdir, PYINSTRUMENT_BINARY))
 
-        assert manager._timestamp_file_up_to_date(envdir, spec)
-        assert not manager._timestamp_file_up_to_date(envdir, spec_with_phony_pip_package)
+        assert manager._manifest_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec_with_phony_pip_package)
 
         # test bad pip package throws error
         deviations = manager.find_environment_deviations(envdir, spec_with_phony_pip_package)
@@ -180,7 +182,7 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         with pytest.raises(CondaManagerError) as excinfo:
             manager.fix_environment_deviations(envdir, spec_with_phony_pip_package, deviations)
         assert 'Failed to install missing pip packages' in str(excinfo.value)
-        assert not manager._timestamp_file_up_to_date(envdir, spec_with_phony_pip_package)
+        assert not manager._manifest_file_up_to_date(envdir, spec_with_phony_pip_package)
 
         # test bad url package throws error
         deviations = manager.find_environment_deviations(envdir, spec_with_bad_url_pip_package)
@@ -192,7 +194,7 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         with pytest.raises(CondaManagerError) as excinfo:
             manager.fix_environment_deviations(envdir, spec_with_bad_url_pip_package, deviations)
         assert 'Failed to install missing pip packages' in str(excinfo.value)
-        assert not manager._timestamp_file_up_to_date(envdir, spec_with_bad_url_pip_package)
+        assert not manager._manifest_file_up_to_date(envdir, spec_with_bad_url_pip_package)
 
         # test we notice wrong ipython version AND missing bokeh
         deviations = manager.find_environment_deviations(envdir, spec_with_bokeh_and_old_ipython)
@@ -214,15 +216,15 @@ def test_conda_create_and_install_and_remove(monkeypatch):
 
         manager.fix_environment_deviations(envdir, spec_with_old_ipython, deviations)
 
-        assert manager._timestamp_file_up_to_date(envdir, spec_with_old_ipython)
+        assert manager._manifest_file_up_to_date(envdir, spec_with_old_ipython)
 
         deviations = manager.find_environment_deviations(envdir, spec_with_old_ipython)
         assert deviations.missing_packages == ()
         assert deviations.wrong_version_packages == ()
 
-        # update timestamp; this doesn't re-upgrade because `spec` doesn't
+        # update manifest; this doesn't re-upgrade because `spec` doesn't
         # specify an ipython version
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         deviations = manager.find_environment_deviations(envdir, spec)
 
@@ -230,18 +232,17 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         assert deviations.wrong_version_packages == ()
 
         manager.fix_environment_deviations(envdir, spec, deviations)
-        assert manager._timestamp_file_up_to_date(envdir, spec)
+        assert manager._manifest_file_up_to_date(envdir, spec)
 
         deviations = manager.find_environment_deviations(envdir, spec)
         assert deviations.missing_packages == ()
         assert deviations.wrong_version_packages == ()
 
         # test that we can remove a package
-        assert manager._timestamp_file_up_to_date(envdir, spec)
-        time.sleep(1)  # removal is fast enough to break our timestamp resolution
+        assert manager._manifest_file_up_to_date(envdir, spec)
         manager.remove_packages(prefix=envdir, packages=['ipython'])
         assert not os.path.exists(os.path.join(envdir, IPYTHON_BINARY))
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         # test for error removing
         with pytest.raises(CondaManagerError) as excinfo:
@@ -251,13 +252,15 @@ def test_conda_create_and_install_and_remove(monkeypatch):
         valid_strings = ('no packages found to remove', 'Package not found', "named 'ipython' found to remove",
                          'PackagesNotFoundError:', "is missing from the environment")
         assert any(s in message for s in valid_strings)
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         # test failure to exec pip
         def mock_call_pip(*args, **kwargs):
             raise pip_api.PipError("pip fail")
 
         monkeypatch.setattr('anaconda_project.internal.pip_api._call_pip', mock_call_pip)
+        # make sure we use pip rather than reading package metadata
+        monkeypatch.setattr('anaconda_project.internal.pip_api._installed_from_metadata', lambda prefix: None)
 
         with pytest.raises(CondaManagerError) as excinfo:
             deviations = manager.find_environment_deviations(envdir, spec)
@@ -267,7 +270,7 @@ def test_conda_create_and_install_and_remove(monkeypatch):
 
 
 @pytest.mark.slow
-def test_timestamp_file_works(monkeypatch):
+def test_manifest_file_works(monkeypatch):
     monkeypatch_conda_not_to_use_links(monkeypatch)
 
     spec = test_spec
@@ -277,29 +280,8 @@ def test_timestamp_file_works(monkeypatch):
 
         manager = DefaultCondaManager(frontend=NullFrontend())
 
-        def print_timestamps(when):
-            newest_in_prefix = 0
-            for d in manager._timestamp_comparison_directories(envdir):
-                try:
-                    t = os.path.getmtime(d)
-                except Exception:
-                    t = 0
-                if t > newest_in_prefix:
-                    newest_in_prefix = t
-            timestamp_fname = manager._timestamp_file(envdir, spec)
-            try:
-                timestamp_file = os.path.getmtime(timestamp_fname)
-            except Exception:
-                timestamp_file = 0
-            print("%s: timestamp file %d prefix %d diff %g" % (when, timestamp_file, newest_in_prefix,
-                                                               newest_in_prefix - timestamp_file))
-
-        print_timestamps("before env creation")
-
         assert not os.path.isdir(envdir)
-        assert not os.path.exists(os.path.join(envdir, IPYTHON_BINARY))
-        assert not os.path.exists(os.path.join(envdir, PYINSTRUMENT_BINARY))
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         deviations = manager.find_environment_deviations(envdir, spec)
 
@@ -309,14 +291,10 @@ def test_timestamp_file_works(monkeypatch):
 
         manager.fix_environment_deviations(envdir, spec, deviations)
 
-        print_timestamps("after fixing deviations")
-
-        assert os.path.isdir(envdir)
-        assert os.path.isdir(os.path.join(envdir, "conda-meta"))
         assert os.path.exists(os.path.join(envdir, IPYTHON_BINARY))
         assert os.path.exists(os.path.join(envdir, PYINSTRUMENT_BINARY))
 
-        assert manager._timestamp_file_up_to_date(envdir, spec)
+        assert manager._manifest_file_up_to_date(envdir, spec)
 
         called = []
         from anaconda_project.internal.pip_api import installed as real_pip_installed
@@ -342,46 +320,158 @@ def test_timestamp_file_works(monkeypatch):
         assert deviations.missing_pip_packages == ()
         assert deviations.ok
 
-        assert manager._timestamp_file_up_to_date(envdir, spec)
-
-        # now modify conda-meta and check that we DO call the package managers
-        time.sleep(1.1)  # be sure we are in a new second
-        conda_meta_dir = os.path.join(envdir, "conda-meta")
-        print("conda-meta original timestamp: %d" % os.path.getmtime(conda_meta_dir))
-        inside_conda_meta = os.path.join(conda_meta_dir, "thing.txt")
-        with codecs.open(inside_conda_meta, 'w', encoding='utf-8') as f:
-            f.write(u"This file should change the mtime on conda-meta\n")
-        print("file inside conda-meta %d and conda-meta itself %d" % (os.path.getmtime(inside_conda_meta),
-                                                                      os.path.getmtime(conda_meta_dir)))
-        os.remove(inside_conda_meta)
-
-        print_timestamps("after touching conda-meta")
+        # uninstall the pip package behind our back, and check
+        # that we DO call the package managers
+        pip_api.remove(prefix=envdir, pkgs=['pyinstrument'])
 
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
+        assert not manager._manifest_file_up_to_date(envdir, spec)
 
         deviations = manager.find_environment_deviations(envdir, spec)
 
         assert len(called) == 2
 
         assert deviations.missing_packages == ()
-        assert deviations.missing_pip_packages == ()
-        # deviations should not be ok (due to timestamp)
+        assert deviations.missing_pip_packages == ('pyinstrument', )
         assert not deviations.ok
 
-        assert not manager._timestamp_file_up_to_date(envdir, spec)
-
-        # we want to be sure we update the timestamp file even though
-        # there wasn't any actual work to do
         manager.fix_environment_deviations(envdir, spec, deviations)
 
-        print_timestamps("after fixing deviations 2")
-
-        assert manager._timestamp_file_up_to_date(envdir, spec)
+        assert manager._manifest_file_up_to_date(envdir, spec)
 
     with_directory_contents(dict(), do_test)
 
 
-def test_timestamp_file_ignores_failed_write(monkeypatch):
+def _fake_env_files(site_packages):
+    return {
+        'conda-meta/python-3.6.0-0.json': '{}',
+        'conda-meta/ipython-5.4.1-py36_0.json': '{}',
+        'conda-meta/history': '',
+        site_packages + '/pyinstrument-1.0.dist-info/METADATA': '',
+        site_packages + '/oldthing-0.1-py3.6.egg-info': '',
+        site_packages + '/notpackage.py': ''
+    }
+
+
+@pytest.mark.parametrize('site_packages', ['lib/python3.6/site-packages', 'Lib/site-packages'])
+def test_manifest_detects_changes_without_subprocesses(monkeypatch, site_packages):
+    def mock_installed(*args, **kwargs):
+        raise AssertionError("should not list packages")
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.installed', mock_installed)
+    monkeypatch.setattr('anaconda_project.internal.pip_api.installed', mock_installed)
+
+    spec = test_spec
+
+    def do_test(dirname):
+        manager = DefaultCondaManager(frontend=NullFrontend())
+        manifest = manager._environment_manifest(dirname)
+
+        manager._write_manifest_file(dirname, spec)
+        assert manager._manifest_file_up_to_date(dirname, spec)
+        assert manager.find_environment_deviations(dirname, spec).ok
+
+        # mtimes and non-package files don't matter
+        os.utime(os.path.join(dirname, 'conda-meta'), (1, 1))
+        with open(os.path.join(dirname, 'conda-meta', 'history'), 'w') as f:
+            f.write("# more history\n")
+        with open(os.path.join(dirname, site_packages, 'another.py'), 'w') as f:
+            f.write("\n")
+        assert manifest == manager._environment_manifest(dirname)
+        assert manager._manifest_file_up_to_date(dirname, spec)
+
+        # a different env spec has a different manifest file
+        other_spec = EnvSpec(name='myenv', conda_packages=['bokeh'], channels=[])
+        assert not manager._manifest_file_up_to_date(dirname, other_spec)
+
+        # upgrading a conda package changes the manifest
+        os.rename(
+            os.path.join(dirname, 'conda-meta', 'ipython-5.4.1-py36_0.json'),
+            os.path.join(dirname, 'conda-meta', 'ipython-6.0.0-py36_0.json'))
+        assert manifest != manager._environment_manifest(dirname)
+        assert not manager._manifest_file_up_to_date(dirname, spec)
+        manager._write_manifest_file(dirname, spec)
+        assert manager._manifest_file_up_to_date(dirname, spec)
+
+        # removing a pip package changes the manifest
+        os.rename(
+            os.path.join(dirname, site_packages, 'pyinstrument-1.0.dist-info'),
+            os.path.join(dirname, site_packages, 'unrelated'))
+        assert not manager._manifest_file_up_to_date(dirname, spec)
+
+    with_directory_contents(_fake_env_files(site_packages), do_test)
+
+
+def test_deviations_cached_until_env_changes(monkeypatch):
+    site_packages = 'lib/python3.6/site-packages'
+    computed = []
+
+    def mock_find_conda_deviations(self, prefix, spec):
+        computed.append(prefix)
+        return (['ipython'], [])
+
+    monkeypatch.setattr(DefaultCondaManager, '_find_conda_deviations', mock_find_conda_deviations)
+    monkeypatch.setattr(DefaultCondaManager, '_find_pip_missing', lambda self, prefix, spec: [])
+
+    def mock_install(prefix, pkgs, channels, stdout_callback, stderr_callback):
+        pass
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.install', mock_install)
+
+    def do_test(dirname):
+        manager = DefaultCondaManager(frontend=NullFrontend())
+
+        # no caching outside of a cache scope
+        manager.find_environment_deviations(dirname, test_spec)
+        manager.find_environment_deviations(dirname, test_spec)
+        assert 2 == len(computed)
+
+        cache = _DeviationCache()
+        with _deviation_cache_scope(cache):
+            first = manager.find_environment_deviations(dirname, test_spec)
+            assert first is manager.find_environment_deviations(dirname, test_spec)
+            assert dict(computed=1, reused=1) == cache.counts
+
+            # a different spec is a different key
+            other_spec = EnvSpec(name='myenv', conda_packages=['bokeh'], channels=[])
+            manager.find_environment_deviations(dirname, other_spec)
+            assert dict(computed=2, reused=1) == cache.counts
+
+            # installing a package changes the manifest so isn't found
+            with open(os.path.join(dirname, 'conda-meta', 'bokeh-0.12-0.json'), 'w') as f:
+                f.write('{}')
+            assert first is not manager.find_environment_deviations(dirname, test_spec)
+            assert dict(computed=3, reused=1) == cache.counts
+
+            # fixing uses the cached deviations then invalidates them
+            manager.fix_environment_deviations(dirname, test_spec)
+            assert dict(computed=3, reused=2) == cache.counts
+            manager.find_environment_deviations(dirname, test_spec)
+            assert dict(computed=4, reused=2) == cache.counts
+
+        assert _current_deviation_cache() is None
+
+    with_directory_contents(_fake_env_files(site_packages), do_test)
+
+
+def test_manifest_file_from_older_version_is_not_up_to_date():
+    spec = test_spec
+
+    def do_test(dirname):
+        manager = DefaultCondaManager(frontend=NullFrontend())
+        filename = manager._manifest_file(dirname, spec)
+        os.makedirs(os.path.dirname(filename))
+        with codecs.open(filename, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(anaconda_project_version="0.8.0")) + "\n")
+        assert not manager._manifest_file_up_to_date(dirname, spec)
+
+        with codecs.open(filename, 'w', encoding='utf-8') as f:
+            f.write("not json")
+        assert not manager._manifest_file_up_to_date(dirname, spec)
+
+    with_directory_contents(_fake_env_files('lib/python3.6/site-packages'), do_test)
+
+
+def test_manifest_file_ignores_failed_write(monkeypatch):
     monkeypatch_conda_not_to_use_links(monkeypatch)
 
     spec = test_spec
@@ -405,27 +495,27 @@ def test_timestamp_file_ignores_failed_write(monkeypatch):
         monkeypatch.setattr('codecs.open', mock_open)
 
         # this should NOT throw but also should not write the
-        # timestamp file (we ignore errors)
-        filename = manager._timestamp_file(envdir, spec)
+        # manifest file (we ignore errors)
+        filename = manager._manifest_file(envdir, spec)
         assert filename.startswith(envdir)
         assert not os.path.exists(filename)
-        manager._write_timestamp_file(envdir, spec)
+        manager._write_manifest_file(envdir, spec)
         assert not os.path.exists(filename)
         # the second time we really write it (this is to prove we
         # are looking at the right filename)
-        manager._write_timestamp_file(envdir, spec)
+        manager._write_manifest_file(envdir, spec)
         assert os.path.exists(filename)
 
         # check on the file contents
         with real_open(filename, 'r', encoding='utf-8') as f:
             content = json.loads(f.read())
-            assert dict(anaconda_project_version=version) == content
+            assert dict(anaconda_project_version=version, manifest=manager._environment_manifest(envdir)) == content
 
     with_directory_contents(dict(), do_test)
 
 
 def test_resolve_dependencies_with_conda_api_mock(monkeypatch):
-    def mock_resolve_dependencies(pkgs, platform, channels):
+    def mock_resolve_dependencies(pkgs, platform, channels, with_urls=False):
         return [('bokeh', '0.12.4', '0'), ('thing', '1.0', '1')]
 
     monkeypatch.setattr('anaconda_project.internal.conda_api.resolve_dependencies', mock_resolve_dependencies)
@@ -449,7 +539,7 @@ def test_resolve_dependencies_with_actual_conda():
 
 
 def test_resolve_dependencies_with_conda_api_mock_raises_error(monkeypatch):
-    def mock_resolve_dependencies(pkgs, platform, channels):
+    def mock_resolve_dependencies(pkgs, platform, channels, with_urls=False):
         raise conda_api.CondaError("nope")
 
     monkeypatch.setattr('anaconda_project.internal.conda_api.resolve_dependencies', mock_resolve_dependencies)
@@ -462,6 +552,141 @@ def test_resolve_dependencies_with_conda_api_mock_raises_error(monkeypatch):
     assert 'Error resolving for' in str(excinfo.value)
 
 
+def test_resolve_dependencies_for_several_platforms_concurrently(monkeypatch):
+    lock = threading.Lock()
+    counts = dict(running=0, max_running=0)
+
+    def mock_resolve_dependencies(pkgs, platform, channels, with_urls=False):
+        with lock:
+            counts['running'] += 1
+            counts['max_running'] = max(counts['max_running'], counts['running'])
+        time.sleep(0.05)
+        with lock:
+            counts['running'] -= 1
+        return [('bokeh', '0.12.4', '0'), ('thing-%s' % platform, '1.0', '1')]
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.resolve_dependencies', mock_resolve_dependencies)
+
+    manager = DefaultCondaManager(frontend=NullFrontend(), resolve_workers=3)
+
+    platforms = ('linux-64', 'osx-64', 'win-64')
+    lock_set = manager.resolve_dependencies(['bokeh'], channels=(), platforms=platforms)
+    assert counts['max_running'] > 1
+    assert counts['max_running'] <= 3
+    assert lock_set.platforms == platforms
+    for platform_name in platforms:
+        assert lock_set.package_specs_for_platform(platform_name) == ('bokeh=0.12.4=0',
+                                                                      'thing-%s=1.0=1' % platform_name)
+
+
+def test_resolve_dependencies_reports_current_platform_error_first(monkeypatch):
+    current = conda_api.current_platform()
+
+    def mock_resolve_dependencies(pkgs, platform, channels, with_urls=False):
+        if platform != current:
+            raise conda_api.CondaError("fast failure")
+        # the current platform fails last in wall-clock time
+        time.sleep(0.05)
+        raise conda_api.CondaError("slow failure")
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.resolve_dependencies', mock_resolve_dependencies)
+
+    manager = DefaultCondaManager(frontend=NullFrontend(), resolve_workers=5)
+
+    platforms = sorted(set(conda_api.default_platforms_plus_32_bit + (current, )))
+    with pytest.raises(CondaManagerError) as excinfo:
+        manager.resolve_dependencies(['bokeh'], channels=(), platforms=platforms)
+
+    assert ('Error resolving for %s: slow failure' % current) == str(excinfo.value)
+
+
+def test_resolve_workers_from_environment(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_RESOLVE_WORKERS', '2')
+    assert DefaultCondaManager(frontend=None)._resolve_workers == 2
+    monkeypatch.delenv('ANACONDA_PROJECT_RESOLVE_WORKERS')
+    assert DefaultCondaManager(frontend=None)._resolve_workers == 4
+
+
+def test_resolve_dependencies_records_package_urls(monkeypatch):
+    def mock_resolve_dependencies(pkgs, platform, channels, with_urls=False):
+        assert with_urls
+        if platform == 'win-64':
+            # we don't know one of the urls, so can't skip the solver on win-64
+            return [('bokeh', '0.12.4', '0', None, None)]
+        return [('bokeh', '0.12.4', '0', 'https://example.com/%s/bokeh-0.12.4-0.tar.bz2' % platform, 'a' * 32)]
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.resolve_dependencies', mock_resolve_dependencies)
+    monkeypatch.setenv('ANACONDA_PROJECT_LOCK_PACKAGE_URLS', 'true')
+
+    manager = DefaultCondaManager(frontend=NullFrontend())
+
+    lock_set = manager.resolve_dependencies(['bokeh'], channels=(), platforms=('linux-64', 'win-64'))
+    assert lock_set.package_specs_for_platform('linux-64') == ('bokeh=0.12.4=0', )
+    assert lock_set.package_specs_for_platform('win-64') == ('bokeh=0.12.4=0', )
+    assert lock_set.package_urls_for_platform('linux-64') == [
+        'https://example.com/linux-64/bokeh-0.12.4-0.tar.bz2#' + 'a' * 32
+    ]
+    assert lock_set.package_urls_for_platform('win-64') is None
+
+
+def _spec_with_package_urls(urls):
+    current = conda_api.current_platform()
+    lock_set = CondaLockSet(
+        package_specs_by_platform={'all': ['bokeh=0.12.4=1', 'thing=1.0=0']},
+        platforms=[current],
+        package_urls_by_platform={current: urls})
+    return EnvSpec(
+        name='myenv', conda_packages=['bokeh', 'thing'], channels=[], platforms=[current], lock_set=lock_set)
+
+
+def test_package_urls_used_to_create_and_fix_without_solving(monkeypatch):
+    md5 = 'b' * 32
+    bokeh_url = 'https://example.com/pkgs/noarch/bokeh-0.12.4-1.tar.bz2#' + md5
+    thing_url = 'https://example.com/pkgs/noarch/thing-1.0-0.tar.bz2#' + md5
+    spec = _spec_with_package_urls([bokeh_url, thing_url])
+
+    def check(dirname):
+        prefix = os.path.join(dirname, "myenv")
+        calls = []
+
+        def mock_create_explicit(prefix, urls, stdout_callback, stderr_callback):
+            calls.append(('create', urls))
+            os.makedirs(os.path.join(prefix, 'conda-meta'))
+
+        def mock_install_explicit(prefix, urls, stdout_callback, stderr_callback):
+            calls.append(('install', urls))
+
+        def mock_solve(*args, **kwargs):
+            raise AssertionError("should not have used the solver")
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api.create_explicit', mock_create_explicit)
+        monkeypatch.setattr('anaconda_project.internal.conda_api.install_explicit', mock_install_explicit)
+        monkeypatch.setattr('anaconda_project.internal.conda_api.create', mock_solve)
+        monkeypatch.setattr('anaconda_project.internal.conda_api.install', mock_solve)
+
+        manager = DefaultCondaManager(frontend=NullFrontend())
+        manager.fix_environment_deviations(prefix, spec)
+        assert [('create', [bokeh_url, thing_url])] == calls
+
+        # the lock set's builds are compared exactly, no prefix matching
+        def mock_installed(prefix):
+            return {'bokeh': ('bokeh', '0.12.4', '1'), 'thing': ('thing', '1.0', '01')}
+
+        monkeypatch.setattr('anaconda_project.internal.conda_api.installed', mock_installed)
+        # change the env so the manifest doesn't short-circuit the check
+        with codecs.open(os.path.join(prefix, 'conda-meta', 'thing-1.0-01.json'), 'w', encoding='utf-8') as f:
+            f.write('{}')
+        deviations = manager.find_environment_deviations(prefix, spec)
+        assert deviations.missing_packages == ()
+        assert deviations.wrong_version_packages == ('thing', )
+
+        del calls[:]
+        manager.fix_environment_deviations(prefix, spec, deviations)
+        assert [('install', [thing_url])] == calls
+
+    with_directory_contents(dict(), check)
+
+
 def test_installed_version_comparison(monkeypatch):
     def check(dirname):
         prefix = os.path.join(dirname, "myenv")
@@ -506,6 +731,16 @@ def test_installed_version_comparison(monkeypatch):
     with_directory_contents(dict(), check)
 
 
+def test_pip_missing_compares_normalized_names(monkeypatch):
+    def mock_installed(prefix):
+        return {'PyYAML': ('PyYAML', '3.12'), 'zope.interface': ('zope.interface', '4.0')}
+
+    monkeypatch.setattr('anaconda_project.internal.pip_api.installed', mock_installed)
+    spec = EnvSpec(name='myenv', conda_packages=[], pip_packages=['pyyaml', 'Zope_Interface', 'nope'], channels=[])
+    manager = DefaultCondaManager(frontend=NullFrontend())
+    assert ['nope'] == manager._find_pip_missing('/some/prefix', spec)
+
+
 def test_extract_common():
     resolve_results = {
         'linux-32': ['linux-32-only', 'linux-only', 'unix-only', 'common'],
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+from anaconda_project.internal import env_store
+from anaconda_project.internal.env_store import EnvStore, shared_env_store, shared_envs_path
+from anaconda_project.internal.test.fake_frontend import FakeFrontend
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def _store_contents(*hashes):
+    contents = {'projects/a/anaconda-project.yml': '', 'projects/b/anaconda-project.yml': '', 'store/notanenv': ''}
+    for locked_hash in hashes:
+        contents['store/%s/conda-meta/thing-1.0-0.json' % locked_hash] = '{}'
+    return contents
+
+
+def _created_long_ago(store):
+    # envs created recently may still be being created, so gc skips them
+    for locked_hash in store.locked_hashes():
+        os.utime(os.path.join(store.prefix(locked_hash), 'conda-meta'), (100, 100))
+
+
+def test_shared_envs_path():
+    assert shared_envs_path(dict()) is None
+    assert shared_envs_path(dict(ANACONDA_PROJECT_SHARED_ENVS_PATH='')) is None
+    assert shared_env_store(dict()) is None
+    assert os.path.abspath('/shared/envs') == shared_envs_path(dict(ANACONDA_PROJECT_SHARED_ENVS_PATH='/shared/envs'))
+    store = shared_env_store(dict(ANACONDA_PROJECT_SHARED_ENVS_PATH='/shared/envs'))
+    assert os.path.abspath('/shared/envs') == store.directory
+
+
+def test_prefixes_and_hashes():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        assert ['abc', 'def'] == store.locked_hashes()
+        assert os.path.join(dirname, 'store', 'abc') == store.prefix('abc')
+        assert 'abc' == store.locked_hash_for_prefix(os.path.join(dirname, 'store', 'abc', ''))
+        assert store.locked_hash_for_prefix(os.path.join(dirname, 'envs', 'default')) is None
+        assert [] == EnvStore(os.path.join(dirname, 'nope')).locked_hashes()
+
+    with_directory_contents(_store_contents('abc', 'def'), check)
+
+
+def test_references():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        a = os.path.join(dirname, 'projects', 'a')
+        b = os.path.join(dirname, 'projects', 'b')
+        assert [] == store.references('abc')
+
+        store.add_reference('abc', a, 'default')
+        store.add_reference('abc', b, 'default')
+        store.add_reference('abc', b, 'other')
+        assert [(a, 'default'), (b, 'default'), (b, 'other')] == sorted(store.references('abc'))
+
+        # an env spec can only use one env
+        store.add_reference('def', a, 'default')
+        assert [(b, 'default'), (b, 'other')] == sorted(store.references('abc'))
+        assert [(a, 'default')] == store.references('def')
+
+        store.remove_reference(b, 'other')
+        assert [(b, 'default')] == store.references('abc')
+
+        # references from deleted projects go away
+        os.remove(os.path.join(a, 'anaconda-project.yml'))
+        os.rmdir(a)
+        assert [] == store.references('def')
+
+    with_directory_contents(_store_contents('abc', 'def'), check)
+
+
+def test_references_ignores_corrupt_files():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        assert [] == store.references('abc')
+
+    references = 'store/abc/var/cache/anaconda-project/store/references/'
+    contents = _store_contents('abc')
+    contents[references + 'notjson.json'] = 'not json'
+    contents[references + 'nokeys.json'] = '{}'
+    with_directory_contents(contents, check)
+
+
+def test_last_used():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        os.utime(os.path.join(dirname, 'store', 'abc', 'conda-meta'), (10, 10))
+        # defaults to when the env was created
+        assert 10 == store.last_used('abc')
+        store.add_reference('abc', os.path.join(dirname, 'projects', 'a'), 'default')
+        assert store.last_used('abc') > 10
+        assert 0 == store.last_used('nope')
+
+    with_directory_contents(_store_contents('abc'), check)
+
+
+def test_gc_removes_unreferenced():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        _created_long_ago(store)
+        store.add_reference('abc', os.path.join(dirname, 'projects', 'a'), 'default')
+        frontend = FakeFrontend()
+        status = store.gc(frontend)
+        assert status
+        assert "Removed 1 environments from %s." % store.directory == status.status_description
+        assert ["Removing %s (not used by any project)." % store.prefix('def')] == frontend.logs
+        assert ['abc'] == store.locked_hashes()
+
+        status = store.gc(frontend)
+        assert status
+        assert "No environments to remove from %s." % store.directory == status.status_description
+
+    with_directory_contents(_store_contents('abc', 'def'), check)
+
+
+def test_gc_removes_old():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        _created_long_ago(store)
+        for locked_hash in ('abc', 'def'):
+            store.add_reference(locked_hash, os.path.join(dirname, 'projects', 'a'), locked_hash)
+        now = store.last_used('def') + 1000
+        os.utime(store._last_used_file('abc'), (now - 5000, now - 5000))
+
+        frontend = FakeFrontend()
+        assert store.gc(frontend, max_age=2000, now=now)
+        assert ["Removing %s (not used recently)." % store.prefix('abc')] == frontend.logs
+        assert ['def'] == store.locked_hashes()
+
+    with_directory_contents(_store_contents('abc', 'def'), check)
+
+
+def test_gc_removes_least_recently_used_when_too_big():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        _created_long_ago(store)
+        hashes = ('abc', 'def', 'ghi')
+        for (i, locked_hash) in enumerate(hashes):
+            store.add_reference(locked_hash, os.path.join(dirname, 'projects', 'a'), locked_hash)
+            with open(os.path.join(store.prefix(locked_hash), 'big'), 'wb') as f:
+                f.write(b'x' * 1000)
+        os.utime(store._last_used_file('abc'), (300, 300))
+        os.utime(store._last_used_file('def'), (100, 100))
+        os.utime(store._last_used_file('ghi'), (200, 200))
+
+        frontend = FakeFrontend()
+        assert store.gc(frontend, max_bytes=2500)
+        assert ["Removing %s (store is too large)." % store.prefix('def')] == frontend.logs
+        assert ['abc', 'ghi'] == store.locked_hashes()
+
+        assert store.gc(frontend, max_bytes=0)
+        assert [] == store.locked_hashes()
+
+    with_directory_contents(_store_contents('abc', 'def', 'ghi'), check)
+
+
+def test_gc_error_removing(monkeypatch):
+    def mock_rmtree(path):
+        raise IOError("nope")
+
+    monkeypatch.setattr('shutil.rmtree', mock_rmtree)
+
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        _created_long_ago(store)
+        frontend = FakeFrontend()
+        status = store.gc(frontend)
+        monkeypatch.undo()
+        assert not status
+        assert "Failed to remove some environments." == status.status_description
+        assert ["Error removing %s: nope." % store.prefix('abc')] == status.errors
+        assert status.errors == frontend.errors
+
+    with_directory_contents(_store_contents('abc'), check)
+
+
+def test_gc_skips_envs_being_prepared():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        _created_long_ago(store)
+        frontend = FakeFrontend()
+        with store.preparing('abc'):
+            assert store.is_preparing('abc')
+            assert not store.is_preparing('def')
+            assert store.gc(frontend)
+            assert ['abc'] == store.locked_hashes()
+        assert not store.is_preparing('abc')
+        assert ["Removing %s (not used by any project)." % store.prefix('def')] == frontend.logs
+
+        # a marker left by a process that died doesn't count forever
+        with store.preparing('abc'):
+            now = time.time() + env_store._PREPARING_EXPIRES_SECONDS + 1
+            assert not store.is_preparing('abc', now=now)
+            assert store.gc(frontend, now=now)
+            assert [] == store.locked_hashes()
+
+    with_directory_contents(_store_contents('abc', 'def'), check)
+
+
+def test_gc_skips_envs_created_recently():
+    def check(dirname):
+        store = EnvStore(os.path.join(dirname, 'store'))
+        frontend = FakeFrontend()
+        assert store.gc(frontend)
+        assert ['abc'] == store.locked_hashes()
+
+        now = time.time() + env_store._GRACE_SECONDS + 1
+        assert store.gc(frontend, now=now)
+        assert [] == store.locked_hashes()
+
+    with_directory_contents(_store_contents('abc'), check)
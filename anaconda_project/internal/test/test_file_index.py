@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+from anaconda_project.archiver import _list_relative_paths_for_unignored_project_files
+from anaconda_project.internal import file_index
+from anaconda_project.internal.test.fake_frontend import FakeFrontend
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def _age(dirname, seconds_ago):
+    # give directories an mtime old enough to trust
+    mtime = time.time() - seconds_ago
+    for (root, dirs, files) in os.walk(dirname):
+        os.utime(root, (mtime, mtime))
+
+
+def _touch(dirname, seconds_ago):
+    mtime = time.time() - seconds_ago
+    os.utime(dirname, (mtime, mtime))
+
+
+def _lister(dirname, listed):
+    def list_directory(relative_dir):
+        listed.append(relative_dir)
+        files = []
+        subdirectories = []
+        for name in sorted(os.listdir(os.path.join(dirname, relative_dir))):
+            if os.path.isdir(os.path.join(dirname, relative_dir, name)):
+                subdirectories.append(name)
+            else:
+                files.append(name)
+        return (files, subdirectories)
+
+    return list_directory
+
+
+def test_update_index_lists_only_changed_directories():
+    def check(dirname):
+        _age(dirname, 100)
+        listed = []
+        list_directory = _lister(dirname, listed)
+
+        (directories, changed) = file_index.update_index(dirname, dict(), list_directory)
+        assert changed
+        assert ['', 'a', os.path.join('a', 'b'), 'c'] == sorted(listed)
+        expected = ['a', 'c', 'top.txt', os.path.join('a', 'b'), os.path.join('a', 'b', 'deep.ipynb'),
+                    os.path.join('c', 'c.txt')]
+        assert expected == file_index.relative_paths(directories)
+
+        # nothing changed, so nothing is listed
+        del listed[:]
+        (directories, changed) = file_index.update_index(dirname, directories, list_directory)
+        assert not changed
+        assert [] == listed
+
+        # a new file only lists its directory again
+        with open(os.path.join(dirname, 'a', 'b', 'new.ipynb'), 'w') as f:
+            f.write('{}')
+        _touch(os.path.join(dirname, 'a', 'b'), 50)
+        (directories, changed) = file_index.update_index(dirname, directories, list_directory)
+        assert changed
+        assert [os.path.join('a', 'b')] == listed
+        assert os.path.join('a', 'b', 'new.ipynb') in file_index.relative_paths(directories)
+
+        # so does removing a directory
+        del listed[:]
+        os.remove(os.path.join(dirname, 'c', 'c.txt'))
+        os.rmdir(os.path.join(dirname, 'c'))
+        _touch(dirname, 50)
+        (directories, changed) = file_index.update_index(dirname, directories, list_directory)
+        assert changed
+        assert [''] == listed
+        assert 'c' not in directories
+
+    with_directory_contents({'top.txt': 'x', 'a/b/deep.ipynb': '{}', 'c/c.txt': 'y'}, check)
+
+
+def test_update_index_distrusts_recent_mtimes():
+    def check(dirname):
+        listed = []
+        list_directory = _lister(dirname, listed)
+        # just created, so the mtime could change again without us noticing
+        (directories, changed) = file_index.update_index(dirname, dict(), list_directory)
+        assert directories[''][0] is None
+        (directories, changed) = file_index.update_index(dirname, directories, list_directory)
+        assert changed
+        assert ['', ''] == listed
+
+    with_directory_contents({'foo.txt': 'x'}, check)
+
+
+def test_save_and_load_index(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', os.path.join(dirname, 'cache'))
+        monkeypatch.setattr(file_index, '_indexes', dict())
+        project = os.path.join(dirname, 'project')
+        assert (None, dict()) == file_index.load_index(project)
+
+        directories = {'': [1.5, ['foo.ipynb'], []]}
+        file_index.save_index(project, dict(patterns=('a', )), directories)
+        assert os.path.isfile(file_index.index_filename(project))
+        assert (dict(patterns=['a']), directories) == file_index.load_index(project)
+
+        # a new process loads it from disk
+        monkeypatch.setattr(file_index, '_indexes', dict())
+        assert (dict(patterns=['a']), directories) == file_index.load_index(project)
+
+    with_directory_contents(dict(), check)
+
+
+def test_list_project_files_notices_ignore_changes():
+    def check(dirname):
+        _age(dirname, 100)
+        frontend = FakeFrontend()
+
+        def listing():
+            files = _list_relative_paths_for_unignored_project_files(dirname, frontend, requirements=[])
+            return sorted(f for f in files if f.endswith('.ipynb'))
+
+        assert ['a.ipynb', os.path.join('data', 'b.ipynb')] == listing()
+        assert ['a.ipynb', os.path.join('data', 'b.ipynb')] == listing()
+
+        # changing .projectignore lists everything again, even
+        # though no directory changed
+        with open(os.path.join(dirname, '.projectignore'), 'a') as f:
+            f.write("\n/data\n")
+        _age(dirname, 100)
+        assert ['a.ipynb'] == listing()
+        assert [] == frontend.errors
+
+    with_directory_contents({'a.ipynb': '{}', 'data/b.ipynb': '{}', '.projectignore': '# nothing\n'}, check)
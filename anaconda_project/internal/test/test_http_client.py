@@ -34,6 +34,7 @@ def _download_file(length, hash_algorithm):
                 assert download.hash == server_hash
             statinfo = os.stat(filename)
             assert statinfo.st_size == length
+            assert download.bytes_downloaded == length
             assert not os.path.isfile(filename + ".part")
 
     with_directory_contents(dict(), inside_directory_download_file)
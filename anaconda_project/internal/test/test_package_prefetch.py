@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+
+import pytest
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+import anaconda_project.internal.package_prefetch as package_prefetch
+from anaconda_project.internal.test.http_server import HttpServerTestContext
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+try:
+    from urllib.request import pathname2url
+except ImportError:  # pragma: no cover (py2 only)
+    from urllib import pathname2url
+
+
+def _file_url(path, md5=None):
+    url = 'file:' + pathname2url(path)
+    if md5 is not None:
+        url = url + "#" + md5
+    return url
+
+
+def _md5(content):
+    return hashlib.md5(content).hexdigest()
+
+
+def test_prefetch_local_files():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        source = os.path.join(dirname, 'channel', 'foo-1.0-0.tar.bz2')
+        url = _file_url(source, _md5(b'foo package'))
+        (count, errors) = package_prefetch.prefetch_packages([url], pkgs_dir)
+        assert [] == errors
+        assert 1 == count
+        with open(os.path.join(pkgs_dir, 'foo-1.0-0.tar.bz2'), 'rb') as f:
+            assert b'foo package' == f.read()
+        assert not os.path.exists(os.path.join(pkgs_dir, 'foo-1.0-0.tar.bz2.prefetch'))
+        with open(os.path.join(pkgs_dir, 'urls.txt')) as f:
+            assert ['existing', _file_url(source)] == f.read().splitlines()
+
+    with_directory_contents(
+        {
+            'channel/foo-1.0-0.tar.bz2': 'foo package',
+            'pkgs/urls.txt': 'existing\n'
+        }, check)
+
+
+def test_prefetched_packages_are_in_conda_package_cache():
+    package_cache_data = pytest.importorskip('conda.core.package_cache_data')
+
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        source = os.path.join(dirname, 'channel', 'foo-1.0-0.tar.bz2')
+        (count, errors) = package_prefetch.prefetch_packages([_file_url(source, _md5(b'foo package'))], pkgs_dir)
+        assert (1, []) == (count, errors)
+        records = list(package_cache_data.PackageCacheData(pkgs_dir).iter_records())
+        assert [_file_url(source)] == [record.url for record in records]
+
+    with_directory_contents({'channel/foo-1.0-0.tar.bz2': 'foo package', 'pkgs/': None}, check)
+
+
+def test_prefetch_fails_to_record_url(monkeypatch):
+    def mock_record_url(pkgs_dir, url):
+        raise IOError("FAIL")
+
+    monkeypatch.setattr('anaconda_project.internal.package_prefetch._record_url', mock_record_url)
+
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        url = _file_url(os.path.join(dirname, 'channel', 'foo-1.0-0.tar.bz2'))
+        (count, errors) = package_prefetch.prefetch_packages([url], pkgs_dir)
+        assert 0 == count
+        assert ["Failed to record %s in the package cache: FAIL" % url] == errors
+
+    with_directory_contents({'channel/foo-1.0-0.tar.bz2': 'foo package', 'pkgs/': None}, check)
+
+
+def test_prefetch_skips_cached_packages():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        missing = os.path.join(dirname, 'channel', 'does-not-exist')
+        urls = [
+            _file_url(os.path.join(missing, 'foo-1.0-0.tar.bz2')),
+            _file_url(os.path.join(missing, 'bar-1.0-0.conda'))
+        ]
+        (count, errors) = package_prefetch.prefetch_packages(urls, pkgs_dir)
+        assert [] == errors
+        assert 0 == count
+
+    with_directory_contents(
+        {
+            'pkgs/foo-1.0-0.tar.bz2': 'already here',
+            'pkgs/bar-1.0-0/info/repodata_record.json': '{}'
+        }, check)
+
+
+def test_prefetch_mismatched_md5():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        source = os.path.join(dirname, 'channel', 'foo-1.0-0.tar.bz2')
+        url = _file_url(source, _md5(b'something else'))
+        (count, errors) = package_prefetch.prefetch_packages([url], pkgs_dir)
+        assert 0 == count
+        assert 1 == len(errors)
+        assert 'mismatched hashes' in errors[0]
+        assert [] == os.listdir(pkgs_dir)
+
+    with_directory_contents({'channel/foo-1.0-0.tar.bz2': 'foo package', 'pkgs/': None}, check)
+
+
+def test_prefetch_missing_local_file():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        url = _file_url(os.path.join(dirname, 'nope', 'foo-1.0-0.tar.bz2'))
+        (count, errors) = package_prefetch.prefetch_packages([url], pkgs_dir)
+        assert 0 == count
+        assert 1 == len(errors)
+        assert errors[0].startswith("Error downloading %s" % url)
+
+    with_directory_contents({'pkgs/': None}, check)
+
+
+def test_prefetch_over_http():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        with HttpServerTestContext() as server:
+            url = server.new_download_url(download_length=1024, hash_algorithm='md5')
+            result = IOLoop.current().run_sync(lambda: package_prefetch.prefetch_packages_coroutine([url], pkgs_dir))
+            server_hash = server.server_computed_hash_for_downloaded_url(url)
+        assert (1, []) == result
+        with open(os.path.join(pkgs_dir, 'download'), 'rb') as f:
+            content = f.read()
+        assert 1024 == len(content)
+        assert server_hash == _md5(content)
+        with open(os.path.join(pkgs_dir, 'urls.txt')) as f:
+            assert [url.partition('#')[0]] == f.read().splitlines()
+
+    with_directory_contents({'pkgs/': None}, check)
+
+
+def test_prefetch_http_error():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        with HttpServerTestContext() as server:
+            url = server.error_url
+            (count, errors) = IOLoop.current().run_sync(
+                lambda: package_prefetch.prefetch_packages_coroutine([url], pkgs_dir))
+        assert 0 == count
+        assert 1 == len(errors)
+        assert [] == os.listdir(pkgs_dir)
+
+    with_directory_contents({'pkgs/': None}, check)
+
+
+def test_prefetch_limits_connections(monkeypatch):
+    state = dict(active=0, most=0)
+
+    @gen.coroutine
+    def mock_fetch_one(url, md5, filename, downloaded, errors):
+        state['active'] += 1
+        state['most'] = max(state['most'], state['active'])
+        yield gen.moment
+        yield gen.moment
+        state['active'] -= 1
+        downloaded.append(filename)
+
+    monkeypatch.setattr('anaconda_project.internal.package_prefetch._fetch_one', mock_fetch_one)
+
+    def check(dirname):
+        urls = ["https://example.com/pkg%d-1.0-0.tar.bz2" % i for i in range(10)]
+        (count, errors) = package_prefetch.prefetch_packages(urls, dirname, connections=3)
+        assert [] == errors
+        assert 10 == count
+        assert 3 == state['most']
+
+    with_directory_contents(dict(), check)
+
+
+def test_default_connections(monkeypatch):
+    monkeypatch.delenv(package_prefetch.CONNECTIONS_VARIABLE, raising=False)
+    assert 4 == package_prefetch.default_connections()
+    monkeypatch.setenv(package_prefetch.CONNECTIONS_VARIABLE, '9')
+    assert 9 == package_prefetch.default_connections()
+
+
+def test_writable_pkgs_dir(monkeypatch):
+    def check(dirname):
+        unwritable = os.path.join(dirname, 'unwritable')
+        writable = os.path.join(dirname, 'writable')
+
+        def mock_access(path, mode):
+            return path != unwritable
+
+        monkeypatch.setattr('os.access', mock_access)
+        assert writable == package_prefetch.writable_pkgs_dir([unwritable, writable])
+        assert os.path.isdir(writable)
+        assert package_prefetch.writable_pkgs_dir([unwritable]) is None
+        assert package_prefetch.writable_pkgs_dir([]) is None
+
+    with_directory_contents({'unwritable/': None}, check)
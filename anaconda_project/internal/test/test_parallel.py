@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+import pytest
+
+from anaconda_project.internal.parallel import default_max_workers, map_in_threads
+
+
+def test_map_in_threads_empty():
+    assert [] == map_in_threads(lambda x: x, [], max_workers=4)
+
+
+def test_map_in_threads_preserves_order():
+    def slow_square(x):
+        # later items finish first
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    assert [0, 1, 4, 9, 16] == map_in_threads(slow_square, range(5), max_workers=5)
+
+
+def test_map_in_threads_one_worker_runs_inline():
+    seen = []
+
+    def record(x):
+        seen.append(threading.current_thread())
+        return x
+
+    assert [1, 2, 3] == map_in_threads(record, [1, 2, 3], max_workers=1)
+    assert [threading.current_thread()] * 3 == seen
+
+
+def test_map_in_threads_bounded():
+    lock = threading.Lock()
+    counts = dict(running=0, max_running=0)
+
+    def work(x):
+        with lock:
+            counts['running'] += 1
+            counts['max_running'] = max(counts['max_running'], counts['running'])
+        time.sleep(0.02)
+        with lock:
+            counts['running'] -= 1
+        return x
+
+    assert list(range(10)) == map_in_threads(work, range(10), max_workers=3)
+    assert counts['max_running'] <= 3
+    assert counts['max_running'] > 1
+
+
+def test_map_in_threads_raises_earliest_error():
+    completed = []
+
+    def work(x):
+        if x in (1, 3):
+            # the later item fails first
+            time.sleep(0.05 if x == 1 else 0)
+            raise ValueError("failed %d" % x)
+        completed.append(x)
+        return x
+
+    with pytest.raises(ValueError) as excinfo:
+        map_in_threads(work, [0, 1, 2, 3, 4], max_workers=5)
+    assert 'failed 1' == str(excinfo.value)
+    # everything else still ran
+    assert [0, 2, 4] == sorted(completed)
+
+
+def test_map_in_threads_reraises_base_exception():
+    def work(x):
+        if x == 2:
+            raise KeyboardInterrupt()
+        return x
+
+    with pytest.raises(KeyboardInterrupt):
+        map_in_threads(work, [0, 1, 2, 3], max_workers=4)
+
+
+def test_default_max_workers(monkeypatch):
+    monkeypatch.delenv('ANACONDA_PROJECT_TEST_WORKERS', raising=False)
+    assert 3 == default_max_workers('ANACONDA_PROJECT_TEST_WORKERS', 3)
+    assert 1 == default_max_workers('ANACONDA_PROJECT_TEST_WORKERS', 0)
+
+    monkeypatch.setenv('ANACONDA_PROJECT_TEST_WORKERS', '7')
+    assert 7 == default_max_workers('ANACONDA_PROJECT_TEST_WORKERS', 3)
+
+    monkeypatch.setenv('ANACONDA_PROJECT_TEST_WORKERS', '0')
+    assert 1 == default_max_workers('ANACONDA_PROJECT_TEST_WORKERS', 3)
+
+    monkeypatch.setenv('ANACONDA_PROJECT_TEST_WORKERS', 'bogus')
+    assert 3 == default_max_workers('ANACONDA_PROJECT_TEST_WORKERS', 3)
@@ -147,6 +147,74 @@ def test_installed_on_nonexistent_prefix():
     assert dict() == installed
 
 
+_fake_site_packages = {
+    'bin/pip': '',
+    'lib/python3.6/site-packages/Foo_Bar-1.0.dist-info/METADATA': 'Metadata-Version: 2.1\nName: Foo_Bar\n'
+    'Version: 1.0\n\nName: not a header\n',
+    'lib/python3.6/site-packages/oldstyle-0.1-py3.6.egg-info/PKG-INFO': 'Name: oldstyle\r\nVersion: 0.1\r\n',
+    'lib/python3.6/site-packages/filestyle-2.0-py3.6.egg-info': 'Name: filestyle\nVersion: 2.0\n',
+    'lib/python3.6/site-packages/foo.bar-0.5.dist-info/METADATA': 'Name: foo.bar\nVersion: 0.5\n',
+    'lib/python3.6/site-packages/broken-1.0.dist-info/METADATA': 'Name: broken\n',
+    'lib/python3.6/site-packages/nometadata-1.0.dist-info/RECORD': '',
+    'lib/python3.6/site-packages/pip-9.0.1.dist-info/METADATA': 'Name: pip\nVersion: 9.0.1\n',
+    'lib/python3.6/site-packages/foo_bar.py': ''
+}
+
+
+def test_installed_reads_metadata_without_pip(monkeypatch):
+    def mock_call_pip(*args, **kwargs):
+        raise AssertionError("should not run pip")
+
+    monkeypatch.setattr('anaconda_project.internal.pip_api._call_pip', mock_call_pip)
+
+    def check(dirname):
+        installed = pip_api.installed(dirname)
+        # the same thing "pip freeze" would have told us; the first of
+        # several dists with the same normalized name wins, and pip
+        # itself is left out like freeze does
+        assert {
+            'Foo_Bar': ('Foo_Bar', '1.0'),
+            'oldstyle': ('oldstyle', '0.1'),
+            'filestyle': ('filestyle', '2.0')
+        } == installed
+
+    with_directory_contents(_fake_site_packages, check)
+
+
+def test_installed_falls_back_to_pip_freeze(monkeypatch):
+    def mock_call_pip(prefix, extra_args):
+        assert ['freeze'] == extra_args
+        return b"develop==0.1\r\nother==2.0\n"
+
+    monkeypatch.setattr('anaconda_project.internal.pip_api._call_pip', mock_call_pip)
+
+    def check(dirname):
+        assert {'develop': ('develop', '0.1'), 'other': ('other', '2.0')} == pip_api.installed(dirname)
+
+    # no site-packages at all
+    with_directory_contents({'bin/pip': ''}, check)
+
+    # a develop install keeps its metadata somewhere else
+    files = dict(_fake_site_packages)
+    files['lib/python3.6/site-packages/develop.egg-link'] = '/src/develop\n'
+    with_directory_contents(files, check)
+
+
+def test_installed_without_pip_command():
+    def check(dirname):
+        assert dict() == pip_api.installed(dirname)
+
+    files = dict(_fake_site_packages)
+    del files['bin/pip']
+    with_directory_contents(files, check)
+
+
+def test_normalize_name():
+    assert 'foo-bar' == pip_api.normalize_name('Foo_Bar')
+    assert 'foo-bar' == pip_api.normalize_name('foo.-_bar')
+    assert 'foo' == pip_api.normalize_name('FOO')
+
+
 def test_parse_spec():
     # just a package name
     assert "foo" == pip_api.parse_spec("foo").name
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import codecs
+import json
+import os
+
+from anaconda_project.internal import prepare_fingerprint
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def test_fingerprint_filename_in_user_cache(monkeypatch):
+    def check(dirname):
+        monkeypatch.setenv('ANACONDA_PROJECT_CACHE_DIR', dirname)
+        filename = prepare_fingerprint.fingerprint_filename('/some/project', 'development')
+        assert os.path.dirname(os.path.dirname(filename)) == dirname
+        assert filename == prepare_fingerprint.fingerprint_filename('/some/project', 'development')
+        assert filename != prepare_fingerprint.fingerprint_filename('/some/project', 'production')
+        assert filename != prepare_fingerprint.fingerprint_filename('/other/project', 'development')
+
+    with_directory_contents(dict(), check)
+
+
+def test_file_content_hash_and_path_state():
+    def check(dirname):
+        foo = os.path.join(dirname, 'foo')
+        missing = os.path.join(dirname, 'missing')
+
+        assert prepare_fingerprint.file_content_hash(missing) is None
+        assert prepare_fingerprint.path_state(missing) is None
+
+        before = prepare_fingerprint.file_content_hash(foo)
+        assert before is not None
+        assert [False, 3, os.stat(foo).st_mtime] == prepare_fingerprint.path_state(foo)
+        assert prepare_fingerprint.path_state(os.path.join(dirname, 'dir'))[0]
+
+        with open(foo, 'w') as f:
+            f.write('bar')
+        assert before != prepare_fingerprint.file_content_hash(foo)
+
+    with_directory_contents({'foo': 'foo', 'dir/': None}, check)
+
+
+def test_save_and_load_fingerprint():
+    def check(dirname):
+        filename = os.path.join(dirname, 'sub', 'fingerprint.json')
+        assert (None, None) == prepare_fingerprint.load_fingerprint(filename)
+
+        fingerprint = dict(files={'a': 'b'}, paths={'c': [False, 1, 2.5]})
+        saved = dict(environ=dict(FOO='bar'), prefixes=[])
+        prepare_fingerprint.save_fingerprint(filename, fingerprint, saved)
+
+        (loaded, loaded_saved) = prepare_fingerprint.load_fingerprint(filename)
+        assert saved == loaded_saved
+        assert prepare_fingerprint.fingerprint_matches(loaded, fingerprint)
+        assert not prepare_fingerprint.fingerprint_matches(loaded, dict(fingerprint, files={'a': 'c'}))
+        assert not prepare_fingerprint.fingerprint_matches(None, fingerprint)
+
+        # a different format version is ignored
+        with codecs.open(filename, 'r', encoding='utf-8') as f:
+            entry = json.loads(f.read())
+        entry['key']['format'] = entry['key']['format'] + 1
+        with codecs.open(filename, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(entry))
+        assert (None, None) == prepare_fingerprint.load_fingerprint(filename)
+
+    with_directory_contents(dict(), check)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+
+from anaconda_project.internal.solve_cache import (SolveCache, solve_cache_key, repodata_fingerprint,
+                                                   solve_cache_from_environment, DEFAULT_MAX_BYTES)
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def _key(**kwargs):
+    args = dict(pkgs=['a', 'b'], channels=['c1', 'c2'], platform='linux-64', conda_version='4.3', repodata='x')
+    args.update(kwargs)
+    return solve_cache_key(**args)
+
+
+def test_solve_cache_key():
+    assert _key() == _key(pkgs=['b', 'a'])
+    assert _key() != _key(pkgs=['a'])
+    assert _key() != _key(channels=['c2', 'c1'])
+    assert _key() != _key(platform='win-64')
+    assert _key() != _key(conda_version='4.4')
+    assert _key() != _key(repodata='y')
+
+
+def test_repodata_fingerprint():
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, 'pkgs')
+        empty = repodata_fingerprint([])
+        first = repodata_fingerprint([pkgs_dir])
+        assert empty != first
+        assert first == repodata_fingerprint([pkgs_dir])
+        # non-json files and missing dirs are ignored
+        assert first == repodata_fingerprint([pkgs_dir, os.path.join(dirname, 'nope')])
+
+        # a refresh that gets nothing new changes nothing
+        with open(os.path.join(pkgs_dir, 'cache', 'b.info.json'), 'w') as f:
+            f.write('{"url": "https://example.com/b/repodata.json", "etag": "2", "refresh_ns": 5}')
+        os.utime(os.path.join(pkgs_dir, 'cache', 'a.json'), (100, 100))
+        assert first == repodata_fingerprint([pkgs_dir])
+
+        # same repodata under another path is the same
+        os.rename(pkgs_dir, os.path.join(dirname, 'elsewhere'))
+        assert first == repodata_fingerprint([os.path.join(dirname, 'elsewhere')])
+
+    with_directory_contents(
+        {
+            'pkgs/cache/a.json': '{"_url": "https://example.com/a/repodata.json", "_etag": "1", "packages": {}}',
+            'pkgs/cache/b.json': '{"packages": {}}',
+            'pkgs/cache/b.info.json': '{"url": "https://example.com/b/repodata.json", "etag": "2", "refresh_ns": 1}',
+            'pkgs/cache/c.q': ''
+        }, check)
+
+
+def test_repodata_fingerprint_changes_with_repodata():
+    def fingerprint(files):
+        return with_directory_contents(files, lambda dirname: repodata_fingerprint([os.path.join(dirname, 'pkgs')]))
+
+    embedded = {'pkgs/cache/a.json': '{"_url": "https://example.com/a", "_etag": "1", "_mod": "Mon", "packages": {}}'}
+    assert fingerprint(embedded) != fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "https://example.com/a", "_etag": "2", "_mod": "Mon", "packages": {}}'})
+    assert fingerprint(embedded) != fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "https://example.com/a", "_etag": "1", "_mod": "Tue", "packages": {}}'})
+    assert fingerprint(embedded) != fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "https://example.com/b", "_etag": "1", "_mod": "Mon", "packages": {}}'})
+
+    # per-user tokens don't matter
+    assert fingerprint({'pkgs/cache/a.json': '{"_url": "https://example.com/t/abc/a", "_etag": "1"}'}) == fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "https://example.com/t/xyz/a", "_etag": "1"}'})
+
+    # without an etag or last-modified we go by content
+    assert fingerprint({'pkgs/cache/a.json': '{"_url": "file:///a", "packages": {}}'}) != fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "file:///a", "packages": {"x": {}}}'})
+    assert fingerprint({'pkgs/cache/a.json': '{"_url": "file:///a", "packages": {}}'}) == fingerprint(
+        {'pkgs/cache/a.json': '{"_url": "file:///a", "packages": {}}'})
+
+
+def test_get_and_put():
+    def check(dirname):
+        cache = SolveCache(os.path.join(dirname, 'solves'))
+        assert cache.directory == os.path.join(dirname, 'solves')
+        assert cache.max_bytes == DEFAULT_MAX_BYTES
+        key = _key()
+        assert cache.get(key) is None
+        cache.put(key, [('a', '1.0', '0'), ('b', '2.0', 'py36_1')])
+        assert [('a', '1.0', '0'), ('b', '2.0', 'py36_1')] == cache.get(key)
+        assert cache.get(_key(platform='win-64')) is None
+
+    with_directory_contents(dict(), check)
+
+
+def test_get_ignores_corrupt_entries():
+    def check(dirname):
+        cache = SolveCache(dirname)
+        assert cache.get('notjson') is None
+        assert cache.get('wrongformat') is None
+        assert cache.get('nopackages') is None
+
+    with_directory_contents({
+        'notjson.json': 'not json',
+        'wrongformat.json': '{"format": 0, "packages": []}',
+        'nopackages.json': '{"format": 1}'
+    }, check)
+
+
+def test_put_ignores_unwritable_directory():
+    def check(dirname):
+        # a file where the directory should be
+        cache = SolveCache(os.path.join(dirname, 'file'))
+        cache.put('key', [('a', '1.0', '0')])
+        assert cache.get('key') is None
+
+    with_directory_contents({'file': ''}, check)
+
+
+def test_evicts_least_recently_used():
+    def check(dirname):
+        cache = SolveCache(dirname, max_bytes=10000)
+        packages = [('package%d' % i, '1.0', '0') for i in range(20)]
+        cache.put('first', packages)
+        entry_size = os.path.getsize(os.path.join(dirname, 'first.json'))
+
+        cache = SolveCache(dirname, max_bytes=entry_size * 2)
+        cache.put('second', packages)
+        # make 'first' older than 'second', then use it
+        os.utime(os.path.join(dirname, 'first.json'), (1, 1))
+        os.utime(os.path.join(dirname, 'second.json'), (2, 2))
+        assert cache.get('first') is not None
+
+        cache.put('third', packages)
+        assert cache.get('second') is None
+        assert cache.get('first') is not None
+        assert cache.get('third') is not None
+
+    with_directory_contents(dict(), check)
+
+
+def test_solve_cache_from_environment():
+    assert solve_cache_from_environment(dict()) is None
+    assert solve_cache_from_environment(dict(ANACONDA_PROJECT_SOLVE_CACHE_DIR='')) is None
+
+    cache = solve_cache_from_environment(dict(ANACONDA_PROJECT_SOLVE_CACHE_DIR='/shared/solves'))
+    assert os.path.abspath('/shared/solves') == cache.directory
+    assert DEFAULT_MAX_BYTES == cache.max_bytes
+
+    cache = solve_cache_from_environment(
+        dict(ANACONDA_PROJECT_SOLVE_CACHE_DIR='/shared/solves', ANACONDA_PROJECT_SOLVE_CACHE_MAX_BYTES='1000'))
+    assert 1000 == cache.max_bytes
+
+    cache = solve_cache_from_environment(
+        dict(ANACONDA_PROJECT_SOLVE_CACHE_DIR='/shared/solves', ANACONDA_PROJECT_SOLVE_CACHE_MAX_BYTES='lots'))
+    assert DEFAULT_MAX_BYTES == cache.max_bytes
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import threading
+
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+from anaconda_project.internal.timings import (EventLog, Timings, current_timings, emit_event, event_log_from_environ,
+                                               format_timings, timed, timings_scope)
+
+
+def test_timed_without_scope_records_nothing():
+    assert current_timings() is None
+    with timed('something', 'FOO'):
+        pass
+    assert current_timings() is None
+
+
+def test_timed_nested_steps():
+    timings = Timings()
+    with timings_scope(timings):
+        assert current_timings() is timings
+        with timed('provide', 'FOO'):
+            # inherits the requirement from the enclosing step
+            with timed('conda install'):
+                pass
+        with timed('conda info'):
+            pass
+    assert current_timings() is None
+
+    entries = timings.entries
+    assert [('FOO', 'conda install'), ('FOO', 'provide'), (None, 'conda info')] == \
+        [(entry['requirement'], entry['operation']) for entry in entries]
+    assert entries[0]['seconds'] <= entries[1]['seconds']
+
+
+def test_timings_scope_on_another_thread():
+    timings = Timings()
+
+    def work():
+        with timings_scope(timings, 'FOO'):
+            with timed('pip install'):
+                pass
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    assert [dict(requirement='FOO', operation='pip install', seconds=timings.entries[0]['seconds'])] == \
+        timings.entries
+
+
+def _read_events(filename):
+    with open(filename) as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+
+def test_event_log_to_path():
+    def check(dirname):
+        filename = os.path.join(dirname, 'events.jsonl')
+        assert event_log_from_environ(dict()) is None
+        timings = Timings(event_log=event_log_from_environ(dict(ANACONDA_PROJECT_PREPARE_EVENTS=filename)))
+        # no scope, nowhere to send it
+        emit_event('ignored')
+        with timings_scope(timings):
+            with timed('provide', 'FOO'):
+                emit_event('subprocess_started', args=['conda', 'info'])
+
+        events = _read_events(filename)
+        assert ['step_started', 'subprocess_started', 'step_finished'] == [event['event'] for event in events]
+        assert dict(operation='provide', requirement='FOO') == \
+            dict((key, events[0][key]) for key in ('operation', 'requirement'))
+        assert ['conda', 'info'] == events[1]['args']
+        assert events[0]['time'] <= events[1]['time'] <= events[2]['time']
+        assert timings.entries[0]['seconds'] == events[2]['seconds']
+
+    with_directory_contents(dict(), check)
+
+
+def test_event_log_to_fd():
+    (read_fd, write_fd) = os.pipe()
+    try:
+        EventLog(str(write_fd)).emit('hello', answer=42)
+        line = os.read(read_fd, 1024).decode('utf-8')
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    assert line.endswith("\n")
+    event = json.loads(line)
+    assert dict(event='hello', answer=42) == dict((key, event[key]) for key in ('event', 'answer'))
+
+
+def test_event_log_write_failure_is_not_raised():
+    def check(dirname):
+        EventLog(os.path.join(dirname, 'missing', 'events.jsonl')).emit('hello')
+
+    with_directory_contents(dict(), check)
+
+
+def test_format_timings():
+    assert [] == format_timings([])
+    entries = [
+        dict(requirement='FOO', operation='check_status', seconds=0.5),
+        dict(requirement=None, operation='conda info', seconds=0.25),
+        dict(requirement='CONDA_PREFIX', operation='provide', seconds=12.0)
+    ]
+    assert ["Seconds  Operation     Requirement",
+            "12.000s  provide       CONDA_PREFIX",
+            " 0.500s  check_status  FOO",
+            " 0.250s  conda info"] == format_timings(entries)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import absolute_import, print_function
+
+import os
+import platform
+
+from anaconda_project.internal.user_cache import (user_cache_directory, load_json_cache, save_json_cache,
+                                                  key_matches)
+from anaconda_project.internal.test.tmpfile_utils import with_directory_contents
+
+
+def test_user_cache_directory_override():
+    assert os.path.abspath('/foo/cache') == user_cache_directory(dict(ANACONDA_PROJECT_CACHE_DIR='/foo/cache'))
+
+
+def test_user_cache_directory_default(monkeypatch):
+    monkeypatch.setattr(platform, 'system', lambda: 'Linux')
+    assert os.path.join('/xdg', 'anaconda-project') == user_cache_directory(dict(XDG_CACHE_HOME='/xdg'))
+    assert os.path.join(os.path.expanduser('~'), '.cache', 'anaconda-project') == user_cache_directory(dict())
+
+
+def test_user_cache_directory_windows(monkeypatch):
+    monkeypatch.setattr(platform, 'system', lambda: 'Windows')
+    assert os.path.join('C:\\local', 'anaconda-project', 'cache') == user_cache_directory(
+        dict(LOCALAPPDATA='C:\\local'))
+    assert os.path.join(os.path.expanduser('~'), 'AppData', 'Local', 'anaconda-project',
+                        'cache') == user_cache_directory(dict())
+
+
+def test_save_and_load():
+    def check(dirname):
+        filename = os.path.join(dirname, 'sub', 'thing.json')
+        assert (None, None) == load_json_cache(filename)
+        save_json_cache(filename, dict(a=('b', 1)), dict(value=42))
+        (key, value) = load_json_cache(filename)
+        assert dict(value=42) == value
+        assert key_matches(key, dict(a=('b', 1)))
+        assert not key_matches(key, dict(a=('b', 2)))
+        assert not key_matches(None, None)
+        assert ['thing.json'] == os.listdir(os.path.join(dirname, 'sub'))
+
+    with_directory_contents(dict(), check)
+
+
+def test_load_corrupt():
+    def check(dirname):
+        assert (None, None) == load_json_cache(os.path.join(dirname, 'notjson.json'))
+        assert (None, None) == load_json_cache(os.path.join(dirname, 'nokey.json'))
+        assert (None, None) == load_json_cache(os.path.join(dirname, 'list.json'))
+
+    with_directory_contents({'notjson.json': 'not json', 'nokey.json': '{"value": 1}', 'list.json': '[]'}, check)
+
+
+def test_save_ignores_errors():
+    def check(dirname):
+        # a file where the directory should be
+        filename = os.path.join(dirname, 'file', 'thing.json')
+        save_json_cache(filename, 'key', 'value')
+        assert (None, None) == load_json_cache(filename)
+
+    with_directory_contents({'file': ''}, check)
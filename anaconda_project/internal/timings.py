@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Wall-clock timings of the steps in a prepare, for performance triage.
+
+Code that does something potentially slow wraps it in ``timed()``,
+which records how long it took if a ``Timings`` has been made
+current with ``timings_scope()``, and does nothing otherwise.
+
+A ``Timings`` may also have an ``EventLog``, which gets a line of
+JSON as each step starts and finishes, along with other events
+passed to ``emit_event()``. Set ``ANACONDA_PROJECT_PREPARE_EVENTS``
+to a file descriptor number or a file path to get one.
+"""
+from __future__ import absolute_import, print_function
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from anaconda_project.verbose import _verbose_logger
+
+EVENTS_VARIABLE = 'ANACONDA_PROJECT_PREPARE_EVENTS'
+
+try:
+    monotonic = time.monotonic  # pragma: no cover (py3 only)
+except AttributeError:  # pragma: no cover (py2 only)
+    monotonic = time.time  # pragma: no cover (py2 only)
+
+_state = threading.local()
+
+
+class EventLog(object):
+    """Appends events as lines of JSON to a file descriptor or a file.
+
+    Each event has an ``event`` name and a ``time`` from a monotonic
+    clock, which is only meaningful relative to other events from
+    the same process.
+    """
+
+    def __init__(self, destination):
+        """Construct an EventLog.
+
+        Args:
+            destination (str): a file descriptor number, or the path of a file to append to
+        """
+        self._lock = threading.Lock()
+        if destination.isdigit():
+            self._fd = int(destination)
+            self._path = None
+        else:
+            self._fd = None
+            self._path = os.path.abspath(destination)
+
+    def emit(self, event, **fields):
+        """Write one event; failing to write is logged, not raised."""
+        fields['event'] = event
+        fields['time'] = monotonic()
+        line = (json.dumps(fields, sort_keys=True) + "\n").encode('utf-8')
+        with self._lock:
+            try:
+                if self._fd is not None:
+                    os.write(self._fd, line)
+                else:
+                    with open(self._path, 'ab') as f:
+                        f.write(line)
+            except (IOError, OSError) as e:
+                _verbose_logger().info("Failed to write prepare event: %s", e)
+
+
+def event_log_from_environ(environ):
+    """Get the ``EventLog`` that ``ANACONDA_PROJECT_PREPARE_EVENTS`` asks for, or None."""
+    destination = environ.get(EVENTS_VARIABLE, '')
+    if destination == '':
+        return None
+    return EventLog(destination)
+
+
+class Timings(object):
+    """A thread-safe list of timed steps."""
+
+    def __init__(self, event_log=None):
+        """Construct an empty Timings.
+
+        Args:
+            event_log (EventLog): where to also send events, or None
+        """
+        self._lock = threading.Lock()
+        self._entries = []
+        self.event_log = event_log
+
+    def add(self, requirement, operation, seconds):
+        """Record that ``operation`` on behalf of ``requirement`` (a name, or None) took ``seconds``."""
+        with self._lock:
+            self._entries.append(dict(requirement=requirement, operation=operation, seconds=seconds))
+
+    @property
+    def entries(self):
+        """List of dicts with ``requirement``, ``operation`` and ``seconds``, in the order the steps finished."""
+        with self._lock:
+            return list(self._entries)
+
+
+def current_timings():
+    """Get the ``Timings`` for this thread, or None if we aren't recording timings."""
+    return getattr(_state, 'timings', None)
+
+
+@contextlib.contextmanager
+def timings_scope(timings, requirement=None):
+    """Record ``timed()`` steps on this thread in ``timings``.
+
+    Steps that don't name a requirement are attributed to
+    ``requirement`` (pass the current requirement when moving work
+    to another thread). ``timings`` may be None to record nothing.
+    """
+    old = (current_timings(), getattr(_state, 'requirement', None))
+    _state.timings = timings
+    _state.requirement = requirement
+    try:
+        yield
+    finally:
+        (_state.timings, _state.requirement) = old
+
+
+def emit_event(event, **fields):
+    """Send an event to the current ``Timings``' event log, if it has one."""
+    timings = current_timings()
+    if timings is not None and timings.event_log is not None:
+        timings.event_log.emit(event, **fields)
+
+
+@contextlib.contextmanager
+def timed(operation, requirement=None):
+    """Time the body of the ``with`` statement.
+
+    Args:
+        operation (str): what we are doing, such as "provide" or "conda install"
+        requirement (str): the requirement this is for, None to use the enclosing step's requirement
+    """
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+
+    outer_requirement = getattr(_state, 'requirement', None)
+    if requirement is None:
+        requirement = outer_requirement
+    _state.requirement = requirement
+    emit_event('step_started', operation=operation, requirement=requirement)
+    start = monotonic()
+    try:
+        yield
+    finally:
+        seconds = monotonic() - start
+        timings.add(requirement, operation, seconds)
+        emit_event('step_finished', operation=operation, requirement=requirement, seconds=seconds)
+        _state.requirement = outer_requirement
+
+
+def format_timings(entries):
+    """Format timing entries as a table, slowest first.
+
+    Returns:
+        a list of lines
+    """
+    rows = [("%.3fs" % entry['seconds'], entry['operation'], entry['requirement'] or "")
+            for entry in sorted(entries, key=lambda entry: entry['seconds'], reverse=True)]
+    if len(rows) == 0:
+        return []
+    rows.insert(0, ("Seconds", "Operation", "Requirement"))
+    seconds_width = max(len(row[0]) for row in rows)
+    operation_width = max(len(row[1]) for row in rows)
+    return [("%s  %s  %s" % (row[0].rjust(seconds_width), row[1].ljust(operation_width), row[2])).rstrip()
+            for row in rows]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Per-user cache directory and small JSON cache files."""
+from __future__ import absolute_import, print_function
+
+import codecs
+import json
+import os
+import platform
+import uuid
+
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
+from anaconda_project.internal.rename import rename_over_existing
+
+CACHE_DIR_VARIABLE = 'ANACONDA_PROJECT_CACHE_DIR'
+
+
+def user_cache_directory(environ=None):
+    """Get the directory for anaconda-project's per-user caches.
+
+    ``ANACONDA_PROJECT_CACHE_DIR`` overrides the platform default,
+    which is ``%LOCALAPPDATA%\\anaconda-project\\cache`` on Windows
+    and ``$XDG_CACHE_HOME/anaconda-project`` (defaulting to
+    ``~/.cache/anaconda-project``) elsewhere.
+
+    The directory may not exist yet.
+    """
+    if environ is None:
+        environ = os.environ
+    override = environ.get(CACHE_DIR_VARIABLE, '')
+    if override != '':
+        return os.path.abspath(os.path.expanduser(override))
+
+    if platform.system() == 'Windows':
+        base = environ.get('LOCALAPPDATA', '')
+        if base == '':
+            base = os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+        return os.path.join(base, 'anaconda-project', 'cache')
+    else:
+        base = environ.get('XDG_CACHE_HOME', '')
+        if base == '':
+            base = os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'anaconda-project')
+
+
+def _normalize_key(key):
+    # round-trip through JSON so tuples become lists, etc., and
+    # keys compare equal to what we load from disk.
+    return json.loads(json.dumps(key))
+
+
+def load_json_cache(filename):
+    """Load a key and value saved by ``save_json_cache``.
+
+    Returns:
+        (key, value) tuple, or (None, None) if missing or unreadable
+    """
+    try:
+        with codecs.open(filename, 'r', encoding='utf-8') as f:
+            entry = json.loads(f.read())
+    except (IOError, OSError, ValueError):
+        return (None, None)
+    if not isinstance(entry, dict) or 'key' not in entry or 'value' not in entry:
+        return (None, None)
+    return (entry['key'], entry['value'])
+
+
+def key_matches(loaded_key, key):
+    """True if a key from ``load_json_cache`` is the same as key."""
+    return loaded_key is not None and loaded_key == _normalize_key(key)
+
+
+def save_json_cache(filename, key, value):
+    """Atomically save a JSON-able value along with the key it's valid for.
+
+    Errors are ignored, since a cache is only an optimization.
+    """
+    entry = dict(key=_normalize_key(key), value=value)
+    tmp = filename + ".tmp-" + str(uuid.uuid4())
+    try:
+        makedirs_ok_if_exists(os.path.dirname(filename))
+        with codecs.open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(entry))
+        rename_over_existing(tmp, filename)
+    except (IOError, OSError):
+        pass
+    finally:
+        try:
+            os.remove(tmp)
+        except (IOError, OSError):
+            pass
@@ -12,17 +12,31 @@ from __future__ import print_function
 from abc import ABCMeta, abstractmethod
 import os
 from copy import deepcopy
+import threading
+import time
 
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal.toposort import toposort_from_dependency_info
 from anaconda_project.internal import conda_api
+from anaconda_project.internal import coroutines
+from anaconda_project.internal import parallel
+from anaconda_project.internal import prepare_fingerprint
+from anaconda_project.internal.timings import (Timings, timings_scope, timed, current_timings, emit_event,
+                                               event_log_from_environ, monotonic, EVENTS_VARIABLE)
+from anaconda_project.internal.default_conda_manager import environment_manifest
 from anaconda_project.internal.py2_compat import is_string
-from anaconda_project.local_state_file import LocalStateFile
-from anaconda_project.provide import (_all_provide_modes, PROVIDE_MODE_DEVELOPMENT)
+from anaconda_project.frontend import _new_buffered_frontend
+from anaconda_project.local_state_file import LocalStateFile, possible_local_state_file_names
+from anaconda_project.provide import (_all_provide_modes, PROVIDE_MODE_CHECK, PROVIDE_MODE_DEVELOPMENT)
+from anaconda_project.conda_manager import _DeviationCache, _deviation_cache_scope, _current_deviation_cache
 from anaconda_project.requirements_registry.provider import ProvideContext
 from anaconda_project.requirements_registry.requirement import Requirement, EnvVarRequirement, UserConfigOverrides
 from anaconda_project.requirements_registry.requirements.conda_env import CondaEnvRequirement
+from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
+from anaconda_project.requirements_registry.requirements.service import ServiceRequirement
+from anaconda_project.requirements_registry import network_util
+from anaconda_project.version import version
 
 
 def _update_environ(dest, src):
@@ -46,6 +60,9 @@ class PrepareResult(with_metaclass(ABCMeta)):
         self._environ = environ
         self._overrides = overrides
         self._env_spec_name = env_spec_name
+        self._deviation_counts = dict(computed=0, reused=0)
+        self._status_check_counts = dict(checked=0, avoided=0)
+        self._timings = []
 
     def __bool__(self):
         """True if we were successful."""
@@ -116,6 +133,39 @@ class PrepareResult(with_metaclass(ABCMeta)):
         """
         return self._env_spec_name
 
+    @property
+    def deviation_counts(self):
+        """Dict of how many times conda environment deviations were ``computed`` or ``reused`` during the prepare.
+
+        A prepare should compute deviations once per environment,
+        or twice if it had to fix the environment.
+        """
+        return self._deviation_counts
+
+    @property
+    def status_check_counts(self):
+        """Dict of how many requirement status checks were ``checked`` or ``avoided`` during the prepare.
+
+        Checks are avoided when nothing the status depends on has
+        changed since it was last checked.
+        """
+        return self._status_check_counts
+
+    @property
+    def timings(self):
+        """List of how long each step of the prepare took.
+
+        Each entry is a dict with the ``requirement`` (env var or
+        title, None if not for a particular requirement), the
+        ``operation`` (such as "check_status", "analyze",
+        "provide", or a conda or pip subprocess like "conda
+        install"), and the wall-clock ``seconds`` it took. Steps
+        can be nested, for example "analyze" is part of
+        "check_status" and conda subprocesses are part of
+        "provide".
+        """
+        return self._timings
+
     @property
     def env_prefix(self):
         """The prefix of the prepared env, or None if none was created."""
@@ -223,6 +273,17 @@ class PrepareStage(with_metaclass(ABCMeta)):
         """Run this step and return a new stage, or None if we are done or failed."""
         pass  # pragma: no cover
 
+    def execute_coroutine(self):
+        """Coroutine version of ``execute()``, which doesn't block the current IOLoop.
+
+        The step runs on its own thread, except for downloads which
+        run on the current IOLoop.
+
+        Returns:
+            a future with the new stage, or None if we are done or failed
+        """
+        return coroutines.run_blocking(self.execute)
+
     @property
     @abstractmethod
     def result(self):
@@ -396,6 +457,64 @@ class _AndThenPrepareStage(PrepareStage):
         return self._stage.statuses_after_execute
 
 
+class _ScopedPrepareStage(PrepareStage):
+    """A stage chain which shares one conda deviation cache and one ``Timings`` among all its stages."""
+
+    def __init__(self, stage, deviation_cache, timings):
+        self._stage = stage
+        self._deviation_cache = deviation_cache
+        self._timings = timings
+
+    @property
+    def description_of_action(self):
+        return self._stage.description_of_action
+
+    @property
+    def failed(self):
+        return self._stage.failed
+
+    def configure(self):
+        with _deviation_cache_scope(self._deviation_cache), timings_scope(self._timings):
+            return self._stage.configure()
+
+    def execute(self):
+        with _deviation_cache_scope(self._deviation_cache), timings_scope(self._timings):
+            emit_event('stage_started', stage=self.description_of_action)
+            start = monotonic()
+            next = self._stage.execute()
+            emit_event('stage_finished',
+                       stage=self.description_of_action,
+                       failed=self._stage.failed,
+                       last=(next is None),
+                       seconds=(monotonic() - start))
+        self._stage.result._deviation_counts = self._deviation_cache.counts
+        self._stage.result._timings = self._timings.entries
+        if next is None:
+            return None
+        else:
+            return _ScopedPrepareStage(next, self._deviation_cache, self._timings)
+
+    @property
+    def result(self):
+        return self._stage.result
+
+    @property
+    def environ(self):
+        return self._stage.environ
+
+    @property
+    def overrides(self):
+        return self._stage.overrides
+
+    @property
+    def statuses_before_execute(self):
+        return self._stage.statuses_before_execute
+
+    @property
+    def statuses_after_execute(self):
+        return self._stage.statuses_after_execute
+
+
 def _after_stage_success(stage, and_then):
     """Run and_then function after stage executes successfully.
 
@@ -429,6 +548,245 @@ def _sort_statuses(environ, local_state, statuses, missing_vars_getter):
     return toposort_from_dependency_info(statuses, get_node_key, get_dependency_keys, can_ignore_dependency_on_key)
 
 
+_DEFAULT_PROVIDE_WORKERS = 4
+
+
+def _provide_waves(statuses, get_dependency_keys):
+    """Split statuses into waves of jobs which can be provided concurrently.
+
+    ``statuses`` must already be in dependency order. Each status
+    goes in the wave after the last of its dependencies, so
+    everything in a wave is independent. Within a wave, statuses
+    whose providers are in the same concurrency group share a job
+    and are provided one after another.
+
+    Returns:
+        list of waves, each a list of jobs, each a list of statuses
+    """
+    wave_by_key = dict()
+    waves = []
+    for status in statuses:
+        wave = 0
+        for key in get_dependency_keys(status):
+            if key in wave_by_key:
+                wave = max(wave, wave_by_key[key] + 1)
+        wave_by_key[status.requirement.env_var] = wave
+        if wave == len(waves):
+            waves.append([])
+        jobs = waves[wave]
+
+        group = status.provider.concurrency_group(status.requirement)
+        for job in jobs:
+            if group is not None and job[0].provider.concurrency_group(job[0].requirement) == group:
+                job.append(status)
+                break
+        else:
+            jobs.append([status])
+    return waves
+
+
+class _SerializedLocalStateFile(object):
+    """Proxy which lets one thread at a time use a ``LocalStateFile``."""
+
+    def __init__(self, underlying, lock):
+        self._underlying = underlying
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._underlying, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+def _provide_concurrently(statuses, get_dependency_keys, environ, local_state, frontend, provide):
+    """Call ``provide(status, environ, local_state, frontend)`` for each status, concurrently where we can.
+
+    Independent jobs run on a pool of threads, each with its own copy
+    of ``environ`` and a buffered frontend. Once a wave finishes we
+    merge each job's environment changes and replay its output in
+    order, so the output from one provider stays together.
+
+    Returns:
+        dict from status to ``ProvideResult``
+    """
+    results_by_status = dict()
+    workers = parallel.default_max_workers('ANACONDA_PROJECT_PROVIDE_WORKERS', _DEFAULT_PROVIDE_WORKERS)
+    serialized_local_state = _SerializedLocalStateFile(local_state, threading.RLock())
+
+    for jobs in _provide_waves(statuses, get_dependency_keys):
+        if len(jobs) == 1:
+            for status in jobs[0]:
+                results_by_status[status] = provide(status, environ, local_state, frontend)
+            continue
+
+        deviation_cache = _current_deviation_cache()
+        timings = current_timings()
+        caller_loop = coroutines.current_caller_loop()
+
+        def run_job(job):
+            job_environ = environ.copy()
+            job_frontend = _new_buffered_frontend()
+            with _deviation_cache_scope(deviation_cache), timings_scope(timings):
+                with coroutines.caller_loop_scope(caller_loop):
+                    results = [provide(status, job_environ, serialized_local_state, job_frontend) for status in job]
+            return (results, job_environ, job_frontend)
+
+        before = environ.copy()
+        for (job, (results, job_environ, job_frontend)) in zip(jobs, parallel.map_in_threads(run_job, jobs, workers)):
+            job_frontend.replay(frontend)
+            for key in before:
+                if key not in job_environ:
+                    environ.pop(key, None)
+            for (key, value) in job_environ.items():
+                if before.get(key) != value:
+                    environ[key] = value
+            results_by_status.update(zip(job, results))
+
+    return results_by_status
+
+
+def _timing_name(requirement):
+    if isinstance(requirement, EnvVarRequirement):
+        return requirement.env_var
+    else:
+        return requirement.title
+
+
+class _ReadRecordingEnviron(dict):
+    """A copy of an environ dict which remembers which variables were read from it."""
+
+    def __init__(self, environ):
+        super(_ReadRecordingEnviron, self).__init__(environ)
+        self.read_names = set()
+        self.read_all = False
+
+    def __getitem__(self, key):
+        self.read_names.add(key)
+        return super(_ReadRecordingEnviron, self).__getitem__(key)
+
+    def __contains__(self, key):
+        self.read_names.add(key)
+        return super(_ReadRecordingEnviron, self).__contains__(key)
+
+    def get(self, key, default=None):
+        self.read_names.add(key)
+        return super(_ReadRecordingEnviron, self).get(key, default)
+
+    def pop(self, key, *args):
+        self.read_names.add(key)
+        return super(_ReadRecordingEnviron, self).pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        self.read_names.add(key)
+        return super(_ReadRecordingEnviron, self).setdefault(key, default)
+
+    # anything that looks at every variable (including dict(environ)
+    # and passing it to a subprocess) depends on the whole environ
+
+    def __iter__(self):
+        self.read_all = True
+        return super(_ReadRecordingEnviron, self).__iter__()
+
+    def keys(self):
+        self.read_all = True
+        return super(_ReadRecordingEnviron, self).keys()
+
+    def items(self):
+        self.read_all = True
+        return super(_ReadRecordingEnviron, self).items()
+
+    def values(self):
+        self.read_all = True
+        return super(_ReadRecordingEnviron, self).values()
+
+    def copy(self):
+        self.read_all = True
+        return dict(super(_ReadRecordingEnviron, self).items())
+
+
+class _StatusChecker(object):
+    """Checks requirement statuses, skipping checks whose inputs haven't changed.
+
+    Checking a status can be slow (connecting to a service,
+    scanning a conda environment), and prepare wants fresh
+    statuses after configuring and again after providing. We
+    remember which env vars each check read, and the local state
+    and env spec override it saw. When a provider changes env vars
+    or local state, only the statuses which depended on them (plus
+    the statuses that were just provided) are checked again.
+
+    We can't see changes made outside of prepare (a service
+    exiting, a file being deleted), so a status is only reused
+    within one pass of a stage; ``begin_pass()`` starts a new
+    pass, after which everything is checked again.
+    """
+
+    def __init__(self, local_state, default_env_spec_name, overrides):
+        self._local_state = local_state
+        self._default_env_spec_name = default_env_spec_name
+        self._overrides = overrides
+        self._inputs_by_requirement = dict()
+        self._pass = 0
+        self.checked = 0
+        self.avoided = 0
+
+    def begin_pass(self):
+        """Stop reusing statuses checked before now."""
+        self._pass += 1
+
+    @property
+    def counts(self):
+        """Dict of how many status checks were ``checked`` or ``avoided``."""
+        return dict(checked=self.checked, avoided=self.avoided)
+
+    def _other_inputs(self):
+        return (repr(self._local_state.root), self._overrides.env_spec_name)
+
+    def check(self, requirement, environ, latest_provide_result=None):
+        """Check the status of requirement, recording what it depended on."""
+        recording = _ReadRecordingEnviron(environ)
+        with timed('check_status', _timing_name(requirement)):
+            status = requirement.check_status(recording, self._local_state, self._default_env_spec_name,
+                                              self._overrides, latest_provide_result)
+        if recording.read_all:
+            env_inputs = dict(environ)
+        else:
+            env_inputs = dict((name, environ.get(name)) for name in recording.read_names)
+        self._inputs_by_requirement[requirement] = (recording.read_all, env_inputs, self._other_inputs(), status,
+                                                    self._pass)
+        self.checked += 1
+        return status
+
+    def recheck(self, status, environ, latest_provide_result=None):
+        """Get an up-to-date status, reusing ``status`` if nothing it depends on has changed.
+
+        Passing a ``latest_provide_result`` means we just provided
+        the requirement, so it is always checked again, as is a
+        status from an earlier pass.
+        """
+        requirement = status.requirement
+        inputs = self._inputs_by_requirement.get(requirement)
+        if latest_provide_result is None and inputs is not None and inputs[3] is status and inputs[4] == self._pass:
+            (read_all, env_inputs, other_inputs, _, _) = inputs
+            if read_all:
+                env_unchanged = (env_inputs == environ)
+            else:
+                env_unchanged = all(environ.get(name) == value for (name, value) in env_inputs.items())
+            if env_unchanged and other_inputs == self._other_inputs():
+                self.avoided += 1
+                return status
+
+        if latest_provide_result is None:
+            latest_provide_result = status.latest_provide_result
+        return self.check(requirement, environ, latest_provide_result)
+
+
 def _in_provide_whitelist(provide_whitelist, requirement):
     if provide_whitelist is None:
         # whitelist of None means "everything"
@@ -448,7 +806,7 @@ def _in_provide_whitelist(provide_whitelist, requirement):
 
 
 def _configure_and_provide(project, environ, local_state, statuses, all_statuses, keep_going_until_success, mode,
-                           provide_whitelist, overrides, command, extra_command_args):
+                           provide_whitelist, overrides, command, extra_command_args, status_checker):
 
     default_env_spec_name = project.default_env_spec_name_for_command(command)
 
@@ -458,38 +816,37 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
 
         sorted = _sort_statuses(environ, local_state, statuses, get_missing_to_provide)
 
-        # we have to recheck all the statuses in case configuration happened
+        # we have to recheck the statuses in case configuration
+        # happened, or anything changed outside of prepare since
+        # they were checked
+        status_checker.begin_pass()
         rechecked = []
         for status in sorted:
-            rechecked.append(status.recheck(environ, local_state, default_env_spec_name, overrides))
+            rechecked.append(status_checker.recheck(status, environ))
 
-        errors = []
-        did_any_providing = False
-        results_by_status = dict()
+        to_provide = [
+            status for status in rechecked
+            if _in_provide_whitelist(provide_whitelist, status.requirement) and not status.has_been_provided
+        ]
 
-        for status in rechecked:
-            if not _in_provide_whitelist(provide_whitelist, status.requirement):
-                continue
-            elif status.has_been_provided:
-                continue
-            else:
-                did_any_providing = True
-                context = ProvideContext(environ, local_state, default_env_spec_name, status, mode, project.frontend)
-                result = status.provider.provide(status.requirement, context)
-                errors.extend(result.errors)
-                results_by_status[status] = result
+        def provide(status, environ, local_state, frontend):
+            context = ProvideContext(environ, local_state, default_env_spec_name, status, mode, frontend)
+            with timed('provide', _timing_name(status.requirement)):
+                return status.provider.provide(status.requirement, context)
+
+        results_by_status = _provide_concurrently(to_provide, get_missing_to_provide, environ, local_state,
+                                                  project.frontend, provide)
 
-        if did_any_providing:
+        errors = []
+        for status in to_provide:
+            errors.extend(results_by_status[status].errors)
+
+        if len(to_provide) > 0:
             old = rechecked
             rechecked = []
             for status in old:
                 rechecked.append(
-                    status.recheck(
-                        environ,
-                        local_state,
-                        default_env_spec_name,
-                        overrides,
-                        latest_provide_result=results_by_status.get(status)))
+                    status_checker.recheck(status, environ, latest_provide_result=results_by_status.get(status)))
 
         failed = False
         for status in rechecked:
@@ -516,13 +873,13 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
                 current_env_spec_name = status.env_spec_name
 
         if failed:
-            stage.set_result(
-                PrepareFailure(
-                    statuses=result_statuses,
-                    errors=errors,
-                    environ=environ,
-                    overrides=overrides,
-                    env_spec_name=current_env_spec_name), rechecked)
+            result = PrepareFailure(statuses=result_statuses,
+                                    errors=errors,
+                                    environ=environ,
+                                    overrides=overrides,
+                                    env_spec_name=current_env_spec_name)
+            result._status_check_counts = status_checker.counts
+            stage.set_result(result, rechecked)
             if keep_going_until_success:
                 return _start_over(stage.statuses_after_execute, rechecked)
             else:
@@ -532,13 +889,13 @@ def _configure_and_provide(project, environ, local_state, statuses, all_statuses
                 exec_info = None
             else:
                 exec_info = command.exec_info_for_environment(environ, extra_args=extra_command_args)
-            stage.set_result(
-                PrepareSuccess(
-                    statuses=result_statuses,
-                    command_exec_info=exec_info,
-                    environ=environ,
-                    overrides=overrides,
-                    env_spec_name=current_env_spec_name), rechecked)
+            result = PrepareSuccess(statuses=result_statuses,
+                                    command_exec_info=exec_info,
+                                    environ=environ,
+                                    overrides=overrides,
+                                    env_spec_name=current_env_spec_name)
+            result._status_check_counts = status_checker.counts
+            stage.set_result(result, rechecked)
             return None
 
     def _start_over(updated_all_statuses, updated_statuses):
@@ -588,7 +945,7 @@ def _partition_first_group_to_configure(environ, local_state, statuses):
 
 def _process_requirement_statuses(project, environ, local_state, current_statuses, all_statuses,
                                   keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                  extra_command_args):
+                                  extra_command_args, status_checker):
     (initial, remaining) = _partition_first_group_to_configure(environ, local_state, current_statuses)
 
     # a surprising thing here is that the "stages" from
@@ -601,7 +958,7 @@ def _process_requirement_statuses(project, environ, local_state, current_statuse
 
     def _stages_for(statuses):
         return _configure_and_provide(project, environ, local_state, statuses, all_statuses, keep_going_until_success,
-                                      mode, provide_whitelist, overrides, command, extra_command_args)
+                                      mode, provide_whitelist, overrides, command, extra_command_args, status_checker)
 
     if len(initial) > 0 and len(remaining) > 0:
 
@@ -610,7 +967,7 @@ def _process_requirement_statuses(project, environ, local_state, current_statuse
             updated = _refresh_status_list(remaining, updated_all_statuses)
             return _process_requirement_statuses(project, environ, local_state, updated, updated_all_statuses,
                                                  keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                                 extra_command_args)
+                                                 extra_command_args, status_checker)
 
         return _after_stage_success(_stages_for(initial), process_remaining)
     elif len(initial) > 0:
@@ -661,14 +1018,14 @@ def _assert_no_missing_env_var_requirements(project, environ, local_state, overr
 
 
 def _first_stage(project, environ, local_state, statuses, keep_going_until_success, mode, provide_whitelist, overrides,
-                 command, extra_command_args):
+                 command, extra_command_args, status_checker):
     assert 'PROJECT_DIR' in environ
 
     _assert_no_missing_env_var_requirements(project, environ, local_state, overrides, command, statuses)
 
     first_stage = _process_requirement_statuses(project, environ, local_state, statuses, statuses,
                                                 keep_going_until_success, mode, provide_whitelist, overrides, command,
-                                                extra_command_args)
+                                                extra_command_args, status_checker)
 
     return first_stage
 
@@ -712,8 +1069,35 @@ def _prepare_environ_and_overrides(project, environ=None, env_spec_name=None):
     return (environ_copy, overrides)
 
 
-def _internal_prepare_in_stages(project, environ_copy, overrides, keep_going_until_success, mode, provide_whitelist,
-                                command_name, command, extra_command_args):
+def _requirements_to_check(project, overrides, provide_whitelist, command, explicit_command):
+    """Get the requirements a prepare should check.
+
+    A command chosen by name or object may declare the variables,
+    services and downloads it needs; then we check only those plus
+    the conda env. When the command is a default, or we're asked to
+    provide particular requirements, we check everything.
+    """
+    requirements = project.requirements(overrides.env_spec_name)
+    if not explicit_command or provide_whitelist is not None or command is None or command.requirements is None:
+        return requirements
+    needed = set(command.requirements)
+    return [
+        requirement for requirement in requirements
+        if isinstance(requirement, CondaEnvRequirement) or not isinstance(requirement, EnvVarRequirement)
+        or requirement.env_var in needed
+    ]
+
+
+def _internal_prepare_in_stages(project,
+                                environ_copy,
+                                overrides,
+                                keep_going_until_success,
+                                mode,
+                                provide_whitelist,
+                                command_name,
+                                command,
+                                extra_command_args,
+                                explicit_command=None):
     assert not project.problems
     if mode not in _all_provide_modes:
         raise ValueError("invalid provide mode " + mode)
@@ -722,6 +1106,9 @@ def _internal_prepare_in_stages(project, environ_copy, overrides, keep_going_unt
     assert command_name is None or command_name in project.commands
     assert overrides.env_spec_name is None or overrides.env_spec_name in project.env_specs
 
+    if explicit_command is None:
+        explicit_command = command_name is not None or command is not None
+
     if command is None:
         command = project.command_for_name(command_name)
         # at this point, "command" is only None if there are no
@@ -729,18 +1116,27 @@ def _internal_prepare_in_stages(project, environ_copy, overrides, keep_going_unt
 
     local_state = LocalStateFile.load_for_directory(project.directory_path)
 
+    # checking a conda env is slow and we recheck statuses several
+    # times, so share deviations among all stages of this prepare
+    deviation_cache = _DeviationCache()
+    timings = Timings(event_log=event_log_from_environ(environ_copy))
+
+    status_checker = _StatusChecker(local_state, project.default_env_spec_name_for_command(command), overrides)
+
     statuses = []
-    for requirement in project.requirements(overrides.env_spec_name):
-        status = requirement.check_status(
-            environ_copy,
-            local_state,
-            project.default_env_spec_name_for_command(command),
-            overrides,
-            latest_provide_result=None)
-        statuses.append(status)
+    with _deviation_cache_scope(deviation_cache), timings_scope(timings):
+        emit_event('prepare_started',
+                   project=project.directory_path,
+                   mode=mode,
+                   env_spec_name=overrides.env_spec_name,
+                   command=(command.name if command is not None else None),
+                   wall_time=time.time())
+        for requirement in _requirements_to_check(project, overrides, provide_whitelist, command, explicit_command):
+            statuses.append(status_checker.check(requirement, environ_copy))
 
-    return _first_stage(project, environ_copy, local_state, statuses, keep_going_until_success, mode, provide_whitelist,
-                        overrides, command, extra_command_args)
+    first_stage = _first_stage(project, environ_copy, local_state, statuses, keep_going_until_success, mode,
+                               provide_whitelist, overrides, command, extra_command_args, status_checker)
+    return _ScopedPrepareStage(first_stage, deviation_cache, timings)
 
 
 def prepare_in_stages(project,
@@ -797,6 +1193,37 @@ def prepare_in_stages(project,
         extra_command_args=extra_command_args)
 
 
+def async_prepare_in_stages(project,
+                            environ=None,
+                            keep_going_until_success=False,
+                            mode=PROVIDE_MODE_DEVELOPMENT,
+                            provide_whitelist=None,
+                            env_spec_name=None,
+                            command_name=None,
+                            command=None,
+                            extra_command_args=None):
+    """Coroutine version of ``prepare_in_stages()``, which doesn't block the current IOLoop.
+
+    Checking the initial status of each requirement runs on its
+    own thread. Use ``execute_coroutine()`` on the returned stages
+    to execute them without blocking the IOLoop.
+
+    Returns:
+        a future with the first ``PrepareStage`` in the chain of steps.
+    """
+    return coroutines.run_blocking(
+        prepare_in_stages,
+        project,
+        environ=environ,
+        keep_going_until_success=keep_going_until_success,
+        mode=mode,
+        provide_whitelist=provide_whitelist,
+        env_spec_name=env_spec_name,
+        command_name=command_name,
+        command=command,
+        extra_command_args=extra_command_args)
+
+
 def _project_problems_to_prepare_failure(project, environ, overrides, would_have_used_env_spec):
     if project.problems:
         errors = []
@@ -867,6 +1294,119 @@ def _check_prepare_prerequisites(project, env_spec_name, command_name, command,
     return failed
 
 
+def _fingerprint_inputs(project, environ, overrides, mode, command, explicit_command):
+    """Get the part of a prepare's fingerprint we can compute before preparing.
+
+    Returns:
+        a dict, or None if the prepare shouldn't be fingerprinted
+    """
+    requirements = _requirements_to_check(project, overrides, None, command, explicit_command)
+    env_var_names = set(['PATH'])
+    for requirement in requirements:
+        if not isinstance(requirement, EnvVarRequirement):
+            return None
+        # we'd have to save the secret in the fingerprint file
+        if requirement.encrypted:
+            return None
+        env_var_names.add(requirement.env_var)
+    env_var_names.update(name for name in environ if name.startswith('ANACONDA_PROJECT_') or name.startswith('CONDA_'))
+    # where events go doesn't change what a prepare does
+    env_var_names.discard(EVENTS_VARIABLE)
+
+    filenames = [project.project_file.filename, project.lock_file.filename]
+    filenames.extend(os.path.join(project.directory_path, name) for name in possible_local_state_file_names)
+
+    return dict(
+        anaconda_project_version=version,
+        project_dir=project.directory_path,
+        mode=mode,
+        env_spec_name=overrides.env_spec_name,
+        inherited_env=overrides.inherited_env,
+        default_env_spec_name=project.default_env_spec_name_for_command(command),
+        # a prepare that checked only some requirements can't stand in for one that checks all
+        checked=sorted(requirement.env_var for requirement in requirements),
+        files=dict((filename, prepare_fingerprint.file_content_hash(filename)) for filename in filenames),
+        environ=dict((name, environ.get(name, None)) for name in env_var_names))
+
+
+def _fingerprint_filename(inputs):
+    name = "%s:%s:%s" % (inputs['mode'], inputs['env_spec_name'], inputs['default_env_spec_name'])
+    return prepare_fingerprint.fingerprint_filename(inputs['project_dir'], name)
+
+
+def _fingerprint(inputs, saved):
+    # add the current state of the envs and files the saved prepare created
+    fingerprint = dict(inputs)
+    fingerprint['prefixes'] = dict((prefix, environment_manifest(prefix)) for prefix in saved['prefixes'])
+    fingerprint['paths'] = dict((path, prepare_fingerprint.path_state(path)) for path in saved['paths'])
+    return fingerprint
+
+
+def _service_is_alive(url):
+    try:
+        parsed = network_util.urlparse.urlparse(url)
+        host = parsed.hostname
+        port = parsed.port
+    except ValueError:
+        return False
+    if host is None or port is None:
+        return False
+    return network_util.can_connect_to_socket(host, port)
+
+
+def _save_fingerprint(inputs, environ_before, result):
+    prefixes = []
+    paths = []
+    services = []
+    for status in result.statuses:
+        value = result.environ.get(status.requirement.env_var, None)
+        if value is None:
+            continue
+        if isinstance(status.requirement, CondaEnvRequirement):
+            prefixes.append(value)
+        elif isinstance(status.requirement, DownloadRequirement):
+            paths.append(value)
+        elif isinstance(status.requirement, ServiceRequirement):
+            services.append(value)
+
+    saved = dict(
+        environ=dict((key, value) for (key, value) in result.environ.items() if environ_before.get(key) != value),
+        removed=[key for key in environ_before if key not in result.environ],
+        env_spec_name=result.env_spec_name,
+        prefixes=prefixes,
+        paths=paths,
+        services=services)
+    prepare_fingerprint.save_fingerprint(_fingerprint_filename(inputs), _fingerprint(inputs, saved), saved)
+
+
+def _prepare_from_fingerprint(inputs, environ, overrides, command, extra_command_args):
+    (loaded, saved) = prepare_fingerprint.load_fingerprint(_fingerprint_filename(inputs))
+    if saved is None:
+        return None
+    try:
+        fingerprint = _fingerprint(inputs, saved)
+    except (KeyError, TypeError):
+        return None
+    if not prepare_fingerprint.fingerprint_matches(loaded, fingerprint):
+        return None
+    # services can die without changing anything we fingerprint
+    for url in saved['services']:
+        if not _service_is_alive(url):
+            return None
+
+    for key in saved['removed']:
+        environ.pop(key, None)
+    environ.update(saved['environ'])
+
+    if command is None:
+        exec_info = None
+    else:
+        exec_info = command.exec_info_for_environment(environ, extra_args=extra_command_args)
+    return PrepareSuccess(
+        statuses=(), command_exec_info=exec_info, environ=environ, overrides=overrides,
+        env_spec_name=saved['env_spec_name'])
+
+
 def prepare_without_interaction(project,
                                 environ=None,
                                 mode=PROVIDE_MODE_DEVELOPMENT,
@@ -874,7 +1414,8 @@ def prepare_without_interaction(project,
                                 env_spec_name=None,
                                 command_name=None,
                                 command=None,
-                                extra_command_args=None):
+                                extra_command_args=None,
+                                use_fingerprint=False):
     """Prepare a project to run one of its commands.
 
     This method doesn't ask the user any questions, so the
@@ -915,6 +1456,8 @@ def prepare_without_interaction(project,
         command_name (str): which named command to choose from the project, None for default
         command (ProjectCommand): command object, None for default
         extra_command_args (list): extra args to include in the returned command argv
+        use_fingerprint (bool): if nothing changed since the last successful prepare, reuse its environment
+                                (the result then has no ``statuses``)
 
     Returns:
         a ``PrepareResult`` instance, which has a ``failed`` flag
@@ -926,6 +1469,23 @@ def prepare_without_interaction(project,
     if failure is not None:
         return failure
 
+    explicit_command = command_name is not None or command is not None
+    fingerprint_inputs = None
+    if use_fingerprint and mode != PROVIDE_MODE_CHECK and provide_whitelist is None:
+        if command is None:
+            command = project.command_for_name(command_name)
+            command_name = None
+        environ_before = environ_copy.copy()
+        fingerprint_inputs = _fingerprint_inputs(project, environ_copy, overrides, mode, command, explicit_command)
+        if fingerprint_inputs is not None:
+            result = _prepare_from_fingerprint(fingerprint_inputs, environ_copy, overrides, command,
+                                               extra_command_args)
+            if result is not None:
+                event_log = event_log_from_environ(environ_copy)
+                if event_log is not None:
+                    event_log.emit('prepare_reused_fingerprint', project=project.directory_path, wall_time=time.time())
+                return result
+
     stage = _internal_prepare_in_stages(
         project,
         environ_copy=environ_copy,
@@ -935,9 +1495,48 @@ def prepare_without_interaction(project,
         provide_whitelist=provide_whitelist,
         command_name=command_name,
         command=command,
-        extra_command_args=extra_command_args)
+        extra_command_args=extra_command_args,
+        explicit_command=explicit_command)
+
+    result = prepare_execute_without_interaction(stage)
+
+    if fingerprint_inputs is not None and not result.failed:
+        # recompute, since preparing may have saved the project files
+        fingerprint_inputs = _fingerprint_inputs(project, environ_before, overrides, mode, command, explicit_command)
+        _save_fingerprint(fingerprint_inputs, environ_before, result)
+
+    return result
 
-    return prepare_execute_without_interaction(stage)
+
+def async_prepare_without_interaction(project,
+                                      environ=None,
+                                      mode=PROVIDE_MODE_DEVELOPMENT,
+                                      provide_whitelist=None,
+                                      env_spec_name=None,
+                                      command_name=None,
+                                      command=None,
+                                      extra_command_args=None,
+                                      use_fingerprint=False):
+    """Coroutine version of ``prepare_without_interaction()``, which doesn't block the current IOLoop.
+
+    Status checks and providers run on a separate thread, so
+    waiting on conda, pip or services doesn't block the IOLoop,
+    and downloads run as coroutines on the current IOLoop.
+
+    Returns:
+        a future with a ``PrepareResult`` instance
+    """
+    return coroutines.run_blocking(
+        prepare_without_interaction,
+        project,
+        environ=environ,
+        mode=mode,
+        provide_whitelist=provide_whitelist,
+        env_spec_name=env_spec_name,
+        command_name=command_name,
+        command=command,
+        extra_command_args=extra_command_args,
+        use_fingerprint=use_fingerprint)
 
 
 def prepare_execute_without_interaction(stage):
@@ -994,8 +1593,9 @@ def unprepare(project, prepare_result, whitelist=None):
             continue
 
         provider = status.provider
-        unprovide_status = provider.unprovide(requirement, prepare_result.environ, local_state_file,
-                                              prepare_result.overrides, status)
+        with timed('unprovide', _timing_name(requirement)):
+            unprovide_status = provider.unprovide(requirement, prepare_result.environ, local_state_file,
+                                                  prepare_result.overrides, status)
         if not unprovide_status:
             failed_requirements.append(requirement)
             failed_statuses.append(unprovide_status)
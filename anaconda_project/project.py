@@ -30,6 +30,7 @@ from anaconda_project.conda_manager import CondaLockSet
 from anaconda_project.frontend import _null_frontend, _new_error_recorder, Frontend
 
 from anaconda_project.internal.py2_compat import is_string, is_list, is_dict
+from anaconda_project.internal import compiled_project
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.internal.slugify import slugify
 import anaconda_project.internal.notebook_analyzer as notebook_analyzer
@@ -131,8 +132,36 @@ def _fatal_problem(problems):
     return False
 
 
+# the parts of _ConfigCache that go in a compiled snapshot
+_COMPILED_ATTRIBUTES = ('name', 'description', 'icon', 'commands', 'default_command_name', 'env_specs', 'lock_sets',
+                        'locking_globally_enabled', 'default_env_spec_name', 'global_base_env_spec', 'requirements',
+                        'skipped_notebooks')
+
+# files besides the project and lock files that we look at while validating
+_IMPORTABLE_SPEC_FILENAMES = ("environment.yml", "environment.yaml", 'requirements.txt')
+
+
+def _section_contents(yaml_file, names):
+    # repr() is cheap next to validating a section, and unlike
+    # change_count it notices exactly which sections changed,
+    # including changes made in place to dicts we handed out.
+    root = yaml_file._read_root()
+    return tuple((name in root, repr(root.get(name))) for name in names)
+
+
+def _file_signatures(directory_path, names):
+    signatures = []
+    for name in names:
+        try:
+            info = os.stat(os.path.join(directory_path, name))
+            signatures.append((info.st_mtime, info.st_size))
+        except OSError:
+            signatures.append(None)
+    return tuple(signatures)
+
+
 class _ConfigCache(object):
-    def __init__(self, directory_path, registry, must_exist):
+    def __init__(self, directory_path, registry, must_exist, compiled=False):
         self.directory_path = directory_path
         if registry is None:
             registry = RequirementsRegistry()
@@ -150,17 +179,71 @@ class _ConfigCache(object):
         self.locking_globally_enabled = False
         self.default_env_spec_name = None
         self.global_base_env_spec = None
+        self.skipped_notebooks = None
         self.must_exist = must_exist
+        self.compiled = compiled and compiled_project.supported
+        self._notebook_problems = []
+        # the commands we found, even if some were broken, for _update_notebooks
+        self._parsed_commands = dict()
+        # step name => (inputs, problems, generation) from the last time we ran the step
+        self._steps = dict()
+        self._generation = 0
+
+    def _compiled_key(self, project_file, lock_file):
+        filenames = [project_file.filename, lock_file.filename]
+        filenames.extend(os.path.join(self.directory_path, name) for name in _IMPORTABLE_SPEC_FILENAMES)
+        return dict(
+            version=version,
+            directory_path=self.directory_path,
+            must_exist=self.must_exist,
+            registry="%s.%s" % (type(self.registry).__module__, type(self.registry).__name__),
+            plugins=sorted(plugins_api.get_plugins('command_run').keys()),
+            files=compiled_project.file_hashes(filenames))
 
     def update(self, project_file, lock_file):
         if project_file.change_count == self.project_file_count and \
            lock_file.change_count == self.lock_file_count:
             return
 
+        # we can only use a snapshot in place of the files on disk,
+        # not of in-memory changes to them
+        use_compiled = (self.compiled and self.project_file_count == 0 and not project_file.is_loaded
+                        and not lock_file.is_loaded and os.path.isfile(project_file.filename))
+
         self.project_file_count = project_file.change_count
         self.lock_file_count = lock_file.change_count
 
-        requirements = dict()
+        if use_compiled:
+            filename = compiled_project.snapshot_filename(self.directory_path)
+            key = self._compiled_key(project_file, lock_file)
+            state = compiled_project.load_snapshot(filename, key, self.registry)
+            if state is not None:
+                self._update_from_compiled(state, project_file)
+                return
+
+        self._update_from_files(project_file, lock_file)
+
+        # notebook suggestions depend on which files are in the
+        # project directory, so we don't snapshot them; we look
+        # for notebooks again after loading a snapshot.
+        if use_compiled and len(self.problems) == len(self._notebook_problems):
+            # in case the files changed while we were reading them
+            if key == self._compiled_key(project_file, lock_file):
+                compiled_project.save_snapshot(filename, key,
+                                               dict((name, getattr(self, name)) for name in _COMPILED_ATTRIBUTES),
+                                               self.registry)
+
+    def _update_from_compiled(self, state, project_file):
+        for (name, value) in state.items():
+            setattr(self, name, value)
+        self._steps = dict()
+        problems = []
+        self._verify_notebook_commands(self.commands, problems, self.requirements, project_file,
+                                       self.skipped_notebooks)
+        self.problems = _make_problems_into_objects(problems)
+        self.problem_strings = list([p.text for p in self.problems if not p.only_a_suggestion])
+
+    def _update_from_files(self, project_file, lock_file):
         problems = []
 
         def accept_project_creation(project):
@@ -193,41 +276,100 @@ class _ConfigCache(object):
                     column_number=lock_file.corrupted_maybe_column))
 
         if project_exists and not (project_file.corrupted or lock_file.corrupted):
-            _unknown_field_suggestions(project_file, problems, project_file.root,
+            _unknown_field_suggestions(project_file, problems, project_file._read_root(),
                                        ('name', 'description', 'icon', 'variables', 'downloads', 'services',
                                         'env_specs', 'commands', 'packages', 'channels', 'platforms', 'skip_imports'))
 
-            _unknown_field_suggestions(lock_file, problems, lock_file.root, ('env_specs', 'locking_enabled'))
+            _unknown_field_suggestions(lock_file, problems, lock_file._read_root(), ('env_specs', 'locking_enabled'))
+
+            def sections(*names):
+                return _section_contents(project_file, names)
+
+            problems.extend(self._run_step('name', sections('name'), self._update_name, project_file))
+            problems.extend(
+                self._run_step('description', sections('description'), self._update_description, project_file))
+            problems.extend(self._run_step('icon', sections('icon'), self._update_icon, project_file))
+            problems.extend(
+                self._run_step('lock_sets', _section_contents(lock_file, ('env_specs', 'locking_enabled')),
+                               self._update_lock_sets, lock_file))
+            problems.extend(
+                self._run_step('env_specs',
+                               (sections('packages', 'channels', 'platforms', 'env_specs', 'skip_imports'),
+                                self._step_generation('lock_sets'),
+                                _file_signatures(self.directory_path, _IMPORTABLE_SPEC_FILENAMES)),
+                               self._update_env_specs, project_file, lock_file))
+
+            def update_requirements(step_problems):
+                requirements = dict()
+                # future: we could un-hardcode this so plugins can add stuff here
+                self._update_variables(requirements, step_problems, project_file)
+                self._update_downloads(requirements, step_problems, project_file)
+                self._update_services(requirements, step_problems, project_file)
+                # this MUST be after we _update_variables since we may get CondaEnvRequirement
+                # options in the variables section, and after _update_env_specs
+                # since we use those
+                self._update_conda_env_requirements(requirements, problems + step_problems, project_file)
+                self.requirements = requirements
+
+            problems.extend(
+                self._run_step('requirements',
+                               (sections('variables', 'downloads', 'services', 'env_specs'),
+                                self._step_generation('env_specs'), _fatal_problem(problems)), update_requirements))
+
+            def update_commands(step_problems):
+                # this MUST be after we update env reqs so we have the valid env spec names
+                self._update_commands(step_problems, project_file, self.requirements)
+                self._verify_command_dependencies(step_problems, project_file)
+
+            problems.extend(
+                self._run_step('commands', (sections('commands', 'skip_imports'), self._step_generation('env_specs'),
+                                            self._step_generation('requirements')), update_commands))
+
+            # not a step, since notebooks can appear on disk without
+            # any change to the project file
+            problems.extend(self._update_notebooks(project_file))
+        else:
+            # we didn't update anything, so we have to start over next time
+            self._steps = dict()
+            self.requirements = dict()
+            self._notebook_problems = []
+
+        self.problems = _make_problems_into_objects(problems)
+        self.problem_strings = list([p.text for p in self.problems if not p.only_a_suggestion])
 
-            self._update_name(problems, project_file)
-            self._update_description(problems, project_file)
-            self._update_icon(problems, project_file)
-            self._update_lock_sets(problems, lock_file)
-            self._update_env_specs(problems, project_file, lock_file)
-            # future: we could un-hardcode this so plugins can add stuff here
-            self._update_variables(requirements, problems, project_file)
-            self._update_downloads(requirements, problems, project_file)
-            self._update_services(requirements, problems, project_file)
-            # this MUST be after we _update_variables since we may get CondaEnvRequirement
-            # options in the variables section, and after _update_env_specs
-            # since we use those
-            self._update_conda_env_requirements(requirements, problems, project_file)
+    def forget_steps(self):
+        """Redo every step on the next update, even if its sections are unchanged."""
+        self._steps = dict()
 
-            # this MUST be after we update env reqs so we have the valid env spec names
-            self._update_commands(problems, project_file, requirements)
+    def _run_step(self, name, inputs, update, *args):
+        """Call update(problems, *args) unless it already ran with the same inputs.
 
-            self._verify_command_dependencies(problems, project_file)
+        Each step sets some of our attributes, and returns the
+        problems it found; the problems from the last run are
+        returned when we skip it. A step's inputs should include
+        the ``_step_generation`` of any earlier step it uses.
+        """
+        previous = self._steps.get(name)
+        if previous is not None and previous[0] == inputs:
+            return previous[1]
+        # if the step raises, it must not look up to date next time
+        self._steps.pop(name, None)
+        problems = []
+        update(problems, *args)
+        self._generation += 1
+        self._steps[name] = (inputs, problems, self._generation)
+        return problems
 
-        self.requirements = requirements
-        self.problems = _make_problems_into_objects(problems)
-        self.problem_strings = list([p.text for p in self.problems if not p.only_a_suggestion])
+    def _step_generation(self, name):
+        """Get a number that changes whenever the named step runs again."""
+        return self._steps[name][2]
 
     def _update_name(self, problems, project_file):
         # For back-compat reasons, name=null means auto-name at runtime,
         # while name field missing entirely is an error.
         default_name = os.path.basename(self.directory_path)
 
-        if 'name' not in project_file.root:
+        if 'name' not in project_file._read_root():
 
             def set_name_field(project):
                 project.project_file.set_value('name', default_name)
@@ -242,7 +384,7 @@ class _ConfigCache(object):
             # just to avoid dealing with `project.name is None` elsewhere
             # in the code, but we don't save the name to the project_file.
 
-        name = project_file.get_value('name', None)
+        name = project_file._read_value('name', None)
         if name is not None:
             if not is_string(name):
                 _file_problem(problems, project_file, "name: field should have a string value not %r" % name)
@@ -257,7 +399,7 @@ class _ConfigCache(object):
         self.name = name
 
     def _update_description(self, problems, project_file):
-        desc = project_file.get_value('description', None)
+        desc = project_file._read_value('description', None)
         if desc is not None and not is_string(desc):
             _file_problem(problems, project_file, "description: field should have a string value not %r" % desc)
             desc = None
@@ -268,7 +410,7 @@ class _ConfigCache(object):
         self.description = desc
 
     def _update_icon(self, problems, project_file):
-        icon = project_file.get_value('icon', None)
+        icon = project_file._read_value('icon', None)
         if icon is not None and not is_string(icon):
             _file_problem(problems, project_file, "icon: field should have a string value not %r" % (icon))
             icon = None
@@ -288,10 +430,10 @@ class _ConfigCache(object):
         requirements[env_spec.name].append(requirement)
 
     def _update_requirements(self, requirements, problems, project_file, dict_name, updater):
-        global_dict = project_file.get_value(dict_name)
+        global_dict = project_file._read_value(dict_name)
         updater(requirements, problems, project_file, self.global_base_env_spec, global_dict)
         for env_spec in self.env_specs.values():
-            env_dict = project_file.get_value(['env_specs', env_spec.name, dict_name], None)
+            env_dict = project_file._read_value(['env_specs', env_spec.name, dict_name], None)
             updater(requirements, problems, project_file, env_spec, env_dict)
 
     def _update_variables(self, requirements, problems, project_file):
@@ -477,13 +619,13 @@ class _ConfigCache(object):
         self.lock_sets = dict()
         self.locking_globally_enabled = False
 
-        enabled = lock_file.get_value(['locking_enabled'], True)
+        enabled = lock_file._read_value(['locking_enabled'], True)
         if not isinstance(enabled, bool):
             _file_problem(problems, lock_file, "Value for locking_enabled should be true or false, found %r" % enabled)
         else:
             self.locking_globally_enabled = enabled
 
-        lock_sets = lock_file.get_value(['env_specs'], {})
+        lock_sets = lock_file._read_value(['env_specs'], {})
         if not is_dict(lock_sets):
             _file_problem(problems, lock_file, ("'env_specs:' section in lock file should be a dictionary from " +
                                                 "env spec names to lock information, found {}").format(repr(lock_sets)))
@@ -497,7 +639,7 @@ class _ConfigCache(object):
                 continue
 
             _unknown_field_suggestions(lock_file, problems, lock_set,
-                                       ('packages', 'platforms', 'locked', 'env_spec_hash'))
+                                       ('packages', 'platforms', 'locked', 'env_spec_hash', 'package_urls'))
 
             enabled = lock_set.get('locked', self.locking_globally_enabled)
             if not isinstance(enabled, bool):
@@ -545,8 +687,28 @@ class _ConfigCache(object):
 
                 conda_packages_by_platform[platform] = deps
 
+            package_urls_by_platform = dict()
+            urls_by_platform = lock_set.get('package_urls', {})
+            if not is_dict(urls_by_platform):
+                _file_problem(
+                    problems, lock_file,
+                    "'package_urls:' section in env spec '%s' in lock file should be a dictionary, found %r" %
+                    (name, urls_by_platform))
+                continue
+
+            for platform in urls_by_platform.keys():
+                urls = self._parse_string_list(problems, lock_file, urls_by_platform, platform, 'package URL')
+                bad_urls = [url for url in urls if conda_api.parse_explicit_url(url) is None]
+                for url in bad_urls:
+                    _file_problem(problems, lock_file, "invalid package URL (should end in #<md5>): %s" % (url))
+                if len(bad_urls) == 0 and platform in platforms:
+                    package_urls_by_platform[platform] = urls
+
             lock_set_object = CondaLockSet(
-                package_specs_by_platform=conda_packages_by_platform, platforms=platforms, enabled=enabled)
+                package_specs_by_platform=conda_packages_by_platform,
+                platforms=platforms,
+                enabled=enabled,
+                package_urls_by_platform=package_urls_by_platform)
             lock_set_object.env_spec_hash = env_spec_hash
 
             self.lock_sets[name] = lock_set_object
@@ -564,10 +726,10 @@ class _ConfigCache(object):
         def _parse_packages(parent_dict):
             return self._parse_packages(problems, project_file, 'packages', parent_dict)
 
-        (shared_deps, shared_pip_deps) = _parse_packages(project_file.root)
-        shared_channels = _parse_channels(project_file.root)
-        shared_platforms = _parse_platforms(project_file.root)
-        env_specs = project_file.get_value('env_specs', default=None)
+        (shared_deps, shared_pip_deps) = _parse_packages(project_file._read_root())
+        shared_channels = _parse_channels(project_file._read_root())
+        shared_platforms = _parse_platforms(project_file._read_root())
+        env_specs = project_file._read_value('env_specs', default=None)
         first_env_spec_name = None
         env_specs_is_empty = False
         env_specs_is_missing = False
@@ -792,7 +954,7 @@ class _ConfigCache(object):
         (importable_spec, importable_filename) = _find_out_of_sync_importable_spec(self.env_specs.values(),
                                                                                    self.directory_path)
         if importable_spec is not None:
-            skip_spec_import = project_file.get_value(['skip_imports', 'environment'])
+            skip_spec_import = project_file._read_value(['skip_imports', 'environment'])
             if skip_spec_import == importable_spec.logical_hash:
                 importable_spec = None
 
@@ -879,12 +1041,17 @@ class _ConfigCache(object):
 
         first_command_name = None
         commands = dict()
-        commands_section = project_file.get_value('commands', None)
+        commands_section = project_file._read_value('commands', None)
 
         plugins = plugins_api.get_plugins('command_run')
         all_known_command_attributes_extended = all_known_command_attributes + \
             tuple(plugins.keys())
 
+        known_env_vars = set()
+        for reqs in requirements.values():
+            known_env_vars.update(req.env_var for req in reqs
+                                  if isinstance(req, EnvVarRequirement) and not isinstance(req, CondaEnvRequirement))
+
         if commands_section is not None and not is_dict(commands_section):
             _file_problem(
                 problems, project_file,
@@ -933,6 +1100,20 @@ class _ConfigCache(object):
                             (attrs['env_spec'], name))
                         failed = True
 
+                if 'requirements' in attrs:
+                    if not (is_list(attrs['requirements']) and all(is_string(r) for r in attrs['requirements'])):
+                        _file_problem(problems, project_file,
+                                      ("'requirements' field of command {} must be a list of environment variable "
+                                       "names".format(name)))
+                        failed = True
+                    else:
+                        for env_var in attrs['requirements']:
+                            if env_var not in known_env_vars:
+                                _file_problem(problems, project_file,
+                                              ("command {} requires {}, which is not a variable, service or "
+                                               "download in this project".format(name, env_var)))
+                                failed = True
+
                 if 'registers_fusion_function' in attrs and not isinstance(attrs['registers_fusion_function'], bool):
                     _file_problem(problems, project_file,
                                   ("'registers_fusion_function' field of command {} must be a boolean".format(name)))
@@ -981,7 +1162,8 @@ class _ConfigCache(object):
                 if not failed:
                     commands[name] = ProjectCommandClass(name=name, attributes=copied_attrs)
 
-        self._verify_notebook_commands(commands, problems, requirements, project_file)
+        self.skipped_notebooks = project_file._read_value(['skip_imports', 'notebooks'])
+        self._parsed_commands = commands
 
         if failed:
             self.commands = dict()
@@ -996,8 +1178,16 @@ class _ConfigCache(object):
             # note: this may be None
             self.default_command_name = first_command_name
 
-    def _verify_notebook_commands(self, commands, problems, requirements, project_file):
-        skipped_notebooks = project_file.get_value(['skip_imports', 'notebooks'])
+    def _update_notebooks(self, project_file):
+        # the file index (see archiver) makes looking at the files
+        # on disk again cheap when few or none of them changed
+        problems = []
+        self._verify_notebook_commands(self._parsed_commands, problems, self.requirements, project_file,
+                                       self.skipped_notebooks)
+        self._notebook_problems = problems
+        return problems
+
+    def _verify_notebook_commands(self, commands, problems, requirements, project_file, skipped_notebooks):
         if skipped_notebooks is not None:
             if skipped_notebooks is True:
                 # skip ALL notebooks forever
@@ -1154,7 +1344,7 @@ class Project(object):
     the project directory or global user configuration.
     """
 
-    def __init__(self, directory_path, plugin_registry=None, frontend=None, must_exist=False):
+    def __init__(self, directory_path, plugin_registry=None, frontend=None, must_exist=False, compiled_cache=False):
         """Construct a Project with the given directory and plugin registry.
 
         Args:
@@ -1163,6 +1353,10 @@ class Project(object):
                                                     None for default
             frontend (Frontend): the UX using this Project instance
             must_exist (bool): if True, the absence of a project file is a problem
+            compiled_cache (bool): if True, load the configuration from a snapshot made the last time
+                                   the project files had the same content, and only parse the files
+                                   (quickly, with libyaml) if something needs them; best for projects
+                                   that are only read
         """
         self._directory_path = os.path.realpath(directory_path).rstrip(os.sep)
 
@@ -1173,10 +1367,13 @@ class Project(object):
             else:
                 return [_anaconda_default_env_spec(shared_base_spec=None)]
 
-        self._project_file = ProjectFile.load_for_directory(directory_path, default_env_specs_func=load_default_specs)
-        self._lock_file = ProjectLockFile.load_for_directory(directory_path)
+        self._project_file = ProjectFile.load_for_directory(
+            directory_path, default_env_specs_func=load_default_specs, defer_load=compiled_cache,
+            fast_load=compiled_cache)
+        self._lock_file = ProjectLockFile.load_for_directory(
+            directory_path, defer_load=compiled_cache, fast_load=compiled_cache)
         self._directory_basename = os.path.basename(self._directory_path)
-        self._config_cache = _ConfigCache(self._directory_path, plugin_registry, must_exist)
+        self._config_cache = _ConfigCache(self._directory_path, plugin_registry, must_exist, compiled=compiled_cache)
         if frontend is None:
             frontend = _null_frontend()
         assert isinstance(frontend, Frontend)
@@ -1605,6 +1802,8 @@ class Project(object):
         """
         self.project_file.load()
         self.lock_file.load()
+        # things besides the files may have changed on disk too
+        self._config_cache.forget_steps()
 
     def save(self):
         """Save any modified project configuration.
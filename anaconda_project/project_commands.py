@@ -10,7 +10,6 @@ from __future__ import absolute_import
 
 from copy import copy
 from collections import namedtuple
-import distutils.spawn as spawn
 
 import os
 import platform
@@ -30,7 +29,7 @@ except ImportError:  # pragma: no cover (py2 only)
     from urllib import quote as url_quote  # pragma: no cover (py2 only)
 
 standard_command_attributes = ('description', 'env_spec', 'supports_http_options', 'bokeh_app', 'notebook', 'unix',
-                               'windows', 'conda_app_entry')
+                               'windows', 'conda_app_entry', 'requirements')
 extra_command_attributes = ('registers_fusion_function', )
 all_known_command_attributes = standard_command_attributes + extra_command_attributes
 
@@ -320,6 +319,14 @@ class ProjectCommand(object):
         default = (self.notebook is not None or self.bokeh_app is not None)
         return self._attributes.get('supports_http_options', default)
 
+    @property
+    def requirements(self):
+        """Env var names of the variables, services and downloads the command needs, or None if it needs them all.
+
+        The command's conda environment is always needed.
+        """
+        return self._attributes.get('requirements', None)
+
     @property
     def notebook(self):
         """Notebook filename relative to project directory, or None."""
@@ -503,6 +510,9 @@ class ProjectCommand(object):
         # line and not a single program name, and the shell will
         # search the path for us.
         if not shell:
+            # import distutils locally because it's slow to import
+            # (setuptools replaces it) and only needed here
+            import distutils.spawn as spawn
             executable = spawn.find_executable(args[0], path)
             # if we didn't find args[0] on the path, we leave it as-is
             # and wait for it to fail when we later try to run it.
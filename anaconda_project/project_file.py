@@ -49,7 +49,11 @@ class ProjectFile(YamlFile):
     """
 
     @classmethod
-    def load_for_directory(cls, directory, default_env_specs_func=_empty_default_env_spec):
+    def load_for_directory(cls,
+                           directory,
+                           default_env_specs_func=_empty_default_env_spec,
+                           defer_load=False,
+                           fast_load=False):
         """Load the project file from the given directory, even if it doesn't exist.
 
         If the directory has no project file, the loaded
@@ -66,6 +70,8 @@ class ProjectFile(YamlFile):
         Args:
             directory (str): path to the project directory
             default_env_specs_func (function makes list of EnvSpec): if file is created, use these
+            defer_load (bool): don't read the file until its contents are needed
+            fast_load (bool): parse the file quickly for reading, see ``YamlFile``
 
         Returns:
             a new ``ProjectFile``
@@ -74,10 +80,14 @@ class ProjectFile(YamlFile):
         for name in possible_project_file_names:
             path = os.path.join(directory, name)
             if os.path.isfile(path):
-                return ProjectFile(path)
-        return ProjectFile(os.path.join(directory, DEFAULT_PROJECT_FILENAME), default_env_specs_func)
-
-    def __init__(self, filename, default_env_specs_func=_empty_default_env_spec):
+                return ProjectFile(path, defer_load=defer_load, fast_load=fast_load)
+        return ProjectFile(
+            os.path.join(directory, DEFAULT_PROJECT_FILENAME),
+            default_env_specs_func,
+            defer_load=defer_load,
+            fast_load=fast_load)
+
+    def __init__(self, filename, default_env_specs_func=_empty_default_env_spec, defer_load=False, fast_load=False):
         """Construct a ``ProjectFile`` with the given filename and requirement registry.
 
         It's easier to use ``ProjectFile.load_for_directory()`` in most cases.
@@ -92,10 +102,12 @@ class ProjectFile(YamlFile):
         Args:
             filename (str): path to the project file
             default_env_specs_func (function makes list of EnvSpec): if file is created, use these
+            defer_load (bool): don't read the file until its contents are needed
+            fast_load (bool): parse the file quickly for reading, see ``YamlFile``
 
         """
         self._default_env_specs_func = default_env_specs_func
-        super(ProjectFile, self).__init__(filename)
+        super(ProjectFile, self).__init__(filename, defer_load=defer_load, fast_load=fast_load)
 
     def _default_content(self):
         header = (
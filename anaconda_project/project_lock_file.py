@@ -31,7 +31,7 @@ class ProjectLockFile(YamlFile):
     """Represents the ``anaconda-project-lock.yml`` file which describes locked package versions."""
 
     @classmethod
-    def load_for_directory(cls, directory):
+    def load_for_directory(cls, directory, defer_load=False, fast_load=False):
         """Load the project lock file from the given directory, even if it doesn't exist.
 
         If the directory has no project file, the loaded
@@ -47,6 +47,8 @@ class ProjectLockFile(YamlFile):
 
         Args:
             directory (str): path to the project directory
+            defer_load (bool): don't read the file until its contents are needed
+            fast_load (bool): parse the file quickly for reading, see ``YamlFile``
 
         Returns:
             a new ``ProjectLockFile``
@@ -55,10 +57,11 @@ class ProjectLockFile(YamlFile):
         for name in possible_project_lock_file_names:
             path = os.path.join(directory, name)
             if os.path.isfile(path):
-                return ProjectLockFile(path)
-        return ProjectLockFile(os.path.join(directory, DEFAULT_PROJECT_LOCK_FILENAME))
+                return ProjectLockFile(path, defer_load=defer_load, fast_load=fast_load)
+        return ProjectLockFile(
+            os.path.join(directory, DEFAULT_PROJECT_LOCK_FILENAME), defer_load=defer_load, fast_load=fast_load)
 
-    def __init__(self, filename):
+    def __init__(self, filename, defer_load=False, fast_load=False):
         """Construct a ``ProjectLockFile`` with the given filename.
 
         It's easier to use ``ProjectLockFile.load_for_directory()`` in most cases.
@@ -72,8 +75,10 @@ class ProjectLockFile(YamlFile):
 
         Args:
             filename (str): path to the project file
+            defer_load (bool): don't read the file until its contents are needed
+            fast_load (bool): parse the file quickly for reading, see ``YamlFile``
         """
-        super(ProjectLockFile, self).__init__(filename)
+        super(ProjectLockFile, self).__init__(filename, defer_load=defer_load, fast_load=fast_load)
 
     def _default_content(self):
         header = (
@@ -9,28 +9,33 @@
 from __future__ import absolute_import
 
 import codecs
+import collections
 import contextlib
+import copy
 import os
 import shutil
 import tempfile
 
 from anaconda_project.project import Project, ALL_COMMAND_TYPES
+from anaconda_project.project_file import possible_project_file_names
 from anaconda_project import archiver
-from anaconda_project import client
 from anaconda_project import prepare
 from anaconda_project import provide
 from anaconda_project.local_state_file import LocalStateFile
-from anaconda_project.frontend import _null_frontend
+from anaconda_project.frontend import _null_frontend, _new_buffered_frontend
 from anaconda_project.requirements_registry.requirement import EnvVarRequirement
 from anaconda_project.requirements_registry.requirements.conda_env import CondaEnvRequirement
 from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
 from anaconda_project.requirements_registry.requirements.download import _hash_algorithms
 from anaconda_project.requirements_registry.requirements.service import ServiceRequirement
-from anaconda_project.requirements_registry.providers.conda_env import _remove_env_path
+from anaconda_project.requirements_registry.providers.conda_env import (_remove_env_path, _unreference_shared_env)
 from anaconda_project.internal.simple_status import SimpleStatus
+from anaconda_project.internal.makedirs import makedirs_ok_if_exists
 import anaconda_project.conda_manager as conda_manager
 from anaconda_project.internal.conda_api import (parse_spec, default_platforms_with_current)
+import anaconda_project.internal.env_store as env_store
 import anaconda_project.internal.notebook_analyzer as notebook_analyzer
+import anaconda_project.internal.parallel as parallel
 from anaconda_project.internal.py2_compat import is_string
 
 _default_projectignore = """
@@ -337,6 +342,72 @@ def _map_inplace(f, items):
         i += 1
 
 
+# Each lock set solve may itself solve several platforms at once,
+# so keep this small.
+_DEFAULT_LOCK_WORKERS = 2
+
+
+def _lock_set_solve_key(env):
+    return (env.conda_packages, env.channels, env.platforms)
+
+
+class _LockSetSolve(object):
+    def __init__(self, lock_set, error, frontend):
+        self.lock_set = lock_set
+        self.error = error
+        self.frontend = frontend
+        self.replayed = False
+
+    def lock_set_for_env(self, env):
+        # each env gets its own copy, since the hash is per-env
+        lock_set = copy.deepcopy(self.lock_set)
+        lock_set.env_spec_hash = env.logical_hash
+        return lock_set
+
+
+def _solve_lock_sets(envs):
+    """Resolve lock sets for envs, solving each distinct set of inputs once.
+
+    Env specs often share their packages, channels and platforms
+    (for example via inherit_from), so we group them by those
+    inputs and solve the distinct groups concurrently. Conda
+    manager output is buffered per solve, so callers can replay it
+    in a deterministic order as they apply the results.
+
+    Returns:
+        dict from ``_lock_set_solve_key(env)`` to ``_LockSetSolve``
+    """
+    keys = list(collections.OrderedDict((_lock_set_solve_key(env), None) for env in envs).keys())
+
+    def solve(key):
+        frontend = _new_buffered_frontend()
+        conda = conda_manager.new_conda_manager(frontend=frontend)
+        (conda_packages, channels, platforms) = key
+        try:
+            lock_set = conda.resolve_dependencies(conda_packages, channels, platforms)
+            return _LockSetSolve(lock_set=lock_set, error=None, frontend=frontend)
+        except conda_manager.CondaManagerError as e:
+            return _LockSetSolve(lock_set=None, error=e, frontend=frontend)
+
+    workers = parallel.default_max_workers('ANACONDA_PROJECT_LOCK_WORKERS', _DEFAULT_LOCK_WORKERS)
+    return dict(zip(keys, parallel.map_in_threads(solve, keys, workers)))
+
+
+def _solved_lock_set_for_env(solves, env, frontend):
+    """Get the lock set for env from _solve_lock_sets(), replaying its output the first time.
+
+    Raises:
+        CondaManagerError if the solve failed
+    """
+    solve = solves[_lock_set_solve_key(env)]
+    if not solve.replayed:
+        solve.frontend.replay(frontend)
+        solve.replayed = True
+    if solve.error is not None:
+        raise solve.error
+    return solve.lock_set_for_env(env)
+
+
 class _StatusHolder(object):
     def __init__(self):
         self.status = None
@@ -371,25 +442,24 @@ def _updating_project_lock_file(project):
             removed_env_names.append(name)
 
     all_env_names = [env_spec.name for env_spec in project.env_specs.values()]
-    conda = conda_manager.new_conda_manager(frontend=project.frontend)
-    for env in changed_or_added_envs:
-        # Update now-obsolete lock set or previously-nonexistent lock set.
-        # (Newly-added environments won't have a lock set yet.)
-        # An unfortunate side effect is that we update everything to latest
-        # versions... ideally we would try to hold constant packages
-        # that are unaffected by whatever changes we are making here.
-        # But that's sort of involved so let's leave it aside for the time
-        # being.
-        if env.lock_set.enabled:
-            try:
-                lock_set = conda.resolve_dependencies(env.conda_packages, env.channels, env.platforms)
-                lock_set.env_spec_hash = env.logical_hash
-            except conda_manager.CondaManagerError as e:
-                status_holder.status = SimpleStatus(
-                    success=False, description="Error resolving dependencies for %s: %s." % (env.name, str(e)))
-                return
+    # Update now-obsolete lock set or previously-nonexistent lock set.
+    # (Newly-added environments won't have a lock set yet.)
+    # An unfortunate side effect is that we update everything to latest
+    # versions... ideally we would try to hold constant packages
+    # that are unaffected by whatever changes we are making here.
+    # But that's sort of involved so let's leave it aside for the time
+    # being.
+    envs_to_lock = [env for env in changed_or_added_envs if env.lock_set.enabled]
+    solves = _solve_lock_sets(envs_to_lock)
+    for env in envs_to_lock:
+        try:
+            lock_set = _solved_lock_set_for_env(solves, env, project.frontend)
+        except conda_manager.CondaManagerError as e:
+            status_holder.status = SimpleStatus(
+                success=False, description="Error resolving dependencies for %s: %s." % (env.name, str(e)))
+            return
 
-            project.lock_file._set_lock_set(env.name, lock_set, all_env_names)
+        project.lock_file._set_lock_set(env.name, lock_set, all_env_names)
 
     for name in removed_env_names:
         project.lock_file.unset_value(['env_specs', name])
@@ -554,7 +624,9 @@ def remove_env_spec(project, name):
     # that was prepared. So instead we share some code with the
     # CondaEnvProvider but don't try to go through the unprepare
     # machinery.
-    status = _remove_env_path(env_path)
+    status = _unreference_shared_env(env_path, project.directory_path, name)
+    if status is None:
+        status = _remove_env_path(env_path)
     if status:
         with _updating_project_lock_file(project) as status_holder:
             project.project_file.unset_value(['env_specs', name])
@@ -699,6 +771,10 @@ def remove_packages(project, env_spec_name, packages):
 
     for env in envs:
         prefix = env.path(project.directory_path)
+        if env_store.shared_env_store() is not None:
+            # other projects may be using the shared env; once we
+            # change the env spec, it'll have a new shared env anyway.
+            continue
         try:
             if os.path.isdir(prefix):
                 conda.remove_packages(prefix, packages)
@@ -806,16 +882,21 @@ def _update_and_lock(project, env_spec_name, update):
             # we'll save later after doing all the other stuff too
             need_save = True
 
-    conda = conda_manager.new_conda_manager(frontend=project.frontend)
+    def needs_lock_set(env):
+        return update or env.lock_set.disabled or env.lock_set.missing
+
+    # Solve everything up front (concurrently, and only once per
+    # distinct set of solver inputs), then apply the results
+    # serially in order so that output and diffs are deterministic.
+    solves = _solve_lock_sets([env for env in envs if needs_lock_set(env)])
 
     # note that "envs" are frozen from the original project state,
     # and won't update as we go through them
     for env in envs:
-        if update or env.lock_set.disabled or env.lock_set.missing:
+        if needs_lock_set(env):
             try:
                 project.frontend.info("Updating locked dependencies for env spec %s..." % env.name)
-                lock_set = conda.resolve_dependencies(env.conda_packages, env.channels, env.platforms)
-                lock_set.env_spec_hash = env.logical_hash
+                lock_set = _solved_lock_set_for_env(solves, env, project.frontend)
             except conda_manager.CondaManagerError as e:
                 return SimpleStatus(
                     success=False, description="Error resolving dependencies for %s: %s." % (env.name, str(e)))
@@ -1671,6 +1752,180 @@ def clean(project, prepare_result):
         return SimpleStatus(success=False, description="Failed to clean everything up.", errors=errors)
 
 
+def gc_shared_envs(frontend=None, max_age=None, max_bytes=None):
+    """Delete unneeded environments from the shared environment store.
+
+    Environments no project uses are deleted, along with (if
+    max_age or max_bytes are given) environments which haven't been
+    used recently or don't fit in the size limit, least recently
+    used first. Projects recreate deleted environments when they
+    are next prepared.
+
+    Args:
+        frontend (Frontend): frontend for progress messages
+        max_age (float): delete envs unused for this many seconds
+        max_bytes (int): delete envs until the store is this small
+
+    Returns:
+        a ``Status``, if failed has ``errors``
+    """
+    if frontend is None:
+        frontend = _null_frontend()
+    store = env_store.shared_env_store()
+    if store is None:
+        return SimpleStatus(
+            success=False,
+            description=("No shared environment store; set %s to enable it." % env_store.SHARED_ENVS_PATH_VARIABLE))
+    return store.gc(frontend, max_age=max_age, max_bytes=max_bytes)
+
+
+# Each project's prepare may itself provide several requirements
+# concurrently, so keep this small.
+_DEFAULT_BATCH_PREPARE_WORKERS = 4
+
+
+def find_project_directories(directory_path):
+    """Find the project directories in a directory tree.
+
+    We don't look for projects inside other projects, or in hidden
+    or ``envs`` directories.
+
+    Args:
+        directory_path (str): root of the tree
+
+    Returns:
+        sorted list of project directories
+    """
+    found = []
+    for (dirpath, dirnames, filenames) in os.walk(directory_path):
+        if any(name in filenames for name in possible_project_file_names):
+            found.append(dirpath)
+            dirnames[:] = []
+        else:
+            dirnames[:] = [name for name in dirnames if not (name.startswith('.') or name == 'envs')]
+    return sorted(found)
+
+
+def _batch_prepare_units(project, env_spec_name):
+    """Get the units of work in preparing a project which other projects may share.
+
+    Env builds are identified by their locked hash (even when
+    projects don't share the env itself, the first build fills the
+    package cache for the others) and by their prefix. Downloads
+    are identified by what they fetch, not where they put it.
+
+    Returns:
+        dict from unit key to the ``DownloadRequirement`` for it, or None for envs
+    """
+    units = dict()
+    if len(project.problems) > 0:
+        return units
+    if env_spec_name is None:
+        env_spec_name = project.default_env_spec_name_for_command(project.default_command)
+    env = project.env_specs.get(env_spec_name)
+    if env is None:
+        return units
+    units[('env', env.locked_hash)] = None
+    units[('env_prefix', env.path(project.directory_path))] = None
+    for requirement in project.find_requirements(env_spec_name, klass=DownloadRequirement):
+        key = ('download', requirement.url, requirement.hash_algorithm, requirement.hash_value, requirement.unzip)
+        units[key] = requirement
+    return units
+
+
+def _copy_shared_download(source_project, source_requirement, project, requirement):
+    """Copy a download from the project that did it, so ``project`` won't download it again."""
+    source = os.path.join(source_project.directory_path, source_requirement.filename)
+    dest = os.path.join(project.directory_path, requirement.filename)
+    if os.path.exists(dest) or not os.path.exists(source):
+        return
+    try:
+        makedirs_ok_if_exists(os.path.dirname(dest))
+        if os.path.isdir(source):
+            shutil.copytree(source, dest)
+        else:
+            shutil.copy2(source, dest)
+    except (IOError, OSError):
+        # don't leave a partial copy behind; the project will
+        # download it itself.
+        if os.path.isdir(dest):
+            shutil.rmtree(dest, ignore_errors=True)
+        elif os.path.exists(dest):
+            os.remove(dest)
+
+
+def prepare_projects(directory_path,
+                     environ=None,
+                     frontend=None,
+                     mode=provide.PROVIDE_MODE_DEVELOPMENT,
+                     env_spec_name=None,
+                     max_workers=None):
+    """Prepare every project in a directory tree, doing work they share only once.
+
+    The first project (in directory order) needing an env build or
+    a download does it, and projects sharing that work wait for it.
+    Shared downloads are then copied rather than fetched again, and
+    shared envs are found already built. Projects with no work in
+    common are prepared concurrently.
+
+    Each project's output is sent to ``frontend`` once that
+    project is prepared.
+
+    Args:
+        directory_path (str): root of the tree of projects
+        environ (dict): os.environ or the previously-prepared environ; not modified in-place
+        frontend (Frontend): frontend for progress messages
+        mode (str): mode from ``PROVIDE_MODE_PRODUCTION``, ``PROVIDE_MODE_DEVELOPMENT``, ``PROVIDE_MODE_CHECK``
+        env_spec_name (str): the environment spec name to require, or None for each project's default
+        max_workers (int): how many projects to prepare at once, None for the default
+
+    Returns:
+        list of ``(Project, PrepareResult)`` in directory order
+    """
+    if frontend is None:
+        frontend = _null_frontend()
+    if max_workers is None:
+        max_workers = parallel.default_max_workers('ANACONDA_PROJECT_BATCH_WORKERS', _DEFAULT_BATCH_PREPARE_WORKERS)
+
+    directories = find_project_directories(directory_path)
+    frontends = [_new_buffered_frontend() for directory in directories]
+    projects = [Project(directory, frontend=buffered) for (directory, buffered) in zip(directories, frontends)]
+    units = [_batch_prepare_units(project, env_spec_name) for project in projects]
+
+    owners = dict()
+    for (index, project_units) in enumerate(units):
+        for key in project_units:
+            owners.setdefault(key, index)
+
+    # a project waits for the owners of its shared units, which
+    # always come before it, so we can go in waves.
+    waves = []
+    wave_of = []
+    for (index, project_units) in enumerate(units):
+        wave = max([wave_of[owners[key]] + 1 for key in project_units if owners[key] != index] + [0])
+        wave_of.append(wave)
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(index)
+
+    def prepare_one(index):
+        project = projects[index]
+        for (key, requirement) in units[index].items():
+            owner = owners[key]
+            if requirement is not None and owner != index:
+                _copy_shared_download(projects[owner], units[owner][key], project, requirement)
+        return prepare.prepare_without_interaction(project, environ, mode=mode, env_spec_name=env_spec_name)
+
+    results = [None] * len(projects)
+    for wave in waves:
+        for (index, result) in zip(wave, parallel.map_in_threads(prepare_one, wave, max_workers)):
+            frontend.info("Project %s:" % projects[index].directory_path)
+            frontends[index].replay(frontend)
+            results[index] = result
+
+    return list(zip(projects, results))
+
+
 def archive(project, filename):
     """Make an archive of the non-ignored files in the project.
 
@@ -1741,6 +1996,10 @@ def upload(project, site=None, username=None, token=None, log_level=None):
         status = archive(project, tmp_tarfile.name)
         if not status:
             return status
+        # import client locally because binstar_client is slow
+        # to import, and we only need it to upload
+        from anaconda_project import client
+
         status = client._upload(
             project,
             tmp_tarfile.name,
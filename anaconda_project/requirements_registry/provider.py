@@ -327,6 +327,23 @@ class Provider(with_metaclass(ABCMeta)):
             missing_env_vars_to_configure=missing_to_configure,
             missing_env_vars_to_provide=missing_to_provide)
 
+    def concurrency_group(self, requirement):
+        """Get a name shared by providers which must not provide at the same time.
+
+        Prepare may run ``provide()`` for requirements that don't
+        depend on each other concurrently, on separate threads, each
+        with its own copy of ``environ``. Providers returning the same
+        non-None group are run one at a time instead, for example
+        because they modify the same environment variables.
+
+        Args:
+            requirement (Requirement): requirement we want to meet
+
+        Returns:
+            a string, or None if this can run alongside any provider
+        """
+        return None
+
     @abstractmethod
     def provide(self, requirement, context):
         """Execute the provider, fulfilling the requirement.
@@ -12,6 +12,8 @@ import os
 import shutil
 
 from anaconda_project.internal import conda_api
+from anaconda_project.internal import env_store
+from anaconda_project.internal import package_prefetch
 from anaconda_project.internal.simple_status import SimpleStatus
 from anaconda_project.conda_manager import new_conda_manager, CondaManagerError
 from anaconda_project.requirements_registry.provider import EnvVarProvider
@@ -32,6 +34,56 @@ def _remove_env_path(env_path):
             success=True, description=("Nothing to clean up for environment '%s'." % os.path.basename(env_path)))
 
 
+def _unreference_shared_env(env_path, project_dir, env_name):
+    """Also used by project_ops.py; returns None if env_path isn't a shared env."""
+    store = env_store.shared_env_store()
+    if store is None or store.locked_hash_for_prefix(env_path) is None:
+        return None
+    # other projects may use it, so just drop our reference and
+    # leave deleting it to "gc"
+    store.remove_reference(project_dir, env_name)
+    return SimpleStatus(
+        success=True, description=("Environment %s is shared, no longer using it from %s." % (env_path, project_dir)))
+
+
+def _prefetch_packages(conda, prefix, env_spec, frontend):
+    # If the lock set has exact package URLs, download the packages
+    # conda is about to install concurrently before conda starts.
+    # Failures aren't fatal; conda tries again itself.
+    urls = env_spec.conda_package_urls_for_create
+    if not urls:
+        return
+    try:
+        deviations = conda.find_environment_deviations(prefix, env_spec)
+    except CondaManagerError:
+        return
+    if deviations.unfixable:
+        return
+    if os.path.isdir(os.path.join(prefix, 'conda-meta')):
+        # only what's missing will be installed
+        names = set(deviations.missing_packages) | set(deviations.wrong_version_packages)
+        needed = []
+        for url in urls:
+            parsed = conda_api.parse_explicit_url(url)
+            if parsed is not None and parsed[0] in names:
+                needed.append(url)
+        if not needed:
+            return
+        urls = needed
+    try:
+        pkgs_dirs = conda_api.cached_info().get('pkgs_dirs', [])
+    except conda_api.CondaError:
+        return
+    pkgs_dir = package_prefetch.writable_pkgs_dir(pkgs_dirs)
+    if pkgs_dir is None:
+        return
+    (count, errors) = package_prefetch.prefetch_packages(urls, pkgs_dir)
+    if count > 0:
+        frontend.info("Downloaded %d packages for env spec %s into %s." % (count, env_spec.name, pkgs_dir))
+    for error in errors:
+        frontend.info(error)
+
+
 class CondaEnvProvider(EnvVarProvider):
     """Provides a Conda environment."""
 
@@ -152,6 +204,10 @@ class CondaEnvProvider(EnvVarProvider):
                         prefix = env.path(project_dir)
                         local_state_file.set_value(['variables', requirement.env_var], prefix)
 
+    def concurrency_group(self, requirement):
+        """Override superclass since conda environments all modify PATH and share the package cache."""
+        return 'conda'
+
     def provide(self, requirement, context):
         """Override superclass to create or update our environment."""
         assert 'PATH' in context.environ
@@ -197,8 +253,32 @@ class CondaEnvProvider(EnvVarProvider):
             # TODO if not creating a named env, we could use the
             # shared packages, but for now we leave it alone
             assert env_spec is not None
+            if not context.status:
+                _prefetch_packages(conda, prefix, env_spec, context.frontend)
+
+            # if it's a shared env, other projects mustn't work on it
+            # and "gc" mustn't delete it while we work on it, and
+            # afterward we note that this project uses it (even if
+            # we failed, so the next prepare can fix it rather than
+            # gc deleting it).
+            store = env_store.shared_env_store()
+            if store is None or store.locked_hash_for_prefix(prefix) != env_spec.locked_hash:
+                store = None
             try:
-                conda.fix_environment_deviations(prefix, env_spec, create=(not inherited))
+                if store is None:
+                    conda.fix_environment_deviations(prefix, env_spec, create=(not inherited))
+                else:
+                    with store.preparing(env_spec.locked_hash):
+                        try:
+                            # someone else may have fixed it while we
+                            # waited for the lock
+                            deviations = conda.find_environment_deviations(prefix, env_spec)
+                            if not deviations.ok:
+                                conda.fix_environment_deviations(
+                                    prefix, env_spec, deviations=deviations, create=(not inherited))
+                        finally:
+                            if os.path.isdir(prefix):
+                                store.add_reference(env_spec.locked_hash, project_dir, env_spec.name)
             except CondaManagerError as e:
                 return super_result.copy_with_additions(errors=[str(e)])
 
@@ -227,6 +307,11 @@ class CondaEnvProvider(EnvVarProvider):
         env_path = config.get('value', None)
         assert env_path is not None
         project_dir = environ['PROJECT_DIR']
+
+        shared_status = _unreference_shared_env(env_path, project_dir, config['env_name'])
+        if shared_status is not None:
+            return shared_status
+
         if not env_path.startswith(project_dir):
             return SimpleStatus(
                 success=True, description=("Current environment is not in %s, no need to delete it." % project_dir))
@@ -347,6 +432,10 @@ class CondaBootstrapEnvProvider(EnvVarProvider):
                         prefix = env.path(project_dir)
                         local_state_file.set_value(['variables', requirement.env_var], prefix)
 
+    def concurrency_group(self, requirement):
+        """Override superclass since conda environments all modify PATH and share the package cache."""
+        return 'conda'
+
     def provide(self, requirement, context):
         """Override superclass to create or update our environment."""
         assert 'PATH' in context.environ
@@ -11,8 +11,7 @@ from __future__ import print_function
 import os
 import shutil
 
-from tornado.ioloop import IOLoop
-
+from anaconda_project.internal import coroutines, timings
 from anaconda_project.internal.http_client import FileDownloader
 from anaconda_project.internal.ziputils import unpack_zip
 from anaconda_project.internal.simple_status import SimpleStatus
@@ -91,8 +90,16 @@ class DownloadProvider(EnvVarProvider):
             url=requirement.url, filename=download_filename, hash_algorithm=requirement.hash_algorithm)
 
         try:
-            _ioloop = IOLoop(make_current=False)
-            response = _ioloop.run_sync(download.run)
+            timings.emit_event('download_started', url=requirement.url, filename=download_filename)
+            start = timings.monotonic()
+            try:
+                response = coroutines.run_sync(download.run)
+            finally:
+                timings.emit_event('download_finished',
+                                   url=requirement.url,
+                                   filename=download_filename,
+                                   bytes=download.bytes_downloaded,
+                                   seconds=(timings.monotonic() - start))
             if response is None:
                 for error in download.errors:
                     frontend.error(error)
@@ -118,8 +125,6 @@ class DownloadProvider(EnvVarProvider):
         except Exception as e:
             frontend.error("Error downloading {}: {}".format(requirement.url, str(e)))
             return None
-        finally:
-            _ioloop.close()
 
     def provide(self, requirement, context):
         """Override superclass to start a download..
@@ -9,15 +9,23 @@ from __future__ import absolute_import
 
 import os
 import platform
+import threading
+import time
+
 import pytest
 
 import anaconda_project.internal.conda_api as conda_api
+import anaconda_project.internal.env_store as env_store
 import anaconda_project.internal.pip_api as pip_api
 from anaconda_project.test.environ_utils import minimal_environ
-from anaconda_project.internal.test.tmpfile_utils import with_directory_contents_completing_project_file
+from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents,
+                                                          with_directory_contents_completing_project_file,
+                                                          complete_project_file_content)
 from anaconda_project.internal.test.test_conda_api import monkeypatch_conda_not_to_use_links
+from anaconda_project.internal.test.fake_frontend import FakeFrontend
 from anaconda_project.prepare import (prepare_without_interaction, prepare_in_stages, unprepare)
 from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
+from anaconda_project.project_lock_file import DEFAULT_PROJECT_LOCK_FILENAME
 from anaconda_project.project import Project
 from anaconda_project import provide
 from anaconda_project.requirements_registry.registry import RequirementsRegistry
@@ -146,6 +154,237 @@ def test_unprepare_gets_error_on_delete(monkeypatch):
     with_directory_contents_completing_project_file(dict(), prepare_project_scoped_env)
 
 
+def test_prepare_and_unprepare_shared_env(monkeypatch):
+    created = []
+
+    def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
+        created.append(prefix)
+        os.makedirs(os.path.join(prefix, "conda-meta"))
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.create', mock_create)
+
+    def check(dirname):
+        store_dir = os.path.join(dirname, "store")
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+        store = env_store.shared_env_store()
+
+        results = []
+        projects = []
+        for name in ('a', 'b'):
+            project = Project(os.path.join(dirname, name))
+            assert [] == project.problems
+            environ = minimal_environ(PROJECT_DIR=project.directory_path)
+            result = prepare_without_interaction(project, environ=environ)
+            assert result
+            projects.append(project)
+            results.append(result)
+
+        # both projects use the same env, which we only created once
+        locked_hash = projects[0].env_specs['default'].locked_hash
+        expected_env = os.path.join(store_dir, locked_hash)
+        assert [expected_env] == created
+        for result in results:
+            assert expected_env == result.environ[conda_env_var]
+        assert [(projects[0].directory_path, 'default'),
+                (projects[1].directory_path, 'default')] == sorted(store.references(locked_hash))
+
+        # unpreparing just drops the reference
+        status = unprepare(projects[0], results[0])
+        assert status
+        expected_description = "Environment %s is shared, no longer using it from %s." % (
+            expected_env, projects[0].directory_path)
+        assert expected_description == status.status_description
+        assert os.path.isdir(expected_env)
+        assert [(projects[1].directory_path, 'default')] == store.references(locked_hash)
+
+    with_directory_contents({
+        'a/' + DEFAULT_PROJECT_FILENAME: complete_project_file_content('name: a\n'),
+        'b/' + DEFAULT_PROJECT_FILENAME: complete_project_file_content('name: b\n')
+    }, check)
+
+
+def test_concurrent_prepares_of_shared_env(monkeypatch):
+    state = dict(creating=0, most_creating=0)
+    created = []
+    lock = threading.Lock()
+
+    def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
+        with lock:
+            state['creating'] += 1
+            state['most_creating'] = max(state['most_creating'], state['creating'])
+            created.append(prefix)
+        # give the other prepare a chance to barge in
+        time.sleep(0.2)
+        os.makedirs(os.path.join(prefix, "conda-meta"))
+        with lock:
+            state['creating'] -= 1
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.create', mock_create)
+
+    def check(dirname):
+        store_dir = os.path.join(dirname, "store")
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+        projects = [Project(os.path.join(dirname, name)) for name in ('a', 'b')]
+        results = dict()
+
+        def prepare(project):
+            environ = minimal_environ(PROJECT_DIR=project.directory_path)
+            results[project.name] = prepare_without_interaction(project, environ=environ)
+
+        threads = [threading.Thread(target=prepare, args=(project, )) for project in projects]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        assert results['a']
+        assert results['b']
+        # the second prepare waited for the first, then found
+        # nothing left to do
+        assert 1 == state['most_creating']
+        locked_hash = projects[0].env_specs['default'].locked_hash
+        assert [os.path.join(store_dir, locked_hash)] == created
+        store = env_store.shared_env_store()
+        assert not store.is_preparing(locked_hash)
+        assert 2 == len(store.references(locked_hash))
+
+    with_directory_contents({
+        'a/' + DEFAULT_PROJECT_FILENAME: complete_project_file_content('name: a\n'),
+        'b/' + DEFAULT_PROJECT_FILENAME: complete_project_file_content('name: b\n')
+    }, check)
+
+
+def test_gc_while_creating_shared_env(monkeypatch):
+    gc_statuses = []
+
+    def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
+        os.makedirs(os.path.join(prefix, "conda-meta"))
+        # even if conda-meta looks old, gc leaves the env alone
+        # while we're creating it
+        os.utime(os.path.join(prefix, "conda-meta"), (100, 100))
+        store = env_store.shared_env_store()
+        assert [] == store.references(store.locked_hash_for_prefix(prefix))
+        gc_statuses.append(store.gc(FakeFrontend()))
+        assert os.path.isdir(os.path.join(prefix, "conda-meta"))
+        raise conda_api.CondaError("create failed")
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.create', mock_create)
+
+    def check(dirname):
+        store_dir = os.path.join(dirname, "store")
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+        store = env_store.shared_env_store()
+
+        project = Project(os.path.join(dirname, 'a'))
+        assert [] == project.problems
+        environ = minimal_environ(PROJECT_DIR=project.directory_path)
+        result = prepare_without_interaction(project, environ=environ)
+        assert not result
+        assert "No environments to remove from %s." % store_dir == gc_statuses[0].status_description
+
+        # the failed env still belongs to the project, so gc keeps it
+        # until the next prepare fixes it
+        locked_hash = project.env_specs['default'].locked_hash
+        assert not store.is_preparing(locked_hash)
+        assert [(project.directory_path, 'default')] == store.references(locked_hash)
+        assert store.gc(FakeFrontend())
+        assert [locked_hash] == store.locked_hashes()
+
+    with_directory_contents({'a/' + DEFAULT_PROJECT_FILENAME: complete_project_file_content('name: a\n')}, check)
+
+
+def test_prepare_prefetches_locked_package_urls(monkeypatch):
+    current = conda_api.current_platform()
+    url = 'https://example.com/%s/a-1.0-0.tar.bz2#%s' % (current, 'a' * 32)
+    calls = []
+
+    def mock_create_explicit(prefix, urls, stdout_callback, stderr_callback):
+        calls.append(('create', urls))
+        os.makedirs(os.path.join(prefix, "conda-meta"))
+
+    def mock_prefetch_packages(urls, pkgs_dir):
+        calls.append(('prefetch', urls, pkgs_dir))
+        return (1, ["Error downloading something: not really"])
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.create_explicit', mock_create_explicit)
+    monkeypatch.setattr('anaconda_project.internal.package_prefetch.prefetch_packages', mock_prefetch_packages)
+
+    def check(dirname):
+        pkgs_dir = os.path.join(dirname, "pkgs")
+
+        def mock_writable_pkgs_dir(pkgs_dirs):
+            return pkgs_dir
+
+        monkeypatch.setattr('anaconda_project.internal.package_prefetch.writable_pkgs_dir', mock_writable_pkgs_dir)
+
+        frontend = FakeFrontend()
+        project = Project(dirname, frontend=frontend)
+        assert [] == project.problems
+        environ = minimal_environ(PROJECT_DIR=dirname)
+        result = prepare_without_interaction(project, environ=environ)
+        assert result
+        assert [('prefetch', [url], pkgs_dir), ('create', [url])] == calls
+        assert ("Downloaded 1 packages for env spec default into %s." % pkgs_dir) in frontend.logs
+        assert "Error downloading something: not really" in frontend.logs
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: "packages: [a]\nplatforms: [%s]\n" % current,
+            DEFAULT_PROJECT_LOCK_FILENAME: """
+locking_enabled: true
+env_specs:
+  default:
+    platforms: [%s]
+    packages:
+      all: [a=1.0=0]
+    package_urls:
+      %s: [%s]
+""" % (current, current, url)
+        }, check)
+
+
+def test_prepare_prefetches_only_packages_to_install(monkeypatch):
+    current = conda_api.current_platform()
+    url_a = 'https://example.com/%s/a-1.0-0.tar.bz2#%s' % (current, 'a' * 32)
+    url_b = 'https://example.com/%s/b-2.0-0.tar.bz2#%s' % (current, 'b' * 32)
+    calls = []
+
+    def mock_install_explicit(prefix, urls, stdout_callback, stderr_callback):
+        calls.append(('install', urls))
+
+    def mock_prefetch_packages(urls, pkgs_dir):
+        calls.append(('prefetch', urls))
+        return (len(urls), [])
+
+    monkeypatch.setattr('anaconda_project.internal.conda_api.install_explicit', mock_install_explicit)
+    monkeypatch.setattr('anaconda_project.internal.package_prefetch.prefetch_packages', mock_prefetch_packages)
+
+    def check(dirname):
+        monkeypatch.setattr('anaconda_project.internal.package_prefetch.writable_pkgs_dir',
+                            lambda pkgs_dirs: os.path.join(dirname, "pkgs"))
+        project = Project(dirname, frontend=FakeFrontend())
+        assert [] == project.problems
+        environ = minimal_environ(PROJECT_DIR=dirname)
+        prepare_without_interaction(project, environ=environ)
+        assert [('prefetch', [url_b]), ('install', [url_b])] == calls
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: "packages: [a, b]\nplatforms: [%s]\n" % current,
+            DEFAULT_PROJECT_LOCK_FILENAME: """
+locking_enabled: true
+env_specs:
+  default:
+    platforms: [%s]
+    packages:
+      all: [a=1.0=0, b=2.0=0]
+    package_urls:
+      %s: [%s, %s]
+""" % (current, current, url_a, url_b),
+            'envs/default/conda-meta/a-1.0-0.json': '{}'
+        }, check)
+
+
 def test_prepare_project_scoped_env_not_attempted_in_check_mode(monkeypatch):
     def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
         raise Exception("Should not have attempted to create env")
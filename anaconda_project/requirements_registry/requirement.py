@@ -13,6 +13,7 @@ from copy import deepcopy
 
 from anaconda_project.internal.metaclass import with_metaclass
 from anaconda_project.internal.py2_compat import is_string
+from anaconda_project.internal.timings import timed
 from anaconda_project.status import Status
 
 
@@ -184,7 +185,8 @@ class Requirement(with_metaclass(ABCMeta)):
     def _create_status(self, environ, local_state_file, default_env_spec_name, overrides, latest_provide_result,
                        has_been_provided, status_description, provider_class_name):
         provider = self.registry.find_provider_by_class_name(provider_class_name)
-        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        with timed('analyze'):
+            analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
         env_spec_name = analysis.config.get('env_name', None)
         return RequirementStatus(
             self,
@@ -198,7 +200,8 @@ class Requirement(with_metaclass(ABCMeta)):
     def _create_status_from_analysis(self, environ, local_state_file, default_env_spec_name, overrides,
                                      latest_provide_result, provider_class_name, status_getter):
         provider = self.registry.find_provider_by_class_name(provider_class_name)
-        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        with timed('analyze'):
+            analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
         (has_been_provided, status_description) = status_getter(environ, local_state_file, analysis)
         env_spec_name = analysis.config.get('env_name', None)
 
@@ -13,6 +13,7 @@ from os.path import join
 from anaconda_project.requirements_registry.requirement import EnvVarRequirement, RequirementStatus
 from anaconda_project.conda_manager import new_conda_manager, CondaManagerError
 from anaconda_project.internal import conda_api
+from anaconda_project.internal.timings import timed
 
 
 class CondaEnvRequirement(EnvVarRequirement):
@@ -155,7 +156,8 @@ class CondaBootstrapEnvRequirement(CondaEnvRequirement):
     def _create_status_from_analysis(self, environ, local_state_file, default_env_spec_name, overrides,
                                      latest_provide_result, provider_class_name, status_getter):
         provider = self.registry.find_provider_by_class_name(provider_class_name)
-        analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
+        with timed('analyze'):
+            analysis = provider.analyze(self, environ, local_state_file, default_env_spec_name, overrides)
         (has_been_provided, status_description) = status_getter(environ, local_state_file, analysis)
 
         # hardcode bootstrap env name since it's a very especial case
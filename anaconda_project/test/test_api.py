@@ -62,7 +62,7 @@ def test_load_project(monkeypatch):
 
     monkeypatch.setattr('anaconda_project.project.Project', MockProject)
     p = api.AnacondaProject()
-    kwargs = dict(directory_path='foo', frontend=37)
+    kwargs = dict(directory_path='foo', frontend=37, compiled_cache=True)
     project = p.load_project(**kwargs)
     assert kwargs == project.kwargs
 
@@ -94,7 +94,8 @@ def _test_prepare_without_interaction(monkeypatch, api_method, provide_mode):
         env_spec_name='someenv',
         command_name='foo',
         command=1234,
-        extra_command_args=['1', '2'])
+        extra_command_args=['1', '2'],
+        use_fingerprint=True)
     result = getattr(p, api_method)(**kwargs)
     assert 42 == result
     assert params['kwargs']['mode'] == provide_mode
@@ -611,6 +612,25 @@ def test_clean(monkeypatch):
     assert kwargs == params['kwargs']
 
 
+def test_prepare_projects(monkeypatch):
+    import anaconda_project.project_ops as project_ops
+    _verify_args_match(api.AnacondaProject.prepare_projects, project_ops.prepare_projects)
+
+    params = dict(args=(), kwargs=dict())
+
+    def mock_prepare_projects(*args, **kwargs):
+        params['args'] = args
+        params['kwargs'] = kwargs
+        return 42
+
+    monkeypatch.setattr('anaconda_project.project_ops.prepare_projects', mock_prepare_projects)
+
+    p = api.AnacondaProject()
+    kwargs = dict(directory_path=43, environ=44, frontend=45, mode=46, env_spec_name=47, max_workers=48)
+    result = p.prepare_projects(**kwargs)
+    assert 42 == result
+    assert kwargs == params['kwargs']
+
 def test_archive(monkeypatch):
     import anaconda_project.project_ops as project_ops
     _verify_args_match(api.AnacondaProject.archive, project_ops.archive)
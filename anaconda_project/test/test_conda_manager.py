@@ -197,3 +197,27 @@ def test_lock_set_diff_and_equivalent():
 +     s
 +   win-64:
 +     j""" == new_lock_set.diff_from(None)
+
+
+def test_lock_set_with_package_urls():
+    url = 'https://example.com/linux-64/a-1.0-0.tar.bz2#' + 'a' * 32
+    lock_set = CondaLockSet({'all': ['a=1.0=0']}, platforms=['linux-64', 'win-64'],
+                            package_urls_by_platform={'linux-64': [url]})
+    assert [url] == lock_set.package_urls_for_platform('linux-64')
+    assert lock_set.package_urls_for_platform('win-64') is None
+    assert {
+        'locked': True,
+        'packages': {
+            'all': ['a=1.0=0']
+        },
+        'platforms': ['linux-64', 'win-64'],
+        'package_urls': {
+            'linux-64': [url]
+        }
+    } == lock_set.to_json()
+
+    without_urls = CondaLockSet({'all': ['a=1.0=0']}, platforms=['linux-64', 'win-64'])
+    assert not lock_set.equivalent_to(without_urls)
+    assert """  package_urls:
++   linux-64:
++     %s""" % url == lock_set.diff_from(without_urls)
@@ -424,3 +424,21 @@ def test_platforms_affect_hash():
 
     assert without_platforms_spec.logical_hash == without_platforms_spec.locked_hash
     assert without_platforms_spec.logical_hash == without_platforms_spec.import_hash
+
+
+def test_path(monkeypatch):
+    spec = EnvSpec(name="myenv", conda_packages=['a'], channels=[])
+    monkeypatch.delenv('ANACONDA_PROJECT_ENVS_PATH', raising=False)
+    monkeypatch.delenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', raising=False)
+    assert os.path.join('/project', 'envs', 'myenv') == spec.path('/project')
+
+    monkeypatch.setenv('ANACONDA_PROJECT_ENVS_PATH', '/envs')
+    assert os.path.join('/envs', 'myenv') == spec.path('/project')
+
+    # the shared store wins, and is shared by env specs with the same packages
+    monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', '/shared')
+    same_packages = EnvSpec(name="other", conda_packages=['a'], channels=[])
+    different_packages = EnvSpec(name="myenv", conda_packages=['b'], channels=[])
+    assert os.path.join(os.path.abspath('/shared'), spec.locked_hash) == spec.path('/project')
+    assert spec.path('/project') == same_packages.path('/other-project')
+    assert spec.path('/project') != different_packages.path('/project')
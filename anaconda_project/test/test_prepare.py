@@ -8,6 +8,7 @@
 from __future__ import absolute_import
 
 from copy import deepcopy
+import json
 import os
 import platform
 import pytest
@@ -24,6 +25,7 @@ from anaconda_project.prepare import (prepare_without_interaction, unprepare, pr
 from anaconda_project.project import Project
 from anaconda_project.project_file import DEFAULT_PROJECT_FILENAME
 from anaconda_project.project_commands import ProjectCommand
+from anaconda_project.provide import PROVIDE_MODE_CHECK
 from anaconda_project.requirements_registry.requirement import UserConfigOverrides
 from anaconda_project.conda_manager import (push_conda_manager_class, pop_conda_manager_class, CondaManager,
                                             CondaEnvironmentDeviations, CondaLockSet)
@@ -634,3 +636,607 @@ downloads:
 
 """
         }, check)
+
+
+class _FakeProvider(object):
+    def __init__(self, group=None):
+        self.group = group
+
+    def concurrency_group(self, requirement):
+        return self.group
+
+
+class _FakeRequirement(object):
+    def __init__(self, env_var):
+        self.env_var = env_var
+
+
+class _FakeStatus(object):
+    def __init__(self, env_var, depends_on=(), group=None):
+        self.requirement = _FakeRequirement(env_var)
+        self.provider = _FakeProvider(group)
+        self.depends_on = depends_on
+        self.latest_provide_result = None
+
+    def __repr__(self):
+        return self.requirement.env_var
+
+
+def test_provide_waves():
+    from anaconda_project.prepare import _provide_waves
+
+    env = _FakeStatus('CONDA_PREFIX', group='conda')
+    bootstrap = _FakeStatus('BOOTSTRAP_ENV_PREFIX', group='conda')
+    download = _FakeStatus('DATA', depends_on=('CONDA_PREFIX', ))
+    redis = _FakeStatus('REDIS_URL', depends_on=('CONDA_PREFIX', 'NOT_BEING_PROVIDED'))
+    other = _FakeStatus('OTHER', depends_on=('DATA', ))
+
+    waves = _provide_waves([bootstrap, env, download, redis, other], lambda status: status.depends_on)
+    assert [[[bootstrap, env]], [[download], [redis]], [[other]]] == waves
+
+    assert [] == _provide_waves([], lambda status: status.depends_on)
+
+
+def test_provide_concurrently(monkeypatch):
+    import threading
+    from anaconda_project.prepare import _provide_concurrently
+    from anaconda_project.internal.test.fake_frontend import FakeFrontend
+
+    monkeypatch.setenv('ANACONDA_PROJECT_PROVIDE_WORKERS', '4')
+
+    first = _FakeStatus('FIRST')
+    second = _FakeStatus('SECOND')
+    third = _FakeStatus('THIRD', depends_on=('FIRST', 'SECOND'))
+    started = dict(FIRST=threading.Event(), SECOND=threading.Event())
+    saw_other_running = dict()
+
+    def provide(status, environ, local_state, frontend):
+        name = status.requirement.env_var
+        frontend.info("%s one" % name)
+        if name in started:
+            started[name].set()
+            other = 'SECOND' if name == 'FIRST' else 'FIRST'
+            saw_other_running[name] = started[other].wait(10)
+            environ.pop('REMOVED_BY_' + name, None)
+        else:
+            assert 'first' == environ['FIRST']
+            assert 'second' == environ['SECOND']
+        environ[name] = name.lower()
+        local_state.set_value(['variables', name], name.lower())
+        frontend.info("%s two" % name)
+        return name + " result"
+
+    class LocalState(object):
+        def __init__(self):
+            self.values = dict()
+
+        def set_value(self, path, value):
+            self.values[tuple(path)] = value
+
+    local_state = LocalState()
+    frontend = FakeFrontend()
+    environ = dict(REMOVED_BY_FIRST='x', REMOVED_BY_SECOND='y', UNCHANGED='z')
+    results = _provide_concurrently([first, second, third], lambda status: status.depends_on, environ, local_state,
+                                    frontend, provide)
+
+    assert dict(FIRST=True, SECOND=True) == saw_other_running
+    assert {first: "FIRST result", second: "SECOND result", third: "THIRD result"} == results
+    assert dict(FIRST='first', SECOND='second', THIRD='third', UNCHANGED='z') == environ
+    assert 3 == len(local_state.values)
+    # output from each provider stays together, in status order
+    assert ["FIRST one", "FIRST two", "SECOND one", "SECOND two", "THIRD one", "THIRD two"] == frontend.logs
+
+
+def test_provide_concurrently_same_group_one_at_a_time():
+    from anaconda_project.prepare import _provide_concurrently
+    from anaconda_project.internal.test.fake_frontend import FakeFrontend
+
+    statuses = [_FakeStatus('A', group='conda'), _FakeStatus('B', group='conda'), _FakeStatus('C')]
+    seen = dict()
+
+    def provide(status, environ, local_state, frontend):
+        seen[status.requirement.env_var] = sorted(environ.keys())
+        environ[status.requirement.env_var] = 'done'
+
+    environ = dict()
+    _provide_concurrently(statuses, lambda status: status.depends_on, environ, None, FakeFrontend(), provide)
+    assert dict(A='done', B='done', C='done') == environ
+    # B runs after A in the same job, so sees its changes
+    assert dict(A=[], B=['A'], C=[]) == seen
+
+
+def test_prepare_computes_conda_deviations_once_or_twice():
+    from anaconda_project.internal.default_conda_manager import DefaultCondaManager
+
+    state = dict(calls=[])
+
+    class CountingCondaManager(DefaultCondaManager):
+        def _find_environment_deviations(self, prefix, spec):
+            state['calls'].append('find')
+            ok = os.path.isdir(os.path.join(prefix, 'conda-meta'))
+            return CondaEnvironmentDeviations(
+                summary="all good" if ok else "no env",
+                missing_packages=() if ok else ('python', ),
+                wrong_version_packages=(),
+                missing_pip_packages=(),
+                wrong_version_pip_packages=(),
+                broken=not ok)
+
+        def _fix_environment_deviations(self, prefix, spec, deviations, create):
+            assert deviations is not None
+            state['calls'].append('fix')
+            if not os.path.isdir(os.path.join(prefix, 'conda-meta')):
+                os.makedirs(os.path.join(prefix, 'conda-meta'))
+            with open(os.path.join(prefix, 'conda-meta', 'python-3.7-0.json'), 'w') as f:
+                f.write('{}')
+
+    def check(dirname):
+        push_conda_manager_class(CountingCondaManager)
+        try:
+            project = Project(dirname)
+            result = prepare_without_interaction(project, environ=minimal_environ())
+            assert result
+            # initial check (reused by the recheck and the fix), then after fixing
+            assert ['find', 'fix', 'find'] == state['calls']
+            assert 2 == result.deviation_counts['computed']
+            assert result.deviation_counts['reused'] >= 1
+
+            state['calls'] = []
+            result = prepare_without_interaction(project, environ=minimal_environ())
+            assert result
+            # the provider still calls fix, but there's nothing to do
+            assert ['find', 'fix'] == state['calls']
+            assert 1 == result.deviation_counts['computed']
+        finally:
+            pop_conda_manager_class()
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: ""}, check)
+
+
+def test_status_checker_rechecks_only_changed_inputs():
+    from anaconda_project.prepare import _StatusChecker
+    from anaconda_project.local_state_file import LocalStateFile
+    from anaconda_project.requirements_registry.provider import ProvideResult
+
+    checks = []
+
+    class ReadingRequirement(object):
+        def __init__(self, name, reads):
+            self.name = name
+            self.title = name
+            self.reads = reads
+
+        def check_status(self, environ, local_state_file, default_env_spec_name, overrides, latest_provide_result):
+            checks.append(self.name)
+            if self.reads is None:
+                values = dict(environ)
+            else:
+                values = [environ.get(name) for name in self.reads]
+            status = _FakeStatus(self.name, depends_on=values)
+            status.requirement = self
+            return status
+
+    def check(dirname):
+        local_state = LocalStateFile.load_for_directory(dirname)
+        checker = _StatusChecker(local_state, 'default', UserConfigOverrides())
+        environ = dict(FOO='foo', BAR='bar')
+        foo = checker.check(ReadingRequirement('foo', ['FOO']), environ)
+        everything = checker.check(ReadingRequirement('everything', None), environ)
+        assert dict(checked=2, avoided=0) == checker.counts
+
+        assert foo is checker.recheck(foo, environ)
+        assert everything is checker.recheck(everything, environ)
+        assert dict(checked=2, avoided=2) == checker.counts
+
+        # BAR isn't read by foo
+        environ['BAR'] = 'changed'
+        assert foo is checker.recheck(foo, environ)
+        everything = checker.recheck(everything, environ)
+        assert ['foo', 'everything', 'everything'] == checks
+
+        # a just-provided status is always checked again
+        foo = checker.recheck(foo, environ, latest_provide_result=ProvideResult.empty())
+        assert ['foo', 'everything', 'everything', 'foo'] == checks
+
+        # anything may depend on the local state
+        local_state.set_value(['variables', 'BAZ'], 'baz')
+        checker.recheck(foo, environ)
+        checker.recheck(everything, environ)
+        assert ['foo', 'everything', 'everything', 'foo', 'foo', 'everything'] == checks
+        assert dict(checked=6, avoided=3) == checker.counts
+
+        # something outside may have changed since the last pass
+        foo = checker.recheck(foo, environ)
+        assert foo is checker.recheck(foo, environ)
+        checker.begin_pass()
+        del checks[:]
+        assert foo is not checker.recheck(foo, environ)
+        assert ['foo'] == checks
+
+    with_directory_contents(dict(), check)
+
+
+def test_prepare_avoids_status_checks():
+    def check(dirname):
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            result = prepare_without_interaction(project, environ=minimal_environ())
+            assert result
+            # everything is checked initially, again at the start of
+            # the stage (something may have changed since), and again
+            # after being provided.
+            assert dict(checked=9, avoided=0) == result.status_check_counts
+
+            # BAR isn't provided (so the prepare fails), and nothing
+            # it reads changes during its stage, so it isn't checked
+            # again after providing FOO.
+            from anaconda_project.requirements_registry.requirements.conda_env import CondaEnvRequirement
+            result = prepare_without_interaction(project,
+                                                 environ=minimal_environ(),
+                                                 provide_whitelist=[CondaEnvRequirement, 'FOO'])
+            assert not result
+            assert dict(checked=8, avoided=1) == result.status_check_counts
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {default: foo}
+  BAR: {default: bar}
+"""
+        }, check)
+
+
+def test_prepare_records_timings():
+    def check(dirname):
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            result = prepare_without_interaction(project, environ=minimal_environ())
+            assert result
+            steps = set((entry['requirement'], entry['operation']) for entry in result.timings)
+            for name in ('FOO', 'CONDA_PREFIX'):
+                assert (name, 'check_status') in steps
+                assert (name, 'analyze') in steps
+                assert (name, 'provide') in steps
+            assert all(entry['seconds'] >= 0 for entry in result.timings)
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {default: foo}
+"""
+        }, check)
+
+
+def test_async_prepare_without_interaction(monkeypatch):
+    import threading
+    from tornado import gen
+    from tornado.ioloop import IOLoop
+    from anaconda_project.prepare import async_prepare_without_interaction
+
+    loop_thread = threading.current_thread()
+    download_threads = []
+
+    @gen.coroutine
+    def mock_downloader_run(self):
+        download_threads.append(threading.current_thread())
+        yield gen.moment
+
+        class Res:
+            pass
+
+        res = Res()
+        res.code = 200
+        with open(self._filename, 'w') as out:
+            out.write('data')
+        raise gen.Return(res)
+
+    monkeypatch.setattr("anaconda_project.internal.http_client.FileDownloader.run", mock_downloader_run)
+
+    def check(dirname):
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            result = IOLoop.current().run_sync(
+                lambda: async_prepare_without_interaction(project, environ=minimal_environ()))
+            assert result.errors == []
+            assert result
+            assert os.path.join(dirname, 'data.csv') == result.environ['DATAFILE']
+            # the download ran on our IOLoop, not a private one
+            assert [loop_thread] == download_threads
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+downloads:
+  DATAFILE:
+    url: http://localhost/data.csv
+    filename: data.csv
+"""
+        }, check)
+
+
+def test_async_prepare_in_stages():
+    from tornado import gen
+    from tornado.ioloop import IOLoop
+    from anaconda_project.prepare import async_prepare_in_stages
+
+    @gen.coroutine
+    def prepare(project):
+        stage = yield async_prepare_in_stages(project, environ=minimal_environ(FOO='bar'))
+        descriptions = []
+        while stage is not None:
+            descriptions.append(stage.description_of_action)
+            next_stage = yield stage.execute_coroutine()
+            result = stage.result
+            stage = next_stage
+        raise gen.Return((descriptions, result))
+
+    def check(dirname):
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            (descriptions, result) = IOLoop.current().run_sync(lambda: prepare(project))
+            assert result
+            assert 'bar' == result.environ['FOO']
+            assert len(descriptions) > 0
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {}
+"""}, check)
+
+
+def test_prepare_rechecks_status_changed_outside_before_providing(monkeypatch):
+    from anaconda_project.requirements_registry.providers.conda_env import CondaEnvProvider
+
+    state = dict(fixed_env=False)
+    provided_with = []
+
+    def mock_read_config(self, requirement, environ, local_state_file, default_env_spec_name, overrides):
+        # stands in for anything outside prepare which the check
+        # looks at, such as the filesystem
+        config = real_read_config(self, requirement, environ, local_state_file, default_env_spec_name, overrides)
+        config['outside'] = state['fixed_env']
+        return config
+
+    def mock_provide(self, requirement, context):
+        provided_with.append(context.status.analysis.config['outside'])
+        return real_provide(self, requirement, context)
+
+    real_read_config = CondaEnvProvider.read_config
+    real_provide = CondaEnvProvider.provide
+    monkeypatch.setattr(CondaEnvProvider, 'read_config', mock_read_config)
+    monkeypatch.setattr(CondaEnvProvider, 'provide', mock_provide)
+
+    def check(dirname):
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            stage = prepare_in_stages(project, environ=minimal_environ())
+            assert [False] == [status.analysis.config['outside'] for status in stage.statuses_before_execute]
+
+            # something changes between the initial check and providing
+            state['fixed_env'] = True
+            while stage is not None:
+                next_stage = stage.execute()
+                result = stage.result
+                stage = next_stage
+            assert result
+            assert [True] == provided_with
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file({DEFAULT_PROJECT_FILENAME: ""}, check)
+
+
+def test_prepare_reuses_fingerprint(monkeypatch):
+    def check(dirname):
+        _monkeypatch_download_file(monkeypatch, dirname, filename='data.csv')
+        try:
+            _push_fake_env_creator()
+            project = Project(dirname)
+            environ = minimal_environ()
+
+            first = prepare_without_interaction(project, environ=environ, use_fingerprint=True)
+            assert first.errors == []
+            assert len(first.statuses) > 0
+
+            from anaconda_project.requirements_registry.requirements.download import DownloadRequirement
+            real_check_status = DownloadRequirement.check_status
+
+            def no_check_status(*args, **kwargs):
+                raise AssertionError("should not have checked requirements")
+
+            monkeypatch.setattr(DownloadRequirement, 'check_status', no_check_status)
+            second = prepare_without_interaction(project, environ=environ, use_fingerprint=True)
+            monkeypatch.setattr(DownloadRequirement, 'check_status', real_check_status)
+
+            assert second
+            assert () == second.statuses
+            assert first.environ == second.environ
+            assert first.env_spec_name == second.env_spec_name
+            assert first.command_exec_info.args == second.command_exec_info.args
+            assert dict(computed=0, reused=0) == second.deviation_counts
+
+            # not used unless asked for
+            assert len(prepare_without_interaction(project, environ=environ).statuses) > 0
+            # not used when only checking
+            assert len(
+                prepare_without_interaction(project, environ=environ, mode=PROVIDE_MODE_CHECK,
+                                            use_fingerprint=True).statuses) > 0
+
+            # a different input environment
+            changed = minimal_environ(FOO='bar')
+            assert len(prepare_without_interaction(project, environ=changed, use_fingerprint=True).statuses) > 0
+
+            # the downloaded file changed
+            with open(os.path.join(dirname, 'data.csv'), 'w') as f:
+                f.write('different data')
+            assert len(prepare_without_interaction(project, environ=environ, use_fingerprint=True).statuses) > 0
+            assert () == prepare_without_interaction(project, environ=environ, use_fingerprint=True).statuses
+
+            # the project file changed
+            project.project_file.set_value('description', 'changed')
+            project.project_file.save()
+            assert len(prepare_without_interaction(project, environ=environ, use_fingerprint=True).statuses) > 0
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+downloads:
+  DATAFILE:
+    url: http://example.com/data.csv
+    filename: data.csv
+variables:
+  FOO: {default: foo}
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+"""
+        }, check)
+
+
+def test_prepare_checks_only_command_requirements():
+    def check(dirname):
+        _push_fake_env_creator()
+        try:
+            project = Project(dirname)
+            assert [] == project.problems
+            environ = minimal_environ()
+
+            def checked(result):
+                return sorted(status.requirement.env_var for status in result.statuses)
+
+            result = prepare_without_interaction(project, environ=environ, command_name='scoped')
+            assert result
+            assert ['CONDA_PREFIX', 'FOO'] == checked(result)
+            assert 'foo' == result.environ['FOO']
+            assert 'BAR' not in result.environ
+
+            # we check everything when "scoped" is only the default,
+            # for commands without requirements, and with provide_whitelist
+            for kwargs in (dict(), dict(command_name='all'), dict(command_name='scoped', provide_whitelist=['FOO'])):
+                assert ['BAR', 'CONDA_PREFIX', 'FOO'] == checked(prepare_without_interaction(project, environ=environ,
+                                                                                             **kwargs))
+
+            # a scoped prepare doesn't stand in for a full one
+            scoped = prepare_without_interaction(project, environ=environ, command_name='scoped', use_fingerprint=True)
+            assert ['CONDA_PREFIX', 'FOO'] == checked(scoped)
+            assert () == prepare_without_interaction(project, environ=environ, command_name='scoped',
+                                                     use_fingerprint=True).statuses
+            full = prepare_without_interaction(project, environ=environ, use_fingerprint=True)
+            assert ['BAR', 'CONDA_PREFIX', 'FOO'] == checked(full)
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {default: foo}
+  BAR: {default: bar}
+commands:
+  scoped:
+    unix: echo hello
+    windows: echo hello
+    requirements: [FOO]
+  all:
+    unix: echo hello
+    windows: echo hello
+"""
+        }, check)
+
+
+def test_prepare_writes_events(monkeypatch):
+    def check(dirname):
+        _monkeypatch_download_file(monkeypatch, dirname, filename='data.csv')
+        events_filename = os.path.join(dirname, 'events.jsonl')
+
+        def read_events():
+            with open(events_filename) as f:
+                events = [json.loads(line) for line in f.read().splitlines()]
+            os.remove(events_filename)
+            return events
+
+        _push_fake_env_creator()
+        try:
+            project = Project(dirname)
+            environ = minimal_environ(ANACONDA_PROJECT_PREPARE_EVENTS=events_filename)
+            result = prepare_without_interaction(project, environ=environ, use_fingerprint=True)
+            assert result
+
+            events = read_events()
+            names = [event['event'] for event in events]
+            assert 'prepare_started' == names[0]
+            assert dirname == events[0]['project']
+            assert 'stage_started' in names
+            assert [True] == [event['last'] for event in events if event['event'] == 'stage_finished'][-1:]
+            assert 'DATAFILE' in [event['requirement'] for event in events if event['event'] == 'step_finished']
+            (downloaded, ) = [event for event in events if event['event'] == 'download_finished']
+            assert 'http://example.com/data.csv' == downloaded['url']
+            assert sorted(event['time'] for event in events) == [event['time'] for event in events]
+
+            # the events variable doesn't affect the fingerprint
+            assert () == prepare_without_interaction(project, environ=environ, use_fingerprint=True).statuses
+            assert ['prepare_reused_fingerprint'] == [event['event'] for event in read_events()]
+        finally:
+            _pop_fake_env_creator()
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+downloads:
+  DATAFILE:
+    url: http://example.com/data.csv
+    filename: data.csv
+"""
+        }, check)
+
+
+def test_prepare_fingerprint_not_used_with_dead_service(monkeypatch):
+    from anaconda_project.prepare import _service_is_alive
+
+    attempts = []
+
+    def mock_can_connect_to_socket(host, port, timeout_seconds=0.5):
+        attempts.append((host, port))
+        return port == 6379
+
+    monkeypatch.setattr('anaconda_project.requirements_registry.network_util.can_connect_to_socket',
+                        mock_can_connect_to_socket)
+
+    assert _service_is_alive("redis://localhost:6379")
+    assert not _service_is_alive("redis://localhost:6380")
+    assert not _service_is_alive("redis://localhost")
+    assert not _service_is_alive("not a url")
+    assert [('localhost', 6379), ('localhost', 6380)] == attempts
+
+
+def test_prepare_fingerprint_skips_encrypted_variables(monkeypatch):
+    from anaconda_project.prepare import _fingerprint_inputs, _prepare_environ_and_overrides
+
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        (environ, overrides) = _prepare_environ_and_overrides(project, minimal_environ())
+        assert _fingerprint_inputs(project, environ, overrides, 'development', None, False) is None
+
+    with_directory_contents_completing_project_file(
+        {DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO_PASSWORD: {}
+"""}, check)
@@ -316,10 +316,10 @@ def test_project_dir_not_readable(monkeypatch):
         project_dir = os.path.join(dirname, 'foo')
         os.makedirs(project_dir)
 
-        def mock_os_walk(dirname):
+        def mock_os_listdir(dirname):
             raise OSError("NOPE")
 
-        monkeypatch.setattr('os.walk', mock_os_walk)
+        monkeypatch.setattr('os.listdir', mock_os_listdir)
 
         project = Project(project_dir)
 
@@ -1326,6 +1326,58 @@ commands:
     }, check)
 
 
+def test_command_requirements():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        assert [] == project.problems
+        assert ['FOO'] == project.command_for_name('scoped').requirements
+        assert project.command_for_name('all').requirements is None
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {}
+commands:
+  scoped:
+    unix: bar
+    requirements: [FOO]
+  all:
+    unix: bar
+"""
+        }, check)
+
+
+def test_command_with_bad_requirements():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        expected_errors = [
+            "%s: 'requirements' field of command a must be a list of environment variable names",
+            "%s: command b requires BAR, which is not a variable, service or download in this project",
+            "%s: command c requires CONDA_PREFIX, which is not a variable, service or download in this project"
+        ]
+        expected_errors = list(map(lambda e: e % project.project_file.basename, expected_errors))
+        assert expected_errors == project.problems
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+variables:
+  FOO: {}
+commands:
+  a:
+    unix: bar
+    requirements: FOO
+  b:
+    unix: bar
+    requirements: [FOO, BAR]
+  c:
+    unix: bar
+    requirements: [CONDA_PREFIX]
+"""
+        }, check)
+
+
 def test_command_with_bogus_key_and_ok_key():
     def check_app_entry(dirname):
         project = project_no_dedicated_env(dirname)
@@ -3432,6 +3484,38 @@ env_specs:
         }, check)
 
 
+def test_lock_file_has_package_urls():
+    def check(dirname):
+        project = project_no_dedicated_env(dirname)
+        filename = project.lock_file.basename
+        assert ["%s: invalid package URL (should end in #<md5>): https://example.com/osx-64/a-1.0-0.tar.bz2" %
+                filename] == project.problems
+
+        lock_set = project.env_specs['default'].lock_set
+        assert [
+            "https://example.com/linux-64/a-1.0-0.tar.bz2#0123456789abcdef0123456789abcdef"
+        ] == lock_set.package_urls_for_platform('linux-64')
+        assert lock_set.package_urls_for_platform('osx-64') is None
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_LOCK_FILENAME:
+            """
+env_specs:
+  default:
+    platforms: [linux-64,osx-64]
+    packages:
+      all:
+        - a=1.0=0
+    package_urls:
+      linux-64:
+        - https://example.com/linux-64/a-1.0-0.tar.bz2#0123456789abcdef0123456789abcdef
+      osx-64:
+        - https://example.com/osx-64/a-1.0-0.tar.bz2
+"""
+        }, check)
+
+
 def test_lock_file_has_pip_packages():
     def check(dirname):
         project = project_no_dedicated_env(dirname)
@@ -3693,3 +3777,212 @@ env_specs:
 locking_enabled: true
 """
     }, check)
+
+
+_compiled_project_file = """
+name: compiled
+description: "A project"
+variables:
+  FOO: {default: bar}
+downloads:
+  DATAFILE: http://example.com/data.csv
+env_specs:
+  default:
+    packages: [python]
+    channels: []
+platforms: [linux-64, osx-64, win-64]
+commands:
+  default:
+    unix: echo hello
+    windows: echo hello
+"""
+
+
+@pytest.mark.skipif(sys.version_info[0] < 3, reason="compiled snapshots need Python 3")
+def test_project_from_compiled_cache():
+    def summary(project):
+        return (project.problems, project.suggestions, project.name, project.description,
+                sorted(project.commands.keys()), sorted(project.env_specs.keys()),
+                [req.env_var for req in project.requirements(None)],
+                project.env_specs['default'].lock_set.package_specs_for_current_platform)
+
+    def check(dirname):
+        project = Project(dirname)
+        env_spec_hash = project.env_specs['default'].logical_hash
+        project.lock_file.set_value(['env_specs', 'default', 'env_spec_hash'], env_spec_hash)
+        project.lock_file.save()
+        expected = summary(Project(dirname))
+        assert ([], []) == expected[:2]
+
+        # the first load saves a snapshot, the second uses it
+        project = Project(dirname, compiled_cache=True)
+        assert expected == summary(project)
+        assert project.project_file.is_loaded
+        project = Project(dirname, compiled_cache=True)
+        assert expected == summary(project)
+        assert not project.project_file.is_loaded
+        assert not project.lock_file.is_loaded
+        assert project.requirements(None)[0].registry is project.plugin_registry
+
+        # the files are loaded on demand, and in-memory changes are noticed
+        project.project_file.set_value('name', 'changed')
+        project.use_changes_without_saving()
+        assert 'changed' == project.name
+
+        # notebook suggestions aren't in the snapshot
+        with open(os.path.join(dirname, 'foo.ipynb'), 'w') as f:
+            f.write('{}')
+        project = Project(dirname, compiled_cache=True)
+        assert ['anaconda-project.yml: No command runs notebook foo.ipynb'] == project.suggestions
+        assert not project.project_file.is_loaded
+        os.remove(os.path.join(dirname, 'foo.ipynb'))
+
+        # a changed file means a new snapshot
+        project.project_file.set_value('description', 'Another project')
+        project.project_file.save()
+        project = Project(dirname, compiled_cache=True)
+        assert 'Another project' == project.description
+        assert project.project_file.is_loaded
+        project = Project(dirname, compiled_cache=True)
+        assert 'Another project' == project.description
+        assert not project.project_file.is_loaded
+
+    with_directory_contents(
+        {
+            DEFAULT_PROJECT_FILENAME: _compiled_project_file,
+            DEFAULT_PROJECT_LOCK_FILENAME: """
+locking_enabled: true
+env_specs:
+  default:
+    locked: true
+    platforms: [linux-64, osx-64, win-64]
+    packages:
+      all: [python=3.6.0=0]
+"""
+        }, check)
+
+
+def test_project_from_compiled_cache_can_still_be_changed():
+    def check(dirname):
+        expected = Project(dirname)
+        # no snapshot yet, so the files are parsed for reading
+        project = Project(dirname, compiled_cache=True)
+        assert [] == project.problems
+        assert sorted(expected.commands.keys()) == sorted(project.commands.keys())
+        assert expected.env_specs['default'].logical_hash == project.env_specs['default'].logical_hash
+
+        commands = project.project_file.get_value('commands')
+        commands['bye'] = dict(unix='echo bye')
+        project.use_changes_without_saving()
+        assert ['bye', 'default'] == sorted(project.commands.keys())
+        project.save()
+
+        with open(os.path.join(dirname, DEFAULT_PROJECT_FILENAME)) as f:
+            assert "# the default command" in f.read()
+        assert ['bye', 'default'] == sorted(Project(dirname).commands.keys())
+
+    with_directory_contents({DEFAULT_PROJECT_FILENAME: _compiled_project_file + "    # the default command\n"}, check)
+
+
+@pytest.mark.skipif(sys.version_info[0] < 3, reason="compiled snapshots need Python 3")
+def test_project_with_problems_not_compiled():
+    def check(dirname):
+        for i in range(2):
+            project = Project(dirname, compiled_cache=True)
+            assert ("anaconda-project.yml: variables section contains wrong value type 42, " +
+                    "should be dict or list of requirements") in project.problems
+            assert project.project_file.is_loaded
+
+    with_directory_contents({DEFAULT_PROJECT_FILENAME: "name: broken\nvariables: 42\n"}, check)
+
+
+def test_update_redoes_only_steps_whose_sections_changed(monkeypatch):
+    def check(dirname):
+        from anaconda_project.project import _ConfigCache
+        counts = dict(env_specs=0, commands=0)
+
+        def counting(name, method):
+            def wrapped(*args, **kwargs):
+                counts[name] += 1
+                return method(*args, **kwargs)
+
+            return wrapped
+
+        monkeypatch.setattr(_ConfigCache, '_update_env_specs', counting('env_specs', _ConfigCache._update_env_specs))
+        monkeypatch.setattr(_ConfigCache, '_update_commands', counting('commands', _ConfigCache._update_commands))
+
+        def summary(project):
+            return (project.problems, project.suggestions, project.name, project.description,
+                    sorted(project.commands.keys()), sorted(project.env_specs.keys()),
+                    sorted(req.env_var for req in project.requirements(None)))
+
+        project = Project(dirname)
+        assert [] == project.problems
+        assert dict(env_specs=1, commands=1) == counts
+
+        # touching commands doesn't rebuild the env specs
+        project.project_file.set_value(['commands', 'other'], dict(unix='echo other'))
+        project.use_changes_without_saving()
+        assert ['default', 'other'] == sorted(project.commands.keys())
+        assert dict(env_specs=1, commands=2) == counts
+
+        # nor does touching the name, which doesn't affect commands either
+        project.project_file.set_value('name', 'renamed')
+        project.use_changes_without_saving()
+        assert 'renamed' == project.name
+        assert dict(env_specs=1, commands=2) == counts
+
+        # changes made in place are noticed too, and commands
+        # are redone since they depend on the env specs
+        project.project_file.get_value(['env_specs', 'default', 'packages']).append('numpy')
+        project.use_changes_without_saving()
+        assert ('numpy' in project.env_specs['default'].conda_package_names_set)
+        assert dict(env_specs=2, commands=3) == counts
+
+        # a bad change leaves us just as a fresh load would
+        project.project_file.set_value(['variables', 'FOO'], 42)
+        project.use_changes_without_saving()
+        project.project_file.save()
+        updated = summary(project)
+        assert 2 == counts['env_specs']
+        assert summary(Project(dirname)) == updated
+
+        # reverting redoes everything
+        project.load()
+        reverted = summary(project)
+        assert 4 == counts['env_specs']
+        assert summary(Project(dirname)) == reverted
+
+    with_directory_contents({DEFAULT_PROJECT_FILENAME: _compiled_project_file}, check)
+
+
+def test_update_notices_new_notebooks(monkeypatch):
+    def check(dirname):
+        from anaconda_project.project import _ConfigCache
+        counts = dict(commands=0)
+        update_commands = _ConfigCache._update_commands
+
+        def counting_update_commands(*args, **kwargs):
+            counts['commands'] += 1
+            return update_commands(*args, **kwargs)
+
+        monkeypatch.setattr(_ConfigCache, '_update_commands', counting_update_commands)
+
+        project = Project(dirname)
+        assert [] == project.suggestions
+
+        with open(os.path.join(dirname, 'new.ipynb'), 'w') as f:
+            f.write('{}')
+
+        # an edit that doesn't redo the commands still looks for notebooks
+        project.project_file.set_value('name', 'renamed')
+        project.use_changes_without_saving()
+        assert 1 == counts['commands']
+        assert ["%s: No command runs notebook new.ipynb" % project.project_file.basename] == project.suggestions
+
+        project.suggestion_objects[0].fix(project)
+        project.use_changes_without_saving()
+        assert 'new.ipynb' in project.commands
+        assert not any('No command runs notebook' in suggestion for suggestion in project.suggestions)
+
+    with_directory_contents({DEFAULT_PROJECT_FILENAME: _compiled_project_file}, check)
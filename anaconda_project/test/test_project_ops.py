@@ -13,6 +13,8 @@ from tornado import gen
 import platform
 import pytest
 import tarfile
+import threading
+import time
 import zipfile
 
 from anaconda_project import project_ops
@@ -20,6 +22,7 @@ from anaconda_project.conda_manager import (CondaManager, CondaEnvironmentDeviat
                                             push_conda_manager_class, pop_conda_manager_class)
 from anaconda_project.project import Project
 import anaconda_project.prepare as prepare
+import anaconda_project.provide as provide
 from anaconda_project.internal.test.tmpfile_utils import (with_directory_contents, with_temporary_script_commandline,
                                                           with_directory_contents_completing_project_file,
                                                           complete_project_file_content)
@@ -33,6 +36,7 @@ from anaconda_project.internal.test.test_conda_api import monkeypatch_conda_not_
 from anaconda_project.test.fake_server import fake_server
 import anaconda_project.internal.keyring as keyring
 import anaconda_project.internal.conda_api as conda_api
+import anaconda_project.internal.env_store as env_store
 import anaconda_project.internal.plugins as plugins_api
 
 
@@ -1800,6 +1804,48 @@ env_specs:
     }, check)
 
 
+def test_remove_env_spec_with_shared_env(monkeypatch):
+    def check(dirname):
+        store_dir = os.path.join(dirname, 'store')
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+
+        def attempt():
+            project = Project(dirname)
+            env = project.env_specs['hello']
+            prefix = env.path(project.directory_path)
+            assert os.path.join(store_dir, env.locked_hash) == prefix
+            os.makedirs(os.path.join(prefix, 'conda-meta'))
+            store = env_store.shared_env_store()
+            store.add_reference(env.locked_hash, project.directory_path, 'hello')
+
+            status = project_ops.remove_env_spec(project, name='hello')
+            assert [] == status.errors
+            assert status.status_description == "Environment %s is shared, no longer using it from %s." % (
+                prefix, project.directory_path)
+            assert status
+
+            assert 'hello' not in project.env_specs
+            # other projects may still use it, so it's only removed by gc
+            assert os.path.isdir(prefix)
+            assert [] == store.references(env.locked_hash)
+
+        _with_conda_test(attempt)
+
+    with_directory_contents_completing_project_file(
+        {
+            DEFAULT_PROJECT_FILENAME: """
+name: foo
+env_specs:
+  hello:
+   packages:
+     - a
+  another:
+   packages:
+     - b
+    """
+        }, check)
+
+
 def test_remove_only_env_spec():
     def check(dirname):
         def attempt():
@@ -3054,6 +3100,140 @@ env_specs:
     }, check)
 
 
+def test_lock_solves_identical_env_specs_once_and_concurrently(monkeypatch):
+    monkeypatch.setenv('ANACONDA_PROJECT_LOCK_WORKERS', '4')
+
+    def check(dirname):
+        lock = threading.Lock()
+        calls = []
+        counts = dict(running=0, max_running=0)
+
+        class ConcurrentCondaManager(CondaManager):
+            def __init__(self, frontend):
+                self.frontend = frontend
+
+            def resolve_dependencies(self, package_specs, channels, platforms):
+                with lock:
+                    calls.append(package_specs)
+                    counts['running'] += 1
+                    counts['max_running'] = max(counts['max_running'], counts['running'])
+                self.frontend.info("Solving %s" % ",".join(package_specs))
+                # make the first solve finish last
+                time.sleep(0.1 if package_specs == ('a', ) else 0.01)
+                with lock:
+                    counts['running'] -= 1
+                return CondaLockSet({'all': ["%s=1.0=0" % p for p in package_specs]}, platforms=platforms)
+
+            def find_environment_deviations(self, prefix, spec):
+                return CondaEnvironmentDeviations(
+                    summary="fixed",
+                    missing_packages=(),
+                    wrong_version_packages=(),
+                    missing_pip_packages=(),
+                    wrong_version_pip_packages=())
+
+            def fix_environment_deviations(self, prefix, spec, deviations=None, create=True):
+                pass
+
+            def remove_packages(self, prefix, packages):
+                pass
+
+        push_conda_manager_class(ConcurrentCondaManager)
+        try:
+            project = Project(dirname, frontend=FakeFrontend())
+            status = project_ops.lock(project, env_spec_name=None)
+            assert [] == status.errors
+            assert status
+        finally:
+            pop_conda_manager_class()
+
+        # "a_child" has the same solver inputs as "a"
+        assert 2 == len(calls)
+        assert 2 == counts['max_running']
+
+        # output is in env spec order, and the solve output only
+        # shows up once per distinct solve
+        logs = [line for line in project.frontend.logs if line.startswith('Solving') or line.startswith('Added')]
+        assert [
+            'Solving a', 'Added locked dependencies for env spec a to anaconda-project-lock.yml.',
+            'Added locked dependencies for env spec a_child to anaconda-project-lock.yml.', 'Solving a,b',
+            'Added locked dependencies for env spec b to anaconda-project-lock.yml.'
+        ] == logs
+
+        assert ('a=1.0=0', ) == project.env_specs['a'].lock_set.package_specs_for_current_platform
+        assert ('a=1.0=0', ) == project.env_specs['a_child'].lock_set.package_specs_for_current_platform
+        assert ('a=1.0=0', 'b=1.0=0') == project.env_specs['b'].lock_set.package_specs_for_current_platform
+        # each env spec has its own hash even though they were solved together
+        assert project.env_specs['a'].lock_set.env_spec_hash == project.env_specs['a'].logical_hash
+        assert project.env_specs['a_child'].lock_set.env_spec_hash == project.env_specs['a_child'].logical_hash
+
+    with_directory_contents({
+        DEFAULT_PROJECT_FILENAME:
+        """
+name: locktest
+platforms: [linux-64,osx-64,win-64]
+env_specs:
+  a:
+    packages:
+      - a
+  a_child:
+    inherit_from: a
+  b:
+    inherit_from: a
+    packages:
+      - b
+"""
+    }, check)
+
+
+def test_lock_reports_first_failed_env_spec(monkeypatch):
+    def check(dirname):
+        class FailingCondaManager(CondaManager):
+            def __init__(self, frontend):
+                pass
+
+            def resolve_dependencies(self, package_specs, channels, platforms):
+                if package_specs == ('a', ):
+                    # the first env fails last
+                    time.sleep(0.05)
+                raise CondaManagerError("failed %s" % ",".join(package_specs))
+
+            def find_environment_deviations(self, prefix, spec):
+                pass  # pragma: no cover
+
+            def fix_environment_deviations(self, prefix, spec, deviations=None, create=True):
+                pass  # pragma: no cover
+
+            def remove_packages(self, prefix, packages):
+                pass  # pragma: no cover
+
+        push_conda_manager_class(FailingCondaManager)
+        try:
+            project = Project(dirname, frontend=FakeFrontend())
+            status = project_ops.lock(project, env_spec_name=None)
+        finally:
+            pop_conda_manager_class()
+
+        assert not status
+        assert "Error resolving dependencies for a: failed a." == status.status_description
+        assert not os.path.isfile(os.path.join(dirname, DEFAULT_PROJECT_LOCK_FILENAME))
+
+    with_directory_contents({
+        DEFAULT_PROJECT_FILENAME:
+        """
+name: locktest
+platforms: [linux-64,osx-64,win-64]
+env_specs:
+  a:
+    packages:
+      - a
+  b:
+    packages:
+      - b
+"""
+    }, check)
+
+
 def test_update_empty_lock_sets():
     def check(dirname):
         resolve_results = {'all': ['a=1.0=1']}
@@ -3487,6 +3667,111 @@ def check_cleaned(dirname, envs_dirname="envs"):
     assert not os.path.isdir(os.path.join(dirname, "services"))
 
 
+def test_gc_shared_envs_not_enabled():
+    status = project_ops.gc_shared_envs()
+    assert not status
+    assert "No shared environment store; set ANACONDA_PROJECT_SHARED_ENVS_PATH to enable it." == \
+        status.status_description
+
+
+def test_gc_shared_envs(monkeypatch):
+    def check(dirname):
+        store_dir = os.path.join(dirname, 'store')
+        monkeypatch.setenv('ANACONDA_PROJECT_SHARED_ENVS_PATH', store_dir)
+        store = env_store.shared_env_store()
+        store.add_reference('used', dirname, 'default')
+        os.utime(store._last_used_file('used'), (1000, 1000))
+        # created long enough ago that they can't be being created now
+        for locked_hash in store.locked_hashes():
+            os.utime(os.path.join(store.prefix(locked_hash), 'conda-meta'), (100, 100))
+
+        frontend = FakeFrontend()
+        status = project_ops.gc_shared_envs(frontend=frontend)
+        assert status
+        assert ["Removing %s (not used by any project)." % os.path.join(store_dir, 'unused')] == frontend.logs
+        assert ['used'] == store.locked_hashes()
+
+        status = project_ops.gc_shared_envs(frontend=frontend, max_age=1000)
+        assert status
+        assert ['Removed 1 environments from %s.' % store_dir] == [status.status_description]
+        assert [] == store.locked_hashes()
+
+    with_directory_contents({
+        'store/used/conda-meta/a-1.0-0.json': '{}',
+        'store/unused/conda-meta/a-1.0-0.json': '{}'
+    }, check)
+
+
+def test_find_project_directories():
+    def check(dirname):
+        assert [os.path.join(dirname, 'a'), os.path.join(dirname, 'b', 'c')] == \
+            project_ops.find_project_directories(dirname)
+
+    with_directory_contents({
+        'a/' + DEFAULT_PROJECT_FILENAME: '',
+        'a/nested/' + DEFAULT_PROJECT_FILENAME: '',
+        'b/c/kapsel.yml': '',
+        'b/.hidden/' + DEFAULT_PROJECT_FILENAME: '',
+        'envs/d/' + DEFAULT_PROJECT_FILENAME: '',
+        'e/README': ''
+    }, check)
+
+
+def _batch_project_file(package, url):
+    return complete_project_file_content("""
+packages: [%s]
+downloads:
+  DATAFILE:
+    url: %s
+    filename: data.csv
+""" % (package, url))
+
+
+def test_prepare_projects_shares_work(monkeypatch):
+    def check(dirname):
+        calls = []
+        lock = threading.Lock()
+
+        def mock_prepare_without_interaction(project, environ, mode, env_spec_name):
+            filename = os.path.join(project.directory_path, 'data.csv')
+            already_downloaded = os.path.exists(filename)
+            if not already_downloaded:
+                with open(filename, 'w') as f:
+                    f.write(project.directory_path)
+            project.frontend.info("preparing " + os.path.basename(project.directory_path))
+            with lock:
+                calls.append((os.path.basename(project.directory_path), already_downloaded, mode))
+            return "result"
+
+        monkeypatch.setattr('anaconda_project.prepare.prepare_without_interaction', mock_prepare_without_interaction)
+
+        frontend = FakeFrontend()
+        results = project_ops.prepare_projects(
+            dirname, environ=dict(), frontend=frontend, mode=provide.PROVIDE_MODE_PRODUCTION, max_workers=2)
+
+        assert ['a', 'b', 'c'] == [os.path.basename(project.directory_path) for (project, result) in results]
+        assert ['result'] * 3 == [result for (project, result) in results]
+
+        # b has the same env and download as a, so it waits for a
+        # and copies the download; c has nothing in common.
+        assert [('b', True, provide.PROVIDE_MODE_PRODUCTION)] == calls[2:]
+        assert [('a', False), ('c', False)] == sorted((name, downloaded) for (name, downloaded, mode) in calls[:2])
+        with open(os.path.join(dirname, 'b', 'data.csv')) as f:
+            assert os.path.join(dirname, 'a') == f.read()
+
+        assert [
+            "Project %s:" % os.path.join(dirname, 'a'), "preparing a",
+            "Project %s:" % os.path.join(dirname, 'c'), "preparing c",
+            "Project %s:" % os.path.join(dirname, 'b'), "preparing b"
+        ] == frontend.logs
+
+    with_directory_contents({
+        'a/' + DEFAULT_PROJECT_FILENAME: _batch_project_file('numpy', 'http://example.com/data.csv'),
+        'b/' + DEFAULT_PROJECT_FILENAME: _batch_project_file('numpy', 'http://example.com/data.csv'),
+        'c/' + DEFAULT_PROJECT_FILENAME: _batch_project_file('scipy', 'http://example.com/other.csv')
+    }, check)
+
+
 def test_clean(monkeypatch):
     def mock_create(prefix, pkgs, channels, stdout_callback, stderr_callback):
         os.makedirs(os.path.join(prefix, "conda-meta"))
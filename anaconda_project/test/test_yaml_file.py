@@ -5,7 +5,7 @@
 # Licensed under the terms of the BSD 3-Clause License.
 # The full license is in the file LICENSE.txt, distributed with this software.
 # -----------------------------------------------------------------------------
-from anaconda_project.yaml_file import YamlFile
+from anaconda_project.yaml_file import YamlFile, _fast_load_string, _load_string
 from anaconda_project.internal.test.tmpfile_utils import with_file_contents, with_directory_contents
 
 import errno
@@ -37,6 +37,120 @@ a:
 """, check_abc)
 
 
+def test_defer_load_yaml_file():
+    def check_abc(filename):
+        yaml = YamlFile(filename, defer_load=True)
+        assert not yaml.is_loaded
+        assert yaml.change_count == 1
+        # the file is read when something needs it
+        with open(filename, 'w') as f:
+            f.write("a:\n  b: d\n")
+        assert "d" == yaml.get_value(["a", "b"])
+        assert yaml.is_loaded
+        assert yaml.change_count == 1
+        assert not yaml.has_unsaved_changes
+
+        yaml = YamlFile(filename, defer_load=True)
+        yaml.set_value(["a", "b"], "e")
+        yaml.save()
+        assert yaml.change_count == 2
+        assert "e" == YamlFile(filename).get_value(["a", "b"])
+
+    with_file_contents("""
+a:
+  b: c
+""", check_abc)
+
+
+def test_defer_load_corrupted_yaml_file():
+    def check_corrupted(filename):
+        yaml = YamlFile(filename, defer_load=True)
+        assert yaml.corrupted
+        assert "mapping values are not allowed here" in yaml.corrupted_error_message
+
+    with_file_contents("""
+^
+a:
+  b: c
+""", check_corrupted)
+
+
+def test_fast_load_parses_like_round_trip():
+    contents = """
+a: yes
+b: 010
+c: 0o10
+d: 12:30
+e: 1e3
+f: 2001-12-14t21:59:43.10-05:00
+g: ~
+h: [1, {x: .inf}]
+i: |
+  literal
+"""
+    fast = _fast_load_string(contents)
+    if fast is None:
+        pytest.skip("libyaml is not available")
+    assert dict is type(fast)
+    assert _load_string(contents) == fast
+    assert list(_load_string(contents).keys()) == list(fast.keys())
+
+    # leave these to the round-trip loader
+    assert _fast_load_string("a: 1\na: 2\n") is None
+    assert _fast_load_string("a: &x {b: 1}\nc:\n  <<: *x\n") is None
+    assert _fast_load_string("^\na: b\n") is None
+    assert _fast_load_string("- a\n") is None
+
+
+def test_fast_load_yaml_file_upgrades_for_changes():
+    def check(filename):
+        yaml = YamlFile(filename, fast_load=True)
+        assert yaml._read_value(["a", "b"]) == "c"
+        assert dict(b="c", d=[1, 2]) == yaml._read_root()["a"]
+        assert not yaml.has_unsaved_changes
+        yaml.save()
+        assert yaml.change_count == 1
+
+        # getting a value someone could change loads it for changes
+        d = yaml.get_value(["a", "d"])
+        d.append(3)
+        assert yaml.has_unsaved_changes
+        yaml.save()
+        assert yaml.change_count == 2
+        with open(filename, 'r') as f:
+            saved = f.read()
+        assert "# the comment" in saved
+        assert [1, 2, 3] == YamlFile(filename).get_value(["a", "d"])
+
+        # so does setting a value
+        yaml = YamlFile(filename, fast_load=True)
+        yaml.set_value(["a", "b"], "e")
+        yaml.save()
+        assert "e" == YamlFile(filename).get_value(["a", "b"])
+        with open(filename, 'r') as f:
+            assert "# the comment" in f.read()
+
+    with_file_contents("""
+# the comment
+a:
+  b: c
+  d: [1, 2]
+""", check)
+
+
+def test_fast_load_corrupted_yaml_file():
+    def check_corrupted(filename):
+        yaml = YamlFile(filename, fast_load=True)
+        assert yaml.corrupted
+        assert "mapping values are not allowed here" in yaml.corrupted_error_message
+
+    with_file_contents("""
+^
+a:
+  b: c
+""", check_corrupted)
+
+
 def test_read_yaml_file_and_get_default():
     def check_abc(filename):
         yaml = YamlFile(filename)
@@ -69,6 +69,111 @@ def _load_string(contents):
         return ryaml.load(contents, Loader=ryaml.RoundTripLoader)
 
 
+class _FastLoadFailed(Exception):
+    pass
+
+
+# the loader class made by _fast_loader(), or False if we can't have one
+_fast_loader_class = None
+
+
+def _fast_loader():
+    global _fast_loader_class
+    if _fast_loader_class is None:
+        _fast_loader_class = _make_fast_loader() or False
+    return _fast_loader_class or None
+
+
+def _make_fast_loader():
+    # we rely on dicts keeping the order of the file (the first
+    # command is the default one, for example)
+    if sys.version_info < (3, 7):
+        return None
+    try:
+        # import yaml locally because it's an optional dependency; we
+        # only want its libyaml-based C loader, so it has to have been
+        # built with libyaml
+        from yaml import CSafeLoader
+    except ImportError:
+        return None
+
+    try:
+        from ruamel_yaml.resolver import implicit_resolvers
+    except ImportError:  # pragma: no cover
+        from ruamel.yaml.resolver import implicit_resolvers  # pragma: no cover
+
+    class FastLoader(CSafeLoader):
+        # the round-trip loader uses YAML 1.2 (where "yes" and "12:30"
+        # are strings, for example) and PyYAML only knows 1.1, so we
+        # borrow ruamel.yaml's 1.2 rules for untagged scalars.
+        yaml_implicit_resolvers = dict()
+
+        def construct_yaml_int(self, node):
+            # YAML 1.2 ints don't treat a leading 0 as octal
+            value = self.construct_scalar(node).replace('_', '')
+            sign = 1
+            if value[0] in '+-':
+                if value[0] == '-':
+                    sign = -1
+                value = value[1:]
+            for (prefix, base) in (('0b', 2), ('0o', 8), ('0x', 16)):
+                if value.startswith(prefix):
+                    return sign * int(value[2:], base)
+            return sign * int(value)
+
+        def construct_yaml_timestamp(self, node):
+            # the round-trip loader converts to UTC, without a tzinfo
+            value = CSafeLoader.construct_yaml_timestamp(self, node)
+            offset = getattr(value, 'utcoffset', lambda: None)()
+            if offset is not None:
+                value = (value - offset).replace(tzinfo=None)
+            return value
+
+        def construct_mapping(self, node, deep=False):
+            for (key_node, value_node) in node.value:
+                if key_node.tag == 'tag:yaml.org,2002:merge':
+                    # merge keys are rare, let the round-trip loader do them
+                    raise _FastLoadFailed()
+            mapping = CSafeLoader.construct_mapping(self, node, deep=deep)
+            if len(mapping) != len(node.value):
+                # the round-trip loader says duplicate keys are an error
+                raise _FastLoadFailed()
+            return mapping
+
+    for (versions, tag, regexp, first) in implicit_resolvers:
+        if (1, 2) in versions:
+            FastLoader.add_implicit_resolver(tag, regexp, first)
+    FastLoader.add_constructor('tag:yaml.org,2002:int', FastLoader.construct_yaml_int)
+    FastLoader.add_constructor('tag:yaml.org,2002:timestamp', FastLoader.construct_yaml_timestamp)
+    return FastLoader
+
+
+def _fast_load_string(contents):
+    """Parse into plain dicts and lists with libyaml, or return None.
+
+    This gives the same values as ``_load_string``, without the
+    comments and formatting, in a small fraction of the time. It
+    returns None if libyaml isn't available, or if it can't be sure to
+    parse the file the way ``_load_string`` would (including if the
+    file has errors, so ``_load_string`` gets to report them).
+    """
+    loader = _fast_loader()
+    if loader is None or contents.strip() == '' or '%YAML' in contents:
+        return None
+    from yaml import YAMLError as FastYAMLError
+
+    parser = loader(contents)
+    try:
+        result = parser.get_single_data()
+    except (FastYAMLError, _FastLoadFailed, ValueError):
+        return None
+    finally:
+        parser.dispose()
+    if not isinstance(result, dict):
+        return None
+    return result
+
+
 def _dump_string(yaml):
     return ryaml.dump(yaml, Dumper=ryaml.RoundTripDumper)
 
@@ -115,7 +220,7 @@ class YamlFile(object):
 
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, defer_load=False, fast_load=False):
         """Load a YamlFile with the given filename.
 
         Raises an exception on an IOError, but if the file is
@@ -127,11 +232,37 @@ class YamlFile(object):
         and attempts to modify the file will raise an
         exception.
 
+        If ``defer_load`` is True, the file isn't read until
+        something needs its contents, so callers that already
+        know everything they need from it can skip parsing it.
+
+        If ``fast_load`` is True, the file is parsed with libyaml
+        (when it's installed) for callers that mostly read it. The
+        round-trip parse that preserves comments and formatting only
+        happens when something asks for a value that could be changed
+        in place (``get_value()``, ``root``), or changes the file.
+
         """
         self.filename = filename
         self._previous_content = ""
         self._change_count = 0
-        self.load()
+        self._fast_load = fast_load
+        self._plain_contents = None
+        self._dump_deferred = False
+        if defer_load:
+            # the deferred load counts as the first load, so
+            # change_count doesn't change when it happens
+            self._change_count = 1
+            self._yaml = None
+            self._load_deferred = True
+        else:
+            self.load()
+
+    def _ensure_loaded(self):
+        if self._load_deferred:
+            change_count = self._change_count
+            self.load()
+            self._change_count = change_count
 
     def load(self):
         """Reload the file from disk, discarding any unsaved changes.
@@ -144,6 +275,9 @@ class YamlFile(object):
         Returns:
             None
         """
+        self._load_deferred = False
+        self._plain_contents = None
+        self._dump_deferred = False
         self._corrupted = False
         self._corrupted_error_message = None
         self._corrupted_maybe_line = None
@@ -153,14 +287,27 @@ class YamlFile(object):
         try:
             with codecs.open(self.filename, 'r', 'utf-8') as file:
                 contents = file.read()
-            self._yaml = _load_string(contents)
+            self._yaml = None
+            if self._fast_load:
+                self._yaml = _fast_load_string(contents)
+            if self._yaml is not None:
+                # keep the contents to parse them again if anything
+                # wants to change them
+                self._plain_contents = contents
+            else:
+                self._yaml = _load_string(contents)
 
-            # we re-dump instead of using "contents" because
-            # when loading a hand-edited file, we may reformat
-            # in trivial ways because our round-tripping isn't perfect,
-            # and we don't want to count those trivial reformats as
-            # a reason to save.
-            self._previous_content = _dump_string(self._yaml)
+            if self._fast_load:
+                # we only need this to know whether to save, and
+                # nothing can change until we're done loading fast
+                self._dump_deferred = True
+            else:
+                # we re-dump instead of using "contents" because
+                # when loading a hand-edited file, we may reformat
+                # in trivial ways because our round-tripping isn't perfect,
+                # and we don't want to count those trivial reformats as
+                # a reason to save.
+                self._previous_content = _dump_string(self._yaml)
         except IOError as e:
             if e.errno == errno.ENOENT:
                 self._yaml = None
@@ -207,7 +354,19 @@ class YamlFile(object):
         """Override to change whether we consider a default, unmodified file dirty."""
         return True
 
+    def _load_for_changes(self):
+        # stop loading fast, since someone may change the file
+        self._ensure_loaded()
+        self._fast_load = False
+        if self._plain_contents is not None:
+            self._yaml = _load_string(self._plain_contents)
+            self._plain_contents = None
+        if self._dump_deferred:
+            self._previous_content = _dump_string(self._yaml)
+            self._dump_deferred = False
+
     def _throw_if_corrupted(self):
+        self._ensure_loaded()
         if self._corrupted:
             raise ValueError(
                 "Cannot modify corrupted YAML file %s\n%s" % (self.filename, self._corrupted_error_message))
@@ -227,6 +386,7 @@ class YamlFile(object):
         Returns:
             True if file is corrupted.
         """
+        self._ensure_loaded()
         return self._corrupted
 
     @property
@@ -238,6 +398,7 @@ class YamlFile(object):
         Returns:
             Corruption message or None.
         """
+        self._ensure_loaded()
         return self._corrupted_error_message
 
     @property
@@ -247,6 +408,7 @@ class YamlFile(object):
         Returns:
             Corruption line or None.
         """
+        self._ensure_loaded()
         return self._corrupted_maybe_line
 
     @property
@@ -256,8 +418,14 @@ class YamlFile(object):
         Returns:
             Corruption column or None.
         """
+        self._ensure_loaded()
         return self._corrupted_maybe_column
 
+    @property
+    def is_loaded(self):
+        """False if the file was constructed with ``defer_load`` and nothing has needed its contents yet."""
+        return not self._load_deferred
+
     @property
     def change_count(self):
         """Get the number of times we've resynced with the file on disk (reloaded or saved changes).
@@ -272,6 +440,10 @@ class YamlFile(object):
     def has_unsaved_changes(self):
         """Get whether changes are all saved."""
         # this is a fairly expensive check
+        self._ensure_loaded()
+        if self._dump_deferred:
+            # nothing could have changed it since we loaded fast
+            return False
         return self._previous_content != _dump_string(self._yaml)
 
     def use_changes_without_saving(self):
@@ -290,6 +462,10 @@ class YamlFile(object):
         Returns:
             None
         """
+        self._ensure_loaded()
+        if self._dump_deferred:
+            # nothing could have changed it since we loaded fast
+            return
         self._throw_if_corrupted()
 
         contents = _dump_string(self._yaml)
@@ -309,6 +485,7 @@ class YamlFile(object):
                 raise ValueError("YAML file path must be a string or an iterable of strings")
 
     def _get_dict_or_none(self, pieces):
+        self._ensure_loaded()
         current = self._yaml
         for p in pieces:
             if p in current and isinstance(current[p], dict):
@@ -343,6 +520,7 @@ class YamlFile(object):
             value: any YAML-compatible value type
         """
         self._throw_if_corrupted()
+        self._load_for_changes()
 
         path = self._path(path)
         existing = self._ensure_dicts_at_path(path[:-1])
@@ -357,6 +535,7 @@ class YamlFile(object):
             path (str or list of str): single key, or list of nested keys
         """
         self._throw_if_corrupted()
+        self._load_for_changes()
 
         path = self._path(path)
 
@@ -375,6 +554,13 @@ class YamlFile(object):
         Returns:
             the value from the file or the provided default
         """
+        # callers may change the value we return in place
+        self._load_for_changes()
+        return self._read_value(path, default)
+
+    def _read_value(self, path, default=None):
+        # like get_value(), but the value must not be changed in
+        # place, since it may be from a fast load
         path = self._path(path)
         existing = self._get_dict_or_none(path[:-1])
         if existing is None:
@@ -386,5 +572,14 @@ class YamlFile(object):
     def root(self):
         """Get the outermost value from the yaml file."""
         self._throw_if_corrupted()
+        # callers may change it in place
+        self._load_for_changes()
+
+        return self._yaml
+
+    def _read_root(self):
+        # like root, but the value must not be changed in place,
+        # since it may be from a fast load
+        self._throw_if_corrupted()
 
         return self._yaml
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark checking whether an environment is up-to-date.
+
+Compares the environment manifest used by DefaultCondaManager with
+the checks it used before, the directory mtime comparison (when it
+hits) and listing conda-meta plus "pip freeze" (when it misses).
+
+By default this builds a fake environment with 350 conda packages and
+350 pip packages; pass --prefix to measure a real environment instead.
+The fake environment's "pip" runs "pip freeze --path" with the current
+Python on the fake site-packages (Unix only).
+"""
+
+from __future__ import print_function
+
+# Standard library imports
+import argparse
+import glob
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import timeit
+
+# Local imports
+HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from anaconda_project.env_spec import EnvSpec  # noqa: E402
+from anaconda_project.frontend import NullFrontend  # noqa: E402
+from anaconda_project.internal.default_conda_manager import DefaultCondaManager  # noqa: E402
+import anaconda_project.internal.conda_api as conda_api  # noqa: E402
+import anaconda_project.internal.pip_api as pip_api  # noqa: E402
+
+
+def make_fake_env(prefix, count):
+    """Create conda-meta and site-packages entries for count packages each."""
+    conda_meta = os.path.join(prefix, 'conda-meta')
+    site_packages = os.path.join(prefix, 'lib', 'python3.6', 'site-packages')
+    os.makedirs(conda_meta)
+    os.makedirs(site_packages)
+    os.makedirs(os.path.join(prefix, 'bin'))
+    for i in range(count):
+        with open(os.path.join(conda_meta, 'condapackage%d-1.%d-py36_0.json' % (i, i)), 'w') as f:
+            f.write('{}')
+        dist_info = os.path.join(site_packages, 'pippackage%d-1.%d.dist-info' % (i, i))
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.1\nName: pippackage%d\nVersion: 1.%d\n' % (i, i))
+    pip = os.path.join(prefix, 'bin', 'pip')
+    with open(pip, 'w') as f:
+        f.write('#!/bin/sh\nexec "%s" -m pip "$@" --path "%s"\n' % (sys.executable, site_packages))
+    os.chmod(pip, os.stat(pip).st_mode | stat.S_IXUSR)
+
+
+def mtime_check(prefix):
+    """The old fast path: compare mtimes of a few directories to a stamp."""
+    dirs = list(glob.iglob(os.path.join(prefix, "lib", "python*", "site-packages")))
+    dirs.extend([os.path.join(prefix, d) for d in ("bin", "lib", "conda-meta", "Scripts")])
+    return [os.path.getmtime(d) for d in dirs if os.path.exists(d)]
+
+
+def list_packages(prefix):
+    """The old slow path: list conda packages and run pip freeze."""
+    conda_api.installed(prefix)
+    # what pip_api.installed() did before it could read metadata itself
+    pip_api._call_pip(prefix, extra_args=['freeze'])
+
+
+def list_packages_from_metadata(prefix):
+    """The new slow path: list conda packages and read pip metadata."""
+    conda_api.installed(prefix)
+    pip_api.installed(prefix)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--prefix', help='existing environment to measure')
+    parser.add_argument('--packages', type=int, default=350, help='packages of each kind in the fake environment')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    tmpdir = None
+    prefix = args.prefix
+    if prefix is None:
+        tmpdir = tempfile.mkdtemp(prefix='anaconda-project-benchmark-')
+        prefix = os.path.join(tmpdir, 'env')
+        make_fake_env(prefix, args.packages)
+
+    try:
+        manager = DefaultCondaManager(frontend=NullFrontend())
+        spec = EnvSpec(name='benchmark', conda_packages=[], pip_packages=['something'], channels=[])
+        manager._write_manifest_file(prefix, spec)
+        assert manager._manifest_file_up_to_date(prefix, spec)
+
+        print("conda packages: %d" % len(conda_api.installed(prefix)))
+        print("pip packages: %d" % len(pip_api.installed(prefix)))
+
+        def report(name, func, repeat):
+            seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+            print("%-44s %10.3f ms" % (name, seconds * 1000))
+
+        report("old: mtime comparison (hit)", lambda: mtime_check(prefix), args.repeat)
+        report("old: conda-meta + pip freeze (miss)", lambda: list_packages(prefix), min(args.repeat, 5))
+        report("new: manifest check", lambda: manager._manifest_file_up_to_date(prefix, spec), args.repeat)
+        report("new: conda-meta + pip metadata (miss)", lambda: list_packages_from_metadata(prefix), args.repeat)
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
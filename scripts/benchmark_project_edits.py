@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark many sequential project_ops edits to one project.
+
+Each edit adds a variable or a command, which validates and saves
+the project file. We time the edits with the project updated
+incrementally (only the parts depending on the changed sections),
+and again with it rebuilt from scratch after every edit as it
+used to be. Besides the total, we report the time spent updating
+the project from its files, since saving them costs the same
+either way.
+"""
+
+from __future__ import print_function
+
+# Standard library imports
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Local imports
+HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from anaconda_project import project_ops  # noqa: E402
+from anaconda_project.project import Project, _ConfigCache  # noqa: E402
+from benchmark_project_load import make_fake_project  # noqa: E402
+
+
+def edit(directory, edits, from_scratch):
+    """Make the edits and return how long they took in total, and updating the project."""
+    project = Project(directory)
+    assert [] == project.problems, project.problems
+
+    updating = [0.0]
+    original_update = _ConfigCache.update
+
+    def timed_update(self, project_file, lock_file):
+        start = time.time()
+        try:
+            return original_update(self, project_file, lock_file)
+        finally:
+            updating[0] += time.time() - start
+
+    _ConfigCache.update = timed_update
+    start = time.time()
+    for i in range(edits):
+        if from_scratch:
+            project._config_cache.forget_steps()
+        if i % 2 == 0:
+            status = project_ops.add_variables(project, None, ['VAR%d' % i], dict())
+        else:
+            status = project_ops.add_command(project, 'command%d' % i, 'unix', 'echo %d' % i)
+        assert status, status.errors
+    seconds = time.time() - start
+    _ConfigCache.update = original_update
+    return (seconds, updating[0])
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--edits', type=int, default=1000)
+    parser.add_argument('--env-specs', type=int, default=3, help='env specs in the fake project')
+    parser.add_argument('--packages', type=int, default=100, help='locked packages per platform in the fake project')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='anaconda-project-benchmark-')
+    try:
+        for (name, from_scratch) in (("incremental", False), ("from scratch", True)):
+            directory = os.path.join(tmpdir, name.replace(" ", "-"))
+            make_fake_project(directory, args.env_specs, args.packages)
+            (seconds, updating) = edit(directory, args.edits, from_scratch)
+            print("%-14s %6d edits %10.3f s total %10.3f ms/edit updating" % (name, args.edits, seconds,
+                                                                               updating * 1000 / args.edits))
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016, Anaconda, Inc. All rights reserved.
+#
+# Licensed under the terms of the BSD 3-Clause License.
+# The full license is in the file LICENSE.txt, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark loading a project: parsing fully, parsing fast, and from a compiled snapshot.
+
+By default this builds a fake project whose lock file has 400
+packages locked for each of three platforms in each of three env
+specs; pass --project to measure a real project instead (it must not
+have problems, or nothing is snapshotted).
+"""
+
+from __future__ import print_function
+
+# Standard library imports
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# Local imports
+HERE = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from anaconda_project.internal import compiled_project  # noqa: E402
+from anaconda_project.project import Project  # noqa: E402
+
+_PLATFORMS = ('linux-64', 'osx-64', 'win-64')
+
+
+def make_fake_project(directory, env_spec_count, package_count):
+    """Create a project with env_spec_count env specs, each locking package_count packages."""
+    os.makedirs(directory)
+    lines = ["name: benchmark", "platforms: [%s]" % ", ".join(_PLATFORMS), "variables:", "  FOO: {default: bar}",
+             "commands:", "  default:", "    unix: echo hello", "    windows: echo hello", "env_specs:"]
+    for i in range(env_spec_count):
+        lines.extend(["  env%d:" % i, "    packages: [python, numpy]", "    channels: [defaults]"])
+    with open(os.path.join(directory, 'anaconda-project.yml'), 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+    # lock with the right hashes, so the project has no problems
+    project = Project(directory)
+    lines = ["locking_enabled: true", "env_specs:"]
+    for (name, env_spec) in sorted(project.env_specs.items()):
+        lines.extend(["  %s:" % name, "    locked: true", "    env_spec_hash: %s" % env_spec.logical_hash,
+                      "    platforms: [%s]" % ", ".join(_PLATFORMS), "    packages:"])
+        for platform in _PLATFORMS:
+            lines.extend(["      %s:" % platform, "      - python=3.6.0=0", "      - numpy=1.11.3=py36_0"])
+            lines.extend("      - package%d=1.%d=py36_0" % (j, j) for j in range(package_count))
+    with open(os.path.join(directory, 'anaconda-project-lock.yml'), 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def load(directory, compiled_cache):
+    """Load a project and touch what "anaconda-project run" needs."""
+    project = Project(directory, compiled_cache=compiled_cache)
+    assert [] == project.problems, project.problems
+    project.default_command
+    project.requirements(project.default_env_spec_name)
+    return project
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--project', help='existing project to measure')
+    parser.add_argument('--env-specs', type=int, default=3, help='env specs in the fake project')
+    parser.add_argument('--packages', type=int, default=400, help='locked packages per platform in the fake project')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    if not compiled_project.supported:
+        print("Compiled snapshots need Python 3.")
+        return 1
+
+    tmpdir = tempfile.mkdtemp(prefix='anaconda-project-benchmark-')
+    # keep our snapshots out of the real user cache
+    os.environ['ANACONDA_PROJECT_CACHE_DIR'] = os.path.join(tmpdir, 'cache')
+    directory = args.project
+    if directory is None:
+        directory = os.path.join(tmpdir, 'project')
+        make_fake_project(directory, args.env_specs, args.packages)
+
+    try:
+        for name in ('anaconda-project.yml', 'anaconda-project-lock.yml'):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                print("%-28s %10d bytes" % (name, os.path.getsize(path)))
+
+        def report(name, func, repeat):
+            seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+            print("%-28s %10.3f ms" % (name, seconds * 1000))
+
+        report("parse and validate", lambda: load(directory, False), args.repeat)
+
+        # without snapshots, compiled_cache=True only parses fast
+        compiled_project.supported = False
+        try:
+            report("parse fast and validate", lambda: load(directory, True), args.repeat)
+        finally:
+            compiled_project.supported = True
+
+        # the first load saves the snapshot
+        assert load(directory, True).project_file.is_loaded
+        assert not load(directory, True).project_file.is_loaded
+        report("load compiled snapshot", lambda: load(directory, True), args.repeat)
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())